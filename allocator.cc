@@ -10,6 +10,7 @@
 #include "lockguard.h"
 #include "static_vector.h"
 #include "counter.h"
+#include "topology.h"
 
 using namespace util;
 
@@ -353,7 +354,7 @@ allocator::FaultRegion(size_t cpu)
   numa_hint_memory_placement(
       pc.region_begin,
       (uintptr_t)pc.region_end - (uintptr_t)pc.region_begin,
-      numa_node_of_cpu(cpu));
+      numa_node_of_cpu(topology::CpuOfSlot(cpu)));
   const size_t nfaults =
     ((uintptr_t)pc.region_end - (uintptr_t)pc.region_begin) / hugepgsize;
   std::cerr << "cpu" << cpu << " starting faulting region ("
@@ -2,6 +2,7 @@
 #define _NDB_BASE_TXN_BTREE_H_
 
 #include "btree_choice.h"
+#include "coro.h"
 #include "txn.h"
 #include "lockguard.h"
 #include "util.h"
@@ -16,7 +17,9 @@
 // behavior- the default implementation is just nops
 template <template <typename> class Transaction>
 struct base_txn_btree_handler {
-  static inline void on_construct() {} // called when initializing
+  // called when initializing
+  static inline void on_construct(const std::string &name,
+                                  const concurrent_btree *btr) {}
   static const bool has_background_task = false;
 };
 
@@ -36,7 +39,7 @@ public:
       name(name),
       been_destructed(false)
   {
-    base_txn_btree_handler<Transaction>::on_construct();
+    base_txn_btree_handler<Transaction>::on_construct(name, &underlying_btree);
   }
 
   ~base_txn_btree()
@@ -77,8 +80,30 @@ public:
    */
   std::map<std::string, uint64_t> unsafe_purge(bool dump_stats = false);
 
+  /**
+   * the memory taken up by the latest versions of the tuples in the tree
+   * (older versions are not counted): "tuples", "tuple_bytes" (as
+   * allocated, see dbtuple::footprint()), "tuple_header_bytes" and
+   * "chained_tuples" (those with an older version). not transactional- only
+   * exact if there are no concurrent modifications
+   */
+  std::map<std::string, uint64_t> unsafe_footprint() const;
+
 private:
 
+  struct footprint_tree_walker : public concurrent_btree::tree_walk_callback {
+    footprint_tree_walker()
+      : ntuples(0), nbytes(0), nchained(0) {}
+    virtual void on_node_begin(const typename concurrent_btree::node_opaque_t *n);
+    virtual void on_node_success();
+    virtual void on_node_failure();
+    uint64_t ntuples;
+    uint64_t nbytes;
+    uint64_t nchained;
+  private:
+    std::vector< std::pair<typename concurrent_btree::value_type, bool> > spec_values;
+  };
+
   struct purge_tree_walker : public concurrent_btree::tree_walk_callback {
     virtual void on_node_begin(const typename concurrent_btree::node_opaque_t *n);
     virtual void on_node_success();
@@ -147,9 +172,12 @@ protected:
           Transaction<Traits> *t,
           Callback *caller_callback,
           KeyReader *key_reader,
-          ValueReader *value_reader)
+          ValueReader *value_reader,
+          const concurrent_btree *btr,
+          const std::string *scan_key)
       : t(t), caller_callback(caller_callback),
-        key_reader(key_reader), value_reader(value_reader) {}
+        key_reader(key_reader), value_reader(value_reader),
+        btr(btr), scan_key(scan_key) {}
 
     virtual void on_resp_node(const typename concurrent_btree::node_opaque_t *n, uint64_t version);
     virtual bool invoke(const typename concurrent_btree::string_type &k, typename concurrent_btree::value_type v,
@@ -160,6 +188,9 @@ protected:
     Callback *const caller_callback;
     KeyReader *const key_reader;
     ValueReader *const value_reader;
+    // for abort attribution- nodes are attributed to the scan's start key
+    const concurrent_btree *const btr;
+    const std::string *const scan_key;
   };
 
   template <typename Traits, typename ValueReader>
@@ -168,6 +199,26 @@ protected:
             const typename P::Key &k,
             ValueReader &value_reader);
 
+  // as do_search(), for a key already in its byte form (which need not be
+  // stable: reads only keep a copy of it for abort attribution)
+  template <typename Traits, typename ValueReader>
+  inline bool
+  do_search_varkey(Transaction<Traits> &t,
+                   const varkey &vk,
+                   ValueReader &value_reader);
+
+  // searches keys[0, n) at once: the btree descents for a batch of keys are
+  // interleaved (see concurrent_btree::prefetch_search()), and so are the
+  // tuple fetches. the reads are recorded in key order, as n do_search()es
+  // would. value_readers[i] reads keys[i], if found[i]
+  template <typename Traits, typename ValueReader>
+  inline void
+  do_multi_search(Transaction<Traits> &t,
+                  const typename P::Key *keys,
+                  size_t n,
+                  ValueReader *value_readers,
+                  bool *found);
+
   template <typename Traits, typename Callback,
             typename KeyReader, typename ValueReader>
   inline void
@@ -224,21 +275,107 @@ base_txn_btree<Transaction, P>::do_search(
   typename P::KeyWriter key_writer(&k);
   const std::string * const key_str =
     key_writer.fully_materialize(true, t.string_allocator());
+  return do_search_varkey(t, varkey(*key_str), value_reader);
+}
+
+template <template <typename> class Transaction, typename P>
+template <typename Traits, typename ValueReader>
+bool
+base_txn_btree<Transaction, P>::do_search_varkey(
+    Transaction<Traits> &t,
+    const varkey &vk,
+    ValueReader &value_reader)
+{
+  t.ensure_active();
+
+  // when txns run as coroutines (see coro.h), descend as prefetches
+  // first, letting the thread's other txns run while each level and then
+  // the tuple are fetched
+  const bool yield = coro::Active() && t.may_yield();
+  if (yield)
+    this->underlying_btree.prefetch_search(&vk, 1, true);
 
   // search the underlying btree to map k=>(btree_node|tuple)
   typename concurrent_btree::value_type underlying_v{};
   concurrent_btree::versioned_node_t search_info;
-  const bool found = this->underlying_btree.search(varkey(*key_str), underlying_v, &search_info);
+  const bool found = this->underlying_btree.search(vk, underlying_v, &search_info);
   if (found) {
     const dbtuple * const tuple = reinterpret_cast<const dbtuple *>(underlying_v);
+    if (yield) {
+      ::prefetch(tuple);
+      prefetch_bytes(tuple, sizeof(dbtuple) + value_size_hint);
+      coro::Yield();
+    }
+    t.note_read_origin(tuple, &this->underlying_btree,
+                       (const char *) vk.data(), vk.size());
     return t.do_tuple_read(tuple, value_reader);
   } else {
     // not found, add to absent_set
+    t.note_read_origin(search_info.first, &this->underlying_btree,
+                       (const char *) vk.data(), vk.size());
     t.do_node_read(search_info.first, search_info.second);
     return false;
   }
 }
 
+template <template <typename> class Transaction, typename P>
+template <typename Traits, typename ValueReader>
+void
+base_txn_btree<Transaction, P>::do_multi_search(
+    Transaction<Traits> &t,
+    const typename P::Key *keys,
+    size_t n,
+    ValueReader *value_readers,
+    bool *found)
+{
+  static const size_t B = concurrent_btree::PrefetchSearchBatch;
+  t.ensure_active();
+  const bool yield = coro::Active() && t.may_yield();
+
+  for (size_t base = 0; base < n; base += B) {
+    const size_t m = std::min(n - base, B);
+    const std::string *key_strs[B];
+    varkey vks[B];
+    for (size_t i = 0; i < m; i++) {
+      typename P::KeyWriter key_writer(&keys[base + i]);
+      key_strs[i] = key_writer.fully_materialize(true, t.string_allocator());
+      vks[i] = varkey(*key_strs[i]);
+    }
+    this->underlying_btree.prefetch_search(&vks[0], m, yield);
+
+    // the leaves are (mostly) cached now: find every tuple, and prefetch
+    // them all before reading any
+    typename concurrent_btree::value_type underlying_vs[B];
+    concurrent_btree::versioned_node_t search_infos[B];
+    for (size_t i = 0; i < m; i++) {
+      underlying_vs[i] = typename concurrent_btree::value_type();
+      found[base + i] = this->underlying_btree.search(
+          vks[i], underlying_vs[i], &search_infos[i]);
+      if (found[base + i]) {
+        ::prefetch(underlying_vs[i]);
+        prefetch_bytes(underlying_vs[i], sizeof(dbtuple) + value_size_hint);
+      }
+    }
+    if (yield)
+      coro::Yield();
+
+    for (size_t i = 0; i < m; i++) {
+      const std::string * const key_str = key_strs[i];
+      if (found[base + i]) {
+        const dbtuple * const tuple =
+          reinterpret_cast<const dbtuple *>(underlying_vs[i]);
+        t.note_read_origin(tuple, &this->underlying_btree,
+                           key_str->data(), key_str->size());
+        found[base + i] = t.do_tuple_read(tuple, value_readers[base + i]);
+      } else {
+        t.note_read_origin(search_infos[i].first, &this->underlying_btree,
+                           key_str->data(), key_str->size());
+        t.do_node_read(search_infos[i].first, search_infos[i].second);
+      }
+    }
+  }
+}
+
 template <template <typename> class Transaction, typename P>
 std::map<std::string, uint64_t>
 base_txn_btree<Transaction, P>::unsafe_purge(bool dump_stats)
@@ -258,6 +395,51 @@ base_txn_btree<Transaction, P>::unsafe_purge(bool dump_stats)
 #endif
 }
 
+template <template <typename> class Transaction, typename P>
+std::map<std::string, uint64_t>
+base_txn_btree<Transaction, P>::unsafe_footprint() const
+{
+  footprint_tree_walker w;
+  scoped_rcu_region guard;
+  underlying_btree.tree_walk(w);
+  std::map<std::string, uint64_t> ret;
+  ret["tuples"] = w.ntuples;
+  ret["tuple_bytes"] = w.nbytes;
+  ret["tuple_header_bytes"] = w.ntuples * sizeof(dbtuple);
+  ret["chained_tuples"] = w.nchained;
+  return ret;
+}
+
+template <template <typename> class Transaction, typename P>
+void
+base_txn_btree<Transaction, P>::footprint_tree_walker::on_node_begin(const typename concurrent_btree::node_opaque_t *n)
+{
+  INVARIANT(spec_values.empty());
+  spec_values = concurrent_btree::ExtractValues(n);
+}
+
+template <template <typename> class Transaction, typename P>
+void
+base_txn_btree<Transaction, P>::footprint_tree_walker::on_node_success()
+{
+  for (size_t i = 0; i < spec_values.size(); i++) {
+    const dbtuple * const tuple = (const dbtuple *) spec_values[i].first;
+    INVARIANT(tuple);
+    ntuples++;
+    nbytes += tuple->footprint();
+    if (tuple->get_next())
+      nchained++;
+  }
+  spec_values.clear();
+}
+
+template <template <typename> class Transaction, typename P>
+void
+base_txn_btree<Transaction, P>::footprint_tree_walker::on_node_failure()
+{
+  spec_values.clear();
+}
+
 template <template <typename> class Transaction, typename P>
 void
 base_txn_btree<Transaction, P>::purge_tree_walker::on_node_begin(const typename concurrent_btree::node_opaque_t *n)
@@ -388,6 +570,7 @@ base_txn_btree<Transaction, P>
   VERBOSE(std::cerr << "on_resp_node(): <node=0x" << util::hexify(intptr_t(n))
                << ", version=" << version << ">" << std::endl);
   VERBOSE(std::cerr << "  " << concurrent_btree::NodeStringify(n) << std::endl);
+  t->note_read_origin(n, btr, scan_key->data(), scan_key->size());
   t->do_node_read(n, version);
 }
 
@@ -406,6 +589,7 @@ base_txn_btree<Transaction, P>
                     << ", version=" << version << ">" << std::endl
                     << "  " << *((dbtuple *) v) << std::endl);
   const dbtuple * const tuple = reinterpret_cast<const dbtuple *>(v);
+  t->note_read_origin(tuple, btr, k.data(), k.length());
   if (t->do_tuple_read(tuple, *value_reader))
     return caller_callback->invoke(
         (*key_reader)(k), value_reader->results());
@@ -446,7 +630,8 @@ base_txn_btree<Transaction, P>::do_search_range_call(
     return;
 
   txn_search_range_callback<Traits, Callback, KeyReader, ValueReader> c(
-			&t, &callback, &key_reader, &value_reader);
+			&t, &callback, &key_reader, &value_reader,
+			&this->underlying_btree, lower_str);
 
   varkey uppervk;
   if (upper_str)
@@ -482,7 +667,8 @@ base_txn_btree<Transaction, P>::do_rsearch_range_call(
     return;
 
   txn_search_range_callback<Traits, Callback, KeyReader, ValueReader> c(
-			&t, &callback, &key_reader, &value_reader);
+			&t, &callback, &key_reader, &value_reader,
+			&this->underlying_btree, upper_str);
 
   varkey lowervk;
   if (lower_str)
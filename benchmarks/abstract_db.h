@@ -7,9 +7,11 @@
 
 #include <map>
 #include <string>
+#include <vector>
 
 #include "abstract_ordered_index.h"
 #include "../str_arena.h"
+#include "../histogram.h"
 
 /**
  * Abstract interface for a DB. This is to facilitate writing
@@ -65,8 +67,35 @@ public:
   virtual std::tuple<uint64_t, uint64_t, double>
     get_ntxn_persisted() const { return std::make_tuple(0, 0, 0.0); }
 
+  // distribution of the latencies averaged by get_ntxn_persisted(), in usec
+  virtual log_histogram
+    get_persist_latency_histogram() const { return log_histogram(); }
+
+  // persisted txns which were committed on core. may be called while the
+  // benchmark is running
+  virtual uint64_t
+    get_ntxn_persisted_on_core(unsigned core) const { return 0; }
+
   virtual void reset_ntxn_persisted() { }
 
+  /**
+   * For readers which need one consistent snapshot across many read-only
+   * txns (e.g. checkpoints): pins the snapshot a read-only txn started now
+   * would read, and fills in epoch such that it contains exactly the txns
+   * committed in epochs <= epoch. Returns false if the db has no snapshots.
+   *
+   * At most one snapshot is pinned at a time
+   */
+  virtual bool pin_snapshot(uint64_t &epoch) { return false; }
+
+  virtual void unpin_snapshot() { }
+
+  /**
+   * Whether read-only txns started by the calling thread read the pinned
+   * snapshot (instead of the latest one)
+   */
+  virtual void use_pinned_snapshot(bool use) { }
+
   enum TxnProfileHint {
     HINT_DEFAULT,
 
@@ -125,10 +154,35 @@ public:
 
   virtual void print_txn_debug(void *txn) const {}
 
+  /**
+   * The phases of commit_txn() timed by take_commit_phase_sample(), in
+   * order (none if the db does not time its commits)
+   */
+  virtual std::vector<std::string>
+  commit_phase_names() const
+  {
+    return std::vector<std::string>();
+  }
+
+  /**
+   * If the last commit_txn() which committed on the calling thread was
+   * timed (and not taken yet), fills in the cycles it spent in each of
+   * commit_phase_names(), and returns true
+   */
+  virtual bool take_commit_phase_sample(uint64_t *cycles) { return false; }
+
+  /**
+   * key_type declares the index's keys (see
+   * abstract_ordered_index::key_type): an index of integer keys only ever
+   * holds keys of their width, and may be used with the *_int() methods.
+   * Dbs which do not specialize integer keys ignore it
+   */
   virtual abstract_ordered_index *
   open_index(const std::string &name,
              size_t value_size_hint,
-             bool mostly_append = false) = 0;
+             bool mostly_append = false,
+             abstract_ordered_index::key_type key_type =
+               abstract_ordered_index::KEY_TYPE_STRING) = 0;
 
   virtual void
   close_index(abstract_ordered_index *idx) = 0;
@@ -1,6 +1,7 @@
 #ifndef _ABSTRACT_ORDERED_INDEX_H_
 #define _ABSTRACT_ORDERED_INDEX_H_
 
+#include <endian.h>
 #include <stdint.h>
 #include <string>
 #include <utility>
@@ -8,6 +9,7 @@
 
 #include "../macros.h"
 #include "../str_arena.h"
+#include "../value_delta.h"
 
 /**
  * The underlying index manages memory for keys/values, but
@@ -17,6 +19,50 @@
 class abstract_ordered_index {
 public:
 
+  /**
+   * The keys of an index, as declared to abstract_db::open_index(): byte
+   * strings, or unsigned integers of one (KEY_TYPE_U64) or two
+   * (KEY_TYPE_U128) 64-bit words, most significant first. Integer keys are
+   * the big endian bytes of their words (so that byte order is numeric
+   * order), as u64_varkey makes them, and can be used with either the
+   * string based methods or the *_int() ones, which take the words.
+   */
+  enum key_type {
+    KEY_TYPE_STRING,
+    KEY_TYPE_U64,
+    KEY_TYPE_U128,
+  };
+
+  static inline size_t
+  KeyWords(key_type kt)
+  {
+    INVARIANT(kt != KEY_TYPE_STRING);
+    return kt == KEY_TYPE_U128 ? 2 : 1;
+  }
+
+  // the bytes of the integer key k[0, nwords), into buf
+  static inline const std::string &
+  EncodeIntKey(std::string &buf, const uint64_t *k, size_t nwords)
+  {
+    buf.resize(nwords * sizeof(uint64_t));
+    for (size_t i = 0; i < nwords; i++) {
+      const uint64_t w = htobe64(k[i]);
+      NDB_MEMCPY(&buf[i * sizeof(uint64_t)], &w, sizeof(w));
+    }
+    return buf;
+  }
+
+  // the inverse: the words of the integer key whose bytes are at p
+  static inline void
+  DecodeIntKey(const char *p, size_t nwords, uint64_t *k)
+  {
+    for (size_t i = 0; i < nwords; i++) {
+      uint64_t w;
+      NDB_MEMCPY(&w, p + i * sizeof(uint64_t), sizeof(w));
+      k[i] = be64toh(w);
+    }
+  }
+
   virtual ~abstract_ordered_index() {}
 
   /**
@@ -29,6 +75,25 @@ public:
       std::string &value,
       size_t max_bytes_read = std::string::npos) = 0;
 
+  /**
+   * Get n keys at once: found[i] is set to whether keys[i] was found, and
+   * if so values[i] to its value. Implementations may overlap the lookups
+   * (eg ndb's, which interleaves the tree descents and prefetches); the
+   * default implementation calls get() once per key.
+   */
+  virtual void
+  multi_get(
+      void *txn,
+      const std::string *keys,
+      size_t n,
+      std::string *values,
+      bool *found,
+      size_t max_bytes_read = std::string::npos)
+  {
+    for (size_t i = 0; i < n; i++)
+      found[i] = get(txn, keys[i], values[i], max_bytes_read);
+  }
+
   class scan_callback {
   public:
     virtual ~scan_callback() {}
@@ -94,6 +159,25 @@ public:
                     static_cast<const std::string &>(value));
   }
 
+  /**
+   * Put the value which the value delta (see value_delta.h, EncodeDelta())
+   * makes of the key's current value. The txn must have read the key (and
+   * found it), the delta being relative to that value, and must not have
+   * written it since. Implementations may write only the bytes the delta
+   * covers (eg ndb's, which also logs just the delta); the default
+   * implementation gets the value, applies the delta and calls put()
+   */
+  virtual const char *
+  put_delta(void *txn,
+            const std::string &key,
+            const std::string &delta)
+  {
+    std::string value;
+    ALWAYS_ASSERT(get(txn, key, value));
+    ALWAYS_ASSERT(value_delta::FailsafeApply(value, delta));
+    return put(txn, key, value);
+  }
+
   /**
    * Insert a key of length keylen.
    *
@@ -136,11 +220,112 @@ public:
     remove(txn, static_cast<const std::string &>(key));
   }
 
+  /**
+   * get(), put(), insert(), remove() and scan() by integer key (see
+   * key_type): k points to the key's nwords words. Implementations may use
+   * the key without making a string of it (eg ndb's, whose reads search it
+   * straight from the stack); the default implementations encode it (see
+   * EncodeIntKey()) and call the string based methods. scan_int() passes
+   * the callback the keys' bytes, which DecodeIntKey() turns back into words
+   */
+  virtual bool
+  get_int(void *txn,
+          const uint64_t *k,
+          size_t nwords,
+          std::string &value,
+          size_t max_bytes_read = std::string::npos)
+  {
+    std::string key;
+    return get(txn, EncodeIntKey(key, k, nwords), value, max_bytes_read);
+  }
+
+  virtual const char *
+  put_int(void *txn,
+          const uint64_t *k,
+          size_t nwords,
+          const std::string &value)
+  {
+    std::string key;
+    return put(txn, EncodeIntKey(key, k, nwords), value);
+  }
+
+  virtual const char *
+  insert_int(void *txn,
+             const uint64_t *k,
+             size_t nwords,
+             const std::string &value)
+  {
+    std::string key;
+    return insert(txn, EncodeIntKey(key, k, nwords), value);
+  }
+
+  virtual void
+  remove_int(void *txn,
+             const uint64_t *k,
+             size_t nwords)
+  {
+    std::string key;
+    remove(txn, EncodeIntKey(key, k, nwords));
+  }
+
+  /**
+   * Search [start_key, *end_key) if end_key is not null, otherwise
+   * search [start_key, +infty). Both keys have nwords words
+   */
+  virtual void
+  scan_int(void *txn,
+           const uint64_t *start_key,
+           const uint64_t *end_key,
+           size_t nwords,
+           scan_callback &callback,
+           str_arena *arena = nullptr)
+  {
+    std::string lower, upper;
+    EncodeIntKey(lower, start_key, nwords);
+    if (end_key)
+      EncodeIntKey(upper, end_key, nwords);
+    scan(txn, lower, end_key ? &upper : nullptr, callback, arena);
+  }
+
+  /**
+   * Bulk loading, for the loading phase (see --bulk-load). Records passed
+   * to bulk_insert() are buffered, outside of any txn (from any number of
+   * threads), and put in the index by bulk_load_finish(), which builds it
+   * with its leaves fill_factor full. A key inserted more than once by one
+   * thread maps to its last value. Nothing is logged.
+   *
+   * bulk_load_finish() is not thread safe, and the index must have been
+   * empty. Only usable if supports_bulk_load()
+   */
+  virtual bool supports_bulk_load() const { return false; }
+
+  virtual void
+  bulk_insert(const std::string &key, const std::string &value)
+  {
+    ALWAYS_ASSERT(false);
+  }
+
+  virtual void
+  bulk_load_finish(double fill_factor)
+  {
+    ALWAYS_ASSERT(false);
+  }
+
   /**
    * Only an estimate, not transactional!
    */
   virtual size_t size() const = 0;
 
+  /**
+   * The memory taken up by the records (not by the index), as named
+   * counts. Only an estimate, not transactional! Empty if not supported
+   */
+  virtual std::map<std::string, uint64_t>
+  footprint() const
+  {
+    return std::map<std::string, uint64_t>();
+  }
+
   /**
    * Not thread safe for now
    */
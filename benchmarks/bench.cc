@@ -1,9 +1,16 @@
 #include <iostream>
 #include <fstream>
 #include <sstream>
+#include <set>
+#include <algorithm>
+#include <functional>
 #include <vector>
 #include <utility>
 #include <string>
+#include <atomic>
+#include <thread>
+#include <mutex>
+#include <cmath>
 
 #include <stdlib.h>
 #include <sched.h>
@@ -11,10 +18,13 @@
 #include <sys/sysinfo.h>
 
 #include "bench.h"
+#include "checkpoint.h"
 
 #include "../counter.h"
 #include "../scopedperf.hh"
 #include "../allocator.h"
+#include "../ticker.h"
+#include "../coro.h"
 
 #ifdef USE_JEMALLOC
 //cannot include this header b/c conflicts with malloc.h
@@ -43,6 +53,18 @@ int slow_exit = 0;
 int retry_aborted_transaction = 0;
 int no_reset_counters = 0;
 int backoff_aborted_transaction = 0;
+uint64_t sample_interval_ms = 0;
+string sample_file;
+uint64_t checkpoint_interval_ms = 0;
+vector<string> checkpoint_logfiles;
+int checkpoint_fsync = 1;
+string db_image;
+string db_image_label;
+int enable_bulk_load = 0;
+double bulk_load_fill_factor = 1.0;
+double offered_load = 0.0;
+int arrival_process = ARRIVAL_FIXED;
+size_t ncoroutines = 1;
 
 template <typename T>
 static void
@@ -81,6 +103,48 @@ get_system_memory_info()
   return make_pair(inf.mem_unit * inf.freeram, inf.mem_unit * inf.totalram);
 }
 
+typedef map<string, map<string, uint64_t>> table_footprints;
+
+// the record memory of each table which reports it (see
+// abstract_ordered_index::footprint())
+static table_footprints
+get_table_footprints(const map<string, abstract_ordered_index *> &open_tables)
+{
+  table_footprints ret;
+  for (auto &p : open_tables) {
+    const map<string, uint64_t> f = p.second->footprint();
+    if (!f.empty())
+      ret[p.first] = f;
+  }
+  return ret;
+}
+
+// one line per table, under the "DB size" and "memory delta" lines; with
+// before, the change since
+static void
+print_table_footprints(
+    const table_footprints &now, const table_footprints *before)
+{
+  for (auto &p : now) {
+    const map<string, uint64_t> &f = p.second;
+    const double mb = double(f.at("tuple_bytes"))/1048576.0;
+    const double header_mb = double(f.at("tuple_header_bytes"))/1048576.0;
+    cerr << "  " << p.first << ": ";
+    if (before && before->count(p.first)) {
+      const map<string, uint64_t> &b = before->at(p.first);
+      const double delta_mb =
+        mb - double(b.at("tuple_bytes"))/1048576.0;
+      cerr << (delta_mb < 0 ? "" : "+") << delta_mb << " MB of tuples ("
+           << mb << " MB, ";
+    } else {
+      cerr << mb << " MB of tuples (";
+    }
+    cerr << header_mb << " MB headers, "
+         << f.at("tuples") << " tuples, "
+         << f.at("chained_tuples") << " with older versions)" << endl;
+  }
+}
+
 static bool
 clear_file(const char *name)
 {
@@ -103,6 +167,30 @@ write_cb(void *p, const char *s)
 }
 
 static event_avg_counter evt_avg_abort_spins("avg_abort_spins");
+static event_avg_counter evt_avg_open_loop_queue_delay_us(
+    "avg_open_loop_queue_delay_us");
+
+// waits (while the benchmark runs) until timer::cur_usec() >= t_us. returns
+// false if the benchmark stopped first
+static bool
+wait_until_usec(uint64_t t_us)
+{
+  for (;;) {
+    if (unlikely(!running))
+      return false;
+    const uint64_t now = timer::cur_usec();
+    if (now >= t_us)
+      return true;
+    if (t_us - now > 1000)
+      usleep(t_us - now - 500); // oversleeping costs latency, so spin the rest
+    else
+      nop_pause();
+  }
+}
+
+// tail latencies reported (in ms) for both commit and persist latency.
+// XXX: keep in sync with RESULT_FIELDS in resultstore.py
+static const double latency_percentiles[] = {50.0, 95.0, 99.0, 99.9};
 
 void
 bench_worker::run()
@@ -111,6 +199,7 @@ bench_worker::run()
   // fix some of this stuff one day
   if (set_core_id)
     coreid::set_core_id(worker_id); // cringe
+  core_id = coreid::core_id();
   {
     scoped_rcu_region r; // register this thread in rcu region
   }
@@ -118,74 +207,392 @@ bench_worker::run()
   scoped_db_thread_ctx ctx(db, false);
   const workload_desc_vec workload = get_workload();
   txn_counts.resize(workload.size());
+  latency_hists.resize(workload.size());
+  commit_phase_sample.resize(db->commit_phase_names().size());
+  commit_phase_cycles.resize(workload.size());
+  for (auto &phases : commit_phase_cycles)
+    phases = vector<commit_phase_stats>(commit_phase_sample.size());
+  // open loop: this worker's share of offered_load arrives on a schedule
+  // of its own, and is served in arrival order- so a txn which runs late
+  // delays the ones queued up behind it. latency is measured from the
+  // scheduled arrival of a txn (not from when it starts), which keeps
+  // a stalled worker from hiding its backlog (coordinated omission)
+  const double arrival_gap_us =
+    offered_load > 0.0 ? 1e6 * double(nthreads) / offered_load : 0.0;
+  double next_arrival_us = 0.0;
+  for (size_t i = 1; i < ncoroutines; i++) {
+    bench_worker * const lane = make_lane();
+    if (!lane)
+      break;
+    lanes.push_back(lane);
+  }
   barrier_a->count_down();
   barrier_b->wait_for();
+  if (arrival_gap_us > 0.0)
+    next_arrival_us = double(timer::cur_usec());
+
+  if (!lanes.empty()) {
+    // the lanes are closed loop (dbtest refuses --offered-load with
+    // coroutines), and yield in the index (see base_txn_btree::do_search())
+    INVARIANT(arrival_gap_us == 0.0);
+    vector<coro::fn_t> fns;
+    for (size_t i = 0; i <= lanes.size(); i++) {
+      bench_worker * const lane = i ? lanes[i - 1] : this;
+      fns.push_back([this, lane, &workload]() {
+        while (running && (run_mode != RUNMODE_OPS || ntxn_commits < ops_per_worker)) {
+          // once the ticker has moved on, start no txn until the ones in
+          // flight are done: the tick can only advance once this core
+          // leaves its RCU region, ie once none of its txns is running
+          uint64_t tick;
+          while (ticker::s_instance.is_locally_guarded(tick) &&
+                 tick < ticker::s_instance.global_current_tick())
+            coro::Yield();
+          run_txn(lane, workload, 0);
+        }
+      });
+    }
+    coro::RunAll(fns);
+    return;
+  }
+
   while (running && (run_mode != RUNMODE_OPS || ntxn_commits < ops_per_worker)) {
-    double d = r.next_uniform();
-    for (size_t i = 0; i < workload.size(); i++) {
-      if ((i + 1) == workload.size() || d < workload[i].frequency) {
-      retry:
-        timer t;
-        const unsigned long old_seed = r.get_seed();
-        const auto ret = workload[i].fn(this);
-        if (likely(ret.first)) {
-          ++ntxn_commits;
-          latency_numer_us += t.lap();
-          backoff_shifts >>= 1;
-        } else {
-          ++ntxn_aborts;
-          if (retry_aborted_transaction && running) {
-            if (backoff_aborted_transaction) {
-              if (backoff_shifts < 63)
-                backoff_shifts++;
-              uint64_t spins = 1UL << backoff_shifts;
-              spins *= 100; // XXX: tuned pretty arbitrarily
-              evt_avg_abort_spins.offer(spins);
-              while (spins) {
-                nop_pause();
-                spins--;
-              }
+    uint64_t arrival_us = 0;
+    if (arrival_gap_us > 0.0) {
+      arrival_us = uint64_t(next_arrival_us);
+      if (!wait_until_usec(arrival_us))
+        break;
+      evt_avg_open_loop_queue_delay_us.offer(timer::cur_usec() - arrival_us);
+      next_arrival_us += (arrival_process == ARRIVAL_POISSON) ?
+        -log(1.0 - arrival_r.next_uniform()) * arrival_gap_us :
+        arrival_gap_us;
+    }
+    run_txn(this, workload, arrival_us);
+  }
+}
+
+void
+bench_worker::run_txn(bench_worker *lane, const workload_desc_vec &workload,
+                      uint64_t arrival_us)
+{
+  double d = lane->r.next_uniform();
+  for (size_t i = 0; i < workload.size(); i++) {
+    if ((i + 1) == workload.size() || d < workload[i].frequency) {
+    retry:
+      timer t;
+      const unsigned long old_seed = lane->r.get_seed();
+      const auto ret = workload[i].fn(lane);
+      if (likely(ret.first)) {
+        ++ntxn_commits;
+        const uint64_t latency_us =
+          arrival_us ? timer::cur_usec() - arrival_us : t.lap();
+        latency_numer_us += latency_us;
+        latency_hists[i].add(latency_us);
+        if (!commit_phase_sample.empty() &&
+            unlikely(db->take_commit_phase_sample(&commit_phase_sample[0])))
+          for (size_t j = 0; j < commit_phase_sample.size(); j++)
+            commit_phase_cycles[i][j].add(commit_phase_sample[j]);
+        backoff_shifts >>= 1;
+      } else {
+        ++ntxn_aborts;
+        if (retry_aborted_transaction && running) {
+          if (backoff_aborted_transaction) {
+            if (backoff_shifts < 63)
+              backoff_shifts++;
+            uint64_t spins = 1UL << backoff_shifts;
+            spins *= 100; // XXX: tuned pretty arbitrarily
+            evt_avg_abort_spins.offer(spins);
+            while (spins) {
+              nop_pause();
+              spins--;
             }
-            r.set_seed(old_seed);
-            goto retry;
           }
+          lane->r.set_seed(old_seed);
+          goto retry;
         }
-        size_delta += ret.second; // should be zero on abort
-        txn_counts[i]++; // txn_counts aren't used to compute throughput (is
-                         // just an informative number to print to the console
-                         // in verbose mode)
-        break;
       }
-      d -= workload[i].frequency;
+      size_delta += ret.second; // should be zero on abort
+      txn_counts[i]++; // txn_counts aren't used to compute throughput (is
+                       // just an informative number to print to the console
+                       // in verbose mode)
+      break;
+    }
+    d -= workload[i].frequency;
+  }
+}
+
+// records per-interval commits, aborts and persisted commits for each
+// worker while the benchmark runs. samples live in a fixed size ring (so the
+// oldest are overwritten if the run outlasts it), and are dumped as csv:
+//   time_ms,worker,commits,aborts,persisted
+// where time_ms is the end of the interval, relative to the benchmark start
+class bench_sampler {
+public:
+  bench_sampler(abstract_db *db, const vector<bench_worker *> &workers,
+                uint64_t interval_ms, size_t nintervals)
+    : db(db), workers(workers), interval_us(interval_ms * 1000),
+      ring(nintervals * workers.size()), nsamples(0),
+      last(workers.size()), stopping(false)
+  {
+    ALWAYS_ASSERT(interval_us > 0);
+  }
+
+  void
+  start()
+  {
+    start_us = timer::cur_usec();
+    th = thread(&bench_sampler::sample_loop, this);
+  }
+
+  // takes one last sample
+  void
+  stop()
+  {
+    stopping.store(true, memory_order_release);
+    th.join();
+  }
+
+  void
+  dump(ostream &o) const
+  {
+    o << "time_ms,worker,commits,aborts,persisted" << endl;
+    const size_t n = min(nsamples, ring.size());
+    for (size_t i = nsamples - n; i < nsamples; i++) {
+      const sample &s = ring[i % ring.size()];
+      o << (double(s.time_us) / 1000.0) << ","
+        << s.worker << ","
+        << s.ncommits << ","
+        << s.naborts << ","
+        << s.npersisted << endl;
+    }
+    if (nsamples > ring.size())
+      cerr << "[WARNING] sample ring overflowed, dropped the first "
+           << (nsamples - ring.size()) << " samples" << endl;
+  }
+
+private:
+  struct sample {
+    uint64_t time_us;
+    unsigned worker;
+    uint64_t ncommits;
+    uint64_t naborts;
+    uint64_t npersisted;
+  };
+
+  struct counts {
+    counts() : ncommits(0), naborts(0), npersisted(0) {}
+    uint64_t ncommits;
+    uint64_t naborts;
+    uint64_t npersisted;
+  };
+
+  void
+  take_sample()
+  {
+    const uint64_t now_us = timer::cur_usec() - start_us;
+    for (size_t i = 0; i < workers.size(); i++) {
+      counts cur;
+      cur.ncommits = workers[i]->peek_ntxn_commits();
+      cur.naborts = workers[i]->peek_ntxn_aborts();
+      cur.npersisted = db->get_ntxn_persisted_on_core(workers[i]->get_core_id());
+      sample &s = ring[nsamples++ % ring.size()];
+      s.time_us = now_us;
+      s.worker = i;
+      s.ncommits = cur.ncommits - last[i].ncommits;
+      s.naborts = cur.naborts - last[i].naborts;
+      s.npersisted = cur.npersisted - last[i].npersisted;
+      last[i] = cur;
+    }
+  }
+
+  void
+  sample_loop()
+  {
+    uint64_t next_us = start_us + interval_us;
+    while (!stopping.load(memory_order_acquire)) {
+      const uint64_t now_us = timer::cur_usec();
+      if (now_us < next_us) {
+        // don't oversleep a stop() request by much
+        usleep(min(next_us - now_us, uint64_t(10000)));
+        continue;
+      }
+      take_sample();
+      next_us += interval_us;
+    }
+    take_sample();
+  }
+
+  abstract_db *const db;
+  const vector<bench_worker *> &workers;
+  const uint64_t interval_us;
+  vector<sample> ring;
+  size_t nsamples;
+  vector<counts> last;
+  atomic<bool> stopping;
+  uint64_t start_us;
+  thread th;
+};
+
+static map<string, vector<counter_data>>
+agg_commit_phase_cycles(const vector<bench_worker *> &workers)
+{
+  map<string, vector<counter_data>> agg;
+  for (auto w : workers)
+    for (auto &p : w->get_commit_phase_cycles()) {
+      vector<counter_data> &phases = agg[p.first];
+      if (phases.empty()) {
+        phases = p.second;
+        continue;
+      }
+      for (size_t j = 0; j < phases.size(); j++)
+        phases[j] += p.second[j];
     }
+  return agg;
+}
+
+// serves the commit phase timings of the running workers, as
+// "commit_phase:<txn type>:<phase>" counters (in cycles)
+class commit_phase_source : public counter_source {
+public:
+  commit_phase_source()
+  {
+    event_counter::register_source(this);
+  }
+
+  void
+  set_workers(abstract_db *db, const vector<bench_worker *> &workers)
+  {
+    std::lock_guard<std::mutex> l(mutex_);
+    phase_names_ = db ? db->commit_phase_names() : vector<string>();
+    workers_ = workers;
+  }
+
+  virtual void
+  fill(const string &prefix, map<string, counter_data> &m)
+  {
+    std::lock_guard<std::mutex> l(mutex_);
+    for (auto &p : agg_commit_phase_cycles(workers_))
+      for (size_t j = 0; j < phase_names_.size(); j++) {
+        const string name =
+          "commit_phase:" + p.first + ":" + phase_names_[j];
+        if (name.compare(0, prefix.size(), prefix) == 0)
+          m[name] = p.second[j];
+      }
+  }
+
+  // the timings belong to one run's workers, which start from scratch
+  virtual void reset() {}
+
+private:
+  std::mutex mutex_;
+  vector<string> phase_names_;
+  vector<bench_worker *> workers_;
+};
+
+static commit_phase_source g_commit_phase_source;
+
+// builds the bulk loaded tables, taking the next one off the queue
+class bulk_load_finisher : public bench_loader {
+public:
+  bulk_load_finisher(unsigned int id,
+                     abstract_db *db,
+                     const map<string, abstract_ordered_index *> &open_tables,
+                     const vector<abstract_ordered_index *> &tables,
+                     atomic<size_t> &next)
+    : bench_loader(id, db, open_tables), tables(tables), next(next)
+  {}
+
+protected:
+  virtual void
+  load()
+  {
+    for (;;) {
+      const size_t i = next.fetch_add(1, memory_order_relaxed);
+      if (i >= tables.size())
+        return;
+      tables[i]->bulk_load_finish(bulk_load_fill_factor);
+    }
+  }
+
+private:
+  const vector<abstract_ordered_index *> &tables;
+  atomic<size_t> &next;
+};
+
+static void
+finish_bulk_load(abstract_db *db,
+                 const map<string, abstract_ordered_index *> &open_tables)
+{
+  // a table can be open under several names
+  vector<abstract_ordered_index *> tables;
+  {
+    set<abstract_ordered_index *> seen;
+    for (auto &p : open_tables)
+      if (p.second->supports_bulk_load() && seen.insert(p.second).second)
+        tables.push_back(p.second);
+  }
+  if (tables.empty())
+    return;
+  atomic<size_t> next(0);
+  const size_t n = min(nthreads, tables.size());
+  vector<bulk_load_finisher *> finishers;
+  spin_barrier b(n);
+  for (size_t i = 0; i < n; i++) {
+    finishers.push_back(
+        new bulk_load_finisher(i, db, open_tables, tables, next));
+    finishers.back()->set_barrier(b);
+  }
+  for (auto f : finishers)
+    f->start();
+  for (auto f : finishers) {
+    f->join();
+    delete f;
   }
 }
 
 void
 bench_runner::run()
 {
-  // load data
+  // load data, from the db image if there is one
   const vector<bench_loader *> loaders = make_loaders();
+  bool from_image = false;
+  double load_ms;
+  table_footprints footprints_before;
   {
     spin_barrier b(loaders.size());
     const pair<uint64_t, uint64_t> mem_info_before = get_system_memory_info();
     {
       scoped_timer t("dataloading", verbose);
-      for (vector<bench_loader *>::const_iterator it = loaders.begin();
-          it != loaders.end(); ++it) {
-        (*it)->set_barrier(b);
-        (*it)->start();
+      timer load_timer;
+      from_image = !db_image.empty() &&
+        load_db_image(db, open_tables, db_image, db_image_label);
+      if (!from_image) {
+        for (vector<bench_loader *>::const_iterator it = loaders.begin();
+            it != loaders.end(); ++it) {
+          (*it)->set_barrier(b);
+          (*it)->start();
+        }
+        for (vector<bench_loader *>::const_iterator it = loaders.begin();
+            it != loaders.end(); ++it)
+          (*it)->join();
+        if (enable_bulk_load)
+          finish_bulk_load(db, open_tables);
       }
-      for (vector<bench_loader *>::const_iterator it = loaders.begin();
-          it != loaders.end(); ++it)
-        (*it)->join();
+      load_ms = load_timer.lap_ms();
     }
     const pair<uint64_t, uint64_t> mem_info_after = get_system_memory_info();
     const int64_t delta = int64_t(mem_info_before.first) - int64_t(mem_info_after.first); // free mem
     const double delta_mb = double(delta)/1048576.0;
-    if (verbose)
+    if (verbose) {
       cerr << "DB size: " << delta_mb << " MB" << endl;
+      footprints_before = get_table_footprints(open_tables);
+      print_table_footprints(footprints_before, nullptr);
+      cerr << "load: " << load_ms << " ms (from "
+           << (from_image ? "db image" : "loaders") << ")" << endl;
+    }
   }
+  // not part of load_ms
+  if (!db_image.empty() && !from_image)
+    save_db_image(db, open_tables, db_image, db_image_label, nthreads);
 
   db->do_txn_epoch_sync(); // also waits for worker threads to be persisted
   {
@@ -201,6 +608,7 @@ bench_runner::run()
   if (!no_reset_counters) {
     event_counter::reset_all_counters(); // XXX: for now - we really should have a before/after loading
     PERF_EXPR(scopedperf::perfsum_base::resetall());
+    ticker::s_instance.reset_lag_stats();
   }
   {
     const auto persisted_info = db->get_ntxn_persisted();
@@ -233,17 +641,41 @@ bench_runner::run()
     (*it)->start();
 
   barrier_a.wait_for(); // wait for all threads to start up
+  g_commit_phase_source.set_workers(db, workers);
+  unique_ptr<bench_sampler> sampler;
+  if (sample_interval_ms) {
+    // sized for the whole run (plus some slack for the final sync) in
+    // time mode
+    const size_t nintervals = (run_mode == RUNMODE_TIME) ?
+      (runtime * 1000) / sample_interval_ms + 64 : 4096;
+    sampler.reset(new bench_sampler(db, workers, sample_interval_ms, nintervals));
+    sampler->start();
+  }
+  unique_ptr<bench_checkpointer> checkpointer;
+  if (checkpoint_interval_ms) {
+    checkpointer.reset(new bench_checkpointer(
+          db, open_tables, checkpoint_logfiles, checkpoint_interval_ms,
+          checkpoint_fsync));
+    checkpointer->start();
+  }
   timer t, t_nosync;
   barrier_b.count_down(); // bombs away!
   if (run_mode == RUNMODE_TIME) {
     sleep(runtime);
     running = false;
+    // a pinned snapshot holds back GC, which exiting workers wait on
+    if (checkpointer)
+      checkpointer->stop();
   }
   __sync_synchronize();
   for (size_t i = 0; i < nthreads; i++)
     workers[i]->join();
+  if (checkpointer)
+    checkpointer->stop();
   const unsigned long elapsed_nosync = t_nosync.lap();
   db->do_txn_finish(); // waits for all worker txns to persist
+  if (sampler)
+    sampler->stop();
   size_t n_commits = 0;
   size_t n_aborts = 0;
   uint64_t latency_numer_us = 0;
@@ -253,6 +685,15 @@ bench_runner::run()
     latency_numer_us += workers[i]->get_latency_numer_us();
   }
   const auto persisted_info = db->get_ntxn_persisted();
+  const log_histogram persist_latency_hist = db->get_persist_latency_histogram();
+
+  // merge the per-worker latency histograms
+  map<string, log_histogram> agg_latency_hists;
+  log_histogram latency_hist;
+  for (size_t i = 0; i < nthreads; i++)
+    map_agg(agg_latency_hists, workers[i]->get_latency_histograms());
+  for (auto &p : agg_latency_hists)
+    latency_hist += p.second;
 
   const unsigned long elapsed = t.lap(); // lap() must come after do_txn_finish(),
                                          // because do_txn_finish() potentially
@@ -327,6 +768,7 @@ bench_runner::run()
     cerr << "--- benchmark statistics ---" << endl;
     cerr << "runtime: " << elapsed_sec << " sec" << endl;
     cerr << "memory delta: " << delta_mb  << " MB" << endl;
+    print_table_footprints(get_table_footprints(open_tables), &footprints_before);
     cerr << "memory delta rate: " << (delta_mb / elapsed_sec)  << " MB/sec" << endl;
     cerr << "logical memory delta: " << size_delta_mb << " MB" << endl;
     cerr << "logical memory delta rate: " << (size_delta_mb / elapsed_sec) << " MB/sec" << endl;
@@ -341,10 +783,62 @@ bench_runner::run()
     cerr << "agg_abort_rate: " << agg_abort_rate << " aborts/sec" << endl;
     cerr << "avg_per_core_abort_rate: " << avg_per_core_abort_rate << " aborts/sec/core" << endl;
     cerr << "txn breakdown: " << format_list(agg_txn_counts.begin(), agg_txn_counts.end()) << endl;
+    cerr << "--- latency distributions (usec) ---" << endl;
+    cerr << "commit: " << latency_hist << endl;
+    for (auto &p : agg_latency_hists)
+      cerr << "commit " << p.first << ": " << p.second << endl;
+    cerr << "persist: " << persist_latency_hist << endl;
+    cerr << "--- epoch advance lag (usec) ---" << endl;
+    {
+      // see ticker::lag_stats
+      auto print_lag = [](const ticker::lag_stats &l) {
+        const uint64_t n = l.nwaits_.load(memory_order_relaxed);
+        const uint64_t total = l.total_us_.load(memory_order_relaxed);
+        cerr << "waits " << n
+             << " avg " << (n ? double(total) / double(n) : 0.0)
+             << " max " << l.max_us_.load(memory_order_relaxed) << endl;
+      };
+      cerr << "tick " << ticker::tick_us() << " us, all cores: ";
+      print_lag(ticker::s_instance.advance_lag());
+      for (auto w : workers) {
+        cerr << "core " << w->get_core_id() << ": ";
+        print_lag(ticker::s_instance.core_lag(w->get_core_id()));
+      }
+    }
     cerr << "--- system counters (for benchmark) ---" << endl;
     for (map<string, counter_data>::iterator it = ctrs.begin();
          it != ctrs.end(); ++it)
       cerr << it->first << ": " << it->second << endl;
+    cerr << "--- commit phases (cycles, if sampled) ---" << endl;
+    {
+      const vector<string> phase_names = db->commit_phase_names();
+      for (auto &p : agg_commit_phase_cycles(workers)) {
+        if (p.second.empty() || !p.second[0].count_)
+          continue;
+        uint64_t total = 0;
+        for (auto &d : p.second)
+          total += d.sum_;
+        cerr << p.first << " (" << p.second[0].count_ << " commits):";
+        for (size_t j = 0; j < phase_names.size(); j++)
+          cerr << " " << phase_names[j]
+               << " avg=" << p.second[j].avg()
+               << " max=" << p.second[j].max_
+               << " (" << (total ? 100.0 * double(p.second[j].sum_) / double(total) : 0.0)
+               << "%)";
+        cerr << endl;
+      }
+    }
+    cerr << "--- abort attribution (top 20, if sampled) ---" << endl;
+    {
+      const map<string, counter_data> attrs =
+        event_counter::get_counters({"abort_attr:*"});
+      vector<pair<uint64_t, string>> top;
+      for (auto &p : attrs)
+        top.emplace_back(p.second.count_, p.first);
+      sort(top.begin(), top.end(), greater<pair<uint64_t, string>>());
+      for (size_t i = 0; i < min(top.size(), size_t(20)); i++)
+        cerr << top[i].second << ": " << top[i].first << endl;
+    }
     cerr << "--- perf counters (if enabled, for benchmark) ---" << endl;
     PERF_EXPR(scopedperf::perfsum_base::printall());
     cerr << "--- allocator stats ---" << endl;
@@ -362,12 +856,44 @@ bench_runner::run()
 #endif
   }
 
-  // output for plotting script
+  if (sampler) {
+    if (sample_file.empty()) {
+      cerr << "--- samples ---" << endl;
+      sampler->dump(cerr);
+    } else {
+      ofstream ofs(sample_file.c_str());
+      sampler->dump(ofs);
+    }
+    sampler.reset();
+  }
+
+  if (checkpointer) {
+    if (verbose) {
+      cerr << "--- checkpoints ---" << endl;
+      cerr << "ncheckpoints : " << checkpointer->ncheckpoints() << endl;
+      cerr << "last_epoch   : " << checkpointer->last_epoch() << endl;
+      cerr << "bytes        : " << checkpointer->nbytes() << endl;
+      cerr << "records      : " << checkpointer->nrecords() << endl;
+      cerr << "total_ms     : " << checkpointer->total_ms() << endl;
+      cerr << "max_ms       : " << checkpointer->max_ms() << endl;
+    }
+    checkpointer.reset();
+  }
+
+  // output for plotting script. the latency percentiles (and then the load
+  // time) come after the original five columns, so older parsers can just
+  // take a prefix
   cout << agg_throughput << " "
        << agg_persist_throughput << " "
        << avg_latency_ms << " "
        << avg_persist_latency_ms << " "
-       << agg_abort_rate << endl;
+       << agg_abort_rate;
+  for (auto p : latency_percentiles)
+    cout << " " << double(latency_hist.percentile(p)) / 1000.0;
+  for (auto p : latency_percentiles)
+    cout << " " << double(persist_latency_hist.percentile(p)) / 1000.0;
+  cout << " " << load_ms;
+  cout << endl;
   cout.flush();
 
   if (!slow_exit)
@@ -387,6 +913,7 @@ bench_runner::run()
   open_tables.clear();
 
   delete_pointers(loaders);
+  g_commit_phase_source.set_workers(nullptr, vector<bench_worker *>());
   delete_pointers(workers);
 }
 
@@ -417,6 +944,43 @@ bench_worker::measure_txn_counters(void *txn, const char *txn_name)
 }
 #endif
 
+map<string, log_histogram>
+bench_worker::get_latency_histograms() const
+{
+  map<string, log_histogram> m;
+  const workload_desc_vec workload = get_workload();
+  for (size_t i = 0; i < latency_hists.size(); i++)
+    m[workload[i].name] += latency_hists[i];
+  return m;
+}
+
+map<string, vector<counter_data>>
+bench_worker::get_commit_phase_cycles() const
+{
+  map<string, vector<counter_data>> m;
+  const workload_desc_vec workload = get_workload();
+  for (size_t i = 0; i < commit_phase_cycles.size(); i++) {
+    vector<counter_data> &phases = m[workload[i].name];
+    phases.resize(commit_phase_cycles[i].size());
+    for (size_t j = 0; j < phases.size(); j++) {
+      phases[j].type_ = counter_data::TYPE_AGG;
+      phases[j] += commit_phase_cycles[i][j].load();
+    }
+  }
+  return m;
+}
+
+counter_data
+bench_worker::commit_phase_stats::load() const
+{
+  counter_data d;
+  d.type_ = counter_data::TYPE_AGG;
+  d.count_ = count_.load(std::memory_order_relaxed);
+  d.sum_ = sum_.load(std::memory_order_relaxed);
+  d.max_ = max_.load(std::memory_order_relaxed);
+  return d;
+}
+
 map<string, size_t>
 bench_worker::get_txn_counts() const
 {
@@ -3,29 +3,40 @@
 
 #include <stdint.h>
 
+#include <atomic>
 #include <map>
 #include <vector>
 #include <utility>
 #include <string>
 
 #include "abstract_db.h"
+#include "../counter.h"
 #include "../macros.h"
 #include "../thread.h"
 #include "../util.h"
 #include "../spinbarrier.h"
 #include "../rcu.h"
+#include "../histogram.h"
 
 extern void ycsb_do_test(abstract_db *db, int argc, char **argv);
 extern void tpcc_do_test(abstract_db *db, int argc, char **argv);
 extern void queue_do_test(abstract_db *db, int argc, char **argv);
 extern void encstress_do_test(abstract_db *db, int argc, char **argv);
 extern void bid_do_test(abstract_db *db, int argc, char **argv);
+extern void recover_do_test(abstract_db *db, int argc, char **argv);
+extern void smoke_do_test(abstract_db *db, int argc, char **argv);
 
 enum {
   RUNMODE_TIME = 0,
   RUNMODE_OPS  = 1
 };
 
+// how open loop txns arrive (see offered_load)
+enum {
+  ARRIVAL_FIXED   = 0, // evenly spaced
+  ARRIVAL_POISSON = 1
+};
+
 // benchmark global variables
 extern size_t nthreads;
 extern volatile bool running;
@@ -41,6 +52,18 @@ extern int slow_exit;
 extern int retry_aborted_transaction;
 extern int no_reset_counters;
 extern int backoff_aborted_transaction;
+extern uint64_t sample_interval_ms; // 0 disables time-series sampling
+extern std::string sample_file; // empty dumps samples to stderr
+extern uint64_t checkpoint_interval_ms; // 0 disables checkpoints
+extern std::vector<std::string> checkpoint_logfiles; // one writer thread each
+extern int checkpoint_fsync;
+extern std::string db_image; // empty disables db images
+extern std::string db_image_label; // what the loaders load (see checkpoint.h)
+extern int enable_bulk_load; // loaders bulk insert, into tables which support it
+extern double bulk_load_fill_factor;
+extern double offered_load; // txns/sec over all workers, 0 runs closed loop
+extern int arrival_process;
+extern size_t ncoroutines; // txns each worker interleaves (see coro.h)
 
 class scoped_db_thread_ctx {
 public:
@@ -61,6 +84,18 @@ private:
   abstract_db *const db;
 };
 
+// inserts a record for a loader: by bulk insert if bulk loading applies to
+// tbl (the record is not part of txn then), otherwise in txn
+static inline void
+load_insert(abstract_ordered_index *tbl, void *txn,
+            const std::string &key, const std::string &value)
+{
+  if (enable_bulk_load && tbl->supports_bulk_load())
+    tbl->bulk_insert(key, value);
+  else
+    tbl->insert(txn, key, value);
+}
+
 class bench_loader : public ndb_thread {
 public:
   bench_loader(unsigned long seed, abstract_db *db,
@@ -110,11 +145,12 @@ public:
                const std::map<std::string, abstract_ordered_index *> &open_tables,
                spin_barrier *barrier_a, spin_barrier *barrier_b)
     : worker_id(worker_id), set_core_id(set_core_id),
-      r(seed), db(db), open_tables(open_tables),
+      r(seed), arrival_r(seed ^ 0x9E3779B97F4A7C15UL),
+      db(db), open_tables(open_tables),
       barrier_a(barrier_a), barrier_b(barrier_b),
       // the ntxn_* numbers are per worker
       ntxn_commits(0), ntxn_aborts(0),
-      latency_numer_us(0),
+      latency_numer_us(0), core_id(0),
       backoff_shifts(0), // spin between [0, 2^backoff_shifts) times before retry
       size_delta(0)
   {
@@ -122,7 +158,11 @@ public:
     txn_obj_buf.resize(db->sizeof_txn_object(txn_flags));
   }
 
-  virtual ~bench_worker() {}
+  virtual ~bench_worker()
+  {
+    for (auto l : lanes)
+      delete l;
+  }
 
   // returns [did_commit?, size_increase_bytes]
   typedef std::pair<bool, ssize_t> txn_result;
@@ -150,6 +190,21 @@ public:
 
   inline uint64_t get_latency_numer_us() const { return latency_numer_us; }
 
+  // for sampling from another thread while the worker is running
+  inline size_t
+  peek_ntxn_commits() const
+  {
+    return *((const volatile size_t *) &ntxn_commits);
+  }
+  inline size_t
+  peek_ntxn_aborts() const
+  {
+    return *((const volatile size_t *) &ntxn_aborts);
+  }
+
+  // the core this worker ran on (valid once the worker has started)
+  inline unsigned get_core_id() const { return core_id; }
+
   inline double
   get_avg_latency_us() const
   {
@@ -158,6 +213,15 @@ public:
 
   std::map<std::string, size_t> get_txn_counts() const;
 
+  // commit latency (usec) distribution, per txn type
+  std::map<std::string, log_histogram> get_latency_histograms() const;
+
+  // cycles spent in each of db->commit_phase_names() by the sampled
+  // commits (see abstract_db::take_commit_phase_sample()), per txn type.
+  // may be called while the benchmark is running
+  std::map<std::string, std::vector<counter_data>>
+  get_commit_phase_cycles() const;
+
   typedef abstract_db::counter_map counter_map;
   typedef abstract_db::txn_counter_map txn_counter_map;
 
@@ -175,20 +239,38 @@ protected:
 
   virtual void on_run_setup() {}
 
+  // with ncoroutines > 1, a worker runs ncoroutines txns at once on its
+  // thread, as coroutines: itself and ncoroutines - 1 lanes made here.
+  // a lane is a worker like this one (same tables, same partition, a seed
+  // of its own) which is never started as a thread, and whose txns are
+  // counted as this worker's. a benchmark which returns null (the default)
+  // runs its txns one at a time
+  virtual bench_worker *make_lane() { return nullptr; }
+
   inline void *txn_buf() { return (void *) txn_obj_buf.data(); }
 
   unsigned int worker_id;
   bool set_core_id;
   util::fast_random r;
+  util::fast_random arrival_r; // open loop only- leaves r to the txns
   abstract_db *const db;
   std::map<std::string, abstract_ordered_index *> open_tables;
   spin_barrier *const barrier_a;
   spin_barrier *const barrier_b;
 
 private:
+  // runs one txn of lane (this worker or one of its lanes), picked from
+  // workload, and accounts for it. arrival_us is its scheduled arrival
+  // (open loop), or 0
+  void run_txn(bench_worker *lane, const workload_desc_vec &workload,
+               uint64_t arrival_us);
+
+  std::vector<bench_worker *> lanes;
+
   size_t ntxn_commits;
   size_t ntxn_aborts;
   uint64_t latency_numer_us;
+  unsigned core_id;
   unsigned backoff_shifts;
 
 protected:
@@ -201,6 +283,33 @@ protected:
 #endif
 
   std::vector<size_t> txn_counts; // breakdown of txns
+  std::vector<log_histogram> latency_hists; // parallel to txn_counts
+  // one phase's timings: only the worker writes them, but
+  // get_commit_phase_cycles() reads them while it runs
+  struct commit_phase_stats {
+    std::atomic<uint64_t> count_;
+    std::atomic<uint64_t> sum_;
+    std::atomic<uint64_t> max_;
+
+    commit_phase_stats() : count_(0), sum_(0), max_(0) {}
+
+    // only called by the worker
+    inline void
+    add(uint64_t cycles)
+    {
+      count_.store(count_.load(std::memory_order_relaxed) + 1,
+                   std::memory_order_relaxed);
+      sum_.store(sum_.load(std::memory_order_relaxed) + cycles,
+                 std::memory_order_relaxed);
+      if (cycles > max_.load(std::memory_order_relaxed))
+        max_.store(cycles, std::memory_order_relaxed);
+    }
+
+    counter_data load() const;
+  };
+
+  std::vector<std::vector<commit_phase_stats>> commit_phase_cycles; // parallel to txn_counts
+  std::vector<uint64_t> commit_phase_sample;
   ssize_t size_delta; // how many logical bytes (of values) did the worker add to the DB
 
   std::string txn_obj_buf;
@@ -0,0 +1,737 @@
+#include <algorithm>
+#include <fstream>
+#include <iostream>
+#include <memory>
+#include <sstream>
+
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <unistd.h>
+
+#include <lz4.h>
+
+#include "../macros.h"
+#include "../rcu.h"
+#include "../txn.h"
+#include "../util.h"
+#include "../record/serializer.h"
+#include "bench.h"
+#include "checkpoint.h"
+
+using namespace std;
+using namespace util;
+
+// uncompressed size of a checkpoint block
+static const size_t BlockSize = (1 << 20);
+
+static void
+write_fully(int fd, const char *p, size_t n)
+{
+  while (n) {
+    const ssize_t ret = ::write(fd, p, n);
+    if (ret < 0) {
+      if (errno == EINTR)
+        continue;
+      perror("write");
+      ALWAYS_ASSERT(false);
+    }
+    p += ret;
+    n -= ret;
+  }
+}
+
+// returns false on EOF before the first byte
+static bool
+read_fully(int fd, char *p, size_t n, const string &fname)
+{
+  const size_t want = n;
+  while (n) {
+    const ssize_t ret = ::read(fd, p, n);
+    if (ret < 0) {
+      if (errno == EINTR)
+        continue;
+      perror("read");
+      ALWAYS_ASSERT(false);
+    }
+    if (!ret) {
+      if (n == want)
+        return false;
+      cerr << "[ERROR] " << fname << ": truncated checkpoint" << endl;
+      ALWAYS_ASSERT(false);
+    }
+    p += ret;
+    n -= ret;
+  }
+  return true;
+}
+
+bool
+checkpoint_manifest::read(const string &fname)
+{
+  ifstream in(fname.c_str());
+  if (!in)
+    return false;
+  string line;
+  while (getline(in, line)) {
+    istringstream iss(line);
+    string tag;
+    iss >> tag;
+    if (tag == "epoch") {
+      iss >> epoch_;
+    } else if (tag == "table") {
+      size_t id;
+      string name;
+      iss >> id;
+      iss.get(); // the separator
+      getline(iss, name);
+      if (tables_.size() <= id)
+        tables_.resize(id + 1);
+      tables_[id] = name;
+    } else if (tag == "file") {
+      string path;
+      iss.get();
+      getline(iss, path);
+      files_.push_back(path);
+    } else if (tag == "label") {
+      iss.get();
+      getline(iss, label_);
+    } else if (!tag.empty()) {
+      cerr << "[WARNING] " << fname << ": ignoring line: " << line << endl;
+    }
+  }
+  return true;
+}
+
+void
+checkpoint_manifest::write(const string &fname, bool do_fsync) const
+{
+  const string tmpname = fname + ".tmp";
+  {
+    ofstream out(tmpname.c_str(), ios::trunc);
+    ALWAYS_ASSERT(out);
+    out << "epoch " << epoch_ << endl;
+    if (!label_.empty())
+      out << "label " << label_ << endl;
+    for (size_t i = 0; i < tables_.size(); i++)
+      out << "table " << i << " " << tables_[i] << endl;
+    for (auto &f : files_)
+      out << "file " << f << endl;
+    ALWAYS_ASSERT(out);
+  }
+  if (do_fsync) {
+    const int fd = open(tmpname.c_str(), O_RDONLY);
+    ALWAYS_ASSERT(fd != -1);
+    ALWAYS_ASSERT(::fsync(fd) == 0);
+    close(fd);
+  }
+  if (rename(tmpname.c_str(), fname.c_str())) {
+    perror("rename");
+    ALWAYS_ASSERT(false);
+  }
+}
+
+checkpoint_writer::checkpoint_writer(const string &fname)
+  : nbytes_(0), nrecords_(0)
+{
+  fd_ = open(fname.c_str(), O_CREAT|O_WRONLY|O_TRUNC, 0664);
+  if (fd_ == -1) {
+    perror("open");
+    ALWAYS_ASSERT(false);
+  }
+  block_.reserve(BlockSize + 64);
+  zblock_.resize(LZ4_compressBound(BlockSize + 64));
+}
+
+checkpoint_writer::~checkpoint_writer()
+{
+  close(fd_);
+}
+
+void
+checkpoint_writer::add(uint32_t table, const char *key, size_t klen,
+                       const char *value, size_t vlen)
+{
+  serializer<uint32_t, true> vs_uint32_t;
+  uint8_t hdr[3 * 5];
+  uint8_t *p = &hdr[0];
+  p = vs_uint32_t.write(p, table);
+  p = vs_uint32_t.write(p, klen);
+  block_.append((const char *) &hdr[0], p - &hdr[0]);
+  block_.append(key, klen);
+  p = vs_uint32_t.write(&hdr[0], vlen);
+  block_.append((const char *) &hdr[0], p - &hdr[0]);
+  block_.append(value, vlen);
+  nrecords_++;
+  if (block_.size() >= BlockSize)
+    flush_block();
+}
+
+void
+checkpoint_writer::flush_block()
+{
+  if (block_.empty())
+    return;
+  if (zblock_.size() < size_t(LZ4_compressBound(block_.size())))
+    zblock_.resize(LZ4_compressBound(block_.size()));
+  const int zlen = LZ4_compress(block_.data(), &zblock_[0], block_.size());
+  ALWAYS_ASSERT(zlen > 0);
+  const uint32_t hdr[2] = {uint32_t(block_.size()), uint32_t(zlen)};
+  write_fully(fd_, (const char *) &hdr[0], sizeof(hdr));
+  write_fully(fd_, zblock_.data(), zlen);
+  nbytes_ += sizeof(hdr) + zlen;
+  block_.clear();
+}
+
+void
+checkpoint_writer::finish(bool do_fsync)
+{
+  flush_block();
+  if (do_fsync && fdatasync(fd_)) {
+    perror("fdatasync");
+    ALWAYS_ASSERT(false);
+  }
+}
+
+checkpoint_reader::checkpoint_reader(const string &fname)
+  : fname_(fname), off_(0), nbytes_(0)
+{
+  fd_ = open(fname.c_str(), O_RDONLY);
+  if (fd_ == -1) {
+    perror("open");
+    ALWAYS_ASSERT(false);
+  }
+}
+
+checkpoint_reader::~checkpoint_reader()
+{
+  close(fd_);
+}
+
+bool
+checkpoint_reader::next_block()
+{
+  uint32_t hdr[2];
+  if (!read_fully(fd_, (char *) &hdr[0], sizeof(hdr), fname_))
+    return false;
+  zblock_.resize(hdr[1]);
+  block_.resize(hdr[0]);
+  ALWAYS_ASSERT(read_fully(fd_, &zblock_[0], hdr[1], fname_));
+  const int ret = LZ4_decompress_safe(
+      zblock_.data(), &block_[0], hdr[1], hdr[0]);
+  if (ret < 0 || uint32_t(ret) != hdr[0]) {
+    cerr << "[ERROR] " << fname_ << ": corrupt checkpoint block" << endl;
+    ALWAYS_ASSERT(false);
+  }
+  nbytes_ += sizeof(hdr) + hdr[1];
+  off_ = 0;
+  return true;
+}
+
+bool
+checkpoint_reader::next(uint32_t &table, string &key, string &value)
+{
+  // blocks always end on a record boundary
+  while (off_ == block_.size())
+    if (!next_block())
+      return false;
+  serializer<uint32_t, true> vs_uint32_t;
+  const uint8_t *p = (const uint8_t *) block_.data() + off_;
+  const uint8_t * const end = (const uint8_t *) block_.data() + block_.size();
+  uint32_t klen, vlen;
+  if (!(p = vs_uint32_t.failsafe_read(p, end - p, &table)) ||
+      !(p = vs_uint32_t.failsafe_read(p, end - p, &klen)) ||
+      size_t(end - p) < klen)
+    goto corrupt;
+  key.assign((const char *) p, klen);
+  p += klen;
+  if (!(p = vs_uint32_t.failsafe_read(p, end - p, &vlen)) ||
+      size_t(end - p) < vlen)
+    goto corrupt;
+  value.assign((const char *) p, vlen);
+  p += vlen;
+  off_ = p - (const uint8_t *) block_.data();
+  return true;
+corrupt:
+  cerr << "[ERROR] " << fname_ << ": corrupt checkpoint record" << endl;
+  ALWAYS_ASSERT(false);
+  return false;
+}
+
+checkpoint_loader::checkpoint_loader(
+    unsigned int id,
+    abstract_db *db,
+    const map<string, abstract_ordered_index *> &open_tables,
+    const vector<abstract_ordered_index *> &tables,
+    const string &fname,
+    size_t batchsize)
+  : bench_loader(id, db, open_tables), id(id), tables(tables), fname(fname),
+    batchsize(batchsize), nbytes(0), nrecords(0)
+{
+  ALWAYS_ASSERT(batchsize > 0);
+}
+
+void
+checkpoint_loader::load()
+{
+  if (pin_cpus) {
+    rcu::s_instance.pin_current_thread(id % nthreads);
+    rcu::s_instance.fault_region();
+  }
+
+  checkpoint_reader r(fname);
+  // a batch is kept around until it commits, so it can be retried
+  vector<uint32_t> batch_tables(batchsize);
+  vector<string> keys(batchsize), values(batchsize);
+  for (;;) {
+    size_t n = 0;
+    while (n < batchsize && r.next(batch_tables[n], keys[n], values[n])) {
+      ALWAYS_ASSERT(batch_tables[n] < tables.size());
+      n++;
+    }
+    if (!n)
+      break;
+    for (;;) {
+      scoped_str_arena s_arena(arena);
+      void * const txn = db->new_txn(txn_flags, arena, txn_buf());
+      try {
+        for (size_t i = 0; i < n; i++)
+          tables[batch_tables[i]]->insert(txn, keys[i], values[i]);
+        if (db->commit_txn(txn))
+          break;
+      } catch (abstract_db::abstract_abort_exception &ex) {
+        db->abort_txn(txn);
+      }
+    }
+    nrecords += n;
+  }
+  nbytes = r.nbytes();
+  if (verbose)
+    cerr << "[INFO] checkpoint loader " << id << " finished "
+         << nrecords << " records" << endl;
+}
+
+bench_checkpointer::bench_checkpointer(
+    abstract_db *db,
+    const map<string, abstract_ordered_index *> &open_tables,
+    const vector<string> &logfiles,
+    uint64_t interval_ms,
+    bool do_fsync)
+  : db(db), logfiles(logfiles), interval_ms(interval_ms), do_fsync(do_fsync),
+    assignment(logfiles.size()), stopping(false), round(0), ndone(0),
+    round_failed(false), worker_nbytes(logfiles.size()),
+    worker_nrecords(logfiles.size()), ncheckpoints_(0), last_epoch_(0),
+    nbytes_(0), nrecords_(0), total_ms_(0.0), max_ms_(0.0)
+{
+  ALWAYS_ASSERT(!logfiles.empty());
+  ALWAYS_ASSERT(interval_ms > 0);
+
+  // table ids are positions in open_tables (which is sorted by name), so
+  // they are stable across checkpoints of one run
+  vector<pair<size_t, uint32_t>> sizes;
+  for (auto &p : open_tables) {
+    scoped_rcu_region guard;
+    sizes.emplace_back(p.second->size(), tables.size());
+    table_names.push_back(p.first);
+    tables.push_back(p.second);
+  }
+
+  // largest table first, onto the least loaded device
+  sort(sizes.begin(), sizes.end(), greater<pair<size_t, uint32_t>>());
+  vector<size_t> load(logfiles.size());
+  for (auto &p : sizes) {
+    const size_t i = min_element(load.begin(), load.end()) - load.begin();
+    assignment[i].push_back(p.second);
+    load[i] += p.first;
+  }
+}
+
+bench_checkpointer::~bench_checkpointer()
+{
+  stop();
+}
+
+string
+bench_checkpointer::file_name(unsigned id, uint64_t seq) const
+{
+  return checkpoint_manifest::FileName(logfiles[id]) + "." + to_string(seq);
+}
+
+void
+bench_checkpointer::start()
+{
+  // a manifest left over from an earlier run refers to logs which were
+  // truncated when this one started
+  unlink(checkpoint_manifest::FileName(logfiles[0]).c_str());
+  for (unsigned i = 0; i < logfiles.size(); i++)
+    workers.emplace_back(&bench_checkpointer::worker_loop, this, i);
+  coordinator = thread(&bench_checkpointer::coordinator_loop, this);
+}
+
+void
+bench_checkpointer::stop()
+{
+  {
+    std::lock_guard<mutex> l(lock);
+    stopping.store(true, memory_order_release);
+    cv.notify_all();
+  }
+  if (coordinator.joinable())
+    coordinator.join();
+  for (auto &t : workers)
+    if (t.joinable())
+      t.join();
+}
+
+class checkpoint_scan_callback : public abstract_ordered_index::scan_callback {
+public:
+  checkpoint_scan_callback(size_t limit) : limit(limit), n(0) {}
+
+  virtual bool
+  invoke(const char *keyp, size_t keylen, const string &value)
+  {
+    const uint32_t lens[2] = {uint32_t(keylen), uint32_t(value.size())};
+    buf.append((const char *) &lens[0], sizeof(lens));
+    buf.append(keyp, keylen);
+    buf.append(value);
+    last_key.assign(keyp, keylen);
+    return ++n < limit;
+  }
+
+  // hands the records seen to w
+  void
+  flush(checkpoint_writer &w, uint32_t table) const
+  {
+    const char *p = buf.data();
+    for (size_t i = 0; i < n; i++) {
+      uint32_t lens[2];
+      NDB_MEMCPY(&lens[0], p, sizeof(lens));
+      p += sizeof(lens);
+      w.add(table, p, lens[0], p + lens[0], lens[1]);
+      p += lens[0] + lens[1];
+    }
+  }
+
+  void
+  clear()
+  {
+    buf.clear();
+    n = 0;
+  }
+
+  const size_t limit;
+  size_t n;
+  string buf;
+  string last_key;
+};
+
+bool
+bench_checkpointer::write_tables(unsigned id, uint64_t seq)
+{
+  const uint64_t flags = txn_flags | transaction_base::TXN_FLAG_READ_ONLY;
+  checkpoint_writer w(file_name(id, seq));
+  str_arena arena;
+  string txn_obj_buf(db->sizeof_txn_object(flags), 0);
+  checkpoint_scan_callback c(ChunkSize);
+  for (auto table : assignment[id]) {
+    string start_key;
+    for (;;) {
+      if (stopping.load(memory_order_acquire))
+        return false;
+      // records are only written out once the txn commits, so an aborted
+      // chunk can simply be retried
+      c.clear();
+      scoped_str_arena s_arena(arena);
+      void * const txn = db->new_txn(
+          flags, arena, (void *) txn_obj_buf.data(), abstract_db::HINT_KV_SCAN);
+      try {
+        tables[table]->scan(txn, start_key, nullptr, c, &arena);
+        if (!db->commit_txn(txn))
+          continue;
+      } catch (abstract_db::abstract_abort_exception &ex) {
+        db->abort_txn(txn);
+        continue;
+      }
+      c.flush(w, table);
+      if (c.n < c.limit)
+        break;
+      start_key.assign(c.last_key).push_back('\0');
+    }
+  }
+  w.finish(do_fsync);
+  std::lock_guard<mutex> l(lock);
+  worker_nbytes[id] = w.nbytes();
+  worker_nrecords[id] = w.nrecords();
+  return true;
+}
+
+void
+bench_checkpointer::worker_loop(unsigned id)
+{
+  // only runs read-only txns, which need no log buffers, so there is no
+  // db->thread_init() here
+  db->use_pinned_snapshot(true);
+  uint64_t seen = 0;
+  for (;;) {
+    {
+      unique_lock<mutex> l(lock);
+      cv.wait(l, [&] { return round != seen || stopping.load(); });
+      // a round which was published must be acknowledged, even if it is
+      // abandoned
+      if (round == seen)
+        return;
+      seen = round;
+    }
+    const bool ok = write_tables(id, seen);
+    std::lock_guard<mutex> l(lock);
+    if (!ok)
+      round_failed = true;
+    ndone++;
+    cv.notify_all();
+  }
+}
+
+bool
+bench_checkpointer::checkpoint(uint64_t seq, uint64_t epoch)
+{
+  {
+    unique_lock<mutex> l(lock);
+    round = seq;
+    ndone = 0;
+    round_failed = false;
+    cv.notify_all();
+    cv.wait(l, [&] { return ndone == workers.size(); });
+  }
+  db->unpin_snapshot();
+
+  checkpoint_manifest m;
+  m.epoch_ = epoch;
+  m.tables_ = table_names;
+  for (unsigned i = 0; i < logfiles.size(); i++)
+    m.files_.push_back(file_name(i, seq));
+  if (round_failed) {
+    for (auto &f : m.files_)
+      unlink(f.c_str());
+    return false;
+  }
+  m.write(checkpoint_manifest::FileName(logfiles[0]), do_fsync);
+  if (seq > 1)
+    for (unsigned i = 0; i < logfiles.size(); i++)
+      unlink(file_name(i, seq - 1).c_str());
+
+  for (unsigned i = 0; i < logfiles.size(); i++) {
+    nbytes_ += worker_nbytes[i];
+    nrecords_ += worker_nrecords[i];
+  }
+  return true;
+}
+
+void
+bench_checkpointer::coordinator_loop()
+{
+  uint64_t seq = 0;
+  for (;;) {
+    {
+      unique_lock<mutex> l(lock);
+      if (cv.wait_for(l, chrono::milliseconds(interval_ms),
+                      [this] { return stopping.load(); }))
+        return;
+    }
+    uint64_t epoch;
+    if (!db->pin_snapshot(epoch)) {
+      cerr << "[WARNING] db has no snapshots, not checkpointing" << endl;
+      return;
+    }
+    timer t;
+    if (!checkpoint(++seq, epoch))
+      return;
+    const double ms = t.lap_ms();
+    ncheckpoints_++;
+    last_epoch_ = epoch;
+    total_ms_ += ms;
+    max_ms_ = max(max_ms_, ms);
+    if (verbose)
+      cerr << "[INFO] checkpoint " << seq << " at epoch " << epoch
+           << " took " << ms << " ms" << endl;
+  }
+}
+
+// records per scan txn while saving an image
+static const size_t ImageChunkSize = 4096;
+
+static inline size_t
+image_batch_size(abstract_db *db)
+{
+  return (db->txn_max_batch_size() == -1) ? 10000 : db->txn_max_batch_size();
+}
+
+// scans whole tables, taken largest first from a shared queue, and deals
+// their chunks out to every image file in turn, so the files (and the
+// threads which later load them) get even shares of every large table
+class image_dumper : public bench_loader {
+public:
+  image_dumper(unsigned int id,
+               abstract_db *db,
+               const map<string, abstract_ordered_index *> &open_tables,
+               const vector<abstract_ordered_index *> &tables,
+               const vector<uint32_t> &order,
+               atomic<size_t> &next,
+               vector<unique_ptr<checkpoint_writer>> &writers,
+               vector<mutex> &writer_locks)
+    : bench_loader(id, db, open_tables), id(id), tables(tables), order(order),
+      next(next), writers(writers), writer_locks(writer_locks)
+  {}
+
+protected:
+  virtual void
+  load()
+  {
+    checkpoint_scan_callback c(ImageChunkSize);
+    size_t w = id;
+    for (;;) {
+      const size_t i = next.fetch_add(1, memory_order_relaxed);
+      if (i >= order.size())
+        return;
+      const uint32_t table = order[i];
+      string start_key;
+      for (;;) {
+        // nothing else runs, so these txns only abort spuriously
+        c.clear();
+        scoped_str_arena s_arena(arena);
+        void * const txn = db->new_txn(txn_flags, arena, txn_buf());
+        try {
+          tables[table]->scan(txn, start_key, nullptr, c, &arena);
+          if (!db->commit_txn(txn))
+            continue;
+        } catch (abstract_db::abstract_abort_exception &ex) {
+          db->abort_txn(txn);
+          continue;
+        }
+        {
+          std::lock_guard<mutex> l(writer_locks[w]);
+          c.flush(*writers[w], table);
+        }
+        w = (w + 1) % writers.size();
+        if (c.n < c.limit)
+          break;
+        start_key.assign(c.last_key).push_back('\0');
+      }
+    }
+  }
+
+private:
+  const unsigned int id;
+  const vector<abstract_ordered_index *> &tables;
+  const vector<uint32_t> &order;
+  atomic<size_t> &next;
+  vector<unique_ptr<checkpoint_writer>> &writers;
+  vector<mutex> &writer_locks;
+};
+
+void
+save_db_image(abstract_db *db,
+              const map<string, abstract_ordered_index *> &open_tables,
+              const string &fname,
+              const string &label,
+              unsigned nfiles)
+{
+  ALWAYS_ASSERT(nfiles > 0);
+  checkpoint_manifest m;
+  m.label_ = label;
+  vector<abstract_ordered_index *> tables;
+  vector<pair<size_t, uint32_t>> sizes;
+  for (auto &p : open_tables) {
+    scoped_rcu_region guard;
+    sizes.emplace_back(p.second->size(), tables.size());
+    m.tables_.push_back(p.first);
+    tables.push_back(p.second);
+  }
+  sort(sizes.begin(), sizes.end(), greater<pair<size_t, uint32_t>>());
+  vector<uint32_t> order;
+  for (auto &p : sizes)
+    order.push_back(p.second);
+
+  vector<unique_ptr<checkpoint_writer>> writers;
+  vector<mutex> writer_locks(nfiles);
+  for (unsigned i = 0; i < nfiles; i++) {
+    m.files_.push_back(fname + "." + to_string(i));
+    writers.emplace_back(new checkpoint_writer(m.files_.back()));
+  }
+
+  atomic<size_t> next(0);
+  vector<image_dumper *> dumpers;
+  spin_barrier b(nfiles);
+  for (unsigned i = 0; i < nfiles; i++) {
+    dumpers.push_back(new image_dumper(
+          i, db, open_tables, tables, order, next, writers, writer_locks));
+    dumpers.back()->set_barrier(b);
+  }
+  for (auto d : dumpers)
+    d->start();
+  uint64_t nbytes = 0, nrecords = 0;
+  for (auto d : dumpers) {
+    d->join();
+    delete d;
+  }
+  for (auto &w : writers) {
+    w->finish(true);
+    nbytes += w->nbytes();
+    nrecords += w->nrecords();
+  }
+  // the manifest goes last: a partial image is never used
+  m.write(fname, true);
+  if (verbose)
+    cerr << "[INFO] saved db image " << fname << ": " << nrecords
+         << " records, " << nbytes << " bytes" << endl;
+}
+
+bool
+load_db_image(abstract_db *db,
+              const map<string, abstract_ordered_index *> &open_tables,
+              const string &fname,
+              const string &label)
+{
+  checkpoint_manifest m;
+  if (!m.read(fname))
+    return false;
+  if (m.label_ != label) {
+    cerr << "[ERROR] db image " << fname << " holds \"" << m.label_
+         << "\", not \"" << label << "\"" << endl;
+    ALWAYS_ASSERT(false);
+  }
+  vector<abstract_ordered_index *> tables;
+  for (auto &name : m.tables_) {
+    auto it = open_tables.find(name);
+    if (it == open_tables.end()) {
+      cerr << "[ERROR] db image " << fname << " has unknown table "
+           << name << endl;
+      ALWAYS_ASSERT(false);
+    }
+    tables.push_back(it->second);
+  }
+  if (tables.size() != open_tables.size()) {
+    cerr << "[ERROR] db image " << fname << " is missing tables" << endl;
+    ALWAYS_ASSERT(false);
+  }
+
+  vector<checkpoint_loader *> loaders;
+  spin_barrier b(m.files_.size());
+  for (size_t i = 0; i < m.files_.size(); i++) {
+    loaders.push_back(new checkpoint_loader(
+          i, db, open_tables, tables, m.files_[i], image_batch_size(db)));
+    loaders.back()->set_barrier(b);
+  }
+  for (auto l : loaders)
+    l->start();
+  uint64_t nbytes = 0, nrecords = 0;
+  for (auto l : loaders) {
+    l->join();
+    nbytes += l->get_nbytes();
+    nrecords += l->get_nrecords();
+    delete l;
+  }
+  if (verbose)
+    cerr << "[INFO] loaded db image " << fname << ": " << nrecords
+         << " records, " << nbytes << " bytes" << endl;
+  return true;
+}
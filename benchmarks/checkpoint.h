@@ -0,0 +1,246 @@
+#ifndef _NDB_BENCH_CHECKPOINT_H_
+#define _NDB_BENCH_CHECKPOINT_H_
+
+#include <stdint.h>
+
+#include <atomic>
+#include <condition_variable>
+#include <map>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include "abstract_db.h"
+#include "abstract_ordered_index.h"
+#include "bench.h"
+
+// consistent checkpoints of a set of tables, taken while a benchmark runs.
+//
+// a checkpoint reads one pinned snapshot (see abstract_db::pin_snapshot())
+// in many short read-only txns, so workers are never blocked and epochs
+// keep advancing. one thread per log device writes its share of the tables
+// into a file next to that device's log:
+//
+//   <logfile>.ckpt.<seq>: a sequence of blocks
+//     [uint32_t nbytes][uint32_t zbytes][zbytes of lz4 compressed records]
+//   where each record is
+//     [varint table][varint klen][key][varint vlen][value]
+//
+// once every file is synced, the manifest <first logfile>.ckpt is replaced
+// (atomically) by
+//
+//   epoch <e>
+//   table <id> <name>
+//   ...
+//   file <path>
+//   ...
+//
+// the checkpoint holds every txn committed in an epoch <= e, so log
+// buffers from those epochs are no longer needed for recovery. the
+// previous checkpoint's files are removed afterwards
+//
+// the same format holds database images (see save_db_image()), whose
+// manifests also have a
+//
+//   label <what was loaded>
+//
+// line
+
+struct checkpoint_manifest {
+  uint64_t epoch_;
+  std::vector<std::string> tables_; // table id => name
+  std::vector<std::string> files_;
+  std::string label_; // empty for checkpoints
+
+  checkpoint_manifest() : epoch_(0) {}
+
+  static inline std::string
+  FileName(const std::string &logfile)
+  {
+    return logfile + ".ckpt";
+  }
+
+  // returns false if fname does not exist
+  bool read(const std::string &fname);
+
+  void write(const std::string &fname, bool do_fsync) const;
+};
+
+class checkpoint_writer {
+public:
+  checkpoint_writer(const std::string &fname);
+  ~checkpoint_writer();
+
+  checkpoint_writer(const checkpoint_writer &) = delete;
+  checkpoint_writer &operator=(const checkpoint_writer &) = delete;
+
+  // appends one record
+  void add(uint32_t table, const char *key, size_t klen,
+           const char *value, size_t vlen);
+
+  // flushes the last block, and syncs the file
+  void finish(bool do_fsync);
+
+  // bytes written to the file so far
+  inline uint64_t nbytes() const { return nbytes_; }
+  inline uint64_t nrecords() const { return nrecords_; }
+
+private:
+  void flush_block();
+
+  int fd_;
+  std::string block_;
+  std::string zblock_;
+  uint64_t nbytes_;
+  uint64_t nrecords_;
+};
+
+class checkpoint_reader {
+public:
+  checkpoint_reader(const std::string &fname);
+  ~checkpoint_reader();
+
+  checkpoint_reader(const checkpoint_reader &) = delete;
+  checkpoint_reader &operator=(const checkpoint_reader &) = delete;
+
+  // returns false at the end of the file. a torn or corrupt file is fatal:
+  // checkpoints are only referenced by a manifest once they are synced
+  bool next(uint32_t &table, std::string &key, std::string &value);
+
+  // bytes read from the file so far
+  inline uint64_t nbytes() const { return nbytes_; }
+
+private:
+  bool next_block();
+
+  const std::string fname_;
+  int fd_;
+  std::string block_;
+  std::string zblock_;
+  size_t off_; // into block_
+  uint64_t nbytes_;
+};
+
+// inserts every record of one checkpoint file into tables (by the file's
+// table ids), batchsize records per txn
+class checkpoint_loader : public bench_loader {
+public:
+  checkpoint_loader(unsigned int id,
+                    abstract_db *db,
+                    const std::map<std::string, abstract_ordered_index *> &open_tables,
+                    const std::vector<abstract_ordered_index *> &tables,
+                    const std::string &fname,
+                    size_t batchsize);
+
+  inline uint64_t get_nbytes() const { return nbytes; }
+  inline uint64_t get_nrecords() const { return nrecords; }
+
+protected:
+  virtual void load();
+
+private:
+  const unsigned int id;
+  const std::vector<abstract_ordered_index *> &tables;
+  const std::string fname;
+  const size_t batchsize;
+  uint64_t nbytes;
+  uint64_t nrecords;
+};
+
+// database images: every table as a benchmark's loaders left it, so that
+// later runs of the same benchmark can skip loading. an image is a
+// checkpoint (of epoch 0) with the manifest fname, and its records spread
+// over nfiles files fname.<n>. label says what was loaded (e.g. the
+// benchmark and its options): an image with another label is not used
+
+// writes open_tables to an image. must not run concurrently with txns which
+// write to open_tables
+void save_db_image(abstract_db *db,
+                   const std::map<std::string, abstract_ordered_index *> &open_tables,
+                   const std::string &fname,
+                   const std::string &label,
+                   unsigned nfiles);
+
+// loads an image into open_tables (which must be the tables it was saved
+// from, and empty), on one thread per file. returns false if there is no
+// image at fname; an image with another label, or other tables, is fatal
+bool load_db_image(abstract_db *db,
+                   const std::map<std::string, abstract_ordered_index *> &open_tables,
+                   const std::string &fname,
+                   const std::string &label);
+
+// takes a checkpoint of open_tables every interval_ms, on one thread per
+// logfile (plus a coordinator), until stop() is called
+class bench_checkpointer {
+public:
+  bench_checkpointer(abstract_db *db,
+                     const std::map<std::string, abstract_ordered_index *> &open_tables,
+                     const std::vector<std::string> &logfiles,
+                     uint64_t interval_ms,
+                     bool do_fsync);
+  ~bench_checkpointer();
+
+  bench_checkpointer(const bench_checkpointer &) = delete;
+  bench_checkpointer &operator=(const bench_checkpointer &) = delete;
+
+  void start();
+
+  // abandons a checkpoint in progress. safe to call more than once
+  void stop();
+
+  inline uint64_t ncheckpoints() const { return ncheckpoints_; }
+  inline uint64_t last_epoch() const { return last_epoch_; }
+  inline uint64_t nbytes() const { return nbytes_; }
+  inline uint64_t nrecords() const { return nrecords_; }
+  inline double total_ms() const { return total_ms_; }
+  inline double max_ms() const { return max_ms_; }
+
+private:
+  // records per read-only txn. keeps each txn short, so it never holds up
+  // the epoch (and GC) for long
+  static const size_t ChunkSize = 4096;
+
+  void coordinator_loop();
+  void worker_loop(unsigned id);
+
+  // one round: returns false if it was abandoned
+  bool checkpoint(uint64_t seq, uint64_t epoch);
+
+  // writes worker id's tables of round seq. returns false if stopped
+  bool write_tables(unsigned id, uint64_t seq);
+
+  std::string file_name(unsigned id, uint64_t seq) const;
+
+  abstract_db *const db;
+  const std::vector<std::string> logfiles;
+  const uint64_t interval_ms;
+  const bool do_fsync;
+
+  std::vector<std::string> table_names; // table id => name
+  std::vector<abstract_ordered_index *> tables;
+  std::vector<std::vector<uint32_t>> assignment; // worker => table ids
+
+  std::thread coordinator;
+  std::vector<std::thread> workers;
+
+  std::atomic<bool> stopping;
+  std::mutex lock;
+  std::condition_variable cv;
+  // protected by lock
+  uint64_t round;      // current round (0 before the first one)
+  unsigned ndone;      // workers finished with round
+  bool round_failed;
+  std::vector<uint64_t> worker_nbytes;
+  std::vector<uint64_t> worker_nrecords;
+
+  // only touched by the coordinator (until stop() joins it)
+  uint64_t ncheckpoints_;
+  uint64_t last_epoch_;
+  uint64_t nbytes_;
+  uint64_t nrecords_;
+  double total_ms_;
+  double max_ms_;
+};
+
+#endif /* _NDB_BENCH_CHECKPOINT_H_ */
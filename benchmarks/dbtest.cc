@@ -5,6 +5,8 @@
 #include <utility>
 #include <string>
 #include <set>
+#include <algorithm>
+#include <numeric>
 
 #include <getopt.h>
 #include <stdlib.h>
@@ -13,6 +15,7 @@
 
 #include "../allocator.h"
 #include "../stats_server.h"
+#include "../topology.h"
 #include "bench.h"
 #include "bdb_wrapper.h"
 #include "ndb_wrapper.h"
@@ -55,6 +58,72 @@ parse_memory_spec(const string &s)
   return strtoul(x.c_str(), nullptr, 10) * mult;
 }
 
+// reads a log config, as written by scripts/calibrate.py: one
+// "<logfile> <weight> [...]" line per log device, '#' starts a comment
+static bool
+read_log_config(const string &fname,
+                vector<string> &logfiles,
+                vector<double> &weights)
+{
+  ifstream ifs(fname.c_str());
+  if (!ifs)
+    return false;
+  string line;
+  while (getline(ifs, line)) {
+    const vector<string> toks = split_ws(line.substr(0, line.find('#')));
+    if (toks.empty())
+      continue;
+    if (toks.size() < 2)
+      return false;
+    const double w = strtod(toks[1].c_str(), nullptr);
+    if (!(w >= 0.0))
+      return false;
+    logfiles.push_back(toks[0]);
+    weights.push_back(w);
+  }
+  return !logfiles.empty();
+}
+
+// splits the workers over the loggers in proportion to weights, giving
+// the leftover workers to the largest remainders. loggers which get no
+// worker are dropped from logfiles
+static vector<vector<unsigned>>
+assign_by_weight(vector<string> &logfiles,
+                 const vector<double> &weights,
+                 size_t nworkers)
+{
+  const double total = accumulate(weights.begin(), weights.end(), 0.0);
+  ALWAYS_ASSERT(total > 0.0);
+  vector<size_t> counts;
+  vector<pair<double, size_t>> remainders;
+  size_t n = 0;
+  for (size_t i = 0; i < weights.size(); i++) {
+    const double share = weights[i] / total * nworkers;
+    counts.push_back(size_t(share));
+    remainders.emplace_back(share - counts.back(), i);
+    n += counts.back();
+  }
+  sort(remainders.begin(), remainders.end(),
+       [](const pair<double, size_t> &a, const pair<double, size_t> &b) {
+         return a.first > b.first || (a.first == b.first && a.second < b.second);
+       });
+  for (size_t i = 0; n < nworkers; i++, n++)
+    counts[remainders[i % remainders.size()].second]++;
+  vector<string> used;
+  vector<vector<unsigned>> ret;
+  unsigned next = 0;
+  for (size_t i = 0; i < counts.size(); i++) {
+    if (!counts[i])
+      continue;
+    used.push_back(logfiles[i]);
+    ret.emplace_back();
+    for (size_t j = 0; j < counts[i]; j++)
+      ret.back().push_back(next++);
+  }
+  logfiles.swap(used);
+  return ret;
+}
+
 int
 main(int argc, char **argv)
 {
@@ -73,8 +142,22 @@ main(int argc, char **argv)
   int fake_writes = 0;
   int disable_gc = 0;
   int disable_snapshots = 0;
+  uint64_t group_commit_us = 0;
+  size_t group_commit_bytes = 0;
+  string log_writer_name;
+  uint64_t tick_us = ticker::tick_us();
+  uint64_t rcu_epoch_ticks = rcu::EpochTimeMultiplier;
+  uint64_t ro_epoch_ticks = transaction_proto2_static::ReadOnlyEpochMultiplier;
+  unsigned hot_record_threshold = 0;
+  unsigned pessimistic_after_aborts = 0;
+  unsigned abort_sample_period = 0;
+  unsigned abort_key_prefix_len = transaction_proto2_static::AbortKeyPrefixLen;
+  unsigned commit_phase_sample_period = 0;
+  topology::placement placement = topology::PLACEMENT_NODE;
+  log_writer::backend writer_backend = log_writer::BACKEND_POSIX;
   vector<string> logfiles;
   vector<vector<unsigned>> assignments;
+  string log_config;
   string stats_server_sockfile;
   while (1) {
     static struct option long_options[] =
@@ -100,14 +183,36 @@ main(int argc, char **argv)
       {"log-nofsync"                , no_argument       , &nofsync                   , 1}   ,
       {"log-compress"               , no_argument       , &do_compress               , 1}   ,
       {"log-fake-writes"            , no_argument       , &fake_writes               , 1}   ,
+      {"log-group-commit"           , required_argument , 0                          , 'g'} , // in us
+      {"log-group-commit-bytes"     , required_argument , 0                          , 'G'} ,
+      {"log-writer"                 , required_argument , 0                          , 'w'} , // posix or aio
       {"disable-gc"                 , no_argument       , &disable_gc                , 1}   ,
       {"disable-snapshots"          , no_argument       , &disable_snapshots         , 1}   ,
       {"stats-server-sockfile"      , required_argument , 0                          , 'x'} ,
       {"no-reset-counters"          , no_argument       , &no_reset_counters         , 1}   ,
+      {"sample-interval"            , required_argument , 0                          , 'i'} , // in ms
+      {"sample-file"                , required_argument , 0                          , 'F'} ,
+      {"checkpoint-interval"        , required_argument , 0                          , 'K'} , // in ms
+      {"tick-us"                    , required_argument , 0                          , 'T'} , // the epoch
+      {"rcu-epoch-ticks"            , required_argument , 0                          , 'E'} ,
+      {"ro-epoch-ticks"             , required_argument , 0                          , 'R'} ,
+      {"db-image"                   , required_argument , 0                          , 'I'} ,
+      {"bulk-load"                  , no_argument       , &enable_bulk_load          , 1}   ,
+      {"bulk-load-fill-factor"      , required_argument , 0                          , 'L'} ,
+      {"hot-record-threshold"       , required_argument , 0                          , 'H'} , // aborts
+      {"pessimistic-after-aborts"   , required_argument , 0                          , 'P'} ,
+      {"abort-sample-period"        , required_argument , 0                          , 'A'} , // txns
+      {"abort-key-prefix-len"       , required_argument , 0                          , 'k'} , // bytes
+      {"commit-phase-sample-period" , required_argument , 0                          , 'C'} , // commits
+      {"offered-load"               , required_argument , 0                          , 'O'} , // txns/sec
+      {"arrival-process"            , required_argument , 0                          , 'p'} , // fixed or poisson
+      {"placement"                  , required_argument , 0                          , 'y'} , // implies --pin-cpus
+      {"log-config"                 , required_argument , 0                          , 'D'} , // instead of --logfile
+      {"coroutines"                 , required_argument , 0                          , 'j'} , // txns per worker
       {0, 0, 0, 0}
     };
     int option_index = 0;
-    int c = getopt_long(argc, argv, "b:s:t:d:B:f:r:n:o:m:l:a:x:", long_options, &option_index);
+    int c = getopt_long(argc, argv, "b:s:t:d:B:f:r:n:o:m:l:a:x:i:F:K:g:G:w:T:E:R:I:L:H:P:A:k:C:O:p:y:D:j:", long_options, &option_index);
     if (c == -1)
       break;
 
@@ -181,10 +286,121 @@ main(int argc, char **argv)
           ParseCSVString<unsigned, RangeAwareParser<unsigned>>(optarg));
       break;
 
+    case 'D':
+      log_config = optarg;
+      break;
+
     case 'x':
       stats_server_sockfile = optarg;
       break;
 
+    case 'i':
+      sample_interval_ms = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(sample_interval_ms > 0);
+      break;
+
+    case 'F':
+      sample_file = optarg;
+      break;
+
+    case 'g':
+      group_commit_us = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(group_commit_us > 0);
+      break;
+
+    case 'G':
+      group_commit_bytes = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(group_commit_bytes > 0);
+      break;
+
+    case 'w':
+      log_writer_name = optarg;
+      if (!log_writer::ParseBackend(log_writer_name, writer_backend)) {
+        cerr << "[ERROR] unknown --log-writer " << log_writer_name << endl;
+        return 1;
+      }
+      break;
+
+    case 'K':
+      checkpoint_interval_ms = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(checkpoint_interval_ms > 0);
+      break;
+
+    case 'I':
+      db_image = optarg;
+      break;
+
+    case 'L':
+      bulk_load_fill_factor = strtod(optarg, NULL);
+      ALWAYS_ASSERT(bulk_load_fill_factor > 0.0 &&
+                    bulk_load_fill_factor <= 1.0);
+      break;
+
+    case 'T':
+      tick_us = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(tick_us > 0);
+      break;
+
+    case 'E':
+      rcu_epoch_ticks = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(rcu_epoch_ticks > 0);
+      break;
+
+    case 'R':
+      ro_epoch_ticks = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(ro_epoch_ticks > 0);
+      break;
+
+    case 'H':
+      hot_record_threshold = strtoul(optarg, NULL, 10);
+      break;
+
+    case 'P':
+      pessimistic_after_aborts = strtoul(optarg, NULL, 10);
+      break;
+
+    case 'A':
+      abort_sample_period = strtoul(optarg, NULL, 10);
+      break;
+
+    case 'k':
+      abort_key_prefix_len = strtoul(optarg, NULL, 10);
+      break;
+
+    case 'C':
+      commit_phase_sample_period = strtoul(optarg, NULL, 10);
+      break;
+
+    case 'O':
+      offered_load = strtod(optarg, NULL);
+      ALWAYS_ASSERT(offered_load > 0.0);
+      break;
+
+    case 'p':
+      if (!strcmp(optarg, "fixed"))
+        arrival_process = ARRIVAL_FIXED;
+      else if (!strcmp(optarg, "poisson"))
+        arrival_process = ARRIVAL_POISSON;
+      else {
+        cerr << "[ERROR] unknown --arrival-process " << optarg << endl;
+        return 1;
+      }
+      break;
+
+    case 'y':
+      if (!topology::ParsePlacement(optarg, placement)) {
+        cerr << "[ERROR] unknown --placement " << optarg << endl;
+        return 1;
+      }
+      if (placement != topology::PLACEMENT_NODE)
+        pin_cpus = 1;
+      break;
+
+    case 'j':
+      ncoroutines = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(ncoroutines > 0);
+      break;
+
     case '?':
       /* getopt_long already printed an error message. */
       exit(1);
@@ -204,9 +420,26 @@ main(int argc, char **argv)
     test_fn = encstress_do_test;
   else if (bench_type == "bid")
     test_fn = bid_do_test;
+  else if (bench_type == "recover")
+    test_fn = recover_do_test;
+  else if (bench_type == "smoke")
+    test_fn = smoke_do_test;
   else
     ALWAYS_ASSERT(false);
 
+  if (!log_config.empty()) {
+    if (!logfiles.empty() || !assignments.empty()) {
+      cerr << "[ERROR] --log-config replaces --logfile and --assignment" << endl;
+      return 1;
+    }
+    vector<double> weights;
+    if (!read_log_config(log_config, logfiles, weights)) {
+      cerr << "[ERROR] bad --log-config " << log_config << endl;
+      return 1;
+    }
+    assignments = assign_by_weight(logfiles, weights, nthreads);
+  }
+
   if (do_compress && logfiles.empty()) {
     cerr << "[ERROR] --log-compress specified without logging enabled" << endl;
     return 1;
@@ -222,16 +455,95 @@ main(int argc, char **argv)
     return 1;
   }
 
+  if (group_commit_us && logfiles.empty()) {
+    cerr << "[ERROR] --log-group-commit specified without logging enabled" << endl;
+    return 1;
+  }
+
+  if (!log_writer_name.empty() && logfiles.empty()) {
+    cerr << "[ERROR] --log-writer specified without logging enabled" << endl;
+    return 1;
+  }
+
+  if (group_commit_bytes && !group_commit_us) {
+    cerr << "[ERROR] --log-group-commit-bytes specified without --log-group-commit" << endl;
+    return 1;
+  }
+
   if (fake_writes && nofsync) {
     cerr << "[WARNING] --log-nofsync has no effect with --log-fake-writes enabled" << endl;
   }
 
+  if (!sample_file.empty() && !sample_interval_ms) {
+    cerr << "[ERROR] --sample-file specified without --sample-interval" << endl;
+    return 1;
+  }
+
+  if (checkpoint_interval_ms) {
+    // checkpoints live next to the logs, and are read at a pinned snapshot
+    if (logfiles.empty()) {
+      cerr << "[ERROR] --checkpoint-interval specified without logging enabled" << endl;
+      return 1;
+    }
+    if (db_type != "ndb-proto2" || disable_snapshots) {
+      cerr << "[ERROR] --checkpoint-interval needs ndb-proto2 with snapshots" << endl;
+      return 1;
+    }
+    checkpoint_logfiles = logfiles;
+    checkpoint_fsync = !nofsync;
+  }
+
+  if (ncoroutines > 1) {
+    // the txns only yield in ndb's index, and the lanes run closed loop
+    if (db_type != "ndb-proto1" && db_type != "ndb-proto2") {
+      cerr << "[ERROR] --coroutines needs an ndb db-type" << endl;
+      return 1;
+    }
+    if (offered_load > 0.0) {
+      cerr << "[ERROR] --coroutines does not apply to --offered-load" << endl;
+      return 1;
+    }
+  }
+
+  if (!db_image.empty()) {
+    if (bench_type == "recover") {
+      cerr << "[ERROR] --db-image does not apply to recover" << endl;
+      return 1;
+    }
+    // everything which can change what the loaders load
+    ostringstream label;
+    label << "bench=" << bench_type
+          << " scale-factor=" << scale_factor
+          << " db-type=" << db_type
+          << " bench-opts=" << bench_opts;
+    db_image_label = label.str();
+  }
+
+  if (enable_bulk_load && !logfiles.empty() && !checkpoint_interval_ms) {
+    // only a checkpoint can bring the loaded records back
+    cerr << "[WARNING] --bulk-load records are not logged" << endl;
+  }
+
 #ifndef ENABLE_EVENT_COUNTERS
   if (!stats_server_sockfile.empty()) {
     cerr << "[WARNING] --stats-server-sockfile with no event counters enabled is useless" << endl;
   }
 #endif
 
+  // nothing has been freed through RCU, nor run as a txn, yet
+  ticker::SetTickUs(tick_us);
+  rcu::SetEpochTimeMultiplier(rcu_epoch_ticks);
+  transaction_proto2_static::SetReadOnlyEpochMultiplier(ro_epoch_ticks);
+  transaction_proto2_static::SetHotRecordThreshold(hot_record_threshold);
+  transaction_proto2_static::SetPessimisticAfterAborts(pessimistic_after_aborts);
+  transaction_proto2_static::SetAbortSamplePeriod(abort_sample_period);
+  transaction_proto2_static::SetAbortKeyPrefixLen(abort_key_prefix_len);
+  transaction_base::SetCommitPhaseSamplePeriod(commit_phase_sample_period);
+  // before the loggers start, and any thread is pinned
+  topology::SetPlacement(placement, nthreads);
+  if (topology::AuxCpu(0) >= 0)
+    ticker::s_instance.pin_thread(topology::AuxCpu(0));
+
   // initialize the numa allocator
   if (numa_memory > 0) {
     const size_t maxpercpu = util::iceil(
@@ -283,7 +595,8 @@ main(int argc, char **argv)
   } else if (db_type == "ndb-proto1") {
     // XXX: hacky simulation of proto1
     db = new ndb_wrapper<transaction_proto2>(
-        logfiles, assignments, !nofsync, do_compress, fake_writes);
+        logfiles, assignments, !nofsync, do_compress, fake_writes,
+        group_commit_us, group_commit_bytes, writer_backend);
     transaction_proto2_static::set_hack_status(true);
     ALWAYS_ASSERT(transaction_proto2_static::get_hack_status());
 #ifdef PROTO2_CAN_DISABLE_GC
@@ -292,7 +605,8 @@ main(int argc, char **argv)
 #endif
   } else if (db_type == "ndb-proto2") {
     db = new ndb_wrapper<transaction_proto2>(
-        logfiles, assignments, !nofsync, do_compress, fake_writes);
+        logfiles, assignments, !nofsync, do_compress, fake_writes,
+        group_commit_us, group_commit_bytes, writer_backend);
     ALWAYS_ASSERT(!transaction_proto2_static::get_hack_status());
 #ifdef PROTO2_CAN_DISABLE_GC
     if (!disable_gc)
@@ -366,11 +680,48 @@ main(int argc, char **argv)
     } else {
       cerr << "  numa-memory : disabled"                    << endl;
     }
+    cerr << "  log-config : " << log_config                 << endl;
     cerr << "  logfiles : " << logfiles                     << endl;
     cerr << "  assignments : " << assignments               << endl;
     cerr << "  disable-gc : " << disable_gc                 << endl;
     cerr << "  disable-snapshots : " << disable_snapshots   << endl;
+    cerr << "  log-group-commit : " << group_commit_us       << endl;
+    cerr << "  log-group-commit-bytes : " << group_commit_bytes << endl;
+    cerr << "  log-writer : " << log_writer::BackendName(writer_backend) << endl;
+    cerr << "  tick-us : " << tick_us                       << endl;
+    cerr << "  rcu-epoch-ticks : " << rcu_epoch_ticks       << endl;
+    cerr << "  ro-epoch-ticks : " << ro_epoch_ticks         << endl;
     cerr << "  stats-server-sockfile: " << stats_server_sockfile << endl;
+    cerr << "  sample-interval : " << sample_interval_ms      << endl;
+    cerr << "  sample-file : " << sample_file                 << endl;
+    cerr << "  checkpoint-interval : " << checkpoint_interval_ms << endl;
+    cerr << "  db-image : " << db_image                       << endl;
+    cerr << "  bulk-load : " << enable_bulk_load              << endl;
+    cerr << "  bulk-load-fill-factor : " << bulk_load_fill_factor << endl;
+    cerr << "  hot-record-threshold : " << hot_record_threshold << endl;
+    cerr << "  pessimistic-after-aborts : " << pessimistic_after_aborts << endl;
+    cerr << "  abort-sample-period : " << abort_sample_period << endl;
+    cerr << "  abort-key-prefix-len : " << abort_key_prefix_len << endl;
+    cerr << "  commit-phase-sample-period : " << commit_phase_sample_period << endl;
+    if (offered_load > 0.0)
+      cerr << "  offered-load : " << offered_load << " txns/sec ("
+           << (arrival_process == ARRIVAL_POISSON ? "poisson" : "fixed")
+           << " arrivals)" << endl;
+    else
+      cerr << "  offered-load : <closed loop>" << endl;
+    cerr << "  coroutines : " << ncoroutines << endl;
+    cerr << "  topology : " << topology::Describe() << endl;
+    cerr << "  placement : " << topology::PlacementStr(placement) << endl;
+    if (pin_cpus) {
+      cerr << "  worker cpus :";
+      for (size_t i = 0; i < nthreads; i++)
+        cerr << " " << topology::CpuOfSlot(i);
+      cerr << endl;
+      if (topology::AuxCpu(0) >= 0)
+        cerr << "  ticker cpu : " << topology::AuxCpu(0) << endl;
+      else
+        cerr << "  ticker cpu : <unpinned>" << endl;
+    }
 
     cerr << "system properties:" << endl;
     cerr << "  btree_internal_node_size: " << concurrent_btree::InternalNodeSize() << endl;
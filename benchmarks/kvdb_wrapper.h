@@ -40,7 +40,8 @@ public:
   virtual abstract_ordered_index *
   open_index(const std::string &name,
              size_t value_size_hint,
-             bool mostly_append);
+             bool mostly_append,
+             abstract_ordered_index::key_type key_type);
 
   virtual void
   close_index(abstract_ordered_index *idx)
@@ -135,7 +135,8 @@ mysql_wrapper::abort_txn(void *p)
 }
 
 abstract_ordered_index *
-mysql_wrapper::open_index(const string &name, size_t value_size_hint, bool mostly_append)
+mysql_wrapper::open_index(const string &name, size_t value_size_hint, bool mostly_append,
+                          abstract_ordered_index::key_type key_type)
 {
   ALWAYS_ASSERT(value_size_hint <= 256); // limitation
   MYSQL *conn = new_connection(db);
@@ -3,6 +3,7 @@
 
 #include "abstract_db.h"
 #include "../txn_btree.h"
+#include "../log_writer.h"
 
 namespace private_ {
   struct ndbtxn {
@@ -44,7 +45,10 @@ public:
       const std::vector<std::vector<unsigned>> &assignments_given,
       bool call_fsync,
       bool use_compression,
-      bool fake_writes);
+      bool fake_writes,
+      uint64_t group_commit_us,
+      size_t group_commit_bytes,
+      log_writer::backend writer_backend);
 
   virtual ssize_t txn_max_batch_size() const OVERRIDE { return 100; }
 
@@ -78,12 +82,42 @@ public:
     return txn_epoch_sync<Transaction>::compute_ntxn_persisted();
   }
 
+  virtual log_histogram
+  get_persist_latency_histogram() const
+  {
+    return txn_epoch_sync<Transaction>::compute_persist_latency_histogram();
+  }
+
+  virtual uint64_t
+  get_ntxn_persisted_on_core(unsigned core) const
+  {
+    return txn_epoch_sync<Transaction>::compute_ntxn_persisted_on_core(core);
+  }
+
   virtual void
   reset_ntxn_persisted()
   {
     txn_epoch_sync<Transaction>::reset_ntxn_persisted();
   }
 
+  virtual bool
+  pin_snapshot(uint64_t &epoch)
+  {
+    return txn_epoch_sync<Transaction>::pin_snapshot(epoch);
+  }
+
+  virtual void
+  unpin_snapshot()
+  {
+    txn_epoch_sync<Transaction>::unpin_snapshot();
+  }
+
+  virtual void
+  use_pinned_snapshot(bool use)
+  {
+    txn_epoch_sync<Transaction>::use_pinned_snapshot(use);
+  }
+
   virtual size_t
   sizeof_txn_object(uint64_t txn_flags) const;
 
@@ -97,10 +131,29 @@ public:
   virtual void print_txn_debug(void *txn) const;
   virtual std::map<std::string, uint64_t> get_txn_counters(void *txn) const;
 
+  virtual std::vector<std::string>
+  commit_phase_names() const
+  {
+    // COMMIT_PHASE_x => x
+    static const size_t prefixlen = sizeof("COMMIT_PHASE_") - 1;
+    std::vector<std::string> ret;
+    for (size_t i = 0; i < transaction_base::NCommitPhases; i++)
+      ret.push_back(transaction_base::CommitPhaseStr(
+            static_cast<transaction_base::commit_phase>(i)) + prefixlen);
+    return ret;
+  }
+
+  virtual bool
+  take_commit_phase_sample(uint64_t *cycles)
+  {
+    return transaction_base::TakeCommitPhaseSample(cycles);
+  }
+
   virtual abstract_ordered_index *
   open_index(const std::string &name,
              size_t value_size_hint,
-             bool mostly_append);
+             bool mostly_append,
+             abstract_ordered_index::key_type key_type);
 
   virtual void
   close_index(abstract_ordered_index *idx);
@@ -115,11 +168,19 @@ protected:
     using cast = private_::cast_base<Transaction, Traits>;
 
 public:
-  ndb_ordered_index(const std::string &name, size_t value_size_hint, bool mostly_append);
+  ndb_ordered_index(const std::string &name, size_t value_size_hint, bool mostly_append,
+                    key_type keytype = KEY_TYPE_STRING);
   virtual bool get(
       void *txn,
       const std::string &key,
       std::string &value, size_t max_bytes_read);
+  virtual void multi_get(
+      void *txn,
+      const std::string *keys,
+      size_t n,
+      std::string *values,
+      bool *found,
+      size_t max_bytes_read);
   virtual const char * put(
       void *txn,
       const std::string &key,
@@ -128,6 +189,10 @@ public:
       void *txn,
       std::string &&key,
       std::string &&value);
+  virtual const char * put_delta(
+      void *txn,
+      const std::string &key,
+      const std::string &delta);
   virtual const char *
   insert(void *txn,
          const std::string &key,
@@ -154,11 +219,58 @@ public:
   virtual void remove(
       void *txn,
       std::string &&key);
+  virtual bool get_int(
+      void *txn,
+      const uint64_t *k,
+      size_t nwords,
+      std::string &value,
+      size_t max_bytes_read);
+  virtual const char *put_int(
+      void *txn,
+      const uint64_t *k,
+      size_t nwords,
+      const std::string &value);
+  virtual const char *insert_int(
+      void *txn,
+      const uint64_t *k,
+      size_t nwords,
+      const std::string &value);
+  virtual void remove_int(
+      void *txn,
+      const uint64_t *k,
+      size_t nwords);
+  virtual void scan_int(
+      void *txn,
+      const uint64_t *start_key,
+      const uint64_t *end_key,
+      size_t nwords,
+      scan_callback &callback,
+      str_arena *arena);
+  virtual bool supports_bulk_load() const { return true; }
+  virtual void bulk_insert(
+      const std::string &key,
+      const std::string &value);
+  virtual void bulk_load_finish(double fill_factor);
   virtual size_t size() const;
+  virtual std::map<std::string, uint64_t> footprint() const;
   virtual std::map<std::string, uint64_t> clear();
 private:
+  typedef std::vector<typename txn_btree<Transaction>::bulk_record_t> bulk_run;
+
+  // integer keys must have the width keytype gives them
+  inline bool
+  key_ok(size_t keylen) const
+  {
+    return keytype == KEY_TYPE_STRING ||
+           keylen == KeyWords(keytype) * sizeof(uint64_t);
+  }
+
   std::string name;
+  key_type keytype;
   txn_btree<Transaction> btr;
+  // not pedantic: indexes are allocated by plain new (see open_index()),
+  // so the member is only as aligned as malloc() makes it
+  percore<bulk_run, true, false> bulk_runs; // one per loader thread
 };
 
 #endif /* _NDB_WRAPPER_H_ */
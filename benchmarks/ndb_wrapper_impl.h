@@ -127,7 +127,10 @@ ndb_wrapper<Transaction>::ndb_wrapper(
     const std::vector<std::vector<unsigned>> &assignments_given,
     bool call_fsync,
     bool use_compression,
-    bool fake_writes)
+    bool fake_writes,
+    uint64_t group_commit_us,
+    size_t group_commit_bytes,
+    log_writer::backend writer_backend)
 {
   if (logfiles.empty())
     return;
@@ -136,13 +139,19 @@ ndb_wrapper<Transaction>::ndb_wrapper(
       nthreads, logfiles, assignments_given, &assignments_used,
       call_fsync,
       use_compression,
-      fake_writes);
+      fake_writes,
+      group_commit_us,
+      group_commit_bytes,
+      writer_backend);
   if (verbose) {
     std::cerr << "[logging subsystem]" << std::endl;
     std::cerr << "  assignments: " << assignments_used << std::endl;
     std::cerr << "  call fsync : " << call_fsync       << std::endl;
     std::cerr << "  compression: " << use_compression  << std::endl;
     std::cerr << "  fake_writes: " << fake_writes      << std::endl;
+    std::cerr << "  group_commit_us   : " << group_commit_us    << std::endl;
+    std::cerr << "  group_commit_bytes: " << group_commit_bytes << std::endl;
+    std::cerr << "  writer     : " << log_writer::BackendName(writer_backend) << std::endl;
   }
 }
 
@@ -278,9 +287,10 @@ ndb_wrapper<Transaction>::get_txn_counters(void *txn) const
 
 template <template <typename> class Transaction>
 abstract_ordered_index *
-ndb_wrapper<Transaction>::open_index(const std::string &name, size_t value_size_hint, bool mostly_append)
+ndb_wrapper<Transaction>::open_index(const std::string &name, size_t value_size_hint, bool mostly_append,
+                                     abstract_ordered_index::key_type key_type)
 {
-  return new ndb_ordered_index<Transaction>(name, value_size_hint, mostly_append);
+  return new ndb_ordered_index<Transaction>(name, value_size_hint, mostly_append, key_type);
 }
 
 template <template <typename> class Transaction>
@@ -292,8 +302,9 @@ ndb_wrapper<Transaction>::close_index(abstract_ordered_index *idx)
 
 template <template <typename> class Transaction>
 ndb_ordered_index<Transaction>::ndb_ordered_index(
-    const std::string &name, size_t value_size_hint, bool mostly_append)
-  : name(name), btr(value_size_hint, mostly_append, name)
+    const std::string &name, size_t value_size_hint, bool mostly_append,
+    key_type keytype)
+  : name(name), keytype(keytype), btr(value_size_hint, mostly_append, name)
 {
   // for debugging
   //std::cerr << name << " : btree= "
@@ -333,6 +344,36 @@ ndb_ordered_index<Transaction>::get(
   }
 }
 
+template <template <typename> class Transaction>
+void
+ndb_ordered_index<Transaction>::multi_get(
+    void *txn,
+    const std::string *keys,
+    size_t n,
+    std::string *values,
+    bool *found,
+    size_t max_bytes_read)
+{
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      btr.multi_search(*t, keys, n, values, found, max_bytes_read); \
+      return; \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+}
+
 // XXX: find way to remove code duplication below using C++ templates!
 
 template <template <typename> class Transaction>
@@ -344,6 +385,7 @@ ndb_ordered_index<Transaction>::put(
 {
   PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
   ANON_REGION(probe1_name.c_str(), &private_::ndb_put_probe0_cg);
+  INVARIANT(key_ok(key.size()));
   ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
   try {
 #define MY_OP_X(a, b) \
@@ -372,6 +414,7 @@ ndb_ordered_index<Transaction>::put(
     std::string &&key,
     std::string &&value)
 {
+  INVARIANT(key_ok(key.size()));
   ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
   try {
 #define MY_OP_X(a, b) \
@@ -393,6 +436,34 @@ ndb_ordered_index<Transaction>::put(
   return 0;
 }
 
+template <template <typename> class Transaction>
+const char *
+ndb_ordered_index<Transaction>::put_delta(
+    void *txn,
+    const std::string &key,
+    const std::string &delta)
+{
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      btr.put_delta(*t, key, delta); \
+      return 0; \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+  return 0;
+}
+
 template <template <typename> class Transaction>
 const char *
 ndb_ordered_index<Transaction>::insert(
@@ -402,6 +473,7 @@ ndb_ordered_index<Transaction>::insert(
 {
   PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
   ANON_REGION(probe1_name.c_str(), &private_::ndb_insert_probe0_cg);
+  INVARIANT(key_ok(key.size()));
   ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
   try {
 #define MY_OP_X(a, b) \
@@ -430,6 +502,7 @@ ndb_ordered_index<Transaction>::insert(
     std::string &&key,
     std::string &&value)
 {
+  INVARIANT(key_ok(key.size()));
   ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
   try {
 #define MY_OP_X(a, b) \
@@ -580,6 +653,186 @@ ndb_ordered_index<Transaction>::remove(void *txn, std::string &&key)
   }
 }
 
+// the *_int() methods make the key on the stack (see int_varkey), and
+// get_int() searches it as is. writes still copy it to the txn's arena,
+// where the write set keeps its keys
+
+template <template <typename> class Transaction>
+bool
+ndb_ordered_index<Transaction>::get_int(
+    void *txn,
+    const uint64_t *k,
+    size_t nwords,
+    std::string &value, size_t max_bytes_read)
+{
+  PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
+  ANON_REGION(probe1_name.c_str(), &private_::ndb_get_probe0_cg);
+  INVARIANT(key_ok(nwords * sizeof(uint64_t)));
+  const int_varkey key(k, nwords);
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      return btr.search(*t, key, value, max_bytes_read); \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+  return false;
+}
+
+template <template <typename> class Transaction>
+const char *
+ndb_ordered_index<Transaction>::put_int(
+    void *txn,
+    const uint64_t *k,
+    size_t nwords,
+    const std::string &value)
+{
+  PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
+  ANON_REGION(probe1_name.c_str(), &private_::ndb_put_probe0_cg);
+  INVARIANT(key_ok(nwords * sizeof(uint64_t)));
+  const int_varkey key(k, nwords);
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      btr.put(*t, key, value); \
+      return 0; \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+  return 0;
+}
+
+template <template <typename> class Transaction>
+const char *
+ndb_ordered_index<Transaction>::insert_int(
+    void *txn,
+    const uint64_t *k,
+    size_t nwords,
+    const std::string &value)
+{
+  PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
+  ANON_REGION(probe1_name.c_str(), &private_::ndb_insert_probe0_cg);
+  INVARIANT(key_ok(nwords * sizeof(uint64_t)));
+  const int_varkey key(k, nwords);
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      btr.insert(*t, key, value); \
+      return 0; \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+  return 0;
+}
+
+template <template <typename> class Transaction>
+void
+ndb_ordered_index<Transaction>::remove_int(
+    void *txn,
+    const uint64_t *k,
+    size_t nwords)
+{
+  PERF_DECL(static std::string probe1_name(std::string(__PRETTY_FUNCTION__) + std::string(":total:")));
+  ANON_REGION(probe1_name.c_str(), &private_::ndb_remove_probe0_cg);
+  INVARIANT(key_ok(nwords * sizeof(uint64_t)));
+  const int_varkey key(k, nwords);
+  ndbtxn * const p = reinterpret_cast<ndbtxn *>(txn);
+  try {
+#define MY_OP_X(a, b) \
+  case a: \
+    { \
+      auto t = cast< b >()(p); \
+      btr.remove(*t, key); \
+      return; \
+    }
+    switch (p->hint) {
+      TXN_PROFILE_HINT_OP(MY_OP_X)
+    default:
+      ALWAYS_ASSERT(false);
+    }
+#undef MY_OP_X
+  } catch (transaction_abort_exception &ex) {
+    throw abstract_db::abstract_abort_exception();
+  }
+}
+
+template <template <typename> class Transaction>
+void
+ndb_ordered_index<Transaction>::scan_int(
+    void *txn,
+    const uint64_t *start_key,
+    const uint64_t *end_key,
+    size_t nwords,
+    scan_callback &callback,
+    str_arena *arena)
+{
+  INVARIANT(key_ok(nwords * sizeof(uint64_t)));
+  // the range is searched as strings: make them in the caller's arena, if
+  // there is one, which reuses their memory
+  std::string lower_buf, upper_buf;
+  std::string * const lower = arena ? arena->next() : &lower_buf;
+  std::string * const upper = arena ? arena->next() : &upper_buf;
+  EncodeIntKey(*lower, start_key, nwords);
+  if (end_key)
+    EncodeIntKey(*upper, end_key, nwords);
+  scan(txn, *lower, end_key ? upper : nullptr, callback, arena);
+}
+
+template <template <typename> class Transaction>
+void
+ndb_ordered_index<Transaction>::bulk_insert(
+    const std::string &key,
+    const std::string &value)
+{
+  INVARIANT(key_ok(key.size()));
+  bulk_runs.my().push_back(btr.bulk_record(key, value));
+}
+
+template <template <typename> class Transaction>
+void
+ndb_ordered_index<Transaction>::bulk_load_finish(double fill_factor)
+{
+  std::vector<bulk_run> runs;
+  for (size_t i = 0; i < bulk_runs.size(); i++)
+    if (!bulk_runs[i].empty()) {
+      runs.emplace_back();
+      runs.back().swap(bulk_runs[i]);
+    }
+  if (runs.empty())
+    return;
+  btr.bulk_load(runs, fill_factor);
+}
+
 template <template <typename> class Transaction>
 size_t
 ndb_ordered_index<Transaction>::size() const
@@ -587,6 +840,13 @@ ndb_ordered_index<Transaction>::size() const
   return btr.size_estimate();
 }
 
+template <template <typename> class Transaction>
+std::map<std::string, uint64_t>
+ndb_ordered_index<Transaction>::footprint() const
+{
+  return btr.unsafe_footprint();
+}
+
 template <template <typename> class Transaction>
 std::map<std::string, uint64_t>
 ndb_ordered_index<Transaction>::clear()
@@ -0,0 +1,308 @@
+/**
+ * recover.cc
+ *
+ * rebuilds the tables of a previous (persistent) run from its logs, and
+ * reports how fast that went
+ *
+ * the logs are given as bench-opts (the dbtest --logfile option truncates
+ * its files on startup), in the order the previous run listed them:
+ *
+ *   dbtest --bench recover --num-threads N \
+ *     --bench-opts "--logfile /data/log0 --logfile /data/log1"
+ *
+ * if the run took checkpoints (dbtest --checkpoint-interval), the latest
+ * one is loaded first (one thread per checkpoint file), and only the log
+ * buffers from later epochs are replayed.
+ *
+ * N threads decode the logs, then N threads replay them (one hash
+ * partition of keys each), in batched txns. only ndb-proto2 writes logs,
+ * and only untyped tables can be replayed- the typed tables in
+ * new-benchmarks log deltas, not values. (value deltas, written by
+ * txn_btree::put_delta(), are applied to the key's previous value)
+ */
+
+#include <iostream>
+#include <limits>
+#include <map>
+#include <string>
+#include <vector>
+
+#include <getopt.h>
+
+#include "../macros.h"
+#include "../log_recovery.h"
+#include "../spinbarrier.h"
+#include "../util.h"
+#include "../value_delta.h"
+#include "bench.h"
+#include "checkpoint.h"
+
+using namespace std;
+using namespace util;
+
+static size_t g_batch_size = 0; // 0 = the db's max batch size
+static int g_ignore_checkpoint = 0;
+
+static inline size_t
+batch_size(abstract_db *db)
+{
+  if (g_batch_size)
+    return g_batch_size;
+  return (db->txn_max_batch_size() == -1) ? 10000 : db->txn_max_batch_size();
+}
+
+class recover_replayer : public bench_loader {
+public:
+  recover_replayer(unsigned int id,
+                   abstract_db *db,
+                   const map<string, abstract_ordered_index *> &open_tables,
+                   const map<uint32_t, abstract_ordered_index *> &tables,
+                   const log_recovery::partition &part)
+    : bench_loader(id, db, open_tables), id(id), tables(tables), part(part),
+      nunknown(0), nbad_deltas(0)
+  {}
+
+  // records of tables missing from the catalog
+  inline size_t get_nunknown() const { return nunknown; }
+
+  // value deltas of keys without a value, or which did not fit it
+  inline size_t get_nbad_deltas() const { return nbad_deltas; }
+
+protected:
+  virtual void
+  load()
+  {
+    if (pin_cpus) {
+      ALWAYS_ASSERT(id < nthreads);
+      rcu::s_instance.pin_current_thread(id);
+      rcu::s_instance.fault_region();
+    }
+
+    const size_t batchsize = batch_size(db);
+
+    for (auto &r : part)
+      if (!tables.count(r.table_))
+        nunknown++;
+
+    for (size_t i = 0; i < part.size();) {
+      scoped_str_arena s_arena(arena);
+      void * const txn = db->new_txn(txn_flags, arena, txn_buf());
+      const size_t end = min(part.size(), i + batchsize);
+      size_t nbad = 0;
+      try {
+        for (size_t j = i; j < end; j++) {
+          const log_recovery::record &r = part[j];
+          auto it = tables.find(r.table_);
+          if (unlikely(it == tables.end()))
+            continue;
+          if (r.delta_) {
+            // the previous value may have been put by this same txn
+            string v;
+            if (unlikely(!it->second->get(txn, r.key(), v) ||
+                         !value_delta::FailsafeApply(v, r.value_, r.vlen_))) {
+              nbad++;
+              continue;
+            }
+            it->second->put(txn, r.key(), v);
+          } else if (r.vlen_) {
+            it->second->put(txn, r.key(), r.value());
+          } else {
+            it->second->remove(txn, r.key());
+          }
+        }
+        if (db->commit_txn(txn)) {
+          i = end;
+          nbad_deltas += nbad;
+        } else
+          db->abort_txn(txn);
+      } catch (abstract_db::abstract_abort_exception &ex) {
+        db->abort_txn(txn);
+      }
+    }
+    if (verbose)
+      cerr << "[INFO] replayer " << id << " finished "
+           << part.size() << " records" << endl;
+  }
+
+private:
+  const unsigned int id;
+  const map<uint32_t, abstract_ordered_index *> &tables;
+  const log_recovery::partition &part;
+  size_t nunknown;
+  size_t nbad_deltas;
+};
+
+void
+recover_do_test(abstract_db *db, int argc, char **argv)
+{
+  vector<string> logfiles;
+
+  // parse options
+  optind = 1;
+  while (1) {
+    static struct option long_options[] = {
+      {"logfile"    , required_argument , 0 , 'l'},
+      {"batch-size" , required_argument , 0 , 'b'},
+      {"ignore-checkpoint" , no_argument , &g_ignore_checkpoint , 1},
+      {0, 0, 0, 0}
+    };
+    int option_index = 0;
+    int c = getopt_long(argc, argv, "l:b:", long_options, &option_index);
+    if (c == -1)
+      break;
+    switch (c) {
+    case 0:
+      if (long_options[option_index].flag != 0)
+        break;
+      abort();
+      break;
+
+    case 'l':
+      logfiles.emplace_back(optarg);
+      break;
+
+    case 'b':
+      g_batch_size = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(g_batch_size > 0);
+      break;
+
+    case '?':
+      /* getopt_long already printed an error message. */
+      exit(1);
+
+    default:
+      abort();
+    }
+  }
+
+  if (logfiles.empty()) {
+    cerr << "[ERROR] recover needs at least one --logfile bench-opt" << endl;
+    exit(1);
+  }
+
+  if (verbose) {
+    cerr << "recover settings:" << endl;
+    cerr << "  logfiles  : " << logfiles << endl;
+    cerr << "  batch_size: " << g_batch_size << endl;
+    cerr << "  ignore_checkpoint: " << g_ignore_checkpoint << endl;
+  }
+
+  checkpoint_manifest ckpt;
+  const bool has_ckpt = !g_ignore_checkpoint &&
+    ckpt.read(checkpoint_manifest::FileName(logfiles[0]));
+
+  log_recovery rec(logfiles);
+  timer t;
+  // the checkpoint holds every txn up to (and including) its epoch
+  rec.read(nthreads, nthreads, has_ckpt ? ckpt.epoch_ + 1 : 0);
+  const double parse_ms = t.lap_ms();
+
+  // a name can be registered more than once (e.g. a table which was dropped
+  // and re-created)- all of its ids map to one table
+  map<string, abstract_ordered_index *> open_tables;
+  map<uint32_t, abstract_ordered_index *> tables;
+  for (auto &p : rec.tables()) {
+    abstract_ordered_index *&tbl = open_tables[p.second];
+    if (!tbl)
+      tbl = db->open_index(p.second, 128);
+    tables[p.first] = tbl;
+  }
+  vector<abstract_ordered_index *> ckpt_tables;
+  for (auto &name : ckpt.tables_) {
+    abstract_ordered_index *&tbl = open_tables[name];
+    if (!tbl)
+      tbl = db->open_index(name, 128);
+    ckpt_tables.push_back(tbl);
+  }
+
+  uint64_t ckpt_nbytes = 0, ckpt_nrecords = 0;
+  t.lap();
+  if (has_ckpt) {
+    vector<checkpoint_loader *> loaders;
+    spin_barrier b(ckpt.files_.size());
+    for (size_t i = 0; i < ckpt.files_.size(); i++) {
+      loaders.push_back(new checkpoint_loader(
+            i, db, open_tables, ckpt_tables, ckpt.files_[i], batch_size(db)));
+      loaders.back()->set_barrier(b);
+    }
+    for (auto l : loaders)
+      l->start();
+    for (auto l : loaders) {
+      l->join();
+      ckpt_nbytes += l->get_nbytes();
+      ckpt_nrecords += l->get_nrecords();
+      delete l;
+    }
+  }
+  const double checkpoint_ms = t.lap_ms();
+
+  vector<recover_replayer *> replayers;
+  spin_barrier b(nthreads);
+  for (size_t i = 0; i < nthreads; i++) {
+    replayers.push_back(
+        new recover_replayer(i, db, open_tables, tables, rec.get_partition(i)));
+    replayers.back()->set_barrier(b);
+  }
+  t.lap();
+  for (auto r : replayers)
+    r->start();
+  size_t nunknown = 0, nbad_deltas = 0;
+  for (auto r : replayers) {
+    r->join();
+    nunknown += r->get_nunknown();
+    nbad_deltas += r->get_nbad_deltas();
+    delete r;
+  }
+  db->do_txn_epoch_sync();
+  const double replay_ms = t.lap_ms();
+
+  const double total_sec = (parse_ms + checkpoint_ms + replay_ms) / 1000.0;
+  const double gb_per_sec =
+    double(rec.nbytes() + ckpt_nbytes) / 1e9 / total_sec;
+  const double records_per_sec =
+    double(rec.nrecords() + ckpt_nrecords) / total_sec;
+
+  if (nunknown)
+    cerr << "[WARNING] skipped " << nunknown
+         << " records of tables missing from the catalog" << endl;
+  if (nbad_deltas)
+    cerr << "[WARNING] skipped " << nbad_deltas
+         << " value deltas which did not apply to their key's value" << endl;
+  if (verbose) {
+    cerr << "--- recovery summary ---" << endl;
+    cerr << "persistent_epoch : " << rec.persistent_epoch() << endl;
+    if (rec.persistent_tid() != numeric_limits<uint64_t>::max())
+      cerr << "persistent_tid   : " << rec.persistent_tid() << endl;
+    if (has_ckpt) {
+      cerr << "checkpoint_epoch : " << ckpt.epoch_ << endl;
+      cerr << "checkpoint_bytes : " << ckpt_nbytes << endl;
+      cerr << "checkpoint_recs  : " << ckpt_nrecords << endl;
+      cerr << "checkpoint_ms    : " << checkpoint_ms << endl;
+    }
+    cerr << "log_bytes        : " << rec.nbytes() << endl;
+    cerr << "torn_bytes       : " << rec.ntorn_bytes() << endl;
+    cerr << "buffers          : " << rec.nbuffers() << endl;
+    cerr << "buffers_skipped  : " << rec.nbuffers_skipped() << endl;
+    cerr << "txns             : " << rec.ntxns() << endl;
+    cerr << "txns_skipped     : " << rec.ntxns_skipped() << endl;
+    cerr << "records          : " << rec.nrecords() << endl;
+    cerr << "parse_ms         : " << parse_ms << endl;
+    cerr << "replay_ms        : " << replay_ms << endl;
+    cerr << "gb_per_sec       : " << gb_per_sec << endl;
+    cerr << "records_per_sec  : " << records_per_sec << endl;
+    for (auto &p : open_tables) {
+      scoped_rcu_region guard;
+      cerr << "table " << p.first << " size " << p.second->size() << endl;
+    }
+  }
+
+  // output for plotting script
+  cout << gb_per_sec << " "
+       << records_per_sec << " "
+       << parse_ms << " "
+       << replay_ms << " "
+       << checkpoint_ms << endl;
+
+  for (auto &p : open_tables)
+    db->close_index(p.second);
+}
@@ -10,149 +10,302 @@ import sys
 import math
 import itertools as it
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import resultstore
+
 # XXX: import from runner.py
 PERSIST_REAL='persist-real'
 PERSIST_TEMP='persist-temp'
 PERSIST_NONE='persist-none'
 
+def mean(x):   return sum(x)/len(x)
+def median(x): return sorted(x)[len(x)/2]
+
+### aggregation
+#
+# results are loaded once into a results_table: every distinct config
+# becomes a group whose fields are stored as categorical codes, and every
+# trial becomes a row of a float matrix tagged with its group. predicates
+# and axes below know how to evaluate themselves against the table (once
+# per distinct field value, not once per record), and medians/mins/maxes
+# are computed per group with a single sort. plain callables on merged
+# (config, values) pairs still work, they just take the slow path.
+
+_MISSING = object() # marks a field a config does not have
+
+def _present(v):
+  return None if v is _MISSING else v
+
+class results_table(object):
+  def __init__(self, results):
+    results = list(results)
+    self.fields = sorted(set(it.chain.from_iterable(c.keys() for c, _ in results)))
+    self.categories = []
+    codes = np.zeros((len(results), len(self.fields)), dtype=np.int32)
+    for j, f in enumerate(self.fields):
+      index = {}
+      for i, (c, _) in enumerate(results):
+        codes[i, j] = index.setdefault(c.get(f, _MISSING), len(index))
+      cats = np.empty(len(index), dtype=object)
+      for v, code in index.iteritems():
+        cats[code] = v
+      self.categories.append(cats)
+    if len(results):
+      self.codes, inverse = np.unique(codes, axis=0, return_inverse=True)
+    else:
+      self.codes, inverse = codes, np.zeros(0, dtype=np.int64)
+    self.ngroups = self.codes.shape[0]
+
+    trials = [(inverse[i], t) for i, (_, v) in enumerate(results)
+                              for t in resultstore.normalize_values(v)]
+    width = max([len(t) for _, t in trials] or [0])
+    self.trial_group = np.array([g for g, _ in trials], dtype=np.int64)
+    self.trial_values = np.full((len(trials), width), np.nan)
+    for i, (_, t) in enumerate(trials):
+      self.trial_values[i, :len(t)] = t
+    self._merged = {}
+
+  def field_apply(self, f, fn, dtype=object, groups=None):
+    """
+    fn(value of f) for groups (default all), calling fn once per distinct
+    value. missing fields are passed as None
+    """
+    if groups is None:
+      groups = np.arange(self.ngroups)
+    if f not in self.fields:
+      return np.array([fn(None)] * len(groups), dtype=dtype)
+    j = self.fields.index(f)
+    uniq, inverse = np.unique(self.codes[groups, j], return_inverse=True)
+    applied = np.array([fn(_present(self.categories[j][c])) for c in uniq], dtype=dtype)
+    return applied[inverse]
+
+  def config(self, g):
+    return dict((f, self.categories[j][self.codes[g, j]])
+                for j, f in enumerate(self.fields)
+                if self.categories[j][self.codes[g, j]] is not _MISSING)
+
+  def merged(self, g):
+    """group g as a (config, [trials]) pair, as merge() used to produce"""
+    if g not in self._merged:
+      rows = self.trial_values[self.trial_group == g]
+      self._merged[g] = (self.config(g),
+          [tuple(v for v in r if not np.isnan(v)) for r in rows])
+    return self._merged[g]
+
+  def mask(self, pred):
+    """per-group boolean mask for a predicate"""
+    if hasattr(pred, 'mask'):
+      return pred.mask(self)
+    return np.array([bool(pred(self.merged(g))) for g in xrange(self.ngroups)],
+                    dtype=bool)
+
+  def group_values(self, axis, groups):
+    """per-group scalar for axis (trial axes are reduced by median)"""
+    if hasattr(axis, 'per_group'):
+      return axis.per_group(self, groups)
+    if hasattr(axis, 'per_trial'):
+      return self.reduce(axis, groups)[0]
+    return np.array([axis(self.merged(g)) for g in groups], dtype=float)
+
+  def reduce(self, axis, groups):
+    """
+    returns (median, min, max) arrays of axis over the trials of each group
+    in groups. median is the upper median, like median()
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    if not hasattr(axis, 'per_trial'):
+      vals = [axis(self.merged(g)) for g in groups]
+      vals = [v if type(v) == list else [v] for v in vals]
+      return (np.array([median(v) for v in vals], dtype=float),
+              np.array([min(v) for v in vals], dtype=float),
+              np.array([max(v) for v in vals], dtype=float))
+    sel = np.flatnonzero(np.in1d(self.trial_group, groups))
+    g = self.trial_group[sel]
+    y = axis.per_trial(self, sel)
+    order = np.lexsort((y, g))
+    g, y = g[order], y[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else \
+        np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, len(g)])
+    pos = np.searchsorted(g[starts], groups)
+    starts, counts = starts[pos], counts[pos]
+    return (y[starts + counts // 2], y[starts], y[starts + counts - 1])
+
+# predicates
+
+class field_pred(object):
+  """fn(value of config field f); missing fields are passed as None"""
+  def __init__(self, f, fn):
+    self.f, self.fn = f, fn
+  def __call__(self, x):
+    return bool(self.fn(x[0].get(self.f)))
+  def mask(self, table):
+    return table.field_apply(self.f, lambda v: bool(self.fn(v)), dtype=bool)
+
+class AND(object):
+  def __init__(self, *extractors):
+    self.extractors = extractors
+  def __call__(self, x):
+    return all(ex(x) for ex in self.extractors)
+  def mask(self, table):
+    return np.logical_and.reduce(
+        [table.mask(ex) for ex in self.extractors] + [np.ones(table.ngroups, dtype=bool)])
+
+class OR(object):
+  def __init__(self, *extractors):
+    self.extractors = extractors
+  def __call__(self, x):
+    return any(ex(x) for ex in self.extractors)
+  def mask(self, table):
+    return np.logical_or.reduce(
+        [table.mask(ex) for ex in self.extractors] + [np.zeros(table.ngroups, dtype=bool)])
+
+# axes
+
+class config_axis(object):
+  """fn(value of config field f), constant across the trials of a group"""
+  def __init__(self, f, fn=lambda v: v):
+    self.f, self.fn = f, fn
+  def __call__(self, x):
+    return self.fn(x[0][self.f])
+  def per_group(self, table, groups):
+    return table.field_apply(self.f, self.fn, dtype=float, groups=groups)
+
+# column of each result field within a trial
+RESULT_COLUMN = dict((f, k) for k, f in enumerate(resultstore.RESULT_FIELDS))
+
+def _column(table, rows, k):
+  # trials from older binaries lack the later columns
+  if k >= table.trial_values.shape[1]:
+    return np.full(len(rows), np.nan)
+  return table.trial_values[rows, k]
+
+class result_axis(object):
+  """
+  column k of each trial's results, optionally divided by the number of
+  threads. Called directly it returns the per-trial list (or its median)
+  """
+  def __init__(self, k, percore=False, median=False):
+    self.k, self.percore, self.median = k, percore, median
+  def _value(self, x, e):
+    v = e[self.k] if self.k < len(e) else float('nan')
+    return v / float(x[0]['threads']) if self.percore else v
+  def __call__(self, x):
+    if type(x[1]) != list:
+      return self._value(x, x[1])
+    ys = [self._value(x, e) for e in x[1]]
+    return median(ys) if self.median else ys
+  def per_trial(self, table, rows):
+    ys = _column(table, rows, self.k)
+    if self.percore:
+      ys = ys / table.field_apply(
+          'threads', float, dtype=float, groups=table.trial_group[rows])
+    return ys
+
+class latency_axis(object):
+  """
+  commit latency, or persist latency when persistence is on. pct selects a
+  percentile column ('50', '95', '99' or '999') instead of the average
+  """
+  def __init__(self, pct=None):
+    if pct is None:
+      self.commit, self.persist = 2, 3
+    else:
+      self.commit = RESULT_COLUMN['p%s_latency_ms' % pct]
+      self.persist = RESULT_COLUMN['p%s_persist_latency_ms' % pct]
+  def __call__(self, x):
+    return result_axis(self.commit)(x) if x[0]['persist'] == PERSIST_NONE else \
+           result_axis(self.persist)(x)
+  def per_trial(self, table, rows):
+    nopersist = table.field_apply(
+        'persist', lambda v: v == PERSIST_NONE, dtype=bool,
+        groups=table.trial_group[rows])
+    return np.where(nopersist,
+                    _column(table, rows, self.commit),
+                    _column(table, rows, self.persist))
+
 NEW_ORDER_RGX = re.compile(r'--new-order-remote-item-pct (\d+)')
-def extract_raw_pct(x):
-  x = x[0]['bench_opts']
-  m = NEW_ORDER_RGX.search(x)
+def raw_pct(bench_opts):
+  m = NEW_ORDER_RGX.search(bench_opts)
   assert m
   p = int(m.group(1))
   assert p >= 0 and p <= 100
   return p
 
-def extract_pct(x):
-  p = extract_raw_pct(x)
+def expected_pct(bench_opts):
+  p = raw_pct(bench_opts)
   def pn(n, p):
     return 1.0 - (1.0 - p)**n
   def ex(p):
-    import math
     return math.fsum([(1.0/11.0)*pn(float(n), p) for n in range(5, 16)])
   return ex(p/100.0) * 100.0
 
-def mean(x):   return sum(x)/len(x)
-def median(x): return sorted(x)[len(x)/2]
-
-def extract_nthreads(x):
-  x = x[0]['threads']
-  return x
+extract_raw_pct = config_axis('bench_opts', raw_pct)
+extract_pct = config_axis('bench_opts', expected_pct)
+extract_nthreads = config_axis('threads')
+extract_coroutines = config_axis('coroutines')
+extract_latency = latency_axis()
+extract_p99_latency = latency_axis('99')
+extract_p999_latency = latency_axis('999')
 
 def deal_with_posK_res(k):
-    def fn(x):
-        x = x[1]
-        if type(x) == list:
-            return [e[k] for e in x]
-        return x[k]
-    return fn
+  return result_axis(k)
 
 def deal_with_posK_res_median(k):
-    def fn(x):
-        x = x[1]
-        if type(x) == list:
-            return median([e[k] for e in x])
-        return x[k]
-    return fn
-
-def extract_latency(x):
-  return deal_with_posK_res(2)(x) if x[0]['persist'] == PERSIST_NONE else \
-         deal_with_posK_res(3)(x)
+  return result_axis(k, median=True)
 
 def deal_with_posK_res_percore(k):
-    def fn(x):
-        nthds = float(extract_nthreads(x))
-        x = x[1]
-        if type(x) == list:
-            return [e[k]/nthds for e in x]
-        return x[k]/nthds
-    return fn
+  return result_axis(k, percore=True)
 
 def longest_line(ls):
     best, bestlen = ls[0], len(ls[0])
     for i in xrange(1, len(ls)):
         if len(ls[i]) > bestlen:
-            best, bestline = ls[i], len(ls[i])
+            best, bestlen = ls[i], len(ls[i])
     return best
 
-def dicttokey(d):
-    return tuple(sorted(d.items(), key=lambda x: x[0]))
-
-def keytodict(k):
-    return dict(k)
-
-def merge(results):
-    def combine(ylist):
-        return list(it.chain.from_iterable(ylist))
-    d = {}
-    for r in results:
-        k = dicttokey(r[0])
-        l = d.get(k, [])
-        l.append(r[1])
-        d[k] = l
-    return [(keytodict(x), combine(ys)) for x, ys in d.iteritems()]
+def line_points(table, line_desc, xaxis, yaxes):
+    """
+    returns (xpts, [(ymid, ymin, ymax) per y-axis]) for the groups matching
+    a line's extractor, sorted by x
+    """
+    groups = np.flatnonzero(table.mask(line_desc['extractor']))
+    xpts = table.group_values(xaxis, groups)
+    order = np.argsort(xpts, kind='mergesort')
+    groups, xpts = groups[order], xpts[order]
+    return xpts, [table.reduce(y, groups) for y in yaxes]
+
+def errbars(ys):
+    ymid, ymin, ymax = ys
+    return np.array([ymid - ymin, ymax - ymid])
 
 def mkplot(results, desc, outfilename):
+    table = results if isinstance(results, results_table) else results_table(results)
     fig = plt.figure()
     ax = plt.subplot(111)
     double_axis = type(desc['y-axis']) == list
     assert not double_axis or len(desc['y-axis']) == 2
     if double_axis:
         ax1 = ax.twinx()
+    yaxes = desc['y-axis'] if double_axis else [desc['y-axis']]
+    axes = [ax, ax1] if double_axis else [ax]
 
-    lines = []
-    for line_desc in desc['lines']:
-        predfn = line_desc['extractor']
-        line_results = merge([d for d in results if predfn(d)])
-        xpts = map(desc['x-axis'], line_results)
-        if not double_axis:
-            ypts = map(desc['y-axis'], line_results)
-        else:
-            ypts = (map(desc['y-axis'][0], line_results),
-                    map(desc['y-axis'][1], line_results))
-            ypts = [(desc['y-axis'][0](x), desc['y-axis'][1](x)) for x in line_results]
-        lines.append({ 'xpts' : xpts, 'ypts' : ypts })
-    longest = longest_line([x['xpts'] for x in lines])
+    lines = [line_points(table, line_desc, desc['x-axis'], yaxes)
+             for line_desc in desc['lines']]
+    longest = longest_line([xpts for xpts, _ in lines])
     for idx in xrange(len(desc['lines'])):
         line_desc = desc['lines'][idx]
         if 'extend' in line_desc and line_desc['extend']:
             assert not double_axis
-            assert len(lines[idx]['xpts']) == 1
-            lines[idx]['xpts'] = longest
-            lines[idx]['ypts'] = [lines[idx]['ypts'][0] for _ in longest]
-    # order lines
-    for i in xrange(len(lines)):
-        l = lines[i]
-        l = sorted(zip(l['xpts'], l['ypts']), key=lambda x: x[0])
-        lines[i] = { 'xpts' : [x[0] for x in l], 'ypts' : [y[1] for y in l] }
-    if not desc['show-error-bars']:
-        for l in lines:
-            if not double_axis:
-                ax.plot(l['xpts'], [median(y) for y in l['ypts']])
+            xpts, ys = lines[idx]
+            assert len(xpts) == 1
+            lines[idx] = (longest, [tuple(np.repeat(a, len(longest)) for a in y) for y in ys])
+    for xpts, ys in lines:
+        for a, y in zip(axes, ys):
+            if not desc['show-error-bars']:
+                a.plot(xpts, y[0])
             else:
-                ax.plot(l['xpts'], [median(y[0]) for y in l['ypts']])
-                ax1.plot(l['xpts'], [median(y[1]) for y in l['ypts']])
-    else:
-        for l in lines:
-            if not double_axis:
-                ymins = np.array([min(y) for y in l['ypts']])
-                ymaxs = np.array([max(y) for y in l['ypts']])
-                ymid = np.array([median(y) for y in l['ypts']])
-                yerr = np.array([ymid - ymins, ymaxs - ymid])
-                ax.errorbar(l['xpts'], ymid, yerr=yerr)
-            else:
-                ymins = np.array([min(y[0]) for y in l['ypts']])
-                ymaxs = np.array([max(y[0]) for y in l['ypts']])
-                ymid = np.array([median(y[0]) for y in l['ypts']])
-                yerr = np.array([ymid - ymins, ymaxs - ymid])
-                ax.errorbar(l['xpts'], ymid, yerr=yerr)
-
-                ymins = np.array([min(y[1]) for y in l['ypts']])
-                ymaxs = np.array([max(y[1]) for y in l['ypts']])
-                ymid = np.array([median(y[1]) for y in l['ypts']])
-                yerr = np.array([ymid - ymins, ymaxs - ymid])
-                ax1.errorbar(l['xpts'], ymid, yerr=yerr)
+                a.errorbar(xpts, y[0], yerr=errbars(y))
 
     ax.set_xlabel(desc['x-label'])
     ax.set_ylabel(desc['y-label'] if not double_axis else desc['y-label'][0])
@@ -179,30 +332,24 @@ def mkplot(results, desc, outfilename):
     fig.savefig(outfilename, format='pdf')
 
 def mkbar(results, desc, outfilename):
+    table = results if isinstance(results, results_table) else results_table(results)
     fig = plt.figure()
     ax = plt.subplot(111)
     bars = []
     for bar_desc in desc['bars']:
-        predfn = bar_desc['extractor']
-        bar_results = merge([d for d in results if predfn(d)])
-        if len(bar_results) != 1:
-            print "bar_results:", bar_results
-        assert len(bar_results) == 1, 'bad predicate'
-        bars.append({ 'ypts' : desc['y-axis'](bar_results[0]) })
+        groups = np.flatnonzero(table.mask(bar_desc['extractor']))
+        if len(groups) != 1:
+            print "bar_results:", [table.merged(g) for g in groups]
+        assert len(groups) == 1, 'bad predicate'
+        bars.append(table.reduce(desc['y-axis'], groups))
     width = 0.15
     inds = np.arange(len(bars)) * width
+    ymids = [y[0][0] for y in bars]
     if not desc['show-error-bars']:
-        ax.bar(inds, [median(y['ypts']) for y in bars], width)
+        ax.bar(inds, ymids, width)
     else:
-        def geterr(ypts):
-            ymin = min(ypts)
-            ymax = max(ypts)
-            ymid = median(ypts)
-            yerr = [ymid - ymin, ymax - ymid]
-            return yerr
-        yerrs = [[geterr(y['ypts'])[0] for y in bars],
-                 [geterr(y['ypts'])[1] for y in bars]]
-        ax.bar(inds, [median(y['ypts']) for y in bars], width, yerr=yerrs)
+        yerrs = np.hstack([errbars(y) for y in bars])
+        ax.bar(inds, ymids, width, yerr=yerrs)
     ax.set_xticks(inds + width/2.)
     ax.set_xticklabels( [l['label'] for l in desc['bars']], rotation='vertical' )
     ax.set_ylabel(desc['y-label'])
@@ -239,75 +386,53 @@ if __name__ == '__main__':
     matplotlib.rcParams.update({'figure.autolayout' : True})
 
     def tpcc_fast_id_extractor(enabled):
-      if enabled:
-        return lambda x: x[0]['bench_opts'].find('--new-order-fast-id-gen') != -1
-      else:
-        return lambda x: x[0]['bench_opts'].find('--new-order-fast-id-gen') == -1
+      return field_pred('bench_opts',
+          lambda v: (v.find('--new-order-fast-id-gen') != -1) == enabled)
 
     def db_extractor(db):
-      return lambda x: x[0]['db'] == db
+      return field_pred('db', lambda v: v == db)
 
     def name_extractor(name):
-      return lambda x: x[0]['name'] == name
+      return field_pred('name', lambda v: v == name)
 
     def persist_extractor(mode):
-      return lambda x: 'persist' in x[0] and x[0]['persist'] == mode
+      return field_pred('persist', lambda v: v == mode)
 
     def binary_extractor(binary):
-      return lambda x: x[0]['binary'] == binary
+      return field_pred('binary', lambda v: v == binary)
 
     def snapshots_extractor(enabled):
-      if enabled:
-        return lambda x: 'disable_snapshots' not in x[0] or not x[0]['disable_snapshots']
-      else:
-        return lambda x: 'disable_snapshots' in x[0] and x[0]['disable_snapshots']
+      return field_pred('disable_snapshots', lambda v: (not v) == enabled)
 
     def ro_txns_extractor(enabled):
-      if enabled:
-        return lambda x: x[0]['bench_opts'].find('--disable-read-only-snapshots') == -1
-      else:
-        return lambda x: x[0]['bench_opts'].find('--disable-read-only-snapshots') != -1
+      return field_pred('bench_opts',
+          lambda v: (v.find('--disable-read-only-snapshots') == -1) == enabled)
 
     def gc_extractor(enabled):
-      if enabled:
-        return lambda x: 'disable_gc' not in x[0] or not x[0]['disable_gc']
-      else:
-        return lambda x: 'disable_gc' in x[0] and x[0]['disable_gc']
+      return field_pred('disable_gc', lambda v: (not v) == enabled)
 
     def log_compress_extractor(enabled):
-      return lambda x: 'log_compress' in x[0] and x[0]['log_compress']
+      return field_pred('log_compress', lambda v: bool(v))
 
     def numa_extractor(enabled):
-      if enabled:
-        return lambda x: x[0]['numa_memory'] is not None
-      else:
-        return lambda x: x[0]['numa_memory'] is None
+      return field_pred('numa_memory', lambda v: (v is not None) == enabled)
 
     def sep_trees_extractor(enabled):
-      return lambda x: (x[0]['bench_opts'].find('--enable-separate-tree-per-partition') != -1) == enabled
+      return field_pred('bench_opts',
+          lambda v: (v.find('--enable-separate-tree-per-partition') != -1) == enabled)
 
     def workload_mix_extractor(mix):
       mixstr = '--workload-mix %s' % (','.join(map(str, mix)))
-      return lambda x: x[0]['bench_opts'].find(mixstr) != -1
+      return field_pred('bench_opts', lambda v: v.find(mixstr) != -1)
 
     def nthreads_extractor(nthreads):
-      return lambda x: x[0]['threads'] == nthreads
-
-    def AND(*extractors):
-      def fn(x):
-        for ex in extractors:
-          if not ex(x):
-            return False
-        return True
-      return fn
-
-    def OR(*extractors):
-      def fn(x):
-        for ex in extractors:
-          if ex(x):
-            return True
-        return False
-      return fn
+      return field_pred('threads', lambda v: v == nthreads)
+
+    def bench_extractor(bench):
+      return field_pred('bench', lambda v: v == bench)
+
+    def arrival_extractor(process):
+      return field_pred('arrival_process', lambda v: v == process)
 
     configs = [
       {
@@ -672,22 +797,149 @@ if __name__ == '__main__':
         'show-error-bars' : True,
         'legend' : 'upper left',
         'title' : 'TPC-C scale (standard mix)',
+      },
+      {
+        # needs a sweep from a dbtest which reports latency percentiles
+        'file'    : 'istc3-tail-latency.jsonl',
+        'outfile' : 'istc3-tail-latency-scale_tpcc-p99.pdf',
+        'x-axis' : extract_nthreads,
+        'y-axis' : [extract_p99_latency, extract_p999_latency],
+        'lines' : [
+            {
+                'label' : 'Silo',
+                'extractor' : AND(
+                    name_extractor('scale_tpcc'),
+                    persist_extractor('persist-none')),
+            },
+            {
+                'label' : 'Silo+PersistTemp',
+                'extractor' : AND(
+                    name_extractor('scale_tpcc'),
+                    persist_extractor('persist-temp')),
+            },
+            {
+                'label' : 'Silo+Persist',
+                'extractor' : AND(
+                    name_extractor('scale_tpcc'),
+                    persist_extractor('persist-real')),
+            },
+        ],
+        'x-label' : 'nthreads',
+        'y-label' : ['p99 latency (ms)', 'p99.9 latency (ms)'],
+        'x-axis-set-major-locator' : False,
+        'show-error-bars' : True,
+        'legend' : 'upper left',
+        'title' : 'TPC-C scale tail latency',
+      },
+      {
+        # latency vs. achieved throughput, one point per offered load
+        'file'    : 'istc3-open-loop.jsonl',
+        'outfile' : 'istc3-open-loop-tpcc.pdf',
+        'x-axis' : deal_with_posK_res_median(0),
+        'y-axis' : extract_p99_latency,
+        'lines' : [
+            {
+                'label' : 'Fixed arrivals',
+                'extractor' : AND(
+                    name_extractor('open_loop'),
+                    bench_extractor('tpcc'),
+                    arrival_extractor('fixed')),
+            },
+            {
+                'label' : 'Poisson arrivals',
+                'extractor' : AND(
+                    name_extractor('open_loop'),
+                    bench_extractor('tpcc'),
+                    arrival_extractor('poisson')),
+            },
+        ],
+        'x-label' : 'throughput (txns/sec)',
+        'y-label' : 'p99 latency (ms)',
+        'x-axis-set-major-locator' : False,
+        'show-error-bars' : True,
+        'legend' : 'upper left',
+        'title' : 'TPC-C open loop',
+      },
+      {
+        # latency vs. achieved throughput, one point per offered load
+        'file'    : 'istc3-open-loop.jsonl',
+        'outfile' : 'istc3-open-loop-ycsb.pdf',
+        'x-axis' : deal_with_posK_res_median(0),
+        'y-axis' : extract_p99_latency,
+        'lines' : [
+            {
+                'label' : 'Fixed arrivals',
+                'extractor' : AND(
+                    name_extractor('open_loop'),
+                    bench_extractor('ycsb'),
+                    arrival_extractor('fixed')),
+            },
+            {
+                'label' : 'Poisson arrivals',
+                'extractor' : AND(
+                    name_extractor('open_loop'),
+                    bench_extractor('ycsb'),
+                    arrival_extractor('poisson')),
+            },
+        ],
+        'x-label' : 'throughput (txns/sec)',
+        'y-label' : 'p99 latency (ms)',
+        'x-axis-set-major-locator' : False,
+        'show-error-bars' : True,
+        'legend' : 'upper left',
+        'title' : 'YCSB open loop',
       }
     ]
 
-    def extract_from_files(f):
-        if type(f) == list:
-            return list(it.chain.from_iterable([extract_from_files(ff) for ff in f]))
-        g, l = {}, {}
-        execfile(f, g, l)
-        return l['RESULTS']
+    # throughput against the txns each worker interleaves (dbtest
+    # --coroutines), 1 being the baseline, per benchmark
+    for outfile, title, bench, bench_opts in (
+        ('istc3-coroutines-tpcc.pdf', 'TPC-C coroutines', 'tpcc', None),
+        ('istc3-coroutines-ycsb-read.pdf', 'YCSB (read) coroutines', 'ycsb',
+         [100, 0, 0, 0]),
+        ('istc3-coroutines-ycsb-multi-get.pdf', 'YCSB (multi-get) coroutines',
+         'ycsb', [0, 0, 0, 0, 0, 100])):
+      configs.append({
+        'file'    : 'istc3-coroutines.jsonl',
+        'outfile' : outfile,
+        'x-axis' : extract_coroutines,
+        'y-axis' : deal_with_posK_res_percore(0),
+        'lines' : [
+            {
+                'label' : '%d thread%s' % (n, '' if n == 1 else 's'),
+                'extractor' : AND(*([
+                    name_extractor('coroutines'),
+                    bench_extractor(bench),
+                    nthreads_extractor(n)] +
+                    ([workload_mix_extractor(bench_opts)] if bench_opts else []))),
+            } for n in (1, 16)
+        ],
+        'x-label' : 'txns per worker',
+        'y-label' : 'throughput (txns/sec/core)',
+        'x-axis-set-major-locator' : False,
+        'show-error-bars' : True,
+        'legend' : 'lower right',
+        'title' : title,
+      })
+
+    # f is a result store (.jsonl) or a legacy RESULTS file (.py); where
+    # narrows the records by config field before any predicate runs
+    tables = {}
+    def extract_from_files(f, where={}):
+        k = (repr(f), repr(sorted(where.items())))
+        if k not in tables:
+            tables[k] = results_table(resultstore.load(f, **where))
+        return tables[k]
 
     FINAL_OUTPUT_FILENAME='istc3-cameraready.pdf'
     from PyPDF2 import PdfFileWriter, PdfFileReader
     output = PdfFileWriter()
     for config in configs:
     #for config in [configs[-1]]:
-      res = extract_from_files(config['file'])
+      if not os.path.exists(config['file']):
+        print >>sys.stderr, '[WARNING] skipping', config['outfile'], '(no', config['file'] + ')'
+        continue
+      res = extract_from_files(config['file'], config.get('where', {}))
       if 'lines' in config:
         mkplot(res, config, config['outfile'])
       elif 'bars' in config:
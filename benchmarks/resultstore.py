@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+
+# Append-only store for benchmark results.
+#
+# A store is one JSON-lines file per sweep. The first line is a header
+# naming the schema; every other line is one finished configuration:
+#
+#   {"key": <config_key>, "config": {...}, "values": [[...], ...]}
+#
+# where values holds one list per trial, in RESULT_FIELDS order. Records
+# from runs with time-series sampling also carry
+#
+#   "samples": [[[...], ...], ...]
+#
+# one list of SAMPLE_FIELDS rows per trial (see dbtest --sample-interval).
+# Records
+# are appended (and fsync-ed) as they arrive, so a crashed sweep leaves a
+# usable prefix behind, and readers can stream a file without evaluating
+# it as python source.
+#
+# Usage:
+#   python resultstore.py convert results/istc3-9-8-13.py [...]
+#     writes results/istc3-9-8-13.jsonl next to each legacy file
+
+import ast
+import hashlib
+import json
+import os
+import sys
+
+SCHEMA_VERSION = 1
+
+# XXX: keep in sync with runner.py
+PERSIST_REAL='persist-real'
+PERSIST_TEMP='persist-temp'
+PERSIST_NONE='persist-none'
+PERSIST_GROUP='persist-group'
+
+# (field, type, default). type is a tuple of acceptable python types, the
+# first of which is used to coerce legacy values. fields with a default of
+# None are missing from some legacy sweeps, and may be None
+CONFIG_SCHEMA = (
+  ('binary'                , (str,)           , None),
+  ('disable_madv_willneed' , (bool,)          , False),
+  ('name'                  , (str,)           , None),
+  ('db'                    , (str,)           , None),
+  ('bench'                 , (str,)           , None),
+  ('scale_factor'          , (int, float)     , None),
+  ('threads'               , (int,)           , None),
+  ('bench_opts'            , (str,)           , ''),
+  ('par_load'              , (bool,)          , False),
+  ('retry'                 , (bool,)          , False),
+  ('backoff'               , (bool,)          , False),
+  ('persist'               , (str,)           , PERSIST_NONE),
+  ('numa_memory'           , (str,)           , None),
+  ('log_fake_writes'       , (bool,)          , False),
+  ('log_nofsync'           , (bool,)          , False),
+  ('log_compress'          , (bool,)          , False),
+  ('disable_gc'            , (bool,)          , False),
+  ('disable_snapshots'     , (bool,)          , False),
+  ('checkpoint_interval_ms', (int,)           , None),
+  ('log_writer'            , (str,)           , None),
+  ('tick_us'               , (int,)           , None),
+  ('rcu_epoch_ticks'       , (int,)           , None),
+  ('ro_epoch_ticks'        , (int,)           , None),
+  ('hot_record_threshold'  , (int,)           , None),
+  ('pessimistic_after_aborts', (int,)         , None),
+  ('offered_load'          , (int, float)     , None), # txns/sec, None is closed loop
+  ('arrival_process'       , (str,)           , None),
+  ('placement'             , (str,)           , None), # dbtest --placement
+  ('topology'              , (str,)           , None), # of the machine
+  ('coroutines'            , (int,)           , None), # dbtest --coroutines
+)
+
+# fields added after sweeps were already journaled. they are left out of
+# config_key() while unset, so older records keep their keys
+_LATE_FIELDS = frozenset([
+  'checkpoint_interval_ms',
+  'log_writer',
+  'tick_us',
+  'rcu_epoch_ticks',
+  'ro_epoch_ticks',
+  'hot_record_threshold',
+  'pessimistic_after_aborts',
+  'offered_load',
+  'arrival_process',
+  'placement',
+  'topology',
+  'coroutines',
+])
+
+CONFIG_FIELDS = tuple(f for f, _, _ in CONFIG_SCHEMA)
+
+# the columns of one trial, as printed by bench_runner::run(). trials from
+# older binaries only have a prefix of them (see LEGACY_RESULT_WIDTHS)
+RESULT_FIELDS = (
+  'agg_throughput',
+  'agg_persist_throughput',
+  'avg_latency_ms',
+  'avg_persist_latency_ms',
+  'agg_abort_rate',
+  'p50_latency_ms',
+  'p95_latency_ms',
+  'p99_latency_ms',
+  'p999_latency_ms',
+  'p50_persist_latency_ms',
+  'p95_persist_latency_ms',
+  'p99_persist_latency_ms',
+  'p999_persist_latency_ms',
+  'load_ms', # loaders or db image, whichever the run used
+)
+
+# widths of the older trials: before the latency percentiles, and before
+# load_ms
+LEGACY_RESULT_WIDTHS = (5, 13)
+
+# the columns of dbtest's --sample-file output: per worker, per interval
+SAMPLE_FIELDS = (
+  'time_ms',
+  'worker',
+  'commits',
+  'aborts',
+  'persisted',
+)
+
+try:
+  _STRING_TYPES = (str, unicode)
+  _INT_TYPES = (int, long)
+except NameError:
+  _STRING_TYPES = (str,)
+  _INT_TYPES = (int,)
+
+def _typecheck(tpes, v):
+  for tpe in tpes:
+    if tpe is str:
+      if isinstance(v, _STRING_TYPES):
+        return True
+    elif tpe is int:
+      if isinstance(v, _INT_TYPES) and not isinstance(v, bool):
+        return True
+    elif isinstance(v, tpe):
+      return True
+  return False
+
+def normalize_config(config, strict=True):
+  """
+  Returns a copy of config with every schema field present. Fields which
+  are not part of the schema are passed through untouched. If strict is set,
+  a field with the wrong type raises ValueError; otherwise legacy values are
+  coerced (e.g. the old boolean 'persist' flag).
+  """
+  ret = dict(config)
+  for field, tpes, default in CONFIG_SCHEMA:
+    if field not in ret:
+      ret[field] = default
+      continue
+    v = ret[field]
+    if (v is None and default is None) or _typecheck(tpes, v):
+      continue
+    if strict:
+      raise ValueError('config field %s: bad value %r' % (field, v))
+    if field == 'persist' and isinstance(v, bool):
+      ret[field] = PERSIST_REAL if v else PERSIST_NONE
+    else:
+      ret[field] = tpes[0](v)
+  return ret
+
+def config_key(config):
+  """
+  Content address of a configuration: any change to a config field
+  (including the binary) yields a new key
+  """
+  items = [(k, v) for k, v in config.items()
+           if not (k in _LATE_FIELDS and v is None)]
+  return hashlib.sha1(repr(sorted(items))).hexdigest()
+
+def normalize_values(values):
+  """
+  Legacy sweeps stored a scalar, a single tuple, or a list of per-trial
+  tuples. Always returns a list of per-trial lists
+  """
+  if isinstance(values, (int, float)):
+    return [[float(values)]]
+  if isinstance(values, tuple):
+    return [list(map(float, values))]
+  return [list(map(float, v)) if isinstance(v, (list, tuple)) else [float(v)]
+          for v in values]
+
+class writer(object):
+  """
+  Appends records to a store, creating it (and its header) if necessary.
+  Every append is flushed to disk before returning
+  """
+
+  def __init__(self, fname):
+    self.fname = fname
+    fresh = not os.path.isfile(fname) or os.path.getsize(fname) == 0
+    self.fp = open(fname, 'a')
+    if fresh:
+      self._writeline({
+        'schema'        : SCHEMA_VERSION,
+        'config_fields' : list(CONFIG_FIELDS),
+        'result_fields' : list(RESULT_FIELDS),
+        'sample_fields' : list(SAMPLE_FIELDS),
+      })
+
+  def _writeline(self, obj):
+    self.fp.write(json.dumps(obj, sort_keys=True) + '\n')
+    self.fp.flush()
+    os.fsync(self.fp.fileno())
+
+  def append(self, config, values, key=None, samples=None):
+    config = normalize_config(config)
+    if key is None:
+      key = config_key(config)
+    record = {
+      'key'    : key,
+      'config' : config,
+      'values' : normalize_values(values),
+    }
+    if samples is not None:
+      record['samples'] = samples
+    self._writeline(record)
+
+  def close(self):
+    self.fp.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+def _strip_unicode(obj):
+  # json hands back unicode strings on python 2, which print (and repr)
+  # differently from the configs the runner builds
+  if bytes is not str:
+    return obj
+  if isinstance(obj, dict):
+    return dict((_strip_unicode(k), _strip_unicode(v)) for k, v in obj.iteritems())
+  if isinstance(obj, list):
+    return [_strip_unicode(v) for v in obj]
+  if isinstance(obj, unicode):
+    return obj.encode('utf-8')
+  return obj
+
+def _matches(config, filters):
+  for field, want in filters.items():
+    v = config.get(field)
+    if callable(want):
+      if not want(v):
+        return False
+    elif isinstance(want, (list, tuple, set, frozenset)):
+      if v not in want:
+        return False
+    elif v != want:
+      return False
+  return True
+
+def _iter_objs(fname):
+  """
+  Yields each record of a store as a dict. A torn last line (from a crash
+  mid-append) is skipped
+  """
+  with open(fname, 'r') as fp:
+    header = None
+    for line in fp:
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        obj = json.loads(line)
+      except ValueError:
+        print >>sys.stderr, '[WARNING] %s: skipping bad record' % fname
+        continue
+      if header is None:
+        header = obj
+        # runner.py journals predating the store have no header, and
+        # start right away with a record
+        if 'key' not in header:
+          if header.get('schema') != SCHEMA_VERSION:
+            raise ValueError('%s: unknown schema %r' % (fname, header.get('schema')))
+          continue
+      yield _strip_unicode(obj)
+
+def iter_records(fname):
+  """
+  Yields (key, config, values) for each record in a store
+  """
+  for obj in _iter_objs(fname):
+    yield obj['key'], obj['config'], [tuple(v) for v in obj['values']]
+
+def read_samples(fname):
+  """
+  Parses a dbtest --sample-file into a list of SAMPLE_FIELDS rows
+  """
+  rows = []
+  with open(fname, 'r') as fp:
+    header = fp.readline().strip().split(',')
+    assert tuple(header) == SAMPLE_FIELDS, 'unexpected sample header %r' % header
+    for line in fp:
+      toks = line.strip().split(',')
+      if len(toks) != len(SAMPLE_FIELDS):
+        continue
+      rows.append([float(toks[0])] + [int(x) for x in toks[1:]])
+  return rows
+
+def load_samples(fnames, **filters):
+  """
+  Like load(), but streams (config, samples) pairs, where samples holds one
+  list of SAMPLE_FIELDS rows per trial. Records without samples (including
+  everything in legacy files) are skipped
+  """
+  if isinstance(fnames, str):
+    fnames = [fnames]
+  for fname in fnames:
+    if fname.endswith('.py'):
+      continue
+    for obj in _iter_objs(fname):
+      if 'samples' in obj and _matches(obj['config'], filters):
+        yield obj['config'], obj['samples']
+
+def _literal(node):
+  # some sweeps were stitched together by hand as RESULTS = [...] + [...]
+  if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+    return _literal(node.left) + _literal(node.right)
+  return ast.literal_eval(node)
+
+def load_legacy(fname):
+  """
+  Reads a legacy 'RESULTS = [...]' results file without executing it. Older
+  sweeps which stored a DBS x THREADS matrix are expanded into records
+  """
+  with open(fname, 'r') as fp:
+    tree = ast.parse(fp.read(), fname)
+  env = {}
+  for stmt in tree.body:
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and \
+       isinstance(stmt.targets[0], ast.Name):
+      env[stmt.targets[0].id] = _literal(stmt.value)
+  results = env['RESULTS']
+  if 'DBS' in env and 'THREADS' in env and results and \
+     not isinstance(results[0], tuple):
+    ret = []
+    for db, row in zip(env['DBS'], results):
+      for nthds, v in zip(env['THREADS'], row):
+        ret.append(({'db' : db, 'threads' : nthds}, v))
+    results = ret
+  return [(normalize_config(c, strict=False), normalize_values(v))
+          for c, v in results]
+
+def load(fnames, **filters):
+  """
+  Streams (config, values) pairs out of one or more result files, keeping
+  only records whose config matches every filter. A filter value may be a
+  constant, a collection of allowed values, or a predicate on the field.
+  Legacy .py files are parsed with load_legacy()
+  """
+  if isinstance(fnames, str):
+    fnames = [fnames]
+  for fname in fnames:
+    if fname.endswith('.py'):
+      for config, values in load_legacy(fname):
+        if _matches(config, filters):
+          yield config, [tuple(v) for v in values]
+      continue
+    for _, config, values in iter_records(fname):
+      if _matches(config, filters):
+        yield config, values
+
+def load_keys(fname):
+  """
+  Returns {key : (config, values)} for a store, or {} if it does not exist
+  """
+  if not os.path.isfile(fname):
+    return {}
+  return dict((k, (c, v)) for k, c, v in iter_records(fname))
+
+def convert(fname, outfname=None):
+  if outfname is None:
+    outfname = os.path.splitext(fname)[0] + '.jsonl'
+  records = load_legacy(fname)
+  if os.path.exists(outfname):
+    os.unlink(outfname)
+  with writer(outfname) as w:
+    for config, values in records:
+      w.append(config, values)
+  return outfname, len(records)
+
+if __name__ == '__main__':
+  if len(sys.argv) < 3 or sys.argv[1] != 'convert':
+    print >>sys.stderr, 'usage: %s convert file.py [file.py ...]' % sys.argv[0]
+    sys.exit(1)
+  for fname in sys.argv[2:]:
+    outfname, n = convert(fname)
+    print >>sys.stderr, '[INFO] %s -> %s (%d records)' % (fname, outfname, n)
@@ -8,6 +8,11 @@ import sys
 import multiprocessing as mp
 import os
 import re
+import glob
+import hashlib
+import threading
+
+import resultstore
 
 DRYRUN = True
 USE_MASSTREE = True
@@ -17,6 +22,10 @@ NTRIALS = 1 if DRYRUN else 3
 PERSIST_REAL='persist-real'
 PERSIST_TEMP='persist-temp'
 PERSIST_NONE='persist-none'
+PERSIST_GROUP='persist-group' # real log devices, group commit mode
+
+# persist modes which write to the machine's real log devices
+REAL_LOG_PERSIST = (PERSIST_REAL, PERSIST_GROUP)
 
 MACHINE_CONFIG = {
   'modis2' : {
@@ -47,18 +56,62 @@ MACHINE_CONFIG = {
   },
 }
 
+# machines without an entry above log to one file in the working directory
+DEFAULT_MACHINE_CONFIG = {
+    'logfiles' : (
+        ('data.log', 1.),
+    ),
+    'tempprefix' : '/run/shm' if os.path.isdir('/run/shm') else '/tmp',
+    'disable_madv_willneed' : False,
+}
+
+# if set, a log config written by scripts/calibrate.py, whose log files and
+# weights replace the machine's MACHINE_CONFIG ones
+LOG_CONFIG = None
+
 NCPUS = mp.cpu_count()
 
+# pack independent configurations onto disjoint cpu sets when the sum of
+# their threads fits in NCPUS. configurations which use --numa-memory are
+# pinned by dbtest itself, so those always get the whole machine
+PARALLEL_SCHEDULE = True
+
+# max number of persist-real runs which may share the log devices at once
+MAX_CONCURRENT_PERSIST_REAL = 1
+
+# if set, record per-worker commits/aborts/persisted commits every this many
+# ms during each run, and store them with the trial's results
+SAMPLE_INTERVAL_MS = None
+
+# if set, each (binary, db, bench, scale factor, bench-opts) is only loaded
+# once: the first run saves its tables to a db image in this directory, and
+# later runs load the image instead (see dbtest --db-image). every trial's
+# load time is in its load_ms column either way
+DB_IMAGE_DIR = None
+
+# with PERSIST_GROUP, loggers flush (and release txns) this often, instead
+# of once per epoch
+GROUP_COMMIT_US = 2000
+
 TPCC_STANDARD_MIX='45,43,4,4,4'
 TPCC_REALISTIC_MIX='39,37,4,10,10'
 
 KNOB_ENABLE_YCSB_SCALE=True
+KNOB_ENABLE_YCSB_SKEW=False
 KNOB_ENABLE_TPCC_SCALE=True
 KNOB_ENABLE_TPCC_MULTIPART=True
 KNOB_ENABLE_TPCC_MULTIPART_SKEW=True
 KNOB_ENABLE_TPCC_FACTOR_ANALYSIS=True
 KNOB_ENABLE_TPCC_PERSIST_FACTOR_ANALYSIS=True
 KNOB_ENABLE_TPCC_RO_SNAPSHOTS=True
+KNOB_ENABLE_TPCC_CHECKPOINT=False
+KNOB_ENABLE_TPCC_GROUP_COMMIT=False
+KNOB_ENABLE_TPCC_LOG_WRITER=False
+KNOB_ENABLE_TPCC_EPOCH_INTERVALS=False
+KNOB_ENABLE_OPEN_LOOP=False
+KNOB_ENABLE_TPCC_PLACEMENT=False
+KNOB_ENABLE_COROUTINES=False
+KNOB_ENABLE_INT_KEYS=False
 
 ## debugging runs
 KNOB_ENABLE_TPCC_SCALE_ALLPERSIST=False
@@ -192,6 +245,27 @@ if KNOB_ENABLE_YCSB_SCALE:
   for nthds in THREADS:
     grids += mk_ycsb_entries(nthds)
 
+# OCC aborts under skew: the YCSB core workloads which write, over a range
+# of zipfian constants
+if KNOB_ENABLE_YCSB_SKEW:
+  YCSB_SKEW_WORKLOADS = ['A', 'B', 'F']
+  YCSB_SKEW_THETAS = [0.5, 0.8, 0.9, 0.99]
+  def mk_grid(nthds):
+    return {
+      'name' : 'ycsb_skew',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [nthds],
+      'scale_factors' : [160000],
+      'benchmarks' : ['ycsb'],
+      'bench_opts' : ['--workload %s --zipf-theta %s' % (w, t)
+                      for w in YCSB_SKEW_WORKLOADS for t in YCSB_SKEW_THETAS],
+      'par_load' : [True],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['%dG' % (40 + 2 * nthds)],
+    }
+  grids += [mk_grid(t) for t in get_scale_threads(8)]
+
 # exp 2:
 if KNOB_ENABLE_TPCC_SCALE:
   def mk_grid(name, bench, nthds):
@@ -305,6 +379,25 @@ if KNOB_ENABLE_TPCC_MULTIPART_SKEW:
         'persist' : [PERSIST_NONE],
         'numa_memory' : ['%dG' % (4 * nthds)],
       },
+      # contention-adaptive CC: lock hot records when read, and go
+      # pessimistic after repeated aborts
+      {
+        'name' : 'multipart:skew',
+        'dbs' : ['ndb-proto2'],
+        'threads' : [nthds],
+        'scale_factors': [4],
+        'benchmarks' : ['tpcc'],
+        'bench_opts' : [
+          '--workload-mix 100,0,0,0,0',
+        ],
+        'par_load' : [False],
+        'retry' : [True],
+        'backoff' : [True],
+        'persist' : [PERSIST_NONE],
+        'numa_memory' : ['%dG' % (4 * nthds)],
+        'hot_record_threshold' : [8],
+        'pessimistic_after_aborts' : [4],
+      },
     ]
   grids += [
     {
@@ -596,6 +689,210 @@ if KNOB_ENABLE_TPCC_SCALE_GC:
   THREADS = get_scale_threads(4)
   grids += [mk_grid('scale_tpcc', 'tpcc', t) for t in THREADS]
 
+# throughput cost of periodic checkpoints (written next to the logs)
+if KNOB_ENABLE_TPCC_CHECKPOINT:
+  def mk_grid(name, bench, nthds):
+    return {
+      'name' : name,
+      'dbs' : ['ndb-proto2'],
+      'threads' : [nthds],
+      'scale_factors' : [nthds],
+      'benchmarks' : [bench],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_REAL],
+      'numa_memory' : ['%dG' % (4 * nthds)],
+      'checkpoint_interval_ms' : [None, 5000, 15000],
+    }
+  THREADS = get_scale_threads(4)
+  grids += [mk_grid('scale_tpcc', 'tpcc', t) for t in THREADS]
+
+# persist latency (and throughput) of epoch vs group commit
+if KNOB_ENABLE_TPCC_GROUP_COMMIT:
+  def mk_grid(name, bench, nthds):
+    return {
+      'name' : name,
+      'dbs' : ['ndb-proto2'],
+      'threads' : [nthds],
+      'scale_factors' : [nthds],
+      'benchmarks' : [bench],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_REAL, PERSIST_GROUP],
+      'numa_memory' : ['%dG' % (4 * nthds)],
+    }
+  THREADS = get_scale_threads(4)
+  grids += [mk_grid('scale_tpcc', 'tpcc', t) for t in THREADS]
+
+# persist throughput of the log writer backends (None is the default,
+# writev + fdatasync)
+if KNOB_ENABLE_TPCC_LOG_WRITER:
+  def mk_grid(name, bench, nthds):
+    return {
+      'name' : name,
+      'dbs' : ['ndb-proto2'],
+      'threads' : [nthds],
+      'scale_factors' : [nthds],
+      'benchmarks' : [bench],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_REAL],
+      'numa_memory' : ['%dG' % (4 * nthds)],
+      'log_writer' : [None, 'aio'],
+    }
+  THREADS = get_scale_threads(4)
+  grids += [mk_grid('scale_tpcc', 'tpcc', t) for t in THREADS]
+
+# throughput and latency vs. the epoch length (None is the default, 40ms),
+# with the RCU and read-only snapshot epochs fixed in ticks
+if KNOB_ENABLE_TPCC_EPOCH_INTERVALS:
+  def mk_grid(name, bench, nthds):
+    return {
+      'name' : name,
+      'dbs' : ['ndb-proto2'],
+      'threads' : [nthds],
+      'scale_factors' : [nthds],
+      'benchmarks' : [bench],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_REAL],
+      'numa_memory' : ['%dG' % (4 * nthds)],
+      'tick_us' : [None, 5000, 10000, 20000, 80000],
+      'rcu_epoch_ticks' : [None],
+      'ro_epoch_ticks' : [None],
+    }
+  THREADS = get_scale_threads(4)
+  grids += [mk_grid('scale_tpcc', 'tpcc', t) for t in THREADS]
+
+# latency vs. throughput: open loop runs at a range of offered loads (in
+# txns/sec/core, well past saturation), each with fixed and poisson
+# arrivals
+if KNOB_ENABLE_OPEN_LOOP:
+  OPEN_LOOP_NTHREADS = 16
+  OPEN_LOOP_LOADS = {
+    'tpcc' : [5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000],
+    'ycsb' : [100000, 200000, 300000, 400000, 500000, 600000, 700000, 800000],
+  }
+  grids += [
+    {
+      'name' : 'open_loop',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [OPEN_LOOP_NTHREADS],
+      'scale_factors' : [OPEN_LOOP_NTHREADS],
+      'benchmarks' : ['tpcc'],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [True],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['%dG' % (4 * OPEN_LOOP_NTHREADS)],
+      'offered_load' : [x * OPEN_LOOP_NTHREADS for x in OPEN_LOOP_LOADS['tpcc']],
+      'arrival_process' : ['fixed', 'poisson'],
+    },
+    {
+      'name' : 'open_loop',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [OPEN_LOOP_NTHREADS],
+      'scale_factors' : [160000],
+      'benchmarks' : ['ycsb'],
+      'bench_opts' : ['--workload-mix 80,0,20,0'],
+      'par_load' : [True],
+      'retry' : [True],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['%dG' % (40 + 2 * OPEN_LOOP_NTHREADS)],
+      'offered_load' : [x * OPEN_LOOP_NTHREADS for x in OPEN_LOOP_LOADS['ycsb']],
+      'arrival_process' : ['fixed', 'poisson'],
+    },
+  ]
+
+# thread placement policies (see dbtest --placement and topology.h)
+PLACEMENTS = ['compact', 'scatter', 'nosmt', 'socket-first']
+
+if KNOB_ENABLE_TPCC_PLACEMENT:
+  grids += [
+    {
+      'name' : 'scale_tpcc_placement',
+      'dbs' : ['ndb-proto2'],
+      'threads' : get_scale_threads(4),
+      'scale_factors' : get_scale_threads(4),
+      'benchmarks' : ['tpcc'],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : [None],
+      'placement' : PLACEMENTS,
+    },
+  ]
+
+# txns interleaved per worker (see dbtest --coroutines and coro.h). 1 is the
+# baseline the gains are relative to
+COROUTINES = [1, 2, 4, 8, 16]
+
+if KNOB_ENABLE_COROUTINES:
+  grids += [
+    {
+      'name' : 'coroutines',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [1, 16],
+      'scale_factors' : [16],
+      'benchmarks' : ['tpcc'],
+      'bench_opts' : [''],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['64G'],
+      'coroutines' : COROUTINES,
+    },
+    {
+      'name' : 'coroutines',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [1, 16],
+      'scale_factors' : [160000],
+      'benchmarks' : ['ycsb'],
+      'bench_opts' : ['--workload-mix 100,0,0,0', '--workload-mix 0,0,0,0,0,100'],
+      'par_load' : [True],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['72G'],
+      'coroutines' : COROUTINES,
+    },
+  ]
+
+# string vs integer keyed tables (--int-keys)
+if KNOB_ENABLE_INT_KEYS:
+  grids += [
+    {
+      'name' : 'int_keys',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [1, NCPUS],
+      'scale_factors' : [NCPUS],
+      'benchmarks' : ['tpcc'],
+      'bench_opts' : ['', '--int-keys'],
+      'par_load' : [False],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['%dG' % (4 * NCPUS)],
+    },
+    {
+      'name' : 'int_keys',
+      'dbs' : ['ndb-proto2'],
+      'threads' : [1, NCPUS],
+      'scale_factors' : [160000],
+      'benchmarks' : ['ycsb'],
+      'bench_opts' : ['--workload-mix %s%s' % (m, o)
+                      for m in ['80,20,0,0', '100,0,0,0', '0,0,0,100']
+                      for o in ['', ' --int-keys']],
+      'par_load' : [True],
+      'retry' : [False],
+      'persist' : [PERSIST_NONE],
+      'numa_memory' : ['%dG' % (40 + 2 * NCPUS)],
+    },
+  ]
+
 def check_binary_executable(binary):
   return os.path.isfile(binary) and os.access(binary, os.X_OK)
 
@@ -604,12 +901,20 @@ def run_configuration(
     basedir, dbtype, bench, scale_factor, nthreads, bench_opts,
     par_load, retry_aborted_txn, backoff_aborted_txn, numa_memory, logfiles,
     assignments, log_fake_writes, log_nofsync, log_compress,
-    disable_gc, disable_snapshots, ntries=5):
+    disable_gc, disable_snapshots, checkpoint_interval_ms, log_writer,
+    tick_us, rcu_epoch_ticks, ro_epoch_ticks,
+    hot_record_threshold, pessimistic_after_aborts,
+    offered_load, arrival_process, placement, coroutines,
+    cpus=None, tag='', sample_file=None, group_commit_us=None, db_image=None,
+    ntries=5):
   # Note: assignments is a list of list of ints
   assert len(logfiles) == len(assignments)
   assert not log_fake_writes or len(logfiles)
   assert not log_nofsync or len(logfiles)
   assert not log_compress or len(logfiles)
+  assert not checkpoint_interval_ms or len(logfiles)
+  assert not group_commit_us or len(logfiles)
+  assert not log_writer or len(logfiles)
   args = [
       binary,
       '--bench', bench,
@@ -629,12 +934,29 @@ def run_configuration(
     + ([] if not log_fake_writes else ['--log-fake-writes']) \
     + ([] if not log_nofsync else ['--log-nofsync']) \
     + ([] if not log_compress else ['--log-compress']) \
+    + ([] if not group_commit_us else ['--log-group-commit', str(group_commit_us)]) \
+    + ([] if not log_writer else ['--log-writer', log_writer]) \
     + ([] if not disable_gc else ['--disable-gc']) \
-    + ([] if not disable_snapshots else ['--disable-snapshots'])
+    + ([] if not disable_snapshots else ['--disable-snapshots']) \
+    + ([] if not checkpoint_interval_ms else ['--checkpoint-interval', str(checkpoint_interval_ms)]) \
+    + ([] if not tick_us else ['--tick-us', str(tick_us)]) \
+    + ([] if not rcu_epoch_ticks else ['--rcu-epoch-ticks', str(rcu_epoch_ticks)]) \
+    + ([] if not ro_epoch_ticks else ['--ro-epoch-ticks', str(ro_epoch_ticks)]) \
+    + ([] if not hot_record_threshold else ['--hot-record-threshold', str(hot_record_threshold)]) \
+    + ([] if not pessimistic_after_aborts else ['--pessimistic-after-aborts', str(pessimistic_after_aborts)]) \
+    + ([] if not offered_load else ['--offered-load', str(offered_load)]) \
+    + ([] if not arrival_process else ['--arrival-process', arrival_process]) \
+    + ([] if not placement else ['--placement', placement]) \
+    + ([] if not coroutines else ['--coroutines', str(coroutines)]) \
+    + ([] if not db_image else ['--db-image', db_image]) \
+    + ([] if not sample_file else ['--sample-interval', str(SAMPLE_INTERVAL_MS), '--sample-file', sample_file])
+  if cpus is not None:
+    args = ['taskset', '-c', format_cpulist(cpus)] + args
   print >>sys.stderr, '[INFO] running command:'
   print >>sys.stderr, ('DISABLE_MADV_WILLNEED=1' if disable_madv_willneed else ''), ' '.join([x.replace(' ', r'\ ') for x in args])
+  errlog = 'stderr.%s.log' % tag if tag else 'stderr.log'
   if not DRYRUN:
-    with open('stderr.log', 'w') as err:
+    with open(errlog, 'w') as err:
       env = dict(os.environ)
       if disable_madv_willneed:
         env['DISABLE_MADV_WILLNEED'] = '1'
@@ -645,23 +967,224 @@ def run_configuration(
       toks = r.strip().split(' ')
   else:
     assert check_binary_executable(binary)
-    toks = [0,0,0,0,0]
-  if len(toks) != 5:
+    toks = [0] * len(resultstore.RESULT_FIELDS)
+  # older dbtest binaries print a prefix of the columns
+  if len(toks) not in resultstore.LEGACY_RESULT_WIDTHS + (len(resultstore.RESULT_FIELDS),):
     print 'Failure: retcode=', retcode, ', stdout=', r
     import shutil
-    shutil.copyfile('stderr.log', 'stderr.%d.log' % p.pid)
+    shutil.copyfile(errlog, 'stderr.%d.log' % p.pid)
     if ntries:
       return run_configuration(
           binary, disable_madv_willneed,
           basedir, dbtype, bench, scale_factor, nthreads, bench_opts,
           par_load, retry_aborted_txn, backoff_aborted_txn, numa_memory, logfiles,
           assignments, log_fake_writes, log_nofsync, log_compress,
-          disable_gc, disable_snapshots, ntries - 1)
+          disable_gc, disable_snapshots, checkpoint_interval_ms, log_writer,
+          tick_us, rcu_epoch_ticks, ro_epoch_ticks,
+          hot_record_threshold, pessimistic_after_aborts,
+          offered_load, arrival_process, placement, coroutines,
+          cpus, tag, sample_file, group_commit_us, db_image, ntries - 1)
     else:
       print "Out of tries!"
       assert False
   return tuple(map(float, toks))
 
+### helpers for cpu packing
+
+def parse_cpulist(s):
+  ret = []
+  for tok in s.strip().split(','):
+    if not tok:
+      continue
+    if '-' in tok:
+      a, b = tok.split('-')
+      ret.extend(range(int(a), int(b) + 1))
+    else:
+      ret.append(int(tok))
+  return ret
+
+def format_cpulist(cpus):
+  return ','.join(map(str, sorted(cpus)))
+
+def read_int(path, default):
+  try:
+    with open(path, 'r') as fp:
+      return int(fp.read().strip())
+  except (IOError, ValueError):
+    return default
+
+# reads the (logfile, weight) pairs of a log config: one "<logfile> <weight>
+# [...]" line per device, '#' starts a comment
+def read_log_config(fname):
+  ret = []
+  with open(fname, 'r') as fp:
+    for line in fp:
+      toks = line.split('#')[0].split()
+      if toks:
+        ret.append((toks[0], float(toks[1])))
+  assert ret, 'empty log config %s' % fname
+  return tuple(ret)
+
+# returns [(cpu, socket, core)] for every online cpu, as numbered by sysfs
+def get_cpu_topology():
+  ret = []
+  try:
+    with open('/sys/devices/system/cpu/online', 'r') as fp:
+      cpus = parse_cpulist(fp.read())
+  except IOError:
+    cpus = range(NCPUS)
+  for cpu in cpus:
+    d = '/sys/devices/system/cpu/cpu%d/topology' % cpu
+    ret.append((cpu,
+                max(read_int(os.path.join(d, 'physical_package_id'), 0), 0),
+                read_int(os.path.join(d, 'core_id'), cpu)))
+  return ret
+
+# eg '2 sockets, 2 nodes, 16 cores, 32 cpus', as dbtest --verbose prints it.
+# stored with every result, so runs from different machines stay apart
+def describe_topology():
+  cpus = get_cpu_topology()
+  return '%d sockets, %d nodes, %d cores, %d cpus' % (
+      len(set(s for _, s, _ in cpus)),
+      len(get_numa_cpus()),
+      len(set((s, c) for _, s, c in cpus)),
+      len(cpus))
+
+# returns a list of cpu lists, one per numa node
+def get_numa_cpus():
+  nodes = []
+  for path in sorted(glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'),
+                     key=lambda x: int(re.search(r'node(\d+)', x).group(1))):
+    with open(path, 'r') as fp:
+      cpus = parse_cpulist(fp.read())
+    if cpus:
+      nodes.append(cpus)
+  if not nodes:
+    nodes = [range(NCPUS)]
+  return nodes
+
+class cpu_pool(object):
+  def __init__(self, nodes):
+    self.free = [set(cpus) for cpus in nodes]
+    self.ncpus = sum(len(cpus) for cpus in nodes)
+
+  def nfree(self):
+    return sum(len(cpus) for cpus in self.free)
+
+  def alloc(self, n):
+    if n > self.nfree():
+      return None
+    # best fit onto a single node first
+    fits = [i for i in xrange(len(self.free)) if len(self.free[i]) >= n]
+    if fits:
+      i = min(fits, key=lambda i: len(self.free[i]))
+      ret = sorted(self.free[i])[:n]
+      self.free[i] -= set(ret)
+      return ret
+    # otherwise span the emptiest nodes
+    ret = []
+    for i in sorted(xrange(len(self.free)), key=lambda i: -len(self.free[i])):
+      take = sorted(self.free[i])[:n - len(ret)]
+      self.free[i] -= set(take)
+      ret += take
+      if len(ret) == n:
+        break
+    return ret
+
+  def release(self, nodes, cpus):
+    for i in xrange(len(nodes)):
+      self.free[i] |= set(nodes[i]) & set(cpus)
+
+# a log slot is reused by at most one concurrent run, so runs sharing
+# a log device never write to the same file
+def slot_logfile(path, slot):
+  if not slot:
+    return path
+  root, ext = os.path.splitext(path)
+  return '%s.%d%s' % (root, slot, ext)
+
+def schedule(jobs, run_job):
+  """
+  jobs is a list of (id, config) pairs. run_job(id, config, cpus, slot) is
+  invoked once per job from a worker thread; cpus is None when the job has the
+  whole machine to itself, and slot picks the log files for persist runs.
+  """
+  nodes = get_numa_cpus()
+  pool = cpu_pool(nodes)
+  cond = threading.Condition()
+  pending = list(jobs)
+  inflight = []
+  npersist_real = [0]
+  # runs on the real log devices share one set of slots
+  slots = {PERSIST_REAL: set(), PERSIST_TEMP: set()}
+  def slot_class(persist):
+    return PERSIST_REAL if persist in REAL_LOG_PERSIST else persist
+
+  errors = []
+
+  # a placement policy needs the whole machine to place threads on
+  def exclusive(config):
+    return not PARALLEL_SCHEDULE or \
+        config['numa_memory'] is not None or \
+        config.get('placement') is not None or \
+        config['threads'] >= pool.ncpus
+
+  def placeable(config):
+    if config['persist'] in REAL_LOG_PERSIST and \
+       npersist_real[0] >= MAX_CONCURRENT_PERSIST_REAL:
+      return False
+    if exclusive(config):
+      return pool.nfree() == pool.ncpus
+    return pool.nfree() >= config['threads']
+
+  def take_slot(persist):
+    persist = slot_class(persist)
+    if persist not in slots:
+      return None
+    slot = 0
+    while slot in slots[persist]:
+      slot += 1
+    slots[persist].add(slot)
+    return slot
+
+  def worker(key, config, cpus, slot):
+    try:
+      run_job(key, config, None if exclusive(config) else cpus, slot)
+    except BaseException, e:
+      errors.append(e)
+    with cond:
+      pool.release(nodes, cpus)
+      if config['persist'] in REAL_LOG_PERSIST:
+        npersist_real[0] -= 1
+      if slot is not None:
+        slots[slot_class(config['persist'])].discard(slot)
+      inflight.remove(threading.current_thread())
+      cond.notify_all()
+
+  with cond:
+    while (pending or inflight) and not errors:
+      idx = None
+      for i in xrange(len(pending)):
+        if placeable(pending[i][1]):
+          idx = i
+          break
+      if idx is None:
+        cond.wait()
+        continue
+      key, config = pending.pop(idx)
+      cpus = pool.alloc(pool.ncpus if exclusive(config) else config['threads'])
+      if config['persist'] in REAL_LOG_PERSIST:
+        npersist_real[0] += 1
+      slot = take_slot(config['persist'])
+      t = threading.Thread(target=worker, args=(key, config, cpus, slot))
+      t.daemon = True
+      inflight.append(t)
+      t.start()
+    while inflight:
+      cond.wait()
+  if errors:
+    raise errors[0]
+
 if __name__ == '__main__':
   (_, basedir, outfile) = sys.argv
 
@@ -686,13 +1209,27 @@ if __name__ == '__main__':
         print >>sys.stderr, 'MASSTREE=%d MODE=%s make -j dbtest' % (1 if m.group(2) == 'masstree' else 0, m.group(1))
     sys.exit(1)
 
-  # iterate over all configs
-  results = []
+  # expand all the grids into configs
+  node = platform.node()
+  if node in MACHINE_CONFIG:
+    machine_config = MACHINE_CONFIG[node]
+  else:
+    print >>sys.stderr, '[WARNING] no MACHINE_CONFIG for %s, using the defaults' % node
+    machine_config = DEFAULT_MACHINE_CONFIG
+  if LOG_CONFIG:
+    machine_config = dict(machine_config, logfiles=read_log_config(LOG_CONFIG))
+  disable_madv_willneed = machine_config['disable_madv_willneed']
+  topology = describe_topology()
+  print >>sys.stderr, '[INFO] topology: %s' % topology
+  jobs = []
   for grid in grids:
     for (binary, db, bench, scale_factor, threads, bench_opts,
          par_load, retry, backoff, numa_memory, persist,
          log_fake_writes, log_nofsync, log_compress,
-         disable_gc, disable_snapshots) in it.product(
+         disable_gc, disable_snapshots, checkpoint_interval_ms,
+         log_writer, tick_us, rcu_epoch_ticks, ro_epoch_ticks,
+         hot_record_threshold, pessimistic_after_aborts,
+         offered_load, arrival_process, placement, coroutines) in it.product(
         grid.get('binary', [DEFAULT_BINARY]),
         grid['dbs'], grid['benchmarks'], grid['scale_factors'],
         grid['threads'], grid.get('bench_opts', ['']), grid['par_load'],
@@ -702,9 +1239,18 @@ if __name__ == '__main__':
         grid.get('log_nofsync', [False]),
         grid.get('log_compress', [False]),
         grid.get('disable_gc', [False]),
-        grid.get('disable_snapshots', [False])):
-      node = platform.node()
-      disable_madv_willneed = MACHINE_CONFIG[node]['disable_madv_willneed']
+        grid.get('disable_snapshots', [False]),
+        grid.get('checkpoint_interval_ms', [None]),
+        grid.get('log_writer', [None]),
+        grid.get('tick_us', [None]),
+        grid.get('rcu_epoch_ticks', [None]),
+        grid.get('ro_epoch_ticks', [None]),
+        grid.get('hot_record_threshold', [None]),
+        grid.get('pessimistic_after_aborts', [None]),
+        grid.get('offered_load', [None]),
+        grid.get('arrival_process', [None]),
+        grid.get('placement', [None]),
+        grid.get('coroutines', [None])):
       config = {
         'binary'                : binary,
         'disable_madv_willneed' : disable_madv_willneed,
@@ -724,36 +1270,102 @@ if __name__ == '__main__':
         'log_compress'          : log_compress,
         'disable_gc'            : disable_gc,
         'disable_snapshots'     : disable_snapshots,
+        'checkpoint_interval_ms': checkpoint_interval_ms,
+        'log_writer'            : log_writer,
+        'tick_us'               : tick_us,
+        'rcu_epoch_ticks'       : rcu_epoch_ticks,
+        'ro_epoch_ticks'        : ro_epoch_ticks,
+        'hot_record_threshold'  : hot_record_threshold,
+        'pessimistic_after_aborts' : pessimistic_after_aborts,
+        'offered_load'          : offered_load,
+        'arrival_process'       : arrival_process,
+        'placement'             : placement,
+        'topology'              : topology,
+        'coroutines'            : coroutines,
       }
-      print >>sys.stderr, '[INFO] running config %s' % (str(config))
-      if persist != PERSIST_NONE:
-        info = MACHINE_CONFIG[node]['logfiles']
-        tempprefix = MACHINE_CONFIG[node]['tempprefix']
-        logfiles = \
-            [x[0] for x in info] if persist == PERSIST_REAL \
-              else [os.path.join(tempprefix, 'data%d.log' % (idx)) for idx in xrange(len(info))]
-        weights = \
-          normalize([x[1] for x in info]) if persist == PERSIST_REAL else \
-          normalize([1.0 for _ in info])
-        assignments = allocate(threads, weights)
-      else:
-        logfiles, assignments = [], []
-      values = []
-      for _ in range(NTRIALS):
+      jobs.append((resultstore.config_key(config), config))
+
+  # the result store doubles as a journal: everything already in it
+  # is skipped
+  journal = resultstore.load_keys(outfile + '.jsonl')
+  todo = []
+  seen = set()
+  for idx, (key, config) in enumerate(jobs):
+    if key in seen:
+      continue
+    seen.add(key)
+    if key not in journal:
+      todo.append((idx, config))
+  print >>sys.stderr, '[INFO] %d configs total, %d already in journal' % \
+      (len(seen), len(seen) - len(todo))
+
+  lock = threading.Lock()
+  store = resultstore.writer(outfile + '.jsonl') if not DRYRUN else None
+  image_locks = {} # db image => lock held while it is being built
+
+  def run_job(idx, config, cpus, slot):
+    print >>sys.stderr, '[INFO] running config %s' % (str(config))
+    persist = config['persist']
+    threads = config['threads']
+    if persist != PERSIST_NONE:
+      info = machine_config['logfiles']
+      tempprefix = machine_config['tempprefix']
+      logfiles = \
+          [slot_logfile(x[0], slot) for x in info] if persist in REAL_LOG_PERSIST \
+            else [os.path.join(tempprefix, slot_logfile('data%d.log' % (i), slot)) for i in xrange(len(info))]
+      weights = \
+        normalize([x[1] for x in info]) if persist in REAL_LOG_PERSIST else \
+        normalize([1.0 for _ in info])
+      assignments = allocate(threads, weights)
+    else:
+      logfiles, assignments = [], []
+    key = resultstore.config_key(config)
+    sample_file = 'samples.%s.csv' % key[:12] if SAMPLE_INTERVAL_MS else None
+    db_image = None
+    if DB_IMAGE_DIR:
+      image_key = hashlib.sha1(repr((
+          config['binary'], config['db'], config['bench'],
+          config['scale_factor'], config['bench_opts']))).hexdigest()
+      db_image = os.path.join(DB_IMAGE_DIR, 'dbimage.%s' % image_key[:12])
+      with lock:
+        image_lock = image_locks.setdefault(db_image, threading.Lock())
+    values = []
+    samples = [] if sample_file else None
+    for _ in range(NTRIALS):
+      # runs which share an image wait for the one building it
+      building = db_image and not os.path.exists(db_image)
+      if building:
+        image_lock.acquire()
+      try:
         value = run_configuration(
-            binary, disable_madv_willneed,
-            basedir, db, bench, scale_factor, threads,
-            bench_opts, par_load, retry, backoff, numa_memory,
-            logfiles, assignments, log_fake_writes,
-            log_nofsync, log_compress, disable_gc,
-            disable_snapshots)
-        values.append(value)
-      results.append((config, values))
-
-    # write intermediate results
-    with open(outfile + '.py', 'w') as fp:
-      print >>fp, 'RESULTS = %s' % (repr(results))
-
-  # write results
-  with open(outfile + '.py', 'w') as fp:
-    print >>fp, 'RESULTS = %s' % (repr(results))
+            config['binary'], config['disable_madv_willneed'],
+            basedir, config['db'], config['bench'], config['scale_factor'], threads,
+            config['bench_opts'], config['par_load'], config['retry'],
+            config['backoff'], config['numa_memory'],
+            logfiles, assignments, config['log_fake_writes'],
+            config['log_nofsync'], config['log_compress'], config['disable_gc'],
+            config['disable_snapshots'], config['checkpoint_interval_ms'],
+            config['log_writer'], config['tick_us'],
+            config['rcu_epoch_ticks'], config['ro_epoch_ticks'],
+            config['hot_record_threshold'], config['pessimistic_after_aborts'],
+            config['offered_load'], config['arrival_process'],
+            config['placement'], config['coroutines'],
+            cpus=cpus, tag=key[:12],
+            sample_file=sample_file,
+            group_commit_us=GROUP_COMMIT_US if persist == PERSIST_GROUP else None,
+            db_image=db_image)
+      finally:
+        if building:
+          image_lock.release()
+      values.append(value)
+      if sample_file and not DRYRUN:
+        samples.append(resultstore.read_samples(sample_file))
+        os.unlink(sample_file)
+    with lock:
+      if store:
+        store.append(config, values, key=key, samples=samples)
+
+  # iterate over all configs
+  schedule(todo, run_job)
+  if store:
+    store.close()
@@ -0,0 +1,77 @@
+#include <iostream>
+#include <vector>
+#include <string>
+
+#include "../macros.h"
+#include "../varkey.h"
+#include "../thread.h"
+#include "../util.h"
+#include "../rcu.h"
+
+#include "bench.h"
+
+using namespace std;
+using namespace util;
+
+// opens a few tables the way the benchmarks do (which ndb allocates with
+// plain new, so at whatever alignment malloc() gives them), loads one, and
+// runs a txn against it
+class smoke_thread : public ndb_thread {
+public:
+  smoke_thread(abstract_db *db) : db(db) {}
+
+  virtual void
+  run()
+  {
+    { // XXX(stephentu): this is a hack
+      scoped_rcu_region r; // register this thread in rcu region
+    }
+    scoped_db_thread_ctx ctx(db, false);
+
+    vector<abstract_ordered_index *> tbls;
+    for (size_t i = 0; i < 4; i++)
+      tbls.push_back(db->open_index(
+            "smoke" + to_string(i), 128, false,
+            abstract_ordered_index::KEY_TYPE_U64));
+    abstract_ordered_index * const tbl = tbls[0];
+
+    str_arena arena;
+    string txn_obj_buf(db->sizeof_txn_object(0), 0);
+    void * const buf = (void *) txn_obj_buf.data();
+    if (tbl->supports_bulk_load()) {
+      tbl->bulk_insert(u64_varkey(1).str(), "a");
+      tbl->bulk_insert(u64_varkey(2).str(), "b");
+      tbl->bulk_load_finish(1.0);
+      ALWAYS_ASSERT(tbl->size() == 2);
+    } else {
+      void * const txn = db->new_txn(0, arena, buf);
+      tbl->insert(txn, u64_varkey(1).str(), "a");
+      tbl->insert(txn, u64_varkey(2).str(), "b");
+      ALWAYS_ASSERT(db->commit_txn(txn));
+      arena.reset();
+    }
+
+    void * const txn = db->new_txn(0, arena, buf);
+    string v;
+    ALWAYS_ASSERT(tbl->get(txn, u64_varkey(2).str(), v) && v == "b");
+    const uint64_t k = 3;
+    tbl->put_int(txn, &k, 1, "c");
+    ALWAYS_ASSERT(tbl->get_int(txn, &k, 1, v) && v == "c");
+    ALWAYS_ASSERT(db->commit_txn(txn));
+
+    for (auto t : tbls)
+      db->close_index(t);
+  }
+
+private:
+  abstract_db *const db;
+};
+
+void
+smoke_do_test(abstract_db *db, int argc, char **argv)
+{
+  smoke_thread t(db);
+  t.start();
+  t.join();
+  cerr << "smoke test passed" << endl;
+}
@@ -10,6 +10,32 @@ import multiprocessing as mp
 import os
 
 BUILDDIR='../out-perf.ectrs'
+
+# how often the stats server pushes counter deltas
+STATS_INTERVAL_US=1000
+
+def load_stats(fname):
+  """
+  Reads the CSV stream written by stats_client --csv. Returns
+  {counter : [(timestamp_us, count, sum, max), ...]} with count and sum
+  accumulated back into absolute values
+  """
+  ret = {}
+  with open(fname, 'r') as fp:
+    fp.readline() # header
+    for line in fp:
+      toks = line.strip().split(',')
+      if len(toks) != 6:
+        continue # torn last line
+      ts, name, delta, cnt, s, mx = toks
+      ts, cnt, s, mx = int(ts), int(cnt), int(s), int(mx)
+      series = ret.setdefault(name, [])
+      if int(delta) and series:
+        cnt += series[-1][1]
+        s += series[-1][2]
+      series.append((ts, cnt, s, mx))
+  return ret
+
 if __name__ == '__main__':
   (_, out) = sys.argv
 
@@ -27,7 +53,12 @@ if __name__ == '__main__':
   env['DISABLE_MADV_WILLNEED'] = '1'
   p0 = subprocess.Popen(args, stdin=open('/dev/null', 'r'), stdout=open('/dev/null', 'w'), env=env)
   time.sleep(1.0) # XXX: hacky
-  args = [os.path.join(BUILDDIR, 'stats_client'), '/tmp/silo.sock', 'dbtuple_bytes_allocated:dbtuple_bytes_freed']
+  args = [
+      os.path.join(BUILDDIR, 'stats_client'),
+      '--subscribe', '--csv',
+      '--interval-us', str(STATS_INTERVAL_US),
+      '/tmp/silo.sock', 'dbtuple_bytes_allocated:dbtuple_bytes_freed',
+  ]
   with open(out, 'w') as fp:
     p1 = subprocess.Popen(args, stdin=open('/dev/null', 'r'), stdout=fp)
     p0.wait()
@@ -148,6 +148,9 @@ static int g_new_order_remote_item_pct = 1;
 static int g_new_order_fast_id_gen = 0;
 static int g_uniform_item_dist = 0;
 static int g_order_status_scan_hack = 0;
+static int g_disable_multi_get = 0;
+static int g_disable_field_access = 0;
+static int g_int_keys = 0;
 static unsigned g_txn_workload_mix[] = { 45, 43, 4, 4, 4 }; // default TPC-C workload mix
 
 static aligned_padded_elem<spinlock> *g_partition_locks = nullptr;
@@ -508,6 +511,7 @@ public:
     : bench_worker(worker_id, true, seed, db,
                    open_tables, barrier_a, barrier_b),
       tpcc_worker_mixin(partitions),
+      partitions(partitions),
       warehouse_id_start(warehouse_id_start),
       warehouse_id_end(warehouse_id_end)
   {
@@ -615,6 +619,18 @@ protected:
     rcu::s_instance.fault_region();
   }
 
+  virtual bench_worker *
+  make_lane() OVERRIDE
+  {
+    // a txn holds its partition locks while it yields, and another lane of
+    // the thread would spin on them for good
+    if (g_enable_partition_locks)
+      return nullptr;
+    return new tpcc_worker(worker_id, r.next(), db, open_tables, partitions,
+                           barrier_a, barrier_b,
+                           warehouse_id_start, warehouse_id_end);
+  }
+
   inline ALWAYS_INLINE string &
   str()
   {
@@ -622,14 +638,134 @@ protected:
   }
 
 private:
+  const map<string, vector<abstract_ordered_index *>> &partitions;
   const uint warehouse_id_start;
   const uint warehouse_id_end;
   int32_t last_no_o_ids[10]; // XXX(stephentu): hack
 
+  // keys batch_get() reads: enough for the order lines of a new order
+  static const size_t MaxBatch = 15;
+
+  // reads batch_keys[0, n) of tbl into vs with one multi_get(), so that
+  // their lookups overlap (--disable-multi-get issues one get() per key
+  // instead). the keys must all exist
+  inline void
+  batch_get(abstract_ordered_index *tbl, void *txn, size_t n, string *vs,
+            size_t max_bytes_read = string::npos)
+  {
+    INVARIANT(n <= MaxBatch);
+    if (g_disable_multi_get) {
+      for (size_t i = 0; i < n; i++)
+        ALWAYS_ASSERT(tbl->get(txn, batch_keys[i], vs[i], max_bytes_read));
+      return;
+    }
+    bool found[MaxBatch];
+    tbl->multi_get(txn, batch_keys, n, vs, found, max_bytes_read);
+    for (size_t i = 0; i < n; i++)
+      ALWAYS_ASSERT(found[i]);
+  }
+
+  // reads k's value into old, and decodes just the given fields of it into
+  // v (--disable-field-access reads and decodes all of them). the key must
+  // exist
+  template <typename T, uint64_t Mask>
+  inline const T *
+  get_fields(abstract_ordered_index *tbl, void *txn, const string &k,
+             string &old, T &v, util::Fields<Mask> fields)
+  {
+    if (g_disable_field_access) {
+      ALWAYS_ASSERT(tbl->get(txn, k, old));
+      return Decode(old, v);
+    }
+    ALWAYS_ASSERT(tbl->get(txn, k, old, ProjectMaxBytes<T>(fields)));
+    return ProjectDecode(old, v, fields);
+  }
+
+  // puts v, which differs from the value old (as read) only in the given
+  // fields, as a delta of those fields (--disable-field-access puts all of
+  // v)
+  template <typename T, uint64_t Mask>
+  inline void
+  put_fields(abstract_ordered_index *tbl, void *txn, const string &k,
+             const string &old, const T &v, util::Fields<Mask> fields)
+  {
+    if (g_disable_field_access)
+      tbl->put(txn, k, Encode(str(), v));
+    else
+      tbl->put_delta(txn, k, EncodeDelta(str(), old, v, fields));
+  }
+
+  // --int-keys opens the tables keyed by two or four int32 fields as u64
+  // or u128 keyed indexes (see TableKeyType()): their encoded keys are the
+  // big endian bytes of those words. the district, stock and order_line
+  // accesses below then use the *_int() methods, the others still the
+  // encoded keys
+  static inline uint64_t
+  IntKeyWord(int32_t hi, int32_t lo)
+  {
+    return (uint64_t(uint32_t(hi)) << 32) | uint32_t(lo);
+  }
+
+  inline bool
+  get_district(void *txn, const district::key &k, string &v)
+  {
+    if (!g_int_keys)
+      return tbl_district(k.d_w_id)->get(txn, Encode(obj_key0, k), v);
+    const uint64_t ik = IntKeyWord(k.d_w_id, k.d_id);
+    return tbl_district(k.d_w_id)->get_int(txn, &ik, 1, v);
+  }
+
+  inline void
+  put_district(void *txn, const district::key &k, const district::value &v)
+  {
+    if (!g_int_keys) {
+      tbl_district(k.d_w_id)->put(txn, Encode(str(), k), Encode(str(), v));
+      return;
+    }
+    const uint64_t ik = IntKeyWord(k.d_w_id, k.d_id);
+    tbl_district(k.d_w_id)->put_int(txn, &ik, 1, Encode(str(), v));
+  }
+
+  inline void
+  put_stock(void *txn, const stock::key &k, const stock::value &v)
+  {
+    if (!g_int_keys) {
+      tbl_stock(k.s_w_id)->put(txn, Encode(str(), k), Encode(str(), v));
+      return;
+    }
+    const uint64_t ik = IntKeyWord(k.s_w_id, k.s_i_id);
+    tbl_stock(k.s_w_id)->put_int(txn, &ik, 1, Encode(str(), v));
+  }
+
+  // scans the order lines [lower, upper)
+  inline void
+  scan_order_line(void *txn, const order_line::key &lower,
+                  const order_line::key &upper,
+                  abstract_ordered_index::scan_callback &c, str_arena *arena)
+  {
+    abstract_ordered_index * const tbl = tbl_order_line(lower.ol_w_id);
+    if (!g_int_keys) {
+      tbl->scan(txn, Encode(obj_key0, lower), &Encode(obj_key1, upper), c, arena);
+      return;
+    }
+    const uint64_t ik_lower[2] = {
+      IntKeyWord(lower.ol_w_id, lower.ol_d_id),
+      IntKeyWord(lower.ol_o_id, lower.ol_number),
+    };
+    const uint64_t ik_upper[2] = {
+      IntKeyWord(upper.ol_w_id, upper.ol_d_id),
+      IntKeyWord(upper.ol_o_id, upper.ol_number),
+    };
+    tbl->scan_int(txn, ik_lower, ik_upper, 2, c, arena);
+  }
+
   // some scratch buffer space
   string obj_key0;
   string obj_key1;
   string obj_v;
+  string batch_keys[MaxBatch];
+  string batch_vs0[MaxBatch];
+  string batch_vs1[MaxBatch];
 };
 
 class tpcc_warehouse_loader : public bench_loader, public tpcc_worker_mixin {
@@ -746,7 +882,7 @@ protected:
         checker::SanityCheckItem(&k, &v);
         const size_t sz = Size(v);
         total_sz += sz;
-        tbl_item(1)->insert(txn, Encode(k), Encode(obj_buf, v)); // this table is shared, so any partition is OK
+        load_insert(tbl_item(1), txn, Encode(k), Encode(obj_buf, v)); // this table is shared, so any partition is OK
 
         if (bsize != -1 && !(i % bsize)) {
           ALWAYS_ASSERT(db->commit_txn(txn));
@@ -843,8 +979,8 @@ protected:
             const size_t sz = Size(v);
             stock_total_sz += sz;
             n_stocks++;
-            tbl_stock(w)->insert(txn, Encode(k), Encode(obj_buf, v));
-            tbl_stock_data(w)->insert(txn, Encode(k_data), Encode(obj_buf1, v_data));
+            load_insert(tbl_stock(w), txn, Encode(k), Encode(obj_buf, v));
+            load_insert(tbl_stock_data(w), txn, Encode(k_data), Encode(obj_buf1, v_data));
           }
           if (db->commit_txn(txn)) {
             b++;
@@ -1024,7 +1160,7 @@ protected:
               checker::SanityCheckCustomer(&k, &v);
               const size_t sz = Size(v);
               total_sz += sz;
-              tbl_customer(w)->insert(txn, Encode(k), Encode(obj_buf, v));
+              load_insert(tbl_customer(w), txn, Encode(k), Encode(obj_buf, v));
 
               // customer name index
               const customer_name_idx::key k_idx(k.c_w_id, k.c_d_id, v.c_last.str(true), v.c_first.str(true));
@@ -1033,7 +1169,7 @@ protected:
               // index structure is:
               // (c_w_id, c_d_id, c_last, c_first) -> (c_id)
 
-              tbl_customer_name_idx(w)->insert(txn, Encode(k_idx), Encode(obj_buf, v_idx));
+              load_insert(tbl_customer_name_idx(w), txn, Encode(k_idx), Encode(obj_buf, v_idx));
 
               history::key k_hist;
               k_hist.h_c_id = c;
@@ -1047,7 +1183,7 @@ protected:
               v_hist.h_amount = 10;
               v_hist.h_data.assign(RandomStr(r, RandomNumber(r, 10, 24)));
 
-              tbl_history(w)->insert(txn, Encode(k_hist), Encode(obj_buf, v_hist));
+              load_insert(tbl_history(w), txn, Encode(k_hist), Encode(obj_buf, v_hist));
             }
             if (db->commit_txn(txn)) {
               batch++;
@@ -1145,12 +1281,12 @@ protected:
             const size_t sz = Size(v_oo);
             oorder_total_sz += sz;
             n_oorders++;
-            tbl_oorder(w)->insert(txn, Encode(k_oo), Encode(obj_buf, v_oo));
+            load_insert(tbl_oorder(w), txn, Encode(k_oo), Encode(obj_buf, v_oo));
 
             const oorder_c_id_idx::key k_oo_idx(k_oo.o_w_id, k_oo.o_d_id, v_oo.o_c_id, k_oo.o_id);
             const oorder_c_id_idx::value v_oo_idx(0);
 
-            tbl_oorder_c_id_idx(w)->insert(txn, Encode(k_oo_idx), Encode(obj_buf, v_oo_idx));
+            load_insert(tbl_oorder_c_id_idx(w), txn, Encode(k_oo_idx), Encode(obj_buf, v_oo_idx));
 
             if (c >= 2101) {
               const new_order::key k_no(w, d, c);
@@ -1160,7 +1296,7 @@ protected:
               const size_t sz = Size(v_no);
               new_order_total_sz += sz;
               n_new_orders++;
-              tbl_new_order(w)->insert(txn, Encode(k_no), Encode(obj_buf, v_no));
+              load_insert(tbl_new_order(w), txn, Encode(k_no), Encode(obj_buf, v_no));
             }
 
             for (uint l = 1; l <= uint(v_oo.o_ol_cnt); l++) {
@@ -1186,7 +1322,7 @@ protected:
               const size_t sz = Size(v_ol);
               order_line_total_sz += sz;
               n_order_lines++;
-              tbl_order_line(w)->insert(txn, Encode(k_ol), Encode(obj_buf, v_ol));
+              load_insert(tbl_order_line(w), txn, Encode(k_ol), Encode(obj_buf, v_ol));
             }
             if (db->commit_txn(txn)) {
               c++;
@@ -1312,7 +1448,7 @@ tpcc_worker::txn_new_order()
     checker::SanityCheckWarehouse(&k_w, v_w);
 
     const district::key k_d(warehouse_id, districtID);
-    ALWAYS_ASSERT(tbl_district(warehouse_id)->get(txn, Encode(obj_key0, k_d), obj_v));
+    ALWAYS_ASSERT(get_district(txn, k_d, obj_v));
     district::value v_d_temp;
     const district::value *v_d = Decode(obj_v, v_d_temp);
     checker::SanityCheckDistrict(&k_d, v_d);
@@ -1329,7 +1465,7 @@ tpcc_worker::txn_new_order()
     if (!g_new_order_fast_id_gen) {
       district::value v_d_new(*v_d);
       v_d_new.d_next_o_id++;
-      tbl_district(warehouse_id)->put(txn, Encode(str(), k_d), Encode(str(), v_d_new));
+      put_district(txn, k_d, v_d_new);
     }
 
     const oorder::key k_oo(warehouse_id, districtID, k_no.no_o_id);
@@ -1349,24 +1485,56 @@ tpcc_worker::txn_new_order()
 
     tbl_oorder_c_id_idx(warehouse_id)->insert(txn, Encode(str(), k_oo_idx), Encode(str(), v_oo_idx));
 
+    // read the items and stock records of every order line up front, one
+    // batch per table, so that their lookups overlap
+    string * const v_items = batch_vs0;
+    string * const v_stocks = batch_vs1;
+    for (uint i = 0; i < numItems; i++)
+      Encode(batch_keys[i], item::key(itemIDs[i]));
+    batch_get(tbl_item(1), txn, numItems, v_items);
+    // the lines supplied by the same warehouse share a stock table. line
+    // i's stock record is read into v_stocks[stock_slot[i]]
+    bool stock_read[15] = {false};
+    uint stock_slot[15], nstocks = 0;
+    for (uint i = 0; i < numItems; i++) {
+      if (stock_read[i])
+        continue;
+      const uint w = supplierWarehouseIDs[i];
+      uint n = 0;
+      for (uint j = i; j < numItems; j++) {
+        if (stock_read[j] || supplierWarehouseIDs[j] != w)
+          continue;
+        Encode(batch_keys[n++], stock::key(w, itemIDs[j]));
+        stock_slot[j] = nstocks + n - 1;
+        stock_read[j] = true;
+      }
+      batch_get(tbl_stock(w), txn, n, v_stocks + nstocks);
+      nstocks += n;
+    }
+    stock::value v_s_news[15];
+
     for (uint ol_number = 1; ol_number <= numItems; ol_number++) {
       const uint ol_supply_w_id = supplierWarehouseIDs[ol_number - 1];
       const uint ol_i_id = itemIDs[ol_number - 1];
       const uint ol_quantity = orderQuantities[ol_number - 1];
 
       const item::key k_i(ol_i_id);
-      ALWAYS_ASSERT(tbl_item(1)->get(txn, Encode(obj_key0, k_i), obj_v));
       item::value v_i_temp;
-      const item::value *v_i = Decode(obj_v, v_i_temp);
+      const item::value *v_i = Decode(v_items[ol_number - 1], v_i_temp);
       checker::SanityCheckItem(&k_i, v_i);
 
       const stock::key k_s(ol_supply_w_id, ol_i_id);
-      ALWAYS_ASSERT(tbl_stock(ol_supply_w_id)->get(txn, Encode(obj_key0, k_s), obj_v));
       stock::value v_s_temp;
-      const stock::value *v_s = Decode(obj_v, v_s_temp);
+      const stock::value *v_s = Decode(v_stocks[stock_slot[ol_number - 1]], v_s_temp);
       checker::SanityCheckStock(&k_s, v_s);
-
-      stock::value v_s_new(*v_s);
+      // an earlier line of this order may have updated the same stock
+      // record already: read our own write, as get() would
+      for (uint j = 0; j < ol_number - 1; j++)
+        if (supplierWarehouseIDs[j] == ol_supply_w_id && itemIDs[j] == ol_i_id)
+          v_s = &v_s_news[j];
+
+      stock::value &v_s_new = v_s_news[ol_number - 1];
+      v_s_new = *v_s;
       if (v_s_new.s_quantity - ol_quantity >= 10)
         v_s_new.s_quantity -= ol_quantity;
       else
@@ -1374,7 +1542,7 @@ tpcc_worker::txn_new_order()
       v_s_new.s_ytd += ol_quantity;
       v_s_new.s_remote_cnt += (ol_supply_w_id == warehouse_id) ? 0 : 1;
 
-      tbl_stock(ol_supply_w_id)->put(txn, Encode(str(), k_s), Encode(str(), v_s_new));
+      put_stock(txn, k_s, v_s_new);
 
       const order_line::key k_ol(warehouse_id, districtID, k_no.no_o_id, ol_number);
       order_line::value v_ol;
@@ -1489,7 +1657,7 @@ tpcc_worker::txn_delivery()
       const order_line::key k_oo_1(warehouse_id, d, k_no->no_o_id, numeric_limits<int32_t>::max());
 
       // XXX(stephentu): mutable scans would help here
-      tbl_order_line(warehouse_id)->scan(txn, Encode(obj_key0, k_oo_0), &Encode(obj_key1, k_oo_1), c, s_arena.get());
+      scan_order_line(txn, k_oo_0, k_oo_1, c, s_arena.get());
       float sum = 0.0;
       for (size_t i = 0; i < c.size(); i++) {
         order_line::value v_ol_temp;
@@ -1522,13 +1690,14 @@ tpcc_worker::txn_delivery()
 
       // update customer
       const customer::key k_c(warehouse_id, d, c_id);
-      ALWAYS_ASSERT(tbl_customer(warehouse_id)->get(txn, Encode(obj_key0, k_c), obj_v));
-
       customer::value v_c_temp;
-      const customer::value *v_c = Decode(obj_v, v_c_temp);
+      const customer::value *v_c = get_fields(
+          tbl_customer(warehouse_id), txn, Encode(obj_key0, k_c), obj_v,
+          v_c_temp, FIELDS(customer::value::c_balance_field));
       customer::value v_c_new(*v_c);
       v_c_new.c_balance += ol_total;
-      tbl_customer(warehouse_id)->put(txn, Encode(str(), k_c), Encode(str(), v_c_new));
+      put_fields(tbl_customer(warehouse_id), txn, Encode(str(), k_c), obj_v,
+                 v_c_new, FIELDS(customer::value::c_balance_field));
     }
     measure_txn_counters(txn, "txn_delivery");
     if (likely(db->commit_txn(txn)))
@@ -1583,25 +1752,34 @@ tpcc_worker::txn_payment()
   try {
     ssize_t ret = 0;
 
+    // of the warehouse and district, payment only reads the ytd and name
     const warehouse::key k_w(warehouse_id);
-    ALWAYS_ASSERT(tbl_warehouse(warehouse_id)->get(txn, Encode(obj_key0, k_w), obj_v));
     warehouse::value v_w_temp;
-    const warehouse::value *v_w = Decode(obj_v, v_w_temp);
-    checker::SanityCheckWarehouse(&k_w, v_w);
+    const warehouse::value *v_w = get_fields(
+        tbl_warehouse(warehouse_id), txn, Encode(obj_key0, k_w), obj_v,
+        v_w_temp, FIELDS(warehouse::value::w_ytd_field,
+                         warehouse::value::w_name_field));
+    if (g_disable_field_access)
+      checker::SanityCheckWarehouse(&k_w, v_w);
 
     warehouse::value v_w_new(*v_w);
     v_w_new.w_ytd += paymentAmount;
-    tbl_warehouse(warehouse_id)->put(txn, Encode(str(), k_w), Encode(str(), v_w_new));
+    put_fields(tbl_warehouse(warehouse_id), txn, Encode(str(), k_w), obj_v,
+               v_w_new, FIELDS(warehouse::value::w_ytd_field));
 
     const district::key k_d(warehouse_id, districtID);
-    ALWAYS_ASSERT(tbl_district(warehouse_id)->get(txn, Encode(obj_key0, k_d), obj_v));
     district::value v_d_temp;
-    const district::value *v_d = Decode(obj_v, v_d_temp);
-    checker::SanityCheckDistrict(&k_d, v_d);
+    const district::value *v_d = get_fields(
+        tbl_district(warehouse_id), txn, Encode(obj_key0, k_d), obj_v,
+        v_d_temp, FIELDS(district::value::d_ytd_field,
+                         district::value::d_name_field));
+    if (g_disable_field_access)
+      checker::SanityCheckDistrict(&k_d, v_d);
 
     district::value v_d_new(*v_d);
     v_d_new.d_ytd += paymentAmount;
-    tbl_district(warehouse_id)->put(txn, Encode(str(), k_d), Encode(str(), v_d_new));
+    put_fields(tbl_district(warehouse_id), txn, Encode(str(), k_d), obj_v,
+               v_d_new, FIELDS(district::value::d_ytd_field));
 
     customer::key k_c;
     customer::value v_c;
@@ -1660,7 +1838,8 @@ tpcc_worker::txn_payment()
     v_c_new.c_balance -= paymentAmount;
     v_c_new.c_ytd_payment += paymentAmount;
     v_c_new.c_payment_cnt++;
-    if (strncmp(v_c.c_credit.data(), "BC", 2) == 0) {
+    const bool bad_credit = strncmp(v_c.c_credit.data(), "BC", 2) == 0;
+    if (bad_credit) {
       char buf[501];
       int n = snprintf(buf, sizeof(buf), "%d %d %d %d %d %f | %s",
                        k_c.c_id,
@@ -1675,7 +1854,20 @@ tpcc_worker::txn_payment()
       NDB_MEMCPY((void *) v_c_new.c_data.data(), &buf[0], v_c_new.c_data.size());
     }
 
-    tbl_customer(customerWarehouseID)->put(txn, Encode(str(), k_c), Encode(str(), v_c_new));
+    // obj_v still holds the customer, read whole
+    if (bad_credit)
+      put_fields(tbl_customer(customerWarehouseID), txn, Encode(str(), k_c),
+                 obj_v, v_c_new,
+                 FIELDS(customer::value::c_balance_field,
+                        customer::value::c_ytd_payment_field,
+                        customer::value::c_payment_cnt_field,
+                        customer::value::c_data_field));
+    else
+      put_fields(tbl_customer(customerWarehouseID), txn, Encode(str(), k_c),
+                 obj_v, v_c_new,
+                 FIELDS(customer::value::c_balance_field,
+                        customer::value::c_ytd_payment_field,
+                        customer::value::c_payment_cnt_field));
 
     const history::key k_h(k_c.c_d_id, k_c.c_w_id, k_c.c_id, districtID, warehouse_id, ts);
     history::value v_h;
@@ -1834,7 +2026,7 @@ tpcc_worker::txn_order_status()
     order_line_nop_callback c_order_line;
     const order_line::key k_ol_0(warehouse_id, districtID, o_id, 0);
     const order_line::key k_ol_1(warehouse_id, districtID, o_id, numeric_limits<int32_t>::max());
-    tbl_order_line(warehouse_id)->scan(txn, Encode(obj_key0, k_ol_0), &Encode(obj_key1, k_ol_1), c_order_line, s_arena.get());
+    scan_order_line(txn, k_ol_0, k_ol_1, c_order_line, s_arena.get());
     ALWAYS_ASSERT(c_order_line.n >= 5 && c_order_line.n <= 15);
 
     measure_txn_counters(txn, "txn_order_status");
@@ -1905,7 +2097,7 @@ tpcc_worker::txn_stock_level()
   // locking is un-necessary (since we can just read from some old snapshot)
   try {
     const district::key k_d(warehouse_id, districtID);
-    ALWAYS_ASSERT(tbl_district(warehouse_id)->get(txn, Encode(obj_key0, k_d), obj_v));
+    ALWAYS_ASSERT(get_district(txn, k_d, obj_v));
     district::value v_d_temp;
     const district::value *v_d = Decode(obj_v, v_d_temp);
     checker::SanityCheckDistrict(&k_d, v_d);
@@ -1921,27 +2113,39 @@ tpcc_worker::txn_stock_level()
     const order_line::key k_ol_1(warehouse_id, districtID, cur_next_o_id, 0);
     {
       ANON_REGION("StockLevelOrderLineScan:", &stock_level_probe0_cg);
-      tbl_order_line(warehouse_id)->scan(txn, Encode(obj_key0, k_ol_0), &Encode(obj_key1, k_ol_1), c, s_arena.get());
+      scan_order_line(txn, k_ol_0, k_ol_1, c, s_arena.get());
     }
     {
       small_unordered_map<uint, bool, 512> s_i_ids_distinct;
-      for (auto &p : c.s_i_ids) {
+      const size_t nbytesread = serializer<int16_t, true>::max_nbytes();
+      // the stock records are read MaxBatch at a time (see batch_get())
+      uint s_i_ids[MaxBatch];
+      size_t n = 0;
+      for (auto it = c.s_i_ids.begin(); ; ++it) {
         ANON_REGION("StockLevelLoopJoinIter:", &stock_level_probe1_cg);
-
-        const size_t nbytesread = serializer<int16_t, true>::max_nbytes();
-
-        const stock::key k_s(warehouse_id, p.first);
-        INVARIANT(p.first >= 1 && p.first <= NumItems());
-        {
-          ANON_REGION("StockLevelLoopJoinGet:", &stock_level_probe2_cg);
-          ALWAYS_ASSERT(tbl_stock(warehouse_id)->get(txn, Encode(obj_key0, k_s), obj_v, nbytesread));
+        const bool done = it == c.s_i_ids.end();
+        if (!done) {
+          INVARIANT(it->first >= 1 && it->first <= NumItems());
+          s_i_ids[n] = it->first;
+          Encode(batch_keys[n++], stock::key(warehouse_id, it->first));
+        }
+        if (n && (done || n == MaxBatch)) {
+          {
+            ANON_REGION("StockLevelLoopJoinGet:", &stock_level_probe2_cg);
+            batch_get(tbl_stock(warehouse_id), txn, n, batch_vs0, nbytesread);
+          }
+          for (size_t i = 0; i < n; i++) {
+            INVARIANT(batch_vs0[i].size() <= nbytesread);
+            const uint8_t *ptr = (const uint8_t *) batch_vs0[i].data();
+            int16_t i16tmp;
+            ptr = serializer<int16_t, true>::read(ptr, &i16tmp);
+            if (i16tmp < int(threshold))
+              s_i_ids_distinct[s_i_ids[i]] = 1;
+          }
+          n = 0;
         }
-        INVARIANT(obj_v.size() <= nbytesread);
-        const uint8_t *ptr = (const uint8_t *) obj_v.data();
-        int16_t i16tmp;
-        ptr = serializer<int16_t, true>::read(ptr, &i16tmp);
-        if (i16tmp < int(threshold))
-          s_i_ids_distinct[p.first] = 1;
+        if (done)
+          break;
       }
       evt_avg_stock_level_loop_join_lookups.offer(c.s_i_ids.size());
       // NB(stephentu): s_i_ids_distinct.size() is the computed result of this txn
@@ -1985,17 +2189,35 @@ private:
            strcmp("oorder_c_id_idx", name) == 0;
   }
 
+  // with --int-keys, the tables keyed by two int32s are u64 keyed, and
+  // those keyed by four u128 keyed
+  static abstract_ordered_index::key_type
+  TableKeyType(const char *name)
+  {
+    if (!g_int_keys)
+      return abstract_ordered_index::KEY_TYPE_STRING;
+    if (strcmp("district", name) == 0 ||
+        strcmp("stock", name) == 0 ||
+        strcmp("stock_data", name) == 0)
+      return abstract_ordered_index::KEY_TYPE_U64;
+    if (strcmp("order_line", name) == 0 ||
+        strcmp("oorder_c_id_idx", name) == 0)
+      return abstract_ordered_index::KEY_TYPE_U128;
+    return abstract_ordered_index::KEY_TYPE_STRING;
+  }
+
   static vector<abstract_ordered_index *>
   OpenTablesForTablespace(abstract_db *db, const char *name, size_t expected_size)
   {
     const bool is_read_only = IsTableReadOnly(name);
     const bool is_append_only = IsTableAppendOnly(name);
+    const abstract_ordered_index::key_type key_type = TableKeyType(name);
     const string s_name(name);
     vector<abstract_ordered_index *> ret(NumWarehouses());
     if (g_enable_separate_tree_per_partition && !is_read_only) {
       if (NumWarehouses() <= nthreads) {
         for (size_t i = 0; i < NumWarehouses(); i++)
-          ret[i] = db->open_index(s_name + "_" + to_string(i), expected_size, is_append_only);
+          ret[i] = db->open_index(s_name + "_" + to_string(i), expected_size, is_append_only, key_type);
       } else {
         const unsigned nwhse_per_partition = NumWarehouses() / nthreads;
         for (size_t partid = 0; partid < nthreads; partid++) {
@@ -2003,13 +2225,13 @@ private:
           const unsigned wend   = (partid + 1 == nthreads) ?
             NumWarehouses() : (partid + 1) * nwhse_per_partition;
           abstract_ordered_index *idx =
-            db->open_index(s_name + "_" + to_string(partid), expected_size, is_append_only);
+            db->open_index(s_name + "_" + to_string(partid), expected_size, is_append_only, key_type);
           for (size_t i = wstart; i < wend; i++)
             ret[i] = idx;
         }
       }
     } else {
-      abstract_ordered_index *idx = db->open_index(s_name, expected_size, is_append_only);
+      abstract_ordered_index *idx = db->open_index(s_name, expected_size, is_append_only, key_type);
       for (size_t i = 0; i < NumWarehouses(); i++)
         ret[i] = idx;
     }
@@ -2145,6 +2367,9 @@ tpcc_do_test(abstract_db *db, int argc, char **argv)
       {"new-order-fast-id-gen"                , no_argument       , &g_new_order_fast_id_gen              , 1}   ,
       {"uniform-item-dist"                    , no_argument       , &g_uniform_item_dist                  , 1}   ,
       {"order-status-scan-hack"               , no_argument       , &g_order_status_scan_hack             , 1}   ,
+      {"disable-multi-get"                    , no_argument       , &g_disable_multi_get                  , 1}   ,
+      {"disable-field-access"                 , no_argument       , &g_disable_field_access               , 1}   ,
+      {"int-keys"                             , no_argument       , &g_int_keys                           , 1}   ,
       {"workload-mix"                         , required_argument , 0                                     , 'w'} ,
       {0, 0, 0, 0}
     };
@@ -2204,6 +2429,9 @@ tpcc_do_test(abstract_db *db, int argc, char **argv)
     cerr << "  new_order_fast_id_gen        : " << g_new_order_fast_id_gen << endl;
     cerr << "  uniform_item_dist            : " << g_uniform_item_dist << endl;
     cerr << "  order_status_scan_hack       : " << g_order_status_scan_hack << endl;
+    cerr << "  multi_get                    : " << !g_disable_multi_get << endl;
+    cerr << "  field_access                 : " << !g_disable_field_access << endl;
+    cerr << "  int_keys                     : " << g_int_keys << endl;
     cerr << "  workload_mix                 : " <<
       format_list(g_txn_workload_mix,
                   g_txn_workload_mix + ARRAY_NELEMS(g_txn_workload_mix)) << endl;
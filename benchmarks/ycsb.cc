@@ -1,4 +1,7 @@
+#include <atomic>
+#include <cmath>
 #include <iostream>
+#include <memory>
 #include <sstream>
 #include <vector>
 #include <utility>
@@ -6,6 +9,7 @@
 #include <set>
 
 #include <stdlib.h>
+#include <strings.h>
 #include <unistd.h>
 #include <getopt.h>
 #include <numa.h>
@@ -22,13 +26,206 @@
 using namespace std;
 using namespace util;
 
-static size_t nkeys;
+static size_t nkeys; // loaded
 static const size_t YCSBRecordSize = 100;
 
-// [R, W, RMW, Scan]
+// [R, W, RMW, Scan, Insert, MultiGet]
 // we're missing remove for now
 // the default is a modification of YCSB "A" we made (80/20 R/W)
-static unsigned g_txn_workload_mix[] = { 80, 20, 0, 0 };
+static unsigned g_txn_workload_mix[] = { 80, 20, 0, 0, 0, 0 };
+
+// keys read by each MultiGet txn (one abstract_ordered_index::multi_get())
+static size_t g_multi_get_keys = 10;
+
+// USERTABLE is opened as an index of u64 keys, which the txns (but for
+// MultiGet) use through the *_int() methods of abstract_ordered_index,
+// rather than as strings
+static int g_int_keys = 0;
+
+// keys [0, g_nkeys) have been handed out: the loaded keys, then the ones
+// picked by inserts (which may not have committed yet)
+static atomic<uint64_t> g_nkeys(0);
+
+// draws the keys of each txn, from one of YCSB's request distributions.
+// the expensive part (zeta(n) for the zipfian ones) is computed once by
+// init(), so next() costs a random double and (at most) one pow()
+class ycsb_key_dist {
+public:
+  enum type {
+    DIST_UNIFORM,
+    DIST_ZIPFIAN,           // key i has weight 1/(i+1)^theta
+    DIST_SCRAMBLED_ZIPFIAN, // zipfian, with the popular keys spread out
+    DIST_HOTSPOT,           // hot_ops of the txns go to the first hot_set
+    DIST_LATEST,            // zipfian, counting back from the newest key
+  };
+
+  static bool
+  Parse(const string &name, type &t)
+  {
+    if (name == "uniform")
+      t = DIST_UNIFORM;
+    else if (name == "zipfian")
+      t = DIST_ZIPFIAN;
+    else if (name == "scrambled-zipfian")
+      t = DIST_SCRAMBLED_ZIPFIAN;
+    else if (name == "hotspot")
+      t = DIST_HOTSPOT;
+    else if (name == "latest")
+      t = DIST_LATEST;
+    else
+      return false;
+    return true;
+  }
+
+  static const char *
+  Name(type t)
+  {
+    switch (t) {
+    case DIST_UNIFORM: return "uniform";
+    case DIST_ZIPFIAN: return "zipfian";
+    case DIST_SCRAMBLED_ZIPFIAN: return "scrambled-zipfian";
+    case DIST_HOTSPOT: return "hotspot";
+    case DIST_LATEST: return "latest";
+    }
+    ALWAYS_ASSERT(false);
+    return nullptr;
+  }
+
+  ycsb_key_dist()
+    : t(DIST_UNIFORM), n(0), theta(0), zetan(0), alpha(0), eta(0),
+      half_pow_theta(0), nhot(0), hot_ops(0)
+  {}
+
+  // keys are drawn from [0, n) (the latest distribution counts back from
+  // g_nkeys instead, over a window of n keys)
+  void
+  init(type t, uint64_t n, double theta, double hot_set, double hot_ops)
+  {
+    ALWAYS_ASSERT(n > 0);
+    this->t = t;
+    this->n = n;
+    this->theta = theta;
+    if (t == DIST_ZIPFIAN || t == DIST_SCRAMBLED_ZIPFIAN || t == DIST_LATEST) {
+      // Gray et al, "Quickly Generating Billion-Record Synthetic Databases"
+      ALWAYS_ASSERT(theta > 0.0 && theta < 1.0);
+      zetan = Zeta(n, theta);
+      alpha = 1.0 / (1.0 - theta);
+      half_pow_theta = pow(0.5, theta);
+      eta = (1.0 - pow(2.0 / double(n), 1.0 - theta)) /
+            (1.0 - (1.0 + half_pow_theta) / zetan);
+    } else if (t == DIST_HOTSPOT) {
+      ALWAYS_ASSERT(hot_set > 0.0 && hot_set < 1.0);
+      ALWAYS_ASSERT(hot_ops >= 0.0 && hot_ops <= 1.0);
+      nhot = max(uint64_t(1), uint64_t(hot_set * n));
+      this->hot_ops = hot_ops;
+    }
+  }
+
+  inline type get_type() const { return t; }
+
+  inline uint64_t
+  next(fast_random &r) const
+  {
+    switch (t) {
+    case DIST_UNIFORM:
+      return r.next() % n;
+    case DIST_ZIPFIAN:
+      return zipf(r);
+    case DIST_SCRAMBLED_ZIPFIAN:
+      return fnv64(zipf(r)) % n;
+    case DIST_HOTSPOT:
+      if (r.next_uniform() < hot_ops)
+        return r.next() % nhot;
+      return nhot + r.next() % (n - nhot);
+    case DIST_LATEST:
+      {
+        const uint64_t newest = g_nkeys.load(memory_order_relaxed) - 1;
+        const uint64_t back = zipf(r);
+        return back <= newest ? newest - back : 0;
+      }
+    }
+    ALWAYS_ASSERT(false);
+    return 0;
+  }
+
+private:
+  // the zipfian rank of a key, in [0, n)
+  inline uint64_t
+  zipf(fast_random &r) const
+  {
+    const double u = r.next_uniform();
+    const double uz = u * zetan;
+    if (uz < 1.0)
+      return 0;
+    if (uz < 1.0 + half_pow_theta)
+      return 1;
+    return min(n - 1, uint64_t(double(n) * pow(eta * u - eta + 1.0, alpha)));
+  }
+
+  static inline uint64_t
+  fnv64(uint64_t v)
+  {
+    // FNV-1a, one byte at a time
+    uint64_t h = 14695981039346656037UL;
+    for (size_t i = 0; i < sizeof(v); i++, v >>= 8) {
+      h ^= v & 0xFF;
+      h *= 1099511628211UL;
+    }
+    return h;
+  }
+
+  // sum_{i=1}^{n} 1/i^theta. the terms past the first million are summed
+  // with the Euler-Maclaurin formula, which is exact enough at that point
+  static double
+  Zeta(uint64_t n, double theta)
+  {
+    static const uint64_t NExact = 1000000;
+    const uint64_t m = min(n, NExact);
+    double sum = 0.0;
+    for (uint64_t i = 1; i <= m; i++)
+      sum += pow(double(i), -theta);
+    if (n == m)
+      return sum;
+    // sum_{i=m+1}^{n} f(i) ~= int_m^n f + (f(n) - f(m))/2
+    //                         + (f'(n) - f'(m))/12
+    const double a = double(m), b = double(n);
+    const double integral =
+      (pow(b, 1.0 - theta) - pow(a, 1.0 - theta)) / (1.0 - theta);
+    const double fa = pow(a, -theta), fb = pow(b, -theta);
+    const double dfa = -theta * pow(a, -theta - 1.0);
+    const double dfb = -theta * pow(b, -theta - 1.0);
+    return sum + integral + (fb - fa) / 2.0 + (dfb - dfa) / 12.0;
+  }
+
+  type t;
+  uint64_t n;
+  double theta;
+  double zetan;
+  double alpha;
+  double eta;
+  double half_pow_theta;
+  uint64_t nhot;
+  double hot_ops;
+};
+
+static ycsb_key_dist g_key_dist;
+
+// the YCSB core workloads. "update" is a Write (a blind put), and "zipfian"
+// is YCSB's scrambled zipfian
+struct ycsb_workload_preset {
+  const char *name;
+  unsigned mix[ARRAY_NELEMS(g_txn_workload_mix)];
+  ycsb_key_dist::type dist;
+};
+
+static const ycsb_workload_preset g_workload_presets[] = {
+  {"A", { 50, 50,  0,  0, 0, 0}, ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN}, // update heavy
+  {"B", { 95,  5,  0,  0, 0, 0}, ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN}, // read mostly
+  {"C", {100,  0,  0,  0, 0, 0}, ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN}, // read only
+  {"D", { 95,  0,  0,  0, 5, 0}, ycsb_key_dist::DIST_LATEST},            // read latest
+  {"E", {  0,  0,  0, 95, 5, 0}, ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN}, // short ranges
+  {"F", { 50,  0, 50,  0, 0, 0}, ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN}, // read-modify-write
+};
 
 class ycsb_worker : public bench_worker {
 public:
@@ -44,6 +241,9 @@ public:
     obj_key0.reserve(str_arena::MinStrReserveLength);
     obj_key1.reserve(str_arena::MinStrReserveLength);
     obj_v.reserve(str_arena::MinStrReserveLength);
+    multi_keys.resize(g_multi_get_keys);
+    multi_vs.resize(g_multi_get_keys);
+    multi_found.reset(new bool[g_multi_get_keys]);
   }
 
   txn_result
@@ -52,9 +252,16 @@ public:
     void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_GET_PUT);
     scoped_str_arena s_arena(arena);
     try {
-      const uint64_t k = r.next() % nkeys;
-      ALWAYS_ASSERT(tbl->get(txn, u64_varkey(k).str(obj_key0), obj_v));
-      computation_n += obj_v.size();
+      const uint64_t k = g_key_dist.next(r);
+      // only an inserted key can be missing (its insert may not have
+      // committed yet, or aborted)
+      const bool found = g_int_keys ?
+        tbl->get_int(txn, &k, 1, obj_v) :
+        tbl->get(txn, u64_varkey(k).str(obj_key0), obj_v);
+      if (likely(found))
+        computation_n += obj_v.size();
+      else
+        ALWAYS_ASSERT(k >= nkeys);
       measure_txn_counters(txn, "txn_read");
       if (likely(db->commit_txn(txn)))
         return txn_result(true, 0);
@@ -76,7 +283,11 @@ public:
     void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_GET_PUT);
     scoped_str_arena s_arena(arena);
     try {
-      tbl->put(txn, u64_varkey(r.next() % nkeys).str(str()), str().assign(YCSBRecordSize, 'b'));
+      const uint64_t k = g_key_dist.next(r);
+      if (g_int_keys)
+        tbl->put_int(txn, &k, 1, str().assign(YCSBRecordSize, 'b'));
+      else
+        tbl->put(txn, u64_varkey(k).str(str()), str().assign(YCSBRecordSize, 'b'));
       measure_txn_counters(txn, "txn_write");
       if (likely(db->commit_txn(txn)))
         return txn_result(true, 0);
@@ -98,10 +309,18 @@ public:
     void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_RMW);
     scoped_str_arena s_arena(arena);
     try {
-      const uint64_t key = r.next() % nkeys;
-      ALWAYS_ASSERT(tbl->get(txn, u64_varkey(key).str(obj_key0), obj_v));
-      computation_n += obj_v.size();
-      tbl->put(txn, obj_key0, str().assign(YCSBRecordSize, 'c'));
+      const uint64_t key = g_key_dist.next(r);
+      const bool found = g_int_keys ?
+        tbl->get_int(txn, &key, 1, obj_v) :
+        tbl->get(txn, u64_varkey(key).str(obj_key0), obj_v);
+      if (likely(found))
+        computation_n += obj_v.size();
+      else
+        ALWAYS_ASSERT(key >= nkeys);
+      if (g_int_keys)
+        tbl->put_int(txn, &key, 1, str().assign(YCSBRecordSize, 'c'));
+      else
+        tbl->put(txn, obj_key0, str().assign(YCSBRecordSize, 'c'));
       measure_txn_counters(txn, "txn_rmw");
       if (likely(db->commit_txn(txn)))
         return txn_result(true, 0);
@@ -134,12 +353,15 @@ public:
   {
     void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_SCAN);
     scoped_str_arena s_arena(arena);
-    const size_t kstart = r.next() % nkeys;
-    const string &kbegin = u64_varkey(kstart).str(obj_key0);
-    const string &kend = u64_varkey(kstart + 100).str(obj_key1);
+    const uint64_t kstart = g_key_dist.next(r);
+    const uint64_t kend = kstart + 100;
     worker_scan_callback c;
     try {
-      tbl->scan(txn, kbegin, &kend, c);
+      if (g_int_keys)
+        tbl->scan_int(txn, &kstart, &kend, 1, c, s_arena.get());
+      else
+        tbl->scan(txn, u64_varkey(kstart).str(obj_key0),
+                  &u64_varkey(kend).str(obj_key1), c);
       computation_n += c.n;
       measure_txn_counters(txn, "txn_scan");
       if (likely(db->commit_txn(txn)))
@@ -156,6 +378,64 @@ public:
     return static_cast<ycsb_worker *>(w)->txn_scan();
   }
 
+  txn_result
+  txn_insert()
+  {
+    void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_GET_PUT);
+    scoped_str_arena s_arena(arena);
+    try {
+      // a key is never reused, even if its insert aborts
+      const uint64_t k = g_nkeys.fetch_add(1, memory_order_relaxed);
+      if (g_int_keys)
+        tbl->insert_int(txn, &k, 1, str().assign(YCSBRecordSize, 'd'));
+      else
+        tbl->insert(txn, u64_varkey(k).str(str()), str().assign(YCSBRecordSize, 'd'));
+      measure_txn_counters(txn, "txn_insert");
+      if (likely(db->commit_txn(txn)))
+        return txn_result(true, 0);
+    } catch (abstract_db::abstract_abort_exception &ex) {
+      db->abort_txn(txn);
+    }
+    return txn_result(false, 0);
+  }
+
+  static txn_result
+  TxnInsert(bench_worker *w)
+  {
+    return static_cast<ycsb_worker *>(w)->txn_insert();
+  }
+
+  txn_result
+  txn_multi_get()
+  {
+    void * const txn = db->new_txn(txn_flags, arena, txn_buf(), abstract_db::HINT_KV_GET_PUT);
+    scoped_str_arena s_arena(arena);
+    try {
+      const size_t n = multi_keys.size();
+      for (size_t i = 0; i < n; i++)
+        u64_varkey(g_key_dist.next(r)).str(multi_keys[i]);
+      tbl->multi_get(txn, &multi_keys[0], n, &multi_vs[0], multi_found.get());
+      for (size_t i = 0; i < n; i++) {
+        if (likely(multi_found[i]))
+          computation_n += multi_vs[i].size();
+        else
+          ALWAYS_ASSERT(varkey(multi_keys[i]).slice() >= nkeys);
+      }
+      measure_txn_counters(txn, "txn_multi_get");
+      if (likely(db->commit_txn(txn)))
+        return txn_result(true, 0);
+    } catch (abstract_db::abstract_abort_exception &ex) {
+      db->abort_txn(txn);
+    }
+    return txn_result(false, 0);
+  }
+
+  static txn_result
+  TxnMultiGet(bench_worker *w)
+  {
+    return static_cast<ycsb_worker *>(w)->txn_multi_get();
+  }
+
   virtual workload_desc_vec
   get_workload() const
   {
@@ -187,6 +467,10 @@ public:
       w.push_back(workload_desc("ReadModifyWrite",  double(g_txn_workload_mix[2])/100.0, TxnRmw));
     if (g_txn_workload_mix[3])
       w.push_back(workload_desc("Scan",  double(g_txn_workload_mix[3])/100.0, TxnScan));
+    if (g_txn_workload_mix[4])
+      w.push_back(workload_desc("Insert",  double(g_txn_workload_mix[4])/100.0, TxnInsert));
+    if (g_txn_workload_mix[5])
+      w.push_back(workload_desc("MultiGet",  double(g_txn_workload_mix[5])/100.0, TxnMultiGet));
     return w;
   }
 
@@ -202,6 +486,13 @@ protected:
     rcu::s_instance.pin_current_thread(b);
   }
 
+  virtual bench_worker *
+  make_lane() OVERRIDE
+  {
+    return new ycsb_worker(worker_id, r.next(), db, open_tables,
+                           barrier_a, barrier_b);
+  }
+
   inline ALWAYS_INLINE string &
   str() {
     return *arena.next();
@@ -214,6 +505,11 @@ private:
   string obj_key1;
   string obj_v;
 
+  // MultiGet's batch, g_multi_get_keys long
+  vector<string> multi_keys;
+  vector<string> multi_vs;
+  unique_ptr<bool[]> multi_found;
+
   uint64_t computation_n;
 };
 
@@ -250,7 +546,7 @@ ycsb_load_keyrange(
         ALWAYS_ASSERT(i >= keystart && i < keyend);
         const string k = u64_varkey(i).str();
         const string v(YCSBRecordSize, 'a');
-        tbl->insert(txn, k, v);
+        load_insert(tbl, txn, k, v);
       }
       if (db->commit_txn(txn))
         batchid++;
@@ -340,7 +636,10 @@ public:
   ycsb_bench_runner(abstract_db *db)
     : bench_runner(db)
   {
-    open_tables["USERTABLE"] = db->open_index("USERTABLE", YCSBRecordSize);
+    open_tables["USERTABLE"] = db->open_index(
+        "USERTABLE", YCSBRecordSize, false,
+        g_int_keys ? abstract_ordered_index::KEY_TYPE_U64 :
+                     abstract_ordered_index::KEY_TYPE_STRING);
   }
 
 protected:
@@ -464,16 +763,33 @@ ycsb_do_test(abstract_db *db, int argc, char **argv)
 {
   nkeys = size_t(scale_factor * 1000.0);
   ALWAYS_ASSERT(nkeys > 0);
+  g_nkeys.store(nkeys, memory_order_relaxed);
+
+  // a preset sets the mix and key distribution, which --workload-mix and
+  // --key-dist override (in any order)
+  const ycsb_workload_preset *preset = nullptr;
+  bool mix_given = false;
+  unsigned mix[ARRAY_NELEMS(g_txn_workload_mix)];
+  string dist_name;
+  ycsb_key_dist::type dist = ycsb_key_dist::DIST_UNIFORM;
+  double zipf_theta = 0.99;
+  double hot_set = 0.2, hot_ops = 0.8;
 
   // parse options
   optind = 1;
   while (1) {
     static struct option long_options[] = {
       {"workload-mix" , required_argument , 0 , 'w'},
+      {"workload"     , required_argument , 0 , 'p'}, // YCSB A-F
+      {"key-dist"     , required_argument , 0 , 'k'},
+      {"zipf-theta"   , required_argument , 0 , 'z'},
+      {"hotspot"      , required_argument , 0 , 'h'}, // hot set,hot ops fractions
+      {"multi-get-keys", required_argument , 0 , 'm'},
+      {"int-keys"     , no_argument       , &g_int_keys , 1},
       {0, 0, 0, 0}
     };
     int option_index = 0;
-    int c = getopt_long(argc, argv, "w:", long_options, &option_index);
+    int c = getopt_long(argc, argv, "w:p:k:z:h:m:", long_options, &option_index);
     if (c == -1)
       break;
     switch (c) {
@@ -485,19 +801,59 @@ ycsb_do_test(abstract_db *db, int argc, char **argv)
 
     case 'w':
       {
+        // inserts and multi-gets may be left out
         const vector<string> toks = split(optarg, ',');
-        ALWAYS_ASSERT(toks.size() == ARRAY_NELEMS(g_txn_workload_mix));
+        ALWAYS_ASSERT(toks.size() <= ARRAY_NELEMS(g_txn_workload_mix) &&
+                      toks.size() >= ARRAY_NELEMS(g_txn_workload_mix) - 2);
         unsigned s = 0;
-        for (size_t i = 0; i < toks.size(); i++) {
-          unsigned p = strtoul(toks[i].c_str(), nullptr, 10);
+        for (size_t i = 0; i < ARRAY_NELEMS(mix); i++) {
+          unsigned p = i < toks.size() ? strtoul(toks[i].c_str(), nullptr, 10) : 0;
           ALWAYS_ASSERT(p >= 0 && p <= 100);
           s += p;
-          g_txn_workload_mix[i] = p;
+          mix[i] = p;
         }
         ALWAYS_ASSERT(s == 100);
+        mix_given = true;
+      }
+      break;
+
+    case 'p':
+      for (auto &p : g_workload_presets)
+        if (strcasecmp(p.name, optarg) == 0)
+          preset = &p;
+      if (!preset) {
+        cerr << "[ERROR] unknown --workload " << optarg << endl;
+        exit(1);
+      }
+      break;
+
+    case 'k':
+      dist_name = optarg;
+      if (!ycsb_key_dist::Parse(dist_name, dist)) {
+        cerr << "[ERROR] unknown --key-dist " << dist_name << endl;
+        exit(1);
       }
       break;
 
+    case 'z':
+      zipf_theta = strtod(optarg, nullptr);
+      ALWAYS_ASSERT(zipf_theta > 0.0 && zipf_theta < 1.0);
+      break;
+
+    case 'h':
+      {
+        const vector<string> toks = split(optarg, ',');
+        ALWAYS_ASSERT(toks.size() == 2);
+        hot_set = strtod(toks[0].c_str(), nullptr);
+        hot_ops = strtod(toks[1].c_str(), nullptr);
+      }
+      break;
+
+    case 'm':
+      g_multi_get_keys = strtoul(optarg, nullptr, 10);
+      ALWAYS_ASSERT(g_multi_get_keys > 0);
+      break;
+
     case '?':
       /* getopt_long already printed an error message. */
       exit(1);
@@ -507,11 +863,31 @@ ycsb_do_test(abstract_db *db, int argc, char **argv)
     }
   }
 
+  if (preset) {
+    NDB_MEMCPY(g_txn_workload_mix, preset->mix, sizeof(g_txn_workload_mix));
+    if (dist_name.empty())
+      dist = preset->dist;
+  }
+  if (mix_given)
+    NDB_MEMCPY(g_txn_workload_mix, mix, sizeof(g_txn_workload_mix));
+  g_key_dist.init(dist, nkeys, zipf_theta, hot_set, hot_ops);
+
   if (verbose) {
     cerr << "ycsb settings:" << endl;
+    cerr << "  workload    : " << (preset ? preset->name : "custom") << endl;
     cerr << "  workload_mix: "
          << format_list(g_txn_workload_mix, g_txn_workload_mix + ARRAY_NELEMS(g_txn_workload_mix))
          << endl;
+    cerr << "  key_dist    : " << ycsb_key_dist::Name(dist) << endl;
+    if (dist == ycsb_key_dist::DIST_ZIPFIAN ||
+        dist == ycsb_key_dist::DIST_SCRAMBLED_ZIPFIAN ||
+        dist == ycsb_key_dist::DIST_LATEST)
+      cerr << "  zipf_theta  : " << zipf_theta << endl;
+    if (dist == ycsb_key_dist::DIST_HOTSPOT)
+      cerr << "  hotspot     : " << hot_set << "," << hot_ops << endl;
+    if (g_txn_workload_mix[5])
+      cerr << "  multi_get_keys: " << g_multi_get_keys << endl;
+    cerr << "  int_keys    : " << g_int_keys << endl;
   }
 
   ycsb_bench_runner r(db);
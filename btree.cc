@@ -855,6 +855,61 @@ test_insert_remove_mix()
   ALWAYS_ASSERT(btr.size() == insert_keys.size());
 }
 
+static void
+test_bulk_load()
+{
+  typedef typename testing_concurrent_btree::value_type value_type;
+  fast_random r(9120398);
+
+  // few distinct prefixes, so the keys share slices and build layers
+  const size_t nkeys = 20000;
+  const string prefixes[] = {"", "a", "abcdefgh", "abcdefghijklmnop"};
+  set<string> keyset;
+  while (keyset.size() < nkeys) {
+    const string &p = prefixes[r.next() % ARRAY_NELEMS(prefixes)];
+    keyset.insert(p + r.next_readable_string(r.next() % 20));
+  }
+  const vector<string> keys(keyset.begin(), keyset.end());
+
+  const double fill_factors[] = {1.0, 0.5, 0.1};
+  for (size_t f = 0; f < ARRAY_NELEMS(fill_factors); f++) {
+    testing_concurrent_btree btr;
+    vector<typename testing_concurrent_btree::bulk_entry_t> entries;
+    for (auto &k : keys)
+      entries.emplace_back(varkey(k), (value_type) k.data());
+    btr.bulk_load(entries, fill_factors[f]);
+    btr.invariant_checker();
+    ALWAYS_ASSERT(btr.size() == nkeys);
+
+    for (auto &k : keys) {
+      value_type v = 0;
+      ALWAYS_ASSERT(btr.search(varkey(k), v));
+      ALWAYS_ASSERT(v == (value_type) k.data());
+    }
+
+    test_range_scan_helper::expect ex(keyset);
+    test_range_scan_helper tester(btr, varkey(""), NULL, false, ex);
+    tester.test();
+
+    // the tree must stay usable after bulk loading
+    set<string> more_keys;
+    while (more_keys.size() < nkeys / 10) {
+      const string k = r.next_readable_string(1 + r.next() % 20);
+      if (keyset.count(k) == 1 || !more_keys.insert(k).second)
+        continue;
+      ALWAYS_ASSERT(btr.insert(varkey(k), (value_type) k.data()));
+    }
+    btr.invariant_checker();
+    ALWAYS_ASSERT(btr.size() == nkeys + more_keys.size());
+    for (auto &k : more_keys)
+      ALWAYS_ASSERT(btr.remove(varkey(k)));
+    for (auto &k : keys)
+      ALWAYS_ASSERT(btr.remove(varkey(k)));
+    btr.invariant_checker();
+    ALWAYS_ASSERT(btr.size() == 0);
+  }
+}
+
 namespace mp_test1_ns {
 
   static const size_t nkeys = 20000;
@@ -1985,6 +2040,7 @@ TestConcurrentBtreeFast()
   test_null_keys_2();
   test_random_keys();
   test_insert_remove_mix();
+  test_bulk_load();
   mp_test_pinning();
   mp_test_inserts_removes();
   cout << "testing_concurrent_btree::TestFast passed" << endl;
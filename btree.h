@@ -18,6 +18,7 @@
 #include "ndb_type_traits.h"
 #include "varkey.h"
 #include "counter.h"
+#include "coro.h"
 #include "macros.h"
 #include "prefetch.h"
 #include "amd64.h"
@@ -1238,6 +1239,22 @@ public:
     return search_impl(k, v, ns, search_info);
   }
 
+  // keys prefetch_search() descends for at once
+  static const size_t PrefetchSearchBatch = 16;
+
+  /**
+   * Descends towards the leaves responsible for keys[0, n) in lock-step,
+   * prefetching the nodes of the next level for every key before reading
+   * any of them, so that the search()es of those keys which follow mostly
+   * hit the cache. Reads no values, and only descends the first layer.
+   * Stops descending for a key whose node changes underneath it.
+   *
+   * If yield, coro::Yield()s after prefetching each level, so that other
+   * coroutines of the thread run while the nodes are fetched
+   */
+  void prefetch_search(const key_type *keys, size_t n,
+                       bool yield = false) const;
+
   /**
    * The low level callback interface is as follows:
    *
@@ -1466,6 +1483,29 @@ private:
   bool
   remove_stable_location(node **root_location, const key_type &k, value_type *old_v);
 
+public:
+
+  typedef std::pair<key_type, value_type> bulk_entry_t;
+
+  /**
+   * Builds the tree bottom-up from entries, which must be sorted by key
+   * (with no duplicates). Leaves are packed with fill_factor * NKeysPerNode
+   * keys (keys which share a key slice are never split across leaves, so
+   * some hold more), and internal nodes with as many children, but never
+   * less than a non-root node needs.
+   *
+   * NOT THREAD SAFE, and the tree must be empty
+   */
+  void bulk_load(const std::vector<bulk_entry_t> &entries,
+                 double fill_factor = 1.0);
+
+private:
+  // builds one layer from [begin, end), whose keys are all past the first
+  // depth slices, and returns its root
+  node *
+  bulk_load_layer(const bulk_entry_t *begin, const bulk_entry_t *end,
+                  size_t depth, size_t leaf_keys, size_t fanout);
+
 public:
 
   /**
@@ -353,6 +353,51 @@ process:
   }
 }
 
+template <typename P>
+void
+btree<P>::prefetch_search(const key_type *keys, size_t n,
+                          bool yield) const
+{
+  rcu_region guard;
+  for (size_t base = 0; base < n; base += PrefetchSearchBatch) {
+    const size_t m = std::min(n - base, size_t(PrefetchSearchBatch));
+    node *cur[PrefetchSearchBatch];
+    node * const root = root_;
+    for (size_t i = 0; i < m; i++)
+      cur[i] = root;
+    bool more = true;
+    while (more) {
+      more = false;
+      // one level for every key: the nodes read here were prefetched by
+      // the previous round
+      for (size_t i = 0; i < m; i++) {
+        if (!cur[i])
+          continue;
+        const uint64_t version = cur[i]->stable_version();
+        if (unlikely(RawVersionManip::IsDeleting(version)) ||
+            AsLeafCheck(cur[i], version)) {
+          cur[i] = nullptr;
+          continue;
+        }
+        internal_node *internal = AsInternal(cur[i]);
+        key_search_ret kret = internal->key_lower_bound_search(keys[base + i].slice());
+        node *child = kret.first != -1 ?
+          internal->children_[kret.first + 1] : internal->children_[0];
+        if (unlikely(!internal->check_version(version))) {
+          cur[i] = nullptr;
+          continue;
+        }
+        ::prefetch(child);
+        prefetch_bytes(child, std::min(sizeof(leaf_node), sizeof(internal_node)));
+        cur[i] = child;
+        more = true;
+      }
+      if (yield && more)
+        coro::Yield();
+    }
+  }
+}
+
 template <typename S>
 class string_restore {
 public:
@@ -614,6 +659,149 @@ retry:
   return false;
 }
 
+template <typename P>
+void
+btree<P>::bulk_load(const std::vector<bulk_entry_t> &entries,
+                    double fill_factor)
+{
+  ALWAYS_ASSERT(fill_factor > 0.0 && fill_factor <= 1.0);
+  ALWAYS_ASSERT(root_->is_leaf_node() && !root_->key_slots_used());
+  if (entries.empty())
+    return;
+  const size_t leaf_keys =
+    std::max(size_t(1), size_t(fill_factor * NKeysPerNode));
+  const size_t fanout =
+    std::max(size_t(NMinKeysPerNode + 1),
+             size_t(fill_factor * (NKeysPerNode + 1)));
+  node * const root = bulk_load_layer(
+      entries.data(), entries.data() + entries.size(), 0, leaf_keys, fanout);
+  recursive_delete(root_);
+  root_ = root;
+}
+
+template <typename P>
+typename btree<P>::node *
+btree<P>::bulk_load_layer(const bulk_entry_t *begin, const bulk_entry_t *end,
+                          size_t depth, size_t leaf_keys, size_t fanout)
+{
+  INVARIANT(begin != end);
+
+  // the nodes of the level being built, and the first key slice under each
+  std::vector<node *> level;
+  std::vector<key_slice> min_keys;
+
+  leaf_node *leaf = NULL;
+  for (const bulk_entry_t *p = begin; p != end;) {
+    const key_slice k = p->first.shift_many(depth).slice();
+
+    // keys which share a slice go in one leaf: the short ones (in length
+    // order), then one slot for the long ones
+    const bulk_entry_t *long_begin = p;
+    while (long_begin != end &&
+           long_begin->first.shift_many(depth).size() <= 8 &&
+           long_begin->first.shift_many(depth).slice() == k)
+      ++long_begin;
+    const bulk_entry_t *long_end = long_begin;
+    while (long_end != end &&
+           long_end->first.shift_many(depth).slice() == k)
+      ++long_end;
+    const size_t nslots = (long_begin - p) + (long_begin != long_end);
+
+    if (!leaf || leaf->key_slots_used() + nslots > leaf_keys) {
+      leaf_node * const next = leaf_node::alloc();
+#ifdef CHECK_INVARIANTS
+      next->lock();
+      next->mark_modifying();
+#endif /* CHECK_INVARIANTS */
+      if (leaf) {
+        next->min_key_ = k;
+        next->prev_ = leaf;
+        leaf->next_ = next;
+#ifdef CHECK_INVARIANTS
+        leaf->unlock();
+#endif /* CHECK_INVARIANTS */
+      }
+      leaf = next;
+      level.push_back(leaf);
+      min_keys.push_back(k);
+    }
+
+    for (; p != long_begin; ++p) {
+      const size_t n = leaf->key_slots_used();
+      leaf->keys_[n] = k;
+      leaf->values_[n].v_ = p->second;
+      leaf->keyslice_set_length(n, p->first.shift_many(depth).size(), false);
+      leaf->inc_key_slots_used();
+    }
+    if (long_begin != long_end) {
+      const size_t n = leaf->key_slots_used();
+      leaf->keys_[n] = k;
+      if (long_end - long_begin == 1) {
+        const varkey kcur = long_begin->first.shift_many(depth);
+        leaf->values_[n].v_ = long_begin->second;
+        leaf->keyslice_set_length(n, 9, false);
+        leaf->ensure_suffixes();
+        rcu_imstring i(kcur.data() + 8, kcur.size() - 8);
+        leaf->suffixes_[n].swap(i);
+      } else {
+        leaf->values_[n].n_ = bulk_load_layer(
+            long_begin, long_end, depth + 1, leaf_keys, fanout);
+        leaf->keyslice_set_length(n, 9, true);
+      }
+      leaf->inc_key_slots_used();
+    }
+    p = long_end;
+  }
+#ifdef CHECK_INVARIANTS
+  leaf->unlock();
+#endif /* CHECK_INVARIANTS */
+
+  // build the internal levels up to the root. a level of c nodes gets
+  // ceil(c / fanout) parents, unless that would leave some parent with
+  // less than NMinKeysPerNode keys
+  while (level.size() > 1) {
+    const size_t c = level.size();
+    const size_t m = std::max(size_t(1),
+        std::min((c + fanout - 1) / fanout, c / (NMinKeysPerNode + 1)));
+    std::vector<node *> parents;
+    std::vector<key_slice> parent_min_keys;
+    for (size_t i = 0, j = 0; i < m; i++) {
+      const size_t nchildren = c / m + (i < (c % m) ? 1 : 0);
+      INVARIANT(nchildren <= NKeysPerNode + 1);
+      INVARIANT(m == 1 || nchildren >= NMinKeysPerNode + 1);
+      internal_node * const internal = internal_node::alloc();
+#ifdef CHECK_INVARIANTS
+      internal->lock();
+      internal->mark_modifying();
+#endif /* CHECK_INVARIANTS */
+      internal->children_[0] = level[j];
+      for (size_t x = 1; x < nchildren; x++) {
+        internal->keys_[x - 1] = min_keys[j + x];
+        internal->children_[x] = level[j + x];
+      }
+      internal->set_key_slots_used(nchildren - 1);
+#ifdef CHECK_INVARIANTS
+      internal->unlock();
+#endif /* CHECK_INVARIANTS */
+      parents.push_back(internal);
+      parent_min_keys.push_back(min_keys[j]);
+      j += nchildren;
+    }
+    level.swap(parents);
+    min_keys.swap(parent_min_keys);
+  }
+
+  node * const root = level[0];
+#ifdef CHECK_INVARIANTS
+  root->lock();
+  root->set_root();
+  root->unlock();
+#else
+  root->set_root();
+#endif /* CHECK_INVARIANTS */
+  return root;
+}
+
 template <typename P>
 typename btree<P>::leaf_node *
 btree<P>::leftmost_descend_layer(node *n) const
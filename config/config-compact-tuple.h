@@ -0,0 +1,4 @@
+#pragma once
+
+// packed dbtuple headers, with the version chain out of line (see tuple.h)
+#define TUPLE_COMPACT
@@ -0,0 +1,131 @@
+#include <sys/mman.h>
+#include <unistd.h>
+#include <iostream>
+
+#include "coro.h"
+#include "util.h"
+
+using namespace std;
+
+// coro_switch(from, to) saves the callee-saved registers on the current
+// stack, stores its stack pointer in *from, and resumes the stack whose
+// pointer is to (saved by an earlier coro_switch(), or laid out by
+// RunAll())
+extern "C" void coro_switch(void **from, void *to);
+
+asm(
+  ".text\n"
+  ".globl coro_switch\n"
+  ".type coro_switch, @function\n"
+  "coro_switch:\n"
+  "  pushq %rbp\n"
+  "  pushq %rbx\n"
+  "  pushq %r12\n"
+  "  pushq %r13\n"
+  "  pushq %r14\n"
+  "  pushq %r15\n"
+  "  movq %rsp, (%rdi)\n"
+  "  movq %rsi, %rsp\n"
+  "  popq %r15\n"
+  "  popq %r14\n"
+  "  popq %r13\n"
+  "  popq %r12\n"
+  "  popq %rbx\n"
+  "  popq %rbp\n"
+  "  ret\n"
+  ".size coro_switch, .-coro_switch\n"
+);
+
+struct coro::sched {
+  const vector<fn_t> *fns_;
+  vector<void *> sps_;     // saved stack pointers
+  vector<bool> done_;
+  vector<char *> stacks_;
+  void *main_sp_;          // RunAll()'s
+  size_t cur_;
+  size_t nlive_;
+};
+
+__thread coro::sched *coro::tl_sched_ = nullptr;
+
+void
+coro::DoYield()
+{
+  sched * const s = tl_sched_;
+  if (s->nlive_ == 1)
+    return;
+  const size_t from = s->cur_;
+  size_t to = from;
+  do {
+    to = (to + 1) % s->sps_.size();
+  } while (s->done_[to]);
+  s->cur_ = to;
+  coro_switch(&s->sps_[from], s->sps_[to]);
+}
+
+void
+coro::Entry()
+{
+  sched * const s = tl_sched_;
+  const size_t me = s->cur_;
+  try {
+    (*s->fns_)[me]();
+  } catch (...) {
+    cerr << "[ERROR] uncaught exception in coroutine " << me << endl;
+    abort();
+  }
+  s->done_[me] = true;
+  s->nlive_--;
+  // RunAll() picks the next one (and frees this stack)
+  coro_switch(&s->sps_[me], s->main_sp_);
+  ALWAYS_ASSERT(false); // a finished coroutine is never resumed
+}
+
+void
+coro::RunAll(const vector<fn_t> &fns, size_t stack_size)
+{
+  ALWAYS_ASSERT(!tl_sched_);
+  if (fns.empty())
+    return;
+  const size_t page = sysconf(_SC_PAGESIZE);
+  stack_size = util::slow_round_up(stack_size, page);
+
+  sched s;
+  s.fns_ = &fns;
+  s.sps_.resize(fns.size());
+  s.done_.assign(fns.size(), false);
+  s.main_sp_ = nullptr;
+  s.cur_ = 0;
+  s.nlive_ = fns.size();
+  for (size_t i = 0; i < fns.size(); i++) {
+    // the lowest page is a guard against overflowing the stack
+    char * const p = (char *) mmap(
+        nullptr, stack_size + page, PROT_READ | PROT_WRITE,
+        MAP_PRIVATE | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+    ALWAYS_ASSERT(p != MAP_FAILED);
+    ALWAYS_ASSERT(!mprotect(p, page, PROT_NONE));
+    s.stacks_.push_back(p);
+    // laid out as coro_switch() leaves a stack: the six registers, then
+    // the address to return to (Entry()). Entry() starts with the stack
+    // pointer 8 off 16 byte alignment, as if it had been called
+    void ** const top = (void **) (p + page + stack_size);
+    top[-1] = nullptr;
+    void **sp = top - 2;
+    *sp = (void *) &Entry;
+    sp -= 6;
+    for (size_t j = 0; j < 6; j++)
+      sp[j] = nullptr;
+    s.sps_[i] = sp;
+  }
+
+  tl_sched_ = &s;
+  while (s.nlive_) {
+    while (s.done_[s.cur_])
+      s.cur_ = (s.cur_ + 1) % fns.size();
+    coro_switch(&s.main_sp_, s.sps_[s.cur_]);
+  }
+  tl_sched_ = nullptr;
+
+  for (auto p : s.stacks_)
+    ALWAYS_ASSERT(!munmap(p, stack_size + page));
+}
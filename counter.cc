@@ -20,6 +20,14 @@ event_ctx::event_counters_lock()
   return s_lock;
 }
 
+// guarded by event_counters_lock()
+static vector<counter_source *> &
+counter_sources()
+{
+  static vector<counter_source *> s_sources;
+  return s_sources;
+}
+
 void
 event_ctx::stat(counter_data &d)
 {
@@ -56,6 +64,44 @@ event_counter::get_all_counters()
   return ret;
 }
 
+map<string, counter_data>
+event_counter::get_counters(const vector<string> &specs)
+{
+  map<string, counter_data> ret;
+  const map<string, event_ctx *> &evts = event_ctx::event_counters();
+  spinlock &l = event_ctx::event_counters_lock();
+  lock_guard<spinlock> sl(l);
+  for (auto &spec : specs) {
+    if (!spec.empty() && spec[spec.size() - 1] == '*') {
+      const string prefix(spec, 0, spec.size() - 1);
+      for (auto it = evts.lower_bound(prefix);
+           it != evts.end() && it->first.compare(0, prefix.size(), prefix) == 0;
+           ++it)
+        if (!ret.count(it->first))
+          it->second->stat(ret[it->first]);
+      map<string, counter_data> m;
+      for (auto src : counter_sources())
+        src->fill(prefix, m);
+      for (auto &p : m)
+        ret.insert(p);
+    } else {
+      auto it = evts.find(spec);
+      if (it != evts.end()) {
+        if (!ret.count(spec))
+          it->second->stat(ret[spec]);
+        continue;
+      }
+      map<string, counter_data> m;
+      for (auto src : counter_sources())
+        src->fill(spec, m);
+      auto it1 = m.find(spec);
+      if (it1 != m.end())
+        ret.insert(*it1);
+    }
+  }
+  return ret;
+}
+
 void
 event_counter::reset_all_counters()
 {
@@ -70,6 +116,8 @@ event_counter::reset_all_counters()
         static_cast<event_ctx_avg *>(p.second)->highs_[i] = 0;
       }
     }
+  for (auto src : counter_sources())
+    src->reset();
 }
 
 bool
@@ -90,6 +138,14 @@ event_counter::stat(const string &name, counter_data &d)
   return true;
 }
 
+void
+event_counter::register_source(counter_source *src)
+{
+  spinlock &l = event_ctx::event_counters_lock();
+  lock_guard<spinlock> sl(l);
+  counter_sources().push_back(src);
+}
+
 #ifdef ENABLE_EVENT_COUNTERS
 event_counter::event_counter(const string &name)
   : ctx_(name, false)
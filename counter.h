@@ -82,6 +82,19 @@ namespace private_ {
   };
 }
 
+// counters only known at runtime (e.g. one per key) come from a
+// counter_source instead of event_counters. get_counters() asks every
+// registered source for the counters its specs match, and
+// reset_all_counters() resets them. sources live forever
+class counter_source {
+public:
+  virtual ~counter_source() {}
+  // adds each of its counters whose name starts with prefix to m
+  virtual void fill(const std::string &prefix,
+                    std::map<std::string, counter_data> &m) = 0;
+  virtual void reset() = 0;
+};
+
 class event_counter {
 public:
   event_counter(const std::string &name);
@@ -113,13 +126,23 @@ public:
   }
 
   // WARNING: an expensive operation!
+  //
+  // event counters only (no counter_source)
   static std::map<std::string, counter_data> get_all_counters();
   // WARNING: an expensive operation!
+  //
+  // snapshot of the counters named by specs, all read under the registry
+  // lock. a spec ending in '*' matches every counter with that prefix
+  static std::map<std::string, counter_data>
+  get_counters(const std::vector<std::string> &specs);
+  // WARNING: an expensive operation!
   static void reset_all_counters();
   // WARNING: an expensive operation!
   static bool
   stat(const std::string &name, counter_data &d);
 
+  static void register_source(counter_source *src);
+
 private:
 #ifdef ENABLE_EVENT_COUNTERS
   unmanaged<private_::event_ctx> ctx_;
@@ -0,0 +1,124 @@
+#pragma once
+
+#include <stdint.h>
+#include <cstring>
+#include <iostream>
+
+#include "macros.h"
+
+// log-bucketed histogram of uint64_t samples (e.g. latencies in usec).
+//
+// each power of two is split into 2^SubBucketBits linear sub-buckets, so
+// any recorded value is known to within a relative error of
+// 2^-SubBucketBits (~6%). values below 2^SubBucketBits are exact.
+//
+// not thread-safe: the intended use is one histogram per writer thread
+// (so add() is a couple of plain increments), merged with operator+=
+// once the writers are done
+class log_histogram {
+public:
+  static const unsigned SubBucketBits = 4;
+  static const uint64_t NSubBuckets = 1UL << SubBucketBits;
+  static const size_t NBuckets = (64 - SubBucketBits + 1) * NSubBuckets;
+
+  log_histogram() { clear(); }
+
+  inline void
+  clear()
+  {
+    NDB_MEMSET(&buckets_[0], 0, sizeof(buckets_));
+    count_ = 0;
+    max_ = 0;
+  }
+
+  inline ALWAYS_INLINE void
+  add(uint64_t v, uint64_t n = 1)
+  {
+    buckets_[bucket_of(v)] += n;
+    count_ += n;
+    if (v > max_)
+      max_ = v;
+  }
+
+  log_histogram &
+  operator+=(const log_histogram &that)
+  {
+    for (size_t i = 0; i < NBuckets; i++)
+      buckets_[i] += that.buckets_[i];
+    count_ += that.count_;
+    if (that.max_ > max_)
+      max_ = that.max_;
+    return *this;
+  }
+
+  inline uint64_t count() const { return count_; }
+  inline uint64_t max() const { return max_; }
+
+  // smallest recorded value v such that at least p percent of samples are
+  // <= v, rounded to the middle of v's bucket (and never above max()).
+  // returns 0 for an empty histogram
+  uint64_t
+  percentile(double p) const
+  {
+    if (!count_)
+      return 0;
+    uint64_t rank = uint64_t(p / 100.0 * double(count_) + 0.5);
+    if (rank < 1)
+      rank = 1;
+    if (rank > count_)
+      rank = count_;
+    uint64_t acc = 0;
+    for (size_t i = 0; i < NBuckets; i++) {
+      acc += buckets_[i];
+      if (acc >= rank) {
+        const uint64_t lo = bucket_low(i);
+        const uint64_t mid = lo + (bucket_width(i) - 1) / 2;
+        return mid < max_ ? mid : max_;
+      }
+    }
+    return max_;
+  }
+
+  static inline ALWAYS_INLINE size_t
+  bucket_of(uint64_t v)
+  {
+    if (v < NSubBuckets)
+      return v;
+    const unsigned shift = 63 - __builtin_clzl(v) - SubBucketBits;
+    return shift * NSubBuckets + (v >> shift);
+  }
+
+  static inline uint64_t
+  bucket_low(size_t i)
+  {
+    if (i < 2 * NSubBuckets)
+      return i;
+    const unsigned shift = i / NSubBuckets - 1;
+    return (NSubBuckets + i % NSubBuckets) << shift;
+  }
+
+  static inline uint64_t
+  bucket_width(size_t i)
+  {
+    if (i < 2 * NSubBuckets)
+      return 1;
+    return 1UL << (i / NSubBuckets - 1);
+  }
+
+private:
+  uint64_t buckets_[NBuckets];
+  uint64_t count_;
+  uint64_t max_;
+};
+
+inline std::ostream &
+operator<<(std::ostream &o, const log_histogram &h)
+{
+  o << "{count=" << h.count()
+    << ", p50=" << h.percentile(50.0)
+    << ", p95=" << h.percentile(95.0)
+    << ", p99=" << h.percentile(99.0)
+    << ", p99.9=" << h.percentile(99.9)
+    << ", max=" << h.max() << "}";
+  return o;
+}
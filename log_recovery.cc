@@ -0,0 +1,325 @@
+#include <algorithm>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <thread>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+
+#include <lz4.h>
+
+#include "log_recovery.h"
+#include "txn_proto2_impl.h"
+#include "record/serializer.h"
+#include "util.h"
+
+using namespace std;
+using namespace util;
+
+static inline uint64_t
+partition_hash(uint32_t table, const uint8_t *key, uint32_t klen)
+{
+  // FNV-1a
+  uint64_t h = 14695981039346656037UL ^ table;
+  for (uint32_t i = 0; i < klen; i++) {
+    h ^= key[i];
+    h *= 1099511628211UL;
+  }
+  return h;
+}
+
+log_recovery::log_recovery(const vector<string> &logfiles)
+  : compressed_(false), pepoch_(numeric_limits<uint64_t>::max()),
+    ptid_(numeric_limits<uint64_t>::max()),
+    nbytes_(0), nbuffers_(0), nbuffers_skipped_(0),
+    ntxns_(0), ntxns_skipped_(0), nrecords_(0), ntorn_bytes_(0)
+{
+  ALWAYS_ASSERT(!logfiles.empty());
+  for (auto &fname : logfiles) {
+    logfile f;
+    f.name_ = fname;
+    f.fd_ = open(fname.c_str(), O_RDONLY);
+    if (f.fd_ == -1) {
+      perror("open");
+      ALWAYS_ASSERT(false);
+    }
+    struct stat st;
+    ALWAYS_ASSERT(fstat(f.fd_, &st) == 0);
+    f.size_ = st.st_size;
+    f.base_ = nullptr;
+    if (f.size_) {
+      void *p = mmap(nullptr, f.size_, PROT_READ, MAP_PRIVATE, f.fd_, 0);
+      if (p == MAP_FAILED) {
+        perror("mmap");
+        ALWAYS_ASSERT(false);
+      }
+      madvise(p, f.size_, MADV_SEQUENTIAL);
+      f.base_ = (const uint8_t *) p;
+    }
+    files_.push_back(f);
+  }
+  read_catalog(txn_logger::CatalogFileName(logfiles[0]));
+  read_persistent_epoch(txn_logger::PersistentEpochFileName(logfiles[0]));
+}
+
+log_recovery::~log_recovery()
+{
+  for (auto &f : files_) {
+    if (f.base_)
+      munmap((void *) f.base_, f.size_);
+    close(f.fd_);
+  }
+}
+
+void
+log_recovery::read_catalog(const string &fname)
+{
+  ifstream in(fname.c_str());
+  if (!in) {
+    cerr << "[ERROR] cannot open log catalog " << fname << endl;
+    ALWAYS_ASSERT(false);
+  }
+  string line;
+  while (getline(in, line)) {
+    istringstream iss(line);
+    string tag;
+    iss >> tag;
+    if (tag == "compress") {
+      iss >> compressed_;
+    } else if (tag == "table") {
+      uint32_t id;
+      string name;
+      iss >> id;
+      iss.get(); // the separator
+      getline(iss, name);
+      tables_[id] = name;
+    } else if (!tag.empty()) {
+      cerr << "[WARNING] " << fname << ": ignoring line: " << line << endl;
+    }
+  }
+}
+
+void
+log_recovery::read_persistent_epoch(const string &fname)
+{
+  const int fd = open(fname.c_str(), O_RDONLY);
+  // [epoch] or, in group commit mode, [epoch][tid]
+  uint64_t e[2];
+  const ssize_t n = (fd == -1) ? -1 : ::read(fd, &e[0], sizeof(e));
+  if (n < ssize_t(sizeof(e[0]))) {
+    cerr << "[WARNING] no persistent epoch in " << fname
+         << ", replaying every txn in the logs" << endl;
+  } else {
+    pepoch_ = e[0];
+    if (n == sizeof(e))
+      ptid_ = e[1];
+  }
+  if (fd != -1)
+    close(fd);
+}
+
+void
+log_recovery::scan(const logfile &f, uint64_t min_epoch)
+{
+  typedef txn_logger::logbuf_header logbuf_header;
+  size_t off = 0;
+  while (off + sizeof(logbuf_header) <= f.size_) {
+    logbuf_header hdr;
+    NDB_MEMCPY(&hdr, f.base_ + off, sizeof(hdr));
+    // a torn write leaves a partial (or zeroed) buffer at the tail
+    if (!hdr.nentries_ ||
+        off + sizeof(hdr) + hdr.datasize_ > f.size_)
+      break;
+    const uint64_t e = transaction_proto2_static::EpochId(hdr.last_tid_);
+    const uint64_t max_epoch =
+      (ptid_ == numeric_limits<uint64_t>::max()) ?
+        pepoch_ : transaction_proto2_static::EpochId(ptid_);
+    if (e > max_epoch || e < min_epoch) {
+      // log buffers never span epochs, so this is all or nothing
+      nbuffers_skipped_++;
+    } else {
+      extent x;
+      x.data_ = f.base_ + off + sizeof(hdr);
+      x.size_ = hdr.datasize_;
+      x.nentries_ = hdr.nentries_;
+      extents_.push_back(x);
+    }
+    off += sizeof(hdr) + hdr.datasize_;
+  }
+  nbytes_ += off;
+  // the aio log writer leaves zeros past the end of the log, which do not
+  // make a buffer header
+  const size_t nleft = f.size_ - off;
+  const uint8_t * const p = f.base_ + off;
+  const bool unused =
+    all_of(p, p + min(nleft, sizeof(logbuf_header)),
+           [](uint8_t c) { return !c; });
+  if (off != f.size_ && !unused) {
+    ntorn_bytes_ += f.size_ - off;
+    cerr << "[WARNING] " << f.name_ << ": ignoring " << (f.size_ - off)
+         << " bytes at offset " << off << endl;
+  }
+}
+
+bool
+log_recovery::decode(const uint8_t *p, size_t n, decoder &d) const
+{
+  serializer<uint32_t, true> vs_uint32_t;
+  serializer<uint64_t, false> s_uint64_t;
+  const uint8_t * const end = p + n;
+  const size_t npartitions = d.parts_.size();
+  while (p < end) {
+    uint64_t tid;
+    uint32_t nwrites;
+    if (!(p = s_uint64_t.failsafe_read(p, end - p, &tid)) ||
+        !(p = vs_uint32_t.failsafe_read(p, end - p, &nwrites)))
+      return false;
+    for (uint32_t i = 0; i < nwrites; i++) {
+      record r;
+      r.tid_ = tid;
+      if (!(p = vs_uint32_t.failsafe_read(p, end - p, &r.table_)) ||
+          !(p = vs_uint32_t.failsafe_read(p, end - p, &r.klen_)) ||
+          size_t(end - p) < r.klen_)
+        return false;
+      r.key_ = p;
+      p += r.klen_;
+      if (!(p = vs_uint32_t.failsafe_read(p, end - p, &r.vlen_)) ||
+          size_t(end - p) < (r.vlen_ & ~txn_logger::LogValueDeltaFlag))
+        return false;
+      r.delta_ = r.vlen_ & txn_logger::LogValueDeltaFlag;
+      r.vlen_ &= ~txn_logger::LogValueDeltaFlag;
+      r.value_ = p;
+      p += r.vlen_;
+      if (tid > ptid_)
+        continue;
+      const uint64_t h = partition_hash(r.table_, r.key_, r.klen_);
+      d.parts_[h % npartitions].push_back(r);
+    }
+    if (tid > ptid_) {
+      // written, but never released as durable
+      d.ntxns_skipped_++;
+      continue;
+    }
+    d.nrecords_ += nwrites;
+    d.ntxns_++;
+  }
+  return true;
+}
+
+void
+log_recovery::decode_worker(atomic<size_t> &next, decoder &d) const
+{
+  serializer<uint32_t, false> s_uint32_t;
+  for (;;) {
+    const size_t i = next.fetch_add(1, memory_order_relaxed);
+    if (i >= extents_.size())
+      return;
+    const extent &x = extents_[i];
+    const uint64_t ntxns_before = d.ntxns_ + d.ntxns_skipped_;
+    if (!compressed_) {
+      if (!decode(x.data_, x.size_, d))
+        goto corrupt;
+    } else {
+      const uint8_t *p = x.data_;
+      const uint8_t * const end = p + x.size_;
+      while (p < end) {
+        uint32_t len;
+        if (!(p = s_uint32_t.failsafe_read(p, end - p, &len)) ||
+            size_t(end - p) < len)
+          goto corrupt;
+        // records point into the decompressed chunk, so it must outlive
+        // the partitions
+        if (d.scratch_off_ + txn_logger::g_horizon_buffer_size >
+            ScratchBlockSize) {
+          d.scratch_.emplace_back(new uint8_t[ScratchBlockSize]);
+          d.scratch_off_ = 0;
+        }
+        uint8_t * const out = d.scratch_.back().get() + d.scratch_off_;
+        const int ret = LZ4_decompress_safe(
+            (const char *) p, (char *) out, len,
+            txn_logger::g_horizon_buffer_size);
+        if (ret < 0 || !decode(out, ret, d))
+          goto corrupt;
+        d.scratch_off_ += ret;
+        p += len;
+      }
+    }
+    if (d.ntxns_ + d.ntxns_skipped_ - ntxns_before != x.nentries_)
+      goto corrupt;
+    continue;
+  corrupt:
+    d.corrupt_ = true;
+  }
+}
+
+void
+log_recovery::merge_worker(atomic<size_t> &next)
+{
+  for (;;) {
+    const size_t p = next.fetch_add(1, memory_order_relaxed);
+    if (p >= partitions_.size())
+      return;
+    partition &part = partitions_[p];
+    size_t n = 0;
+    for (auto &d : decoders_)
+      n += d.parts_[p].size();
+    part.reserve(n);
+    for (auto &d : decoders_) {
+      part.insert(part.end(), d.parts_[p].begin(), d.parts_[p].end());
+      partition().swap(d.parts_[p]);
+    }
+    // a key is written at most once per txn, and proto2 orders conflicting
+    // txns by TID, so this is the commit order of every key
+    sort(part.begin(), part.end(),
+        [](const record &a, const record &b) { return a.tid_ < b.tid_; });
+  }
+}
+
+void
+log_recovery::read(unsigned nthreads, unsigned npartitions, uint64_t min_epoch)
+{
+  ALWAYS_ASSERT(nthreads > 0);
+  ALWAYS_ASSERT(npartitions > 0);
+  ALWAYS_ASSERT(partitions_.empty());
+
+  for (auto &f : files_)
+    scan(f, min_epoch);
+  nbuffers_ = extents_.size();
+
+  decoders_.resize(nthreads);
+  for (auto &d : decoders_)
+    d.parts_.resize(npartitions);
+  {
+    atomic<size_t> next(0);
+    vector<thread> thds;
+    for (auto &d : decoders_)
+      thds.emplace_back(&log_recovery::decode_worker, this, ref(next), ref(d));
+    for (auto &t : thds)
+      t.join();
+  }
+
+  bool corrupt = false;
+  for (auto &d : decoders_) {
+    ntxns_ += d.ntxns_;
+    ntxns_skipped_ += d.ntxns_skipped_;
+    nrecords_ += d.nrecords_;
+    corrupt = corrupt || d.corrupt_;
+  }
+  if (corrupt) {
+    // buffers below the persistent epoch were synced before it advanced
+    cerr << "[ERROR] corrupt log buffer below the persistent epoch" << endl;
+    ALWAYS_ASSERT(false);
+  }
+
+  partitions_.resize(npartitions);
+  {
+    atomic<size_t> next(0);
+    vector<thread> thds;
+    for (unsigned i = 0; i < min(nthreads, npartitions); i++)
+      thds.emplace_back(&log_recovery::merge_worker, this, ref(next));
+    for (auto &t : thds)
+      t.join();
+  }
+}
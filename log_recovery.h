@@ -0,0 +1,144 @@
+#ifndef _NDB_LOG_RECOVERY_H_
+#define _NDB_LOG_RECOVERY_H_
+
+#include <stdint.h>
+#include <atomic>
+#include <map>
+#include <memory>
+#include <string>
+#include <vector>
+
+#include "macros.h"
+
+// reads back the logs written by txn_logger (see txn_proto2_impl.h for the
+// on disk format).
+//
+// every log file is mmap-ed, and its buffers are decompressed and decoded
+// on a pool of threads. only txns up to (and including) the persistent
+// epoch are kept- later ones may be missing from some logs. logs written in
+// group commit mode also record a persisted TID, which is used instead (it
+// is never below the end of the persistent epoch). records are
+// hash partitioned by (table, key), so replaying each partition in TID
+// order (on its own thread) rebuilds every table
+class log_recovery {
+public:
+
+  struct record {
+    uint64_t tid_;
+    uint32_t table_;  // id in the catalog
+    uint32_t klen_;
+    uint32_t vlen_;   // 0 if the key was removed
+    bool delta_;      // is the value a value delta (see value_delta.h)?
+    const uint8_t *key_;
+    const uint8_t *value_;
+
+    inline std::string key() const
+    { return std::string((const char *) key_, klen_); }
+    inline std::string value() const
+    { return std::string((const char *) value_, vlen_); }
+  };
+
+  typedef std::vector<record> partition;
+
+  // logfiles must be listed in the order given to txn_logger::Init(); the
+  // catalog and persistent epoch are found next to logfiles[0]
+  log_recovery(const std::vector<std::string> &logfiles);
+  ~log_recovery();
+
+  log_recovery(const log_recovery &) = delete;
+  log_recovery &operator=(const log_recovery &) = delete;
+
+  // decodes every log on nthreads threads into npartitions partitions,
+  // each sorted by TID. buffers from epochs below min_epoch (e.g. ones
+  // covered by a checkpoint) are skipped. can only be called once
+  void read(unsigned nthreads, unsigned npartitions, uint64_t min_epoch = 0);
+
+  // table id => name, from the catalog
+  inline const std::map<uint32_t, std::string> &
+  tables() const
+  {
+    return tables_;
+  }
+
+  inline partition &
+  get_partition(unsigned p)
+  {
+    return partitions_.at(p);
+  }
+
+  // stats, valid after read()
+
+  inline uint64_t persistent_epoch() const { return pepoch_; }
+  inline uint64_t persistent_tid() const { return ptid_; }
+  inline uint64_t nbytes() const { return nbytes_; }       // read from disk
+  inline uint64_t nbuffers() const { return nbuffers_; }   // decoded
+  inline uint64_t nbuffers_skipped() const { return nbuffers_skipped_; }
+  inline uint64_t ntxns() const { return ntxns_; }
+  inline uint64_t ntxns_skipped() const { return ntxns_skipped_; } // > ptid
+  inline uint64_t nrecords() const { return nrecords_; }
+  inline uint64_t ntorn_bytes() const { return ntorn_bytes_; }
+
+private:
+
+  struct logfile {
+    std::string name_;
+    int fd_;
+    const uint8_t *base_;
+    size_t size_;
+  };
+
+  // one log buffer
+  struct extent {
+    const uint8_t *data_;
+    size_t size_;
+    uint64_t nentries_;
+  };
+
+  static const size_t ScratchBlockSize = (1<<24);
+
+  // state private to one decoding thread
+  struct decoder {
+    std::vector<partition> parts_;
+    // blocks of decompressed chunks
+    std::vector<std::unique_ptr<uint8_t[]>> scratch_;
+    size_t scratch_off_; // into scratch_.back()
+    uint64_t ntxns_;
+    uint64_t ntxns_skipped_;
+    uint64_t nrecords_;
+    bool corrupt_;
+    decoder()
+      : scratch_off_(ScratchBlockSize), ntxns_(0), ntxns_skipped_(0),
+        nrecords_(0), corrupt_(false) {}
+  };
+
+
+  void read_catalog(const std::string &fname);
+  void read_persistent_epoch(const std::string &fname);
+  void scan(const logfile &f, uint64_t min_epoch);
+
+  // decodes the entries in [p, p + n). returns false on a corrupt entry
+  bool decode(const uint8_t *p, size_t n, decoder &d) const;
+
+  void decode_worker(std::atomic<size_t> &next, decoder &d) const;
+
+  void merge_worker(std::atomic<size_t> &next);
+
+  std::vector<logfile> files_;
+  std::vector<extent> extents_;
+  std::map<uint32_t, std::string> tables_;
+  bool compressed_;
+  std::vector<decoder> decoders_; // kept alive for the records in scratch_
+  std::vector<partition> partitions_;
+
+  uint64_t pepoch_;
+  uint64_t ptid_; // max if the logs have no persisted TID
+  uint64_t nbytes_;
+  uint64_t nbuffers_;
+  uint64_t nbuffers_skipped_;
+  uint64_t ntxns_;
+  uint64_t ntxns_skipped_;
+  uint64_t nrecords_;
+  uint64_t ntorn_bytes_;
+};
+
+#endif /* _NDB_LOG_RECOVERY_H_ */
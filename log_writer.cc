@@ -0,0 +1,257 @@
+#include <algorithm>
+#include <iostream>
+#include <errno.h>
+#include <fcntl.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+
+#include "log_writer.h"
+#include "util.h"
+
+using namespace std;
+
+// libaio's io_* wrappers are thin shims over these syscalls; calling them
+// directly keeps the core library free of the dependency
+
+static inline int
+io_setup(unsigned nr, aio_context_t *ctx)
+{
+  return syscall(__NR_io_setup, nr, ctx);
+}
+
+static inline int
+io_destroy(aio_context_t ctx)
+{
+  return syscall(__NR_io_destroy, ctx);
+}
+
+static inline int
+io_submit(aio_context_t ctx, long n, struct iocb **iocbs)
+{
+  return syscall(__NR_io_submit, ctx, n, iocbs);
+}
+
+static inline int
+io_getevents(aio_context_t ctx, long min_nr, long nr, struct io_event *events)
+{
+  return syscall(__NR_io_getevents, ctx, min_nr, nr, events, nullptr);
+}
+
+bool
+log_writer::ParseBackend(const string &name, backend &b)
+{
+  if (name == "posix")
+    b = BACKEND_POSIX;
+  else if (name == "aio")
+    b = BACKEND_AIO;
+  else
+    return false;
+  return true;
+}
+
+const char *
+log_writer::BackendName(backend b)
+{
+  switch (b) {
+  case BACKEND_POSIX:
+    return "posix";
+  case BACKEND_AIO:
+    return "aio";
+  }
+  ALWAYS_ASSERT(false);
+  return nullptr;
+}
+
+log_writer *
+log_writer::Make(backend b, const string &fname, bool do_sync)
+{
+  switch (b) {
+  case BACKEND_POSIX:
+    return new posix_log_writer(fname, do_sync);
+  case BACKEND_AIO:
+    return new aio_log_writer(fname, do_sync);
+  }
+  ALWAYS_ASSERT(false);
+  return nullptr;
+}
+
+posix_log_writer::posix_log_writer(const string &fname, bool do_sync)
+  : do_sync_(do_sync)
+{
+  fd_ = open(fname.c_str(), O_CREAT|O_WRONLY|O_TRUNC, 0664);
+  if (fd_ == -1) {
+    perror("open");
+    ALWAYS_ASSERT(false);
+  }
+}
+
+posix_log_writer::~posix_log_writer()
+{
+  close(fd_);
+}
+
+void
+posix_log_writer::write(const struct iovec *iovs, size_t n, size_t nbytes)
+{
+  const ssize_t ret = writev(fd_, iovs, n);
+  if (unlikely(ret == -1)) {
+    perror("writev");
+    ALWAYS_ASSERT(false);
+  }
+  if (do_sync_) {
+    const int fret = fdatasync(fd_);
+    if (unlikely(fret == -1)) {
+      perror("fdatasync");
+      ALWAYS_ASSERT(false);
+    }
+  }
+}
+
+const size_t aio_log_writer::Alignment;
+const size_t aio_log_writer::ChunkSize;
+const size_t aio_log_writer::MaxInflight;
+const size_t aio_log_writer::SegmentSize;
+
+aio_log_writer::aio_log_writer(const string &fname, bool do_sync)
+  : fname_(fname), direct_(true), can_preallocate_(true), ctx_(0),
+    staging_(nullptr), capacity_(0), tail_(0), off_(0), preallocated_(0)
+{
+  const int flags = O_CREAT|O_WRONLY|O_TRUNC | (do_sync ? O_DSYNC : 0);
+  fd_ = open(fname.c_str(), flags | O_DIRECT, 0664);
+  if (fd_ == -1 && errno == EINVAL) {
+    cerr << "[WARNING] " << fname << ": O_DIRECT not supported, "
+         << "writing through the page cache" << endl;
+    direct_ = false;
+    fd_ = open(fname.c_str(), flags, 0664);
+  }
+  if (fd_ == -1) {
+    perror("open");
+    ALWAYS_ASSERT(false);
+  }
+  if (io_setup(MaxInflight, &ctx_) == -1) {
+    perror("io_setup");
+    ALWAYS_ASSERT(false);
+  }
+  reserve(ChunkSize);
+}
+
+aio_log_writer::~aio_log_writer()
+{
+  io_destroy(ctx_);
+  free(staging_);
+  close(fd_);
+}
+
+void
+aio_log_writer::reserve(size_t nbytes)
+{
+  if (nbytes <= capacity_)
+    return;
+  const size_t capacity =
+    util::iceil(max(nbytes, 2 * capacity_), Alignment);
+  void *p = nullptr;
+  if (posix_memalign(&p, Alignment, capacity)) {
+    cerr << "[ERROR] posix_memalign failed" << endl;
+    ALWAYS_ASSERT(false);
+  }
+  NDB_MEMCPY(p, staging_, tail_);
+  free(staging_);
+  staging_ = (uint8_t *) p;
+  capacity_ = capacity;
+}
+
+void
+aio_log_writer::preallocate(uint64_t end)
+{
+  // writing into allocated space does not change the file's size, so
+  // O_DSYNC writes need not update its metadata (besides converting
+  // unwritten extents)
+  while (can_preallocate_ && preallocated_ < end) {
+    if (fallocate(fd_, 0, preallocated_, SegmentSize) == -1) {
+      if (errno != EOPNOTSUPP) {
+        perror("fallocate");
+        ALWAYS_ASSERT(false);
+      }
+      cerr << "[WARNING] " << fname_ << ": cannot preallocate log segments"
+           << endl;
+      can_preallocate_ = false;
+      break;
+    }
+    preallocated_ += SegmentSize;
+  }
+}
+
+void
+aio_log_writer::write(const struct iovec *iovs, size_t n, size_t nbytes)
+{
+  reserve(tail_ + nbytes + Alignment);
+  size_t len = tail_;
+  for (size_t i = 0; i < n; i++) {
+    NDB_MEMCPY(staging_ + len, iovs[i].iov_base, iovs[i].iov_len);
+    len += iovs[i].iov_len;
+  }
+  INVARIANT(len == tail_ + nbytes);
+  const size_t padded = util::iceil(len, Alignment);
+  NDB_MEMSET(staging_ + len, 0, padded - len);
+
+  // staging_ starts at the block which holds the end of the log
+  const uint64_t base = off_ - tail_;
+  INVARIANT(!(base % Alignment));
+  preallocate(base + padded);
+
+  // one write per chunk, up to MaxInflight at once. chunks are disjoint, so
+  // they can complete in any order
+  struct iocb cbs[MaxInflight];
+  struct iocb *free_cbs[MaxInflight];
+  struct iocb *cbps[MaxInflight];
+  struct io_event events[MaxInflight];
+  for (size_t i = 0; i < MaxInflight; i++)
+    free_cbs[i] = &cbs[i];
+  size_t nfree = MaxInflight, next = 0;
+  while (next < padded || nfree < MaxInflight) {
+    long nsubmit = 0;
+    while (next < padded && nfree) {
+      const size_t clen = min(ChunkSize, padded - next);
+      struct iocb &cb = *free_cbs[--nfree];
+      NDB_MEMSET(&cb, 0, sizeof(cb));
+      cb.aio_fildes = fd_;
+      cb.aio_lio_opcode = IOCB_CMD_PWRITE;
+      cb.aio_buf = (uint64_t) (staging_ + next);
+      cb.aio_nbytes = clen;
+      cb.aio_offset = base + next;
+      cbps[nsubmit++] = &cb;
+      next += clen;
+    }
+    if (nsubmit) {
+      const int ret = io_submit(ctx_, nsubmit, cbps);
+      if (unlikely(ret != nsubmit)) {
+        perror("io_submit");
+        ALWAYS_ASSERT(false);
+      }
+    }
+    const int ret =
+      io_getevents(ctx_, 1, MaxInflight - nfree, events);
+    if (unlikely(ret <= 0)) {
+      perror("io_getevents");
+      ALWAYS_ASSERT(false);
+    }
+    for (int i = 0; i < ret; i++) {
+      struct iocb * const cb = (struct iocb *) events[i].obj;
+      if (unlikely(events[i].res != int64_t(cb->aio_nbytes))) {
+        cerr << "[ERROR] " << fname_ << ": aio write returned "
+             << events[i].res << " (" << strerror(-events[i].res) << ")"
+             << endl;
+        ALWAYS_ASSERT(false);
+      }
+      free_cbs[nfree++] = cb;
+    }
+  }
+
+  off_ += nbytes;
+  // keep the last partial block, to complete it next time
+  const size_t tail = off_ % Alignment;
+  memmove(staging_, staging_ + (len - tail), tail);
+  tail_ = tail;
+}
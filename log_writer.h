@@ -0,0 +1,98 @@
+#ifndef _NDB_LOG_WRITER_H_
+#define _NDB_LOG_WRITER_H_
+
+#include <stdint.h>
+#include <string>
+#include <sys/uio.h>
+#include <linux/aio_abi.h>
+
+#include "macros.h"
+
+// appends log buffers to one log file, for one txn_logger thread. the file
+// is truncated when the writer is made. backends:
+//
+//   posix: writev() + fdatasync() (the default)
+//   aio:   O_DIRECT | O_DSYNC writes, several in flight at once (linux native
+//          aio), into space preallocated a segment at a time. a write is
+//          durable once it completes, so no fdatasync() is needed
+//
+// both leave the same sequence of bytes in the file, except that the aio
+// backend leaves zeros past the end of the log (the rest of the last block
+// and segment)
+class log_writer {
+public:
+
+  enum backend {
+    BACKEND_POSIX,
+    BACKEND_AIO,
+  };
+
+  // returns false if name is not a backend
+  static bool ParseBackend(const std::string &name, backend &b);
+
+  static const char *BackendName(backend b);
+
+  // if do_sync is false, writes are not made durable
+  static log_writer *Make(backend b, const std::string &fname, bool do_sync);
+
+  virtual ~log_writer() {}
+
+  // appends n buffers (nbytes in total) to the log, returning once they are
+  // durable (if do_sync)
+  virtual void write(const struct iovec *iovs, size_t n, size_t nbytes) = 0;
+};
+
+class posix_log_writer : public log_writer {
+public:
+  posix_log_writer(const std::string &fname, bool do_sync);
+  virtual ~posix_log_writer();
+
+  posix_log_writer(const posix_log_writer &) = delete;
+  posix_log_writer &operator=(const posix_log_writer &) = delete;
+
+  virtual void write(const struct iovec *iovs, size_t n, size_t nbytes) OVERRIDE;
+
+private:
+  int fd_;
+  const bool do_sync_;
+};
+
+class aio_log_writer : public log_writer {
+public:
+  // O_DIRECT needs offsets and sizes aligned to the device's logical block
+  static const size_t Alignment = 4096;
+  static const size_t ChunkSize = (1<<20); // bytes per write
+  static const size_t MaxInflight = 32; // writes in flight
+  static const size_t SegmentSize = (1<<26); // preallocated at a time
+
+  aio_log_writer(const std::string &fname, bool do_sync);
+  virtual ~aio_log_writer();
+
+  aio_log_writer(const aio_log_writer &) = delete;
+  aio_log_writer &operator=(const aio_log_writer &) = delete;
+
+  virtual void write(const struct iovec *iovs, size_t n, size_t nbytes) OVERRIDE;
+
+  // false if the file system refused O_DIRECT (e.g. older tmpfs), in which
+  // case writes go through the page cache
+  inline bool direct() const { return direct_; }
+
+private:
+  void reserve(size_t nbytes);
+  void preallocate(uint64_t end);
+
+  const std::string fname_;
+  int fd_;
+  bool direct_;
+  bool can_preallocate_;
+  aio_context_t ctx_;
+  // staging_[0, tail_) holds the last (partial) block written, which is
+  // written again, with more data, by the next write
+  uint8_t *staging_;
+  size_t capacity_;
+  size_t tail_;
+  uint64_t off_; // end of the log
+  uint64_t preallocated_;
+};
+
+#endif /* _NDB_LOG_WRITER_H_ */
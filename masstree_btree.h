@@ -18,6 +18,7 @@
 #include "ndb_type_traits.h"
 #include "varkey.h"
 #include "counter.h"
+#include "coro.h"
 #include "macros.h"
 #include "prefetch.h"
 #include "amd64.h"
@@ -259,6 +260,22 @@ public:
   inline bool search(const key_type &k, value_type &v,
                      versioned_node_t *search_info = nullptr) const;
 
+  // keys prefetch_search() descends for at once
+  static const size_t PrefetchSearchBatch = 16;
+
+  /**
+   * Descends towards the leaves responsible for keys[0, n) in lock-step,
+   * prefetching the nodes of the next level for every key before reading
+   * any of them, so that the search()es of those keys which follow mostly
+   * hit the cache. Reads no values, and only descends the first layer.
+   * Stops descending for a key whose node changes underneath it.
+   *
+   * If yield, coro::Yield()s after prefetching each level, so that other
+   * coroutines of the thread run while the nodes are fetched
+   */
+  void prefetch_search(const key_type *keys, size_t n,
+                       bool yield = false) const;
+
   /**
    * The low level callback interface is as follows:
    *
@@ -413,6 +430,20 @@ public:
   inline bool
   remove(const key_type &k, value_type *old_v = NULL);
 
+  typedef std::pair<key_type, value_type> bulk_entry_t;
+
+  /**
+   * Loads entries, which must be sorted by key (with no duplicates), into
+   * the tree. masstree nodes are not built directly: the entries are
+   * inserted in order, which its splits already pack (a leaf split at the
+   * right end of a layer moves only the new key), so fill_factor is
+   * ignored. See btree::bulk_load()
+   *
+   * NOT THREAD SAFE, and the tree must be empty
+   */
+  void bulk_load(const std::vector<bulk_entry_t> &entries,
+                 double fill_factor = 1.0);
+
   /**
    * The tree walk API is a bit strange, due to the optimistic nature of the
    * btree.
@@ -595,6 +626,49 @@ inline bool mbtree<P>::search(const key_type &k, value_type &v,
   return found;
 }
 
+template <typename P>
+void mbtree<P>::prefetch_search(const key_type *keys, size_t n,
+                                 bool yield) const
+{
+  rcu_region guard;
+  for (size_t base = 0; base < n; base += PrefetchSearchBatch) {
+    const size_t m = std::min(n - base, size_t(PrefetchSearchBatch));
+    const node_base_type *cur[PrefetchSearchBatch];
+    const node_base_type * const root = table_.root();
+    for (size_t i = 0; i < m; i++)
+      cur[i] = root;
+    bool more = true;
+    while (more) {
+      more = false;
+      // one level for every key: the nodes read here were prefetched by
+      // the previous round
+      for (size_t i = 0; i < m; i++) {
+        if (!cur[i])
+          continue;
+        const nodeversion_type version = cur[i]->stable();
+        if (version.isleaf()) {
+          cur[i] = nullptr;
+          continue;
+        }
+        const internode_type *in = static_cast<const internode_type *>(cur[i]);
+        typename internode_type::key_type ka(keys[base + i].data(),
+                                             keys[base + i].length());
+        const node_base_type *child =
+          in->child_[internode_type::bound_type::upper(ka, *in)];
+        if (unlikely(!child || in->has_changed(version))) {
+          cur[i] = nullptr;
+          continue;
+        }
+        child->prefetch_full();
+        cur[i] = child;
+        more = true;
+      }
+      if (yield && more)
+        coro::Yield();
+    }
+  }
+}
+
 template <typename P>
 inline bool mbtree<P>::insert(const key_type &k, value_type v,
                               value_type *old_v,
@@ -658,6 +732,23 @@ inline bool mbtree<P>::remove(const key_type &k, value_type *old_v)
   return found;
 }
 
+template <typename P>
+void mbtree<P>::bulk_load(const std::vector<bulk_entry_t> &entries,
+                          double fill_factor)
+{
+  ALWAYS_ASSERT(fill_factor > 0.0 && fill_factor <= 1.0);
+  rcu_region guard;
+  threadinfo ti;
+  for (auto &e : entries) {
+    Masstree::tcursor<P> lp(table_, e.first.data(), e.first.length());
+    const bool found = lp.find_insert(ti);
+    ALWAYS_ASSERT(!found);
+    ti.advance_timestamp(lp.node_timestamp());
+    lp.value() = e.second;
+    lp.finish(1, ti);
+  }
+}
+
 template <typename P>
 template <bool Reverse>
 class mbtree<P>::search_range_scanner_base {
@@ -138,10 +138,13 @@ static vector<uint64_t> g_database;
 static atomic<uint64_t> g_ntxns_committed(0);
 static atomic<uint64_t> g_ntxns_written(0);
 static atomic<uint64_t> g_bytes_written[g_nmax_loggers];
+static atomic<uint64_t> g_nios[g_nmax_loggers]; // writev() + sync rounds
+static atomic<uint64_t> g_io_us[g_nmax_loggers]; // spent in those
 
 static size_t g_nworkers = 1;
 static int g_verbose = 0;
 static int g_fsync_background = 0;
+static int g_device_stats = 0;
 static size_t g_readset = 30;
 static size_t g_writeset = 16;
 static size_t g_keysize = 8; // in bytes
@@ -608,7 +611,9 @@ private:
     one_way_post<int> *channel =
       g_fsync_background ? new one_way_post<int> : nullptr;
     uint64_t total_nbytes_written = 0,
-             total_txns_written = 0;
+             total_txns_written = 0,
+             total_nios = 0,
+             total_io_us = 0;
 
     bool sense = false; // cur is at sense, prev is at !sense
     uint64_t nbytes_written[2], txns_written[2], epoch_prefixes[2][g_nworkers];
@@ -677,6 +682,7 @@ private:
 
       //cerr << "writer " << id << " nwritten " << nwritten << endl;
 
+      util::timer io_timer;
       const ssize_t ret =
         nwritten ? writev(fd, &iovs[0], nwritten) : 0;
       if (ret == -1) {
@@ -700,6 +706,10 @@ private:
         }
         dosense = sense;
       }
+      if (nwritten) {
+        total_nios++;
+        total_io_us += io_timer.lap();
+      }
 
       // update metadata from previous write
       for (size_t i = 0; i < g_nworkers; i++) {
@@ -729,6 +739,8 @@ private:
     }
 
     g_bytes_written[id].store(total_nbytes_written, memory_order_release);
+    g_nios[id].store(total_nios, memory_order_release);
+    g_io_us[id].store(total_io_us, memory_order_release);
     g_ntxns_written.fetch_add(total_txns_written, memory_order_release);
   }
 
@@ -1075,6 +1087,7 @@ main(int argc, char **argv)
     {
       {"verbose"     , no_argument       , &g_verbose , 1}   ,
       {"fsync-back"  , no_argument       , &g_fsync_background, 1},
+      {"device-stats", no_argument       , &g_device_stats, 1},
       {"num-threads" , required_argument , 0          , 't'} ,
       {"strategy"    , required_argument , 0          , 's'} ,
       {"readset"     , required_argument , 0          , 'r'} ,
@@ -1217,5 +1230,18 @@ main(int argc, char **argv)
     cout << rate << endl;
   }
 
+  // one line per logfile: <MB/sec> <avg us per write + sync> <avg KB per
+  // write>, for scripts/calibrate.py
+  if (g_device_stats) {
+    for (size_t i = 0; i < logfiles.size(); i++) {
+      const double nbytes = g_bytes_written[i].load(memory_order_acquire);
+      const double nios = g_nios[i].load(memory_order_acquire);
+      const double io_us = g_io_us[i].load(memory_order_acquire);
+      cout << (nbytes / double(1UL << 20) / xsec) << " "
+           << (nios ? io_us / nios : 0.0) << " "
+           << (nios ? nbytes / 1024.0 / nios : 0.0) << endl;
+    }
+  }
+
   return 0;
 }
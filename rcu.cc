@@ -13,10 +13,13 @@
 #include "thread.h"
 #include "counter.h"
 #include "lockguard.h"
+#include "topology.h"
 
 using namespace std;
 using namespace util;
 
+uint64_t rcu::EpochTimeMultiplier = rcu::DefaultEpochTimeMultiplier;
+
 rcu rcu::s_instance;
 
 static event_counter evt_rcu_deletes("rcu_deletes");
@@ -287,11 +290,15 @@ rcu::pin_current_thread(size_t cpu)
 {
   sync &s = mysync();
   s.set_pin_cpu(cpu);
-  auto node = numa_node_of_cpu(cpu);
-  // pin to node
-  ALWAYS_ASSERT(!numa_run_on_node(node));
-  // is numa_run_on_node() guaranteed to take effect immediately?
-  ALWAYS_ASSERT(!sched_yield());
+  if (topology::GetPlacement() == topology::PLACEMENT_NODE) {
+    auto node = numa_node_of_cpu(cpu);
+    // pin to node
+    ALWAYS_ASSERT(!numa_run_on_node(node));
+    // is numa_run_on_node() guaranteed to take effect immediately?
+    ALWAYS_ASSERT(!sched_yield());
+  } else {
+    topology::PinCurrentThread(topology::CpuOfSlot(cpu));
+  }
   // release current thread-local cache back to allocator
   s.do_release();
 }
@@ -318,6 +325,13 @@ rcu::rcu()
   }
 }
 
+void
+rcu::SetEpochTimeMultiplier(uint64_t m)
+{
+  ALWAYS_ASSERT(m >= 1);
+  EpochTimeMultiplier = m;
+}
+
 struct rcu_stress_test_rec {
   uint64_t magic_;
   uint64_t counter_;
@@ -68,16 +68,29 @@ public:
   }
 
 #ifdef CHECK_INVARIANTS
-  static const uint64_t EpochTimeMultiplier = 10; /* 10 * 1 ms */
+  static const uint64_t DefaultEpochTimeMultiplier = 10; /* 10 * 1 ms */
 #else
-  static const uint64_t EpochTimeMultiplier = 25; /* 25 * 40 ms */
+  static const uint64_t DefaultEpochTimeMultiplier = 25; /* 25 * 40 ms */
 #endif
 
-  static_assert(EpochTimeMultiplier >= 1, "XX");
+  // ticks per RCU epoch. only SetEpochTimeMultiplier() changes it, which
+  // must happen before anything is freed through RCU
+  static uint64_t EpochTimeMultiplier;
+
+  static void SetEpochTimeMultiplier(uint64_t m);
 
   // legacy helpers
-  static const uint64_t EpochTimeUsec = ticker::tick_us * EpochTimeMultiplier;
-  static const uint64_t EpochTimeNsec = EpochTimeUsec * 1000;
+  static inline uint64_t
+  EpochTimeUsec()
+  {
+    return ticker::tick_us() * EpochTimeMultiplier;
+  }
+
+  static inline uint64_t
+  EpochTimeNsec()
+  {
+    return EpochTimeUsec() * 1000;
+  }
 
   static const size_t NQueueGroups = 32;
 
@@ -255,10 +268,10 @@ public:
 
   // pin the current thread to CPU.
   //
-  // this CPU number corresponds to the ones exposed by
-  // sched.h. note that we currently pin to the numa node
-  // associated with the cpu. memory allocation, however, is
-  // CPU-specific
+  // CPU is a slot of the current placement (see topology.h), which picks
+  // the cpu (as exposed by sched.h) the thread runs on. under the default
+  // placement the slot is the cpu, and we only pin to the numa node
+  // associated with it. memory allocation, however, is slot-specific
   void pin_current_thread(size_t cpu);
 
   void fault_region();
@@ -271,7 +284,7 @@ private:
 
   rcu(); // private ctor to enforce singleton
 
-  static inline uint64_t constexpr
+  static inline uint64_t
   to_rcu_ticks(uint64_t ticks)
   {
     return ticks / EpochTimeMultiplier;
@@ -6,6 +6,7 @@
 #include "serializer.h"
 #include "../util.h"
 #include "../ndb_type_traits.h"
+#include "../value_delta.h"
 
 #if NDB_MASSTREE
 #include "../masstree/str.hh"
@@ -79,6 +80,119 @@ Size(const T &t)
   return enc.nbytes(&t);
 }
 
+// field-level access to values (see the util::Fields masks, FIELDS()):
+// ProjectDecode() reads just the given fields of obj from buf, which needs
+// to hold the encoding through the last of them (ProjectMaxBytes() bytes of
+// it, as the max_bytes_read of a get()). the other fields are left as is
+template <typename T, uint64_t Mask>
+static inline const T *
+ProjectDecode(const std::string &buf, T &obj, util::Fields<Mask>)
+{
+  const encoder<T> enc;
+  return enc.project_read((const uint8_t *) buf.data(), &obj, Mask);
+}
+
+template <typename T, uint64_t Mask>
+static inline size_t
+ProjectMaxBytes(util::Fields<Mask>)
+{
+  static_assert(Mask, "no fields");
+  const encoder<T> enc;
+  return enc.encode_max_nbytes_prefix(64 - __builtin_clzll(Mask));
+}
+
+// EncodeDelta() writes to delta a value delta (see value_delta.h) which
+// takes the value encoded in old to obj, given that obj only differs from
+// it in the given fields. old needs to hold the encoding through the last of
+// them, and all of it if one of them changes its encoded size
+template <typename T, uint64_t Mask>
+static inline std::string &
+EncodeDelta(std::string &delta, const std::string &old, const T &obj,
+            util::Fields<Mask>)
+{
+  const encoder<T> enc;
+  return enc.write_delta(delta, old, &obj, Mask);
+}
+
+template <typename Descriptor>
+static inline void
+encode_project_read(const uint8_t *buf, uint8_t *obj, uint64_t fields)
+{
+  for (size_t i = 0; i < Descriptor::nfields() && (fields >> i); i++) {
+    const bool read = (fields >> i) & 1;
+#ifdef USE_VARINT_ENCODING
+    if (read)
+      buf = Descriptor::read_fn(i)(buf, obj + Descriptor::cstruct_offsetof(i));
+    else
+      buf += Descriptor::skip_fn(i)(buf, nullptr);
+#else
+    if (read)
+      NDB_MEMCPY(obj + Descriptor::cstruct_offsetof(i),
+                 buf + Descriptor::cstruct_offsetof(i),
+                 Descriptor::cstruct_sizeof(i));
+#endif
+  }
+}
+
+// one range per field, except that once a field changes its size, the rest
+// of the value is rewritten as a single range
+template <typename Descriptor>
+static inline std::string &
+encode_write_delta(std::string &delta, const uint8_t *old, size_t old_nbytes,
+                   const uint8_t *obj, uint64_t fields)
+{
+  value_delta::Init(delta);
+#ifdef USE_VARINT_ENCODING
+  size_t off = 0;
+  for (size_t i = 0; i < Descriptor::nfields() && (fields >> i); i++) {
+    const size_t old_sz = Descriptor::skip_fn(i)(old + off, nullptr);
+    if (!((fields >> i) & 1)) {
+      off += old_sz;
+      continue;
+    }
+    const uint8_t * const px = obj + Descriptor::cstruct_offsetof(i);
+    const size_t new_sz = Descriptor::nbytes_fn(i)(px);
+    if (likely(new_sz == old_sz)) {
+      Descriptor::write_fn(i)(value_delta::AddRange(delta, off, new_sz), px);
+      off += old_sz;
+      continue;
+    }
+    size_t tail_sz = 0, p = off;
+    for (size_t j = i; j < Descriptor::nfields(); j++) {
+      const size_t sz = Descriptor::skip_fn(j)(old + p, nullptr);
+      tail_sz += ((fields >> j) & 1) ?
+        Descriptor::nbytes_fn(j)(obj + Descriptor::cstruct_offsetof(j)) : sz;
+      p += sz;
+    }
+    INVARIANT(p == old_nbytes);
+    uint8_t *q = value_delta::AddRange(delta, off, tail_sz);
+    p = off;
+    for (size_t j = i; j < Descriptor::nfields(); j++) {
+      const size_t sz = Descriptor::skip_fn(j)(old + p, nullptr);
+      if ((fields >> j) & 1) {
+        q = Descriptor::write_fn(j)(q, obj + Descriptor::cstruct_offsetof(j));
+      } else {
+        NDB_MEMCPY(q, old + p, sz);
+        q += sz;
+      }
+      p += sz;
+    }
+    value_delta::SetNewSize(delta, off + tail_sz);
+    break;
+  }
+#else
+  for (size_t i = 0; i < Descriptor::nfields() && (fields >> i); i++) {
+    if (!((fields >> i) & 1))
+      continue;
+    const size_t off = Descriptor::cstruct_offsetof(i);
+    const size_t sz = Descriptor::cstruct_sizeof(i);
+    INVARIANT(off + sz <= old_nbytes);
+    NDB_MEMCPY(value_delta::AddRange(delta, off, sz), obj + off, sz);
+  }
+#endif
+  return delta;
+}
+
 #define IDENT_TRANSFORM(tpe, expr) (expr)
 #define HOST_TO_BIG_TRANSFORM(tpe, expr) (util::host_endian_trfm< tpe >()(expr))
 #define BIG_TO_HOST_TRANSFORM(tpe, expr) (util::big_endian_trfm< tpe >()(expr))
@@ -608,6 +722,20 @@ Size(const T &t)
     APPLY_X_AND_Y(valuefields, SERIALIZE_MAX_NBYTES_PREFIX_VALUE_FIELD_X) \
     return ret; \
   } \
+  inline ALWAYS_INLINE const struct name::value * \
+  project_read(const uint8_t *buf, struct name::value *obj, uint64_t fields) const \
+  { \
+    encode_project_read< name::value_descriptor >(buf, (uint8_t *) obj, fields); \
+    return obj; \
+  } \
+  inline std::string & \
+  write_delta(std::string &delta, const std::string &old, \
+              const struct name::value *obj, uint64_t fields) const \
+  { \
+    return encode_write_delta< name::value_descriptor >( \
+        delta, (const uint8_t *) old.data(), old.size(), \
+        (const uint8_t *) obj, fields); \
+  } \
   DO_STRUCT_COMMON(name::value) \
   DO_STRUCT_REST_VALUE(name::value) \
   };
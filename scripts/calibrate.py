@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+# Calibrates the log devices of a machine with persist_test.
+#
+# Each candidate log file is driven on its own, across thread counts, value
+# sizes (so write sizes) and logging strategies. Per device, this fits
+#
+#   peak MB/sec           the bandwidth it sustains, under --strategy
+#   io us = a + b * KB    the latency of one write + sync of KB bytes
+#
+# and writes a log config: one "<logfile> <weight> ..." line per device,
+# weighted by peak bandwidth. dbtest --log-config and runner.py's LOG_CONFIG
+# read it, and split the workers over the loggers by weight.
+#
+# Usage:
+#   python calibrate.py [options] out.logconf data.log /f0/data.log [...]
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+
+def parse_ints(s):
+  return [int(x) for x in s.split(',') if x]
+
+def run(cmd):
+  print >>sys.stderr, '[INFO] running command %s' % ' '.join(cmd)
+  p = subprocess.Popen(cmd, stdin=open('/dev/null', 'r'), stdout=subprocess.PIPE)
+  r = p.stdout.read()
+  if p.wait():
+    raise Exception('%s failed' % cmd[0])
+  return r
+
+def measure(args, logfiles, ncores, strategy, valuesize, assignments=None):
+  """
+  Returns (txns/sec, [(MB/sec, io us, io KB)] per logfile)
+  """
+  cmd = [args.persist_test] + \
+      list(itertools.chain.from_iterable([['--logfile', f] for f in logfiles])) + \
+      list(itertools.chain.from_iterable(
+        [['--assignment', ','.join(map(str, a))] for a in (assignments or [])])) + \
+      ['--num-threads', str(ncores),
+       '--strategy', strategy,
+       '--writeset', str(args.writeset),
+       '--valuesize', str(valuesize),
+       '--device-stats']
+  lines = run(cmd).strip().split('\n')
+  assert len(lines) == 1 + len(logfiles), 'unexpected output %r' % lines
+  devs = [tuple(map(float, l.split())) for l in lines[1:]]
+  return float(lines[0]), devs
+
+def fit_line(points):
+  """
+  Least squares y = a + b * x over [(x, y)]. b is 0 with fewer than two
+  distinct x
+  """
+  n = float(len(points))
+  mx = sum(x for x, _ in points) / n
+  my = sum(y for _, y in points) / n
+  sxx = sum((x - mx) ** 2 for x, _ in points)
+  if not sxx:
+    return my, 0.0
+  b = sum((x - mx) * (y - my) for x, y in points) / sxx
+  return my - b * mx, b
+
+# XXX: keep in sync with assign_by_weight() in benchmarks/dbtest.cc
+def assign_by_weight(weights, nworkers):
+  total = sum(weights)
+  shares = [w / total * nworkers for w in weights]
+  counts = [int(s) for s in shares]
+  order = sorted(xrange(len(weights)), key=lambda i: (-(shares[i] - counts[i]), i))
+  i = 0
+  while sum(counts) < nworkers:
+    counts[order[i % len(order)]] += 1
+    i += 1
+  ret, acc = [], 0
+  for c in counts:
+    ret.append(range(acc, acc + c))
+    acc += c
+  return ret
+
+def calibrate(args, logfile):
+  points = []
+  for strategy, ncores, valuesize in itertools.product(
+      args.strategies, args.threads, args.valuesizes):
+    rate, devs = measure(args, [logfile], ncores, strategy, valuesize)
+    mbps, io_us, io_kb = devs[0]
+    points.append({
+      'strategy'  : strategy,
+      'threads'   : ncores,
+      'valuesize' : valuesize,
+      'txns_sec'  : rate,
+      'mb_sec'    : mbps,
+      'io_us'     : io_us,
+      'io_kb'     : io_kb,
+    })
+  mine = [p for p in points if p['strategy'] == args.strategy]
+  a, b = fit_line([(p['io_kb'], p['io_us']) for p in mine if p['io_kb']])
+  return {
+    'logfile'   : logfile,
+    'peak_mb_sec' : max(p['mb_sec'] for p in mine),
+    'io_us_fixed' : a,
+    'io_us_per_kb' : b,
+    'points'    : points,
+  }
+
+def write_config(args, fname, devices, weights):
+  with open(fname, 'w') as fp:
+    print >>fp, '# log config written by scripts/calibrate.py on %s, %s' % \
+        (platform.node(), time.strftime('%Y-%m-%d %H:%M:%S'))
+    print >>fp, '# strategy %s, writeset %d' % (args.strategy, args.writeset)
+    print >>fp, '# logfile weight peak_mb_sec io_us_fixed io_us_per_kb'
+    for d, w in zip(devices, weights):
+      print >>fp, '%s %.6f %.2f %.2f %.4f' % \
+          (d['logfile'], w, d['peak_mb_sec'], d['io_us_fixed'], d['io_us_per_kb'])
+    print >>fp, '#'
+    print >>fp, '# worker assignments, as dbtest --log-config derives them:'
+    for ncores in args.threads:
+      print >>fp, '#   %d threads: %s' % (ncores, ' '.join(
+          ('%d-%d' % (a[0], a[-1]) if len(a) > 1 else str(a[0])) if a else '-'
+          for a in assign_by_weight(weights, ncores)))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+      description='calibrate log devices with persist_test')
+  parser.add_argument('outfile', help='log config to write')
+  parser.add_argument('logfiles', nargs='+', help='one log file per device')
+  parser.add_argument('--persist-test', default='./persist_test')
+  parser.add_argument('--threads', type=parse_ints, default=[1, 2, 4, 8, 16, 24, 32])
+  parser.add_argument('--valuesizes', type=parse_ints, default=[32, 128, 512, 2048])
+  parser.add_argument('--writeset', type=int, default=18)
+  parser.add_argument('--strategies', type=lambda s: s.split(','),
+                      default=['epoch', 'epoch-compress'])
+  parser.add_argument('--strategy', default='epoch',
+                      help='the strategy the weights are fit for')
+  parser.add_argument('--raw', help='also dump every measurement (json)')
+  parser.add_argument('--verify', action='store_true',
+                      help='compare the weighted assignment with an even one, on all devices at once')
+  args = parser.parse_args()
+  if args.strategy not in args.strategies:
+    parser.error('--strategy must be one of --strategies')
+
+  devices = [calibrate(args, f) for f in args.logfiles]
+  total = sum(d['peak_mb_sec'] for d in devices)
+  weights = [d['peak_mb_sec'] / total for d in devices]
+  write_config(args, args.outfile, devices, weights)
+  if args.raw:
+    with open(args.raw, 'w') as fp:
+      json.dump(devices, fp, indent=2)
+
+  if args.verify:
+    ncores = max(args.threads)
+    for label, w in (('weighted', weights), ('even', [1.] * len(weights))):
+      assignments = [a for a in assign_by_weight(w, ncores) if a]
+      logfiles = [f for f, a in zip(args.logfiles, assign_by_weight(w, ncores)) if a]
+      rate, _ = measure(args, logfiles, ncores, args.strategy,
+                        args.valuesizes[0], assignments)
+      print >>sys.stderr, '[INFO] %s assignment, %d threads: %f txns/sec' % \
+          (label, ncores, rate)
+  print >>sys.stderr, '[INFO] wrote %s' % args.outfile
@@ -60,7 +60,12 @@ def run(cmd):
   return r
 
 if __name__ == '__main__':
-  (_, outfile) = sys.argv
+  # the loggers come from a log config (see calibrate.py) if one is given
+  if len(sys.argv) == 3:
+    (_, outfile, log_config) = sys.argv
+  else:
+    (_, outfile) = sys.argv
+    log_config = None
 
   STRATEGIES = ['epoch', 'epoch-compress']
   NCORES = [1, 2, 4, 8, 16, 24, 32]
@@ -72,7 +77,14 @@ if __name__ == '__main__':
 
   node = platform.node()
 
-  if node == 'modis2':
+  if log_config:
+    LOGGERS = []
+    with open(log_config, 'r') as fp:
+      for line in fp:
+        toks = line.split('#')[0].split()
+        if toks:
+          LOGGERS.append((toks[0], float(toks[1])))
+  elif node == 'modis2':
     LOGGERS = [
         ('data.log', 1.),
         ('/data/scidb/001/2/stephentu/data.log', 1.),
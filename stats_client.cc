@@ -3,13 +3,24 @@
  *
  * stand-alone client to poll a stats server
  *
+ * by default, polls the server for a snapshot of every counter in the
+ * counterspec (one request per poll). with --subscribe, the server pushes
+ * snapshots instead, and count/sum are deltas since the previous push
+ * (except for the first push, and the first one after the counters were
+ * reset: the delta column tells them apart).
+ *
+ * counterspec is a ':' separated list of counter names. a name ending in
+ * '*' matches every counter with that prefix (quote it from the shell)
+ *
  */
 
 #include <iostream>
+#include <map>
 #include <string>
 #include <system_error>
 #include <thread>
 
+#include <getopt.h>
 #include <unistd.h>
 #include <sys/socket.h>
 #include <sys/un.h>
@@ -21,16 +32,81 @@
 using namespace std;
 using namespace util;
 
+static void
+print_snapshot(const get_counter_values_t &hdr,
+               const map<string, counter_data> &snapshot,
+               bool csv)
+{
+  const bool delta = hdr.flags_ & get_counter_values_t::FLAG_DELTA;
+  if (hdr.flags_ & get_counter_values_t::FLAG_TRUNCATED)
+    cerr << "[WARNING] snapshot truncated, narrow the counterspec" << endl;
+  for (auto &p : snapshot) {
+    if (csv)
+      cout << hdr.timestamp_us_ << ","
+           << p.first           << ","
+           << delta             << ","
+           << p.second.count_   << ","
+           << p.second.sum_     << ","
+           << p.second.max_     << "\n";
+    else
+      cout << p.first           << " "
+           << hdr.timestamp_us_ << " "
+           << p.second.count_   << " "
+           << p.second.sum_     << " "
+           << p.second.max_     << "\n";
+  }
+  cout.flush();
+}
+
 int
 main(int argc, char **argv)
 {
-  if (argc != 3) {
-    cerr << "[usage] " << argv[0] << " sockfile counterspec" << endl;
+  uint64_t interval_us = 1000;
+  int subscribe = 0;
+  int csv = 0;
+  while (1) {
+    static struct option long_options[] =
+    {
+      {"interval-us" , required_argument , 0          , 'i'} ,
+      {"subscribe"   , no_argument       , &subscribe , 1}   ,
+      {"csv"         , no_argument       , &csv       , 1}   ,
+      {0, 0, 0, 0}
+    };
+    int option_index = 0;
+    int c = getopt_long(argc, argv, "i:", long_options, &option_index);
+    if (c == -1)
+      break;
+
+    switch (c) {
+    case 0:
+      if (long_options[option_index].flag != 0)
+        break;
+      abort();
+      break;
+
+    case 'i':
+      interval_us = strtoul(optarg, NULL, 10);
+      ALWAYS_ASSERT(interval_us > 0);
+      break;
+
+    case '?':
+      /* getopt_long already printed an error message. */
+      exit(1);
+
+    default:
+      abort();
+    }
+  }
+
+  if (argc - optind != 2) {
+    cerr << "[usage] " << argv[0]
+         << " [--interval-us N] [--subscribe] [--csv] sockfile counterspec"
+         << endl;
     return 1;
   }
 
-  const string sockfile(argv[1]);
-  const vector<string> counter_names = split(argv[2], ':');
+  const string sockfile(argv[optind]);
+  const string counterspec(argv[optind + 1]);
 
   int fd = socket(AF_UNIX, SOCK_STREAM, 0);
   if (fd < 0)
@@ -47,42 +123,61 @@ main(int argc, char **argv)
     throw system_error(errno, system_category(),
         "connecting to socket");
 
+  if (csv)
+    cout << "timestamp_us,counter,delta,count,sum,max" << endl;
+
+  string req;
+  if (subscribe) {
+    subscribe_t s;
+    s.interval_us_ = interval_us;
+    req.push_back((char) stats_command::SUBSCRIBE);
+    req.append((const char *) &s, sizeof(s));
+  } else {
+    req.push_back((char) stats_command::GET_COUNTER_VALUES);
+  }
+  req.append(counterspec);
+
   packet pkt;
   int r;
+  pkt.assign(req);
+  if (subscribe && (r = pkt.sendpkt(fd))) {
+    perror("send - disconnecting");
+    return 1;
+  }
+
+  get_counter_values_t hdr;
+  map<string, counter_data> snapshot;
   timer loop_timer;
   for (;;) {
-    for (auto &name : counter_names) {
-      uint8_t buf[1 + name.size()];
-      buf[0] = (uint8_t) stats_command::GET_COUNTER_VALUE;
-      memcpy(&buf[1], name.data(), name.size());
-      pkt.assign((const char *) &buf[0], sizeof(buf));
+    if (!subscribe) {
+      pkt.assign(req);
       if ((r = pkt.sendpkt(fd))) {
         perror("send - disconnecting");
         return 1;
       }
-      if ((r = pkt.recvpkt(fd))) {
-        if (r == EOF)
-          return 0;
-        perror("recv - disconnecting");
-        return 1;
-      }
-      const get_counter_value_t *resp = (const get_counter_value_t *) pkt.data();
-      cout << name                << " "
-           << resp->timestamp_us_ << " "
-           << resp->d_.count_     << " "
-           << resp->d_.sum_       << " "
-           << resp->d_.max_       << endl;
     }
+    if ((r = pkt.recvpkt(fd))) {
+      if (r == EOF)
+        return 0;
+      perror("recv - disconnecting");
+      return 1;
+    }
+    if (!get_counter_values_t::decode(pkt.data(), pkt.size(), hdr, snapshot)) {
+      cerr << "bad snapshot packet - disconnecting" << endl;
+      return 1;
+    }
+    print_snapshot(hdr, snapshot, csv);
 
-    const uint64_t last_loop_usec  = loop_timer.lap();
-    //const uint64_t delay_time_usec = 1000000;
-    const uint64_t delay_time_usec = 1000000/1000;
-    if (last_loop_usec < delay_time_usec) {
-      const uint64_t sleep_ns = (delay_time_usec - last_loop_usec) * 1000;
+    if (subscribe)
+      continue;
+    const uint64_t last_loop_usec = loop_timer.lap();
+    if (last_loop_usec < interval_us) {
+      const uint64_t sleep_ns = (interval_us - last_loop_usec) * 1000;
       struct timespec t;
       t.tv_sec  = sleep_ns / ONE_SECOND_NS;
       t.tv_nsec = sleep_ns % ONE_SECOND_NS;
       nanosleep(&t, nullptr);
+      loop_timer.lap();
     }
   }
 
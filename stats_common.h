@@ -4,13 +4,68 @@
 #include "macros.h"
 #include "fileutils.h"
 
-enum class stats_command : uint8_t { GET_COUNTER_VALUE = 0x1 };
+#include <map>
+#include <string>
+
+enum class stats_command : uint8_t {
+  GET_COUNTER_VALUE = 0x1,
+
+  // request: the command byte followed by a counterspec (counter names
+  // separated by ':', a name ending in '*' matches by prefix). response:
+  // one get_counter_values_t
+  GET_COUNTER_VALUES = 0x2,
+
+  // request: the command byte, a subscribe_t, then a counterspec. the server
+  // then pushes a get_counter_values_t every interval_us_ until the client
+  // disconnects; the connection takes no other command after this one. the
+  // first push holds absolute values, every push after that holds deltas
+  // (max_ is always absolute), except that the first push after the
+  // counters are reset holds absolute values again (no FLAG_DELTA): clients
+  // restart their totals from it
+  SUBSCRIBE = 0x3,
+};
 
 struct get_counter_value_t {
   uint64_t timestamp_us_; // usec
   counter_data d_;
 };
 
+struct subscribe_t {
+  // shorter intervals are served at this one
+  static const uint64_t MinIntervalUs = 1000;
+
+  uint64_t interval_us_;
+};
+
+// a snapshot of several counters, all taken at timestamp_us_. on the wire,
+// the header is followed by n_ entries of the form:
+//   [counter_value_entry_t][name (namelen_ bytes)]
+struct get_counter_values_t {
+  static const uint32_t FLAG_DELTA     = 0x1;
+  static const uint32_t FLAG_TRUNCATED = 0x2; // did not fit in one packet
+
+  uint64_t timestamp_us_; // usec
+  uint32_t n_;
+  uint32_t flags_;
+
+  struct counter_value_entry_t {
+    counter_data d_;
+    uint32_t namelen_;
+  };
+
+  // encodes snapshot into buf, dropping whatever does not fit in a packet
+  static void encode(std::string &buf,
+                     uint64_t timestamp_us,
+                     uint32_t flags,
+                     const std::map<std::string, counter_data> &snapshot);
+
+  // decodes a packet payload produced by encode(). returns false if the
+  // payload is malformed
+  static bool decode(const char *p, size_t n,
+                     get_counter_values_t &hdr,
+                     std::map<std::string, counter_data> &snapshot);
+};
+
 class packet {
 public:
   static const size_t MAX_DATA = 0xFFFF - 4;
@@ -61,3 +116,59 @@ private:
   uint32_t size_;
   char data_[MAX_DATA];
 };
+
+inline void
+get_counter_values_t::encode(
+    std::string &buf,
+    uint64_t timestamp_us,
+    uint32_t flags,
+    const std::map<std::string, counter_data> &snapshot)
+{
+  get_counter_values_t hdr;
+  hdr.timestamp_us_ = timestamp_us;
+  hdr.n_ = 0;
+  hdr.flags_ = flags;
+  buf.assign(sizeof(hdr), '\0');
+  for (auto &p : snapshot) {
+    if (buf.size() + sizeof(counter_value_entry_t) + p.first.size() >
+        packet::MAX_DATA) {
+      hdr.flags_ |= FLAG_TRUNCATED;
+      break;
+    }
+    counter_value_entry_t e;
+    e.d_ = p.second;
+    e.namelen_ = p.first.size();
+    buf.append((const char *) &e, sizeof(e));
+    buf.append(p.first);
+    hdr.n_++;
+  }
+  NDB_MEMCPY(&buf[0], &hdr, sizeof(hdr));
+}
+
+inline bool
+get_counter_values_t::decode(
+    const char *p, size_t n,
+    get_counter_values_t &hdr,
+    std::map<std::string, counter_data> &snapshot)
+{
+  snapshot.clear();
+  if (n < sizeof(hdr))
+    return false;
+  NDB_MEMCPY(&hdr, p, sizeof(hdr));
+  p += sizeof(hdr);
+  n -= sizeof(hdr);
+  for (uint32_t i = 0; i < hdr.n_; i++) {
+    counter_value_entry_t e;
+    if (n < sizeof(e))
+      return false;
+    NDB_MEMCPY(&e, p, sizeof(e));
+    p += sizeof(e);
+    n -= sizeof(e);
+    if (n < e.namelen_)
+      return false;
+    snapshot[std::string(p, e.namelen_)] = e.d_;
+    p += e.namelen_;
+    n -= e.namelen_;
+  }
+  return true;
+}
@@ -1,6 +1,7 @@
 #include <system_error>
 #include <thread>
 
+#include <signal.h>
 #include <unistd.h>
 #include <sys/socket.h>
 #include <sys/un.h>
@@ -18,6 +19,10 @@ stats_server::stats_server(const string &sockfile)
 void
 stats_server::serve_forever()
 {
+  // a client which goes away fails our writes with EPIPE, instead of
+  // killing the process
+  signal(SIGPIPE, SIG_IGN);
+
   int fd = socket(AF_UNIX, SOCK_STREAM, 0);
   if (fd < 0)
     throw system_error(errno, system_category(),
@@ -59,6 +64,78 @@ stats_server::handle_cmd_get_counter_value(const string &name, packet &pkt)
   return true;
 }
 
+bool
+stats_server::handle_cmd_get_counter_values(const string &spec, packet &pkt)
+{
+  string buf;
+  const uint64_t now = timer::cur_usec();
+  get_counter_values_t::encode(
+      buf, now, 0, event_counter::get_counters(split(spec, ':')));
+  pkt.assign(buf);
+  return true;
+}
+
+void
+stats_server::handle_cmd_subscribe(
+    int fd, uint64_t interval_us, const string &spec)
+{
+  if (interval_us < subscribe_t::MinIntervalUs)
+    interval_us = subscribe_t::MinIntervalUs;
+  const vector<string> specs = split(spec, ':');
+  map<string, counter_data> last, delta;
+  packet pkt;
+  string buf;
+  bool first = true;
+  timer loop_timer;
+  for (;;) {
+    const uint64_t now = timer::cur_usec();
+    map<string, counter_data> cur = event_counter::get_counters(specs);
+    // counters only go backwards across reset_all_counters(), after which
+    // the client gets absolute values again
+    bool absolute = first;
+    for (auto it = cur.begin(); !absolute && it != cur.end(); ++it) {
+      auto l = last.find(it->first);
+      absolute = l != last.end() &&
+        (it->second.count_ < l->second.count_ ||
+         it->second.sum_ < l->second.sum_);
+    }
+    if (!absolute) {
+      // a counter missing from last counted from zero
+      delta = cur;
+      for (auto &p : delta) {
+        auto it = last.find(p.first);
+        if (it == last.end())
+          continue;
+        p.second.count_ -= it->second.count_;
+        p.second.sum_   -= it->second.sum_;
+      }
+    }
+    get_counter_values_t::encode(
+        buf, now, absolute ? 0 : get_counter_values_t::FLAG_DELTA,
+        absolute ? cur : delta);
+    pkt.assign(buf);
+    if (pkt.sendpkt(fd)) {
+      if (errno == EPIPE || errno == ECONNRESET)
+        cerr << "subscriber disconnected" << endl;
+      else
+        perror("send- dropping subscriber");
+      return;
+    }
+    last.swap(cur);
+    first = false;
+
+    const uint64_t last_loop_usec = loop_timer.lap();
+    if (last_loop_usec < interval_us) {
+      const uint64_t sleep_ns = (interval_us - last_loop_usec) * 1000;
+      struct timespec t;
+      t.tv_sec  = sleep_ns / ONE_SECOND_NS;
+      t.tv_nsec = sleep_ns % ONE_SECOND_NS;
+      nanosleep(&t, nullptr);
+      loop_timer.lap();
+    }
+  }
+}
+
 void
 stats_server::serve_client(int fd)
 {
@@ -86,6 +163,29 @@ stats_server::serve_client(int fd)
         pkt.sendpkt(fd);
         break;
       }
+    case static_cast<uint8_t>(stats_command::GET_COUNTER_VALUES):
+      {
+        scratch.assign(pkt.data() + 1, pkt.size() - 1);
+        if (!handle_cmd_get_counter_values(scratch, pkt)) {
+          cerr << "error on handle_cmd_get_counter_values(), dropping" << endl;
+          return;
+        }
+        pkt.sendpkt(fd);
+        break;
+      }
+    case static_cast<uint8_t>(stats_command::SUBSCRIBE):
+      {
+        subscribe_t req;
+        if (pkt.size() < 1 + sizeof(req)) {
+          cerr << "bad subscribe request- dropping connection" << endl;
+          return;
+        }
+        memcpy(&req, pkt.data() + 1, sizeof(req));
+        scratch.assign(pkt.data() + 1 + sizeof(req),
+                       pkt.size() - 1 - sizeof(req));
+        handle_cmd_subscribe(fd, req.interval_us_, scratch);
+        return;
+      }
     default:
       cerr << "bad command- dropping connection" << endl;
       return;
@@ -10,6 +10,10 @@ public:
   void serve_forever(); // blocks current thread
 private:
   bool handle_cmd_get_counter_value(const std::string &name, packet &pkt);
+  bool handle_cmd_get_counter_values(const std::string &spec, packet &pkt);
+  // pushes snapshots to fd until the client goes away
+  void handle_cmd_subscribe(int fd, uint64_t interval_us,
+                            const std::string &spec);
   void serve_client(int fd);
   std::string sockfile_;
 };
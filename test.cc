@@ -1,8 +1,10 @@
 #include <iostream>
+#include <fstream>
 #include <functional>
 #include <unordered_map>
 #include <tuple>
 #include <set>
+#include <cmath>
 #include <unistd.h>
 
 #include "circbuf.h"
@@ -17,6 +19,9 @@
 #include "small_unordered_map.h"
 #include "static_unordered_map.h"
 #include "counter.h"
+#include "histogram.h"
+#include "log_writer.h"
+#include "coro.h"
 #include "record/encoder.h"
 #include "record/inline_str.h"
 #include "record/cursor.h"
@@ -61,6 +66,16 @@ namespace varkeytest {
     ALWAYS_ASSERT(s0.size() == 8);
     const char e0[] = { 0, 0, 0, 0, 0, 0, 0, 1 };
     ALWAYS_ASSERT(memcmp(s0.data(), &e0[0], 8) == 0);
+
+    // int_varkey's bytes are u64_varkey's, word by word, and order as the
+    // words do
+    const uint64_t k0[] = { 1, 0xff00000000000000UL };
+    const uint64_t k1[] = { 2, 0 };
+    const int_varkey ik0(&k0[0], 2), ik1(&k1[0], 2), ik2(&k0[0], 1);
+    ALWAYS_ASSERT(ik0.size() == 16);
+    ALWAYS_ASSERT(ik0.str() == s0 + u64_varkey(k0[1]).str());
+    ALWAYS_ASSERT(ik2 == u64_varkey(1));
+    ALWAYS_ASSERT(ik0 < ik1);
     cout << "varkey test passed" << endl;
   }
 }
@@ -253,6 +268,142 @@ CounterTest()
 #endif
 }
 
+// both backends must leave the same log in the file (the aio one pads it
+// with zeros)
+void
+LogWriterTest()
+{
+  const string fnames[] = {"/tmp/silo_test_posix.log", "/tmp/silo_test_aio.log"};
+  const log_writer::backend backends[] =
+    {log_writer::BACKEND_POSIX, log_writer::BACKEND_AIO};
+  fast_random r(9084398309893UL);
+  string expected;
+  vector<string> bufs;
+  vector<vector<iovec>> writes;
+  for (size_t i = 0; i < 50; i++) {
+    // some writes span several aio chunks
+    const size_t nbufs = 1 + r.next() % 8;
+    const size_t maxlen = (i % 10) ? 5000 : aio_log_writer::ChunkSize;
+    for (size_t j = 0; j < nbufs; j++)
+      bufs.push_back(r.next_string(1 + r.next() % maxlen));
+  }
+  size_t b = 0;
+  while (b < bufs.size()) {
+    const size_t nbufs = min(bufs.size() - b, size_t(1 + r.next() % 8));
+    vector<iovec> iovs;
+    for (size_t j = b; j < b + nbufs; j++) {
+      iovs.push_back({(void *) bufs[j].data(), bufs[j].size()});
+      expected += bufs[j];
+    }
+    writes.push_back(iovs);
+    b += nbufs;
+  }
+  for (size_t i = 0; i < ARRAY_NELEMS(backends); i++) {
+    log_writer *w = log_writer::Make(backends[i], fnames[i], true);
+    for (auto &iovs : writes) {
+      size_t nbytes = 0;
+      for (auto &iov : iovs)
+        nbytes += iov.iov_len;
+      w->write(&iovs[0], iovs.size(), nbytes);
+    }
+    delete w;
+    ifstream in(fnames[i].c_str(), ios::binary);
+    const string contents(
+        (istreambuf_iterator<char>(in)), istreambuf_iterator<char>());
+    ALWAYS_ASSERT(contents.size() >= expected.size());
+    ALWAYS_ASSERT(contents.compare(0, expected.size(), expected) == 0);
+    for (size_t j = expected.size(); j < contents.size(); j++)
+      ALWAYS_ASSERT(!contents[j]);
+    unlink(fnames[i].c_str());
+  }
+  cout << "log writer test passed" << endl;
+}
+
+void
+CoroTest()
+{
+  ALWAYS_ASSERT(!coro::Active());
+  coro::Yield(); // a no-op outside of RunAll()
+
+  // coroutine i yields i times: they run round robin, skipping the ones
+  // which are done, and exceptions stay within their coroutine
+  vector<int> order;
+  vector<coro::fn_t> fns;
+  for (int i = 0; i < 4; i++)
+    fns.push_back([i, &order]() {
+      ALWAYS_ASSERT(coro::Active());
+      for (int j = 0; j <= i; j++) {
+        order.push_back(i);
+        try {
+          throw runtime_error("caught");
+        } catch (runtime_error &) {
+        }
+        coro::Yield();
+      }
+    });
+  coro::RunAll(fns);
+  ALWAYS_ASSERT(!coro::Active());
+  ALWAYS_ASSERT(order == vector<int>({0, 1, 2, 3, 1, 2, 3, 2, 3, 3}));
+
+  // deep stacks
+  size_t n = 0;
+  function<void(size_t)> recurse = [&n, &recurse](size_t depth) {
+    char buf[1024];
+    NDB_MEMSET(buf, depth, sizeof(buf));
+    n += buf[depth % sizeof(buf)] == char(depth);
+    if (depth)
+      recurse(depth - 1);
+    else
+      coro::Yield();
+  };
+  fns.assign(2, [&recurse]() { recurse(256); });
+  coro::RunAll(fns);
+  ALWAYS_ASSERT(n == 2 * 257);
+  cout << "coro test passed" << endl;
+}
+
+void
+HistogramTest()
+{
+  log_histogram h;
+  ALWAYS_ASSERT(h.percentile(50.0) == 0);
+  for (uint64_t v = 0; v < 16; v++)
+    ALWAYS_ASSERT(log_histogram::bucket_of(v) == v);
+  for (size_t i = 0; i + 1 < log_histogram::NBuckets; i++) {
+    const uint64_t lo = log_histogram::bucket_low(i);
+    const uint64_t w = log_histogram::bucket_width(i);
+    ALWAYS_ASSERT(log_histogram::bucket_of(lo) == i);
+    ALWAYS_ASSERT(log_histogram::bucket_of(lo + w - 1) == i);
+    ALWAYS_ASSERT(log_histogram::bucket_low(i + 1) == lo + w);
+  }
+  ALWAYS_ASSERT(log_histogram::bucket_of(numeric_limits<uint64_t>::max()) ==
+                log_histogram::NBuckets - 1);
+
+  // 1..1000: percentiles are within the bucket error of the exact answer
+  log_histogram a, b;
+  for (uint64_t v = 1; v <= 1000; v++)
+    (v % 2 ? a : b).add(v);
+  a += b;
+  ALWAYS_ASSERT(a.count() == 1000);
+  ALWAYS_ASSERT(a.max() == 1000);
+  const double ps[] = {50.0, 95.0, 99.0, 99.9};
+  for (auto p : ps) {
+    const double exact = p * 10.0;
+    const double got = a.percentile(p);
+    ALWAYS_ASSERT(fabs(got - exact) <= exact / log_histogram::NSubBuckets);
+  }
+  ALWAYS_ASSERT(a.percentile(100.0) == 1000);
+
+  // weighted adds
+  log_histogram c;
+  c.add(10, 99);
+  c.add(5000, 1);
+  ALWAYS_ASSERT(c.percentile(99.0) == 10);
+  ALWAYS_ASSERT(c.percentile(99.9) >= 5000 - 5000 / log_histogram::NSubBuckets);
+
+  cout << "histogram test passed" << endl;
+}
+
 void
 UtilTest()
 {
@@ -970,6 +1121,9 @@ public:
     cerr << "PID: " << getpid() << endl;
 
     CircbufTest();
+    HistogramTest();
+    LogWriterTest();
+    CoroTest();
 
     // initialize the numa allocator subsystem with the number of CPUs running
     // + reasonable size per core
@@ -977,7 +1131,7 @@ public:
 #ifdef PROTO2_CAN_DISABLE_GC
     transaction_proto2_static::InitGC();
 #endif
-    //varkeytest::Test();
+    varkeytest::Test();
     //pxqueuetest::Test();
     //CounterTest();
     //UtilTest();
@@ -1,3 +1,24 @@
+#include <pthread.h>
+#include <sched.h>
+
 #include "ticker.h"
 
+std::atomic<uint64_t> ticker::s_tick_us(ticker::DefaultTickUs);
+
+void
+ticker::SetTickUs(uint64_t us)
+{
+  ALWAYS_ASSERT(us > 0);
+  s_tick_us.store(us, std::memory_order_relaxed);
+}
+
+void
+ticker::pin_thread(unsigned cpu)
+{
+  cpu_set_t s;
+  CPU_ZERO(&s);
+  CPU_SET(cpu, &s);
+  ALWAYS_ASSERT(!pthread_setaffinity_np(thread_, sizeof(s), &s));
+}
+
 ticker ticker::s_instance;
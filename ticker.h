@@ -13,18 +13,51 @@ class ticker {
 public:
 
 #ifdef CHECK_INVARIANTS
-  static const uint64_t tick_us = 1 * 1000; /* 1 ms */
+  static const uint64_t DefaultTickUs = 1 * 1000; /* 1 ms */
 #else
-  static const uint64_t tick_us = 40 * 1000; /* 40 ms */
+  static const uint64_t DefaultTickUs = 40 * 1000; /* 40 ms */
 #endif
 
+  // length of a tick (the persistence epoch). SetTickUs() takes effect from
+  // the next tick on
+  static inline uint64_t
+  tick_us()
+  {
+    return s_tick_us.load(std::memory_order_relaxed);
+  }
+
+  static void SetTickUs(uint64_t us);
+
+  // how long advancing the tick waited for one core: the ticker bumps the
+  // tick, then takes each core's lock which is still on the previous tick,
+  // so a core in a long RCU region holds up the whole system
+  struct lag_stats {
+    std::atomic<uint64_t> nwaits_; // ticks which actually waited on this core
+    std::atomic<uint64_t> total_us_;
+    std::atomic<uint64_t> max_us_;
+
+    lag_stats() : nwaits_(0), total_us_(0), max_us_(0) {}
+
+    void
+    reset()
+    {
+      nwaits_.store(0, std::memory_order_relaxed);
+      total_us_.store(0, std::memory_order_relaxed);
+      max_us_.store(0, std::memory_order_relaxed);
+    }
+  };
+
   ticker()
     : current_tick_(1), last_tick_inclusive_(0)
   {
     std::thread thd(&ticker::tickerloop, this);
+    thread_ = thd.native_handle();
     thd.detach();
   }
 
+  // restricts the ticker thread to cpu (see topology::AuxCpu())
+  void pin_thread(unsigned cpu);
+
   inline uint64_t
   global_current_tick() const
   {
@@ -82,6 +115,29 @@ public:
     return ticks_[core_id].lock_;
   }
 
+  inline const lag_stats &
+  core_lag(uint64_t core_id) const
+  {
+    INVARIANT(core_id < lags_.size());
+    return lags_[core_id];
+  }
+
+  // from bumping the tick until no core is left on the previous one. its
+  // nwaits_ counts every tick, including the ones which did not wait
+  inline const lag_stats &
+  advance_lag() const
+  {
+    return advance_lag_;
+  }
+
+  void
+  reset_lag_stats()
+  {
+    for (size_t i = 0; i < lags_.size(); i++)
+      lags_[i].reset();
+    advance_lag_.reset();
+  }
+
   // a guard is re-entrant within a single thread
   class guard {
   public:
@@ -186,7 +242,7 @@ private:
     for (;;) {
 
       const uint64_t last_loop_usec = loop_timer.lap();
-      const uint64_t delay_time_usec = tick_us;
+      const uint64_t delay_time_usec = tick_us();
       if (last_loop_usec < delay_time_usec) {
         const uint64_t sleep_ns = (delay_time_usec - last_loop_usec) * 1000;
         t.tv_sec  = sleep_ns / ONE_SECOND_NS;
@@ -199,6 +255,7 @@ private:
       // XXX: ignore overflow
       const uint64_t last_tick = util::non_atomic_fetch_add(current_tick_, 1UL);
       const uint64_t cur_tick  = last_tick + 1;
+      const uint64_t bump_us = util::timer::cur_usec();
 
       // wait for all threads to finish the last tick
       for (size_t i = 0; i < ticks_.size(); i++) {
@@ -209,14 +266,33 @@ private:
                   thread_cur_tick == cur_tick);
         if (thread_cur_tick == cur_tick)
           continue;
-        lock_guard<spinlock> lg(ti.lock_);
+        // an idle core (not in a guard) is not holding up the tick
+        if (!ti.lock_.try_lock()) {
+          const uint64_t wait_start_us = util::timer::cur_usec();
+          ti.lock_.lock();
+          record_lag(lags_[i], util::timer::cur_usec() - wait_start_us);
+        }
         ti.current_tick_.store(cur_tick, std::memory_order_release);
+        ti.lock_.unlock();
       }
 
       last_tick_inclusive_.store(last_tick, std::memory_order_release);
+      record_lag(advance_lag_, util::timer::cur_usec() - bump_us);
     }
   }
 
+  // only called by the ticker thread
+  static inline void
+  record_lag(lag_stats &l, uint64_t us)
+  {
+    l.nwaits_.store(l.nwaits_.load(std::memory_order_relaxed) + 1,
+                    std::memory_order_relaxed);
+    l.total_us_.store(l.total_us_.load(std::memory_order_relaxed) + us,
+                      std::memory_order_relaxed);
+    if (us > l.max_us_.load(std::memory_order_relaxed))
+      l.max_us_.store(us, std::memory_order_relaxed);
+  }
+
   struct tickinfo {
     spinlock lock_; // guards current_tick_ and depth_
 
@@ -233,9 +309,15 @@ private:
   };
 
   percore<tickinfo> ticks_;
+  percore<lag_stats> lags_; // only written by the ticker thread
+  lag_stats advance_lag_;
+
+  static std::atomic<uint64_t> s_tick_us;
 
   std::atomic<uint64_t> current_tick_; // which tick are we currenlty on?
   std::atomic<uint64_t> last_tick_inclusive_;
     // all threads have *completed* ticks <= last_tick_inclusive_
     // (< current_tick_)
+
+  std::thread::native_handle_type thread_; // runs tickerloop(), never exits
 };
@@ -0,0 +1,205 @@
+#include <sched.h>
+#include <numa.h>
+#include <algorithm>
+#include <fstream>
+#include <map>
+#include <set>
+#include <sstream>
+#include <tuple>
+
+#include "topology.h"
+
+using namespace std;
+
+topology::placement topology::s_placement = topology::PLACEMENT_NODE;
+size_t topology::s_nworkers = 0;
+vector<unsigned> topology::s_order;
+
+static bool
+read_int(const string &path, int &v)
+{
+  ifstream ifs(path.c_str());
+  return bool(ifs >> v);
+}
+
+static vector<topology::cpu>
+discover()
+{
+  cpu_set_t allowed;
+  CPU_ZERO(&allowed);
+  ALWAYS_ASSERT(!sched_getaffinity(0, sizeof(allowed), &allowed));
+
+  // (socket, core) as sysfs numbers them, which may be sparse
+  vector<pair<int, int>> ids;
+  vector<topology::cpu> ret;
+  for (unsigned i = 0; i < CPU_SETSIZE; i++) {
+    if (!CPU_ISSET(i, &allowed))
+      continue;
+    const string dir =
+      "/sys/devices/system/cpu/cpu" + to_string(i) + "/topology/";
+    int socket, core;
+    if (!read_int(dir + "physical_package_id", socket) || socket < 0)
+      socket = 0;
+    if (!read_int(dir + "core_id", core) || core < 0)
+      core = i; // no SMT information, so every cpu is its own core
+    const int node = numa_available() < 0 ? 0 : numa_node_of_cpu(i);
+    topology::cpu c;
+    c.id_ = i;
+    c.node_ = node < 0 ? 0 : node;
+    ret.push_back(c);
+    ids.emplace_back(socket, core);
+  }
+  ALWAYS_ASSERT(!ret.empty());
+
+  // densify: sockets and cores are numbered in the order of their ids
+  set<int> sockets;
+  map<int, set<int>> cores;
+  for (auto &p : ids) {
+    sockets.insert(p.first);
+    cores[p.first].insert(p.second);
+  }
+  map<pair<int, int>, unsigned> nsiblings;
+  for (size_t i = 0; i < ret.size(); i++) {
+    const int socket = ids[i].first, core = ids[i].second;
+    ret[i].socket_ = distance(sockets.begin(), sockets.find(socket));
+    ret[i].core_ = distance(cores[socket].begin(), cores[socket].find(core));
+    // cpus are visited in id order
+    ret[i].smt_ = nsiblings[ids[i]]++;
+  }
+  return ret;
+}
+
+const vector<topology::cpu> &
+topology::Cpus()
+{
+  static const vector<cpu> s_cpus = discover();
+  return s_cpus;
+}
+
+unsigned
+topology::NSockets()
+{
+  set<unsigned> s;
+  for (auto &c : Cpus())
+    s.insert(c.socket_);
+  return s.size();
+}
+
+unsigned
+topology::NNodes()
+{
+  set<unsigned> s;
+  for (auto &c : Cpus())
+    s.insert(c.node_);
+  return s.size();
+}
+
+unsigned
+topology::NCores()
+{
+  unsigned n = 0;
+  for (auto &c : Cpus())
+    if (!c.smt_)
+      n++;
+  return n;
+}
+
+string
+topology::Describe()
+{
+  ostringstream buf;
+  buf << NSockets() << " sockets, " << NNodes() << " nodes, "
+      << NCores() << " cores, " << Cpus().size() << " cpus";
+  return buf.str();
+}
+
+static const char *const g_placement_names[] = {
+  "node",
+  "compact",
+  "scatter",
+  "nosmt",
+  "socket-first",
+};
+
+const char *
+topology::PlacementStr(placement p)
+{
+  ALWAYS_ASSERT(size_t(p) < ARRAY_NELEMS(g_placement_names));
+  return g_placement_names[p];
+}
+
+bool
+topology::ParsePlacement(const string &s, placement &p)
+{
+  for (size_t i = 0; i < ARRAY_NELEMS(g_placement_names); i++) {
+    if (s == g_placement_names[i]) {
+      p = placement(i);
+      return true;
+    }
+  }
+  return false;
+}
+
+void
+topology::SetPlacement(placement p, size_t nworkers)
+{
+  typedef tuple<unsigned, unsigned, unsigned, unsigned> sort_key;
+  s_placement = p;
+  s_nworkers = nworkers;
+  vector<pair<sort_key, unsigned>> keyed;
+  for (auto &c : Cpus()) {
+    sort_key k;
+    switch (p) {
+    case PLACEMENT_NODE:
+      k = sort_key(c.id_, 0, 0, 0);
+      break;
+    case PLACEMENT_COMPACT:
+      k = sort_key(c.socket_, c.core_, c.smt_, c.id_);
+      break;
+    case PLACEMENT_SCATTER:
+      k = sort_key(c.smt_, c.core_, c.socket_, c.id_);
+      break;
+    case PLACEMENT_NOSMT:
+      k = sort_key(c.smt_, c.socket_, c.core_, c.id_);
+      break;
+    case PLACEMENT_SOCKET_FIRST:
+      k = sort_key(c.socket_, c.smt_, c.core_, c.id_);
+      break;
+    }
+    keyed.emplace_back(k, c.id_);
+  }
+  sort(keyed.begin(), keyed.end());
+  s_order.clear();
+  for (auto &e : keyed)
+    s_order.push_back(e.second);
+}
+
+unsigned
+topology::CpuOfSlot(size_t slot)
+{
+  if (s_placement == PLACEMENT_NODE)
+    return slot;
+  INVARIANT(!s_order.empty());
+  return s_order[slot % s_order.size()];
+}
+
+int
+topology::AuxCpu(size_t aux)
+{
+  if (s_placement == PLACEMENT_NODE)
+    return -1;
+  const size_t slot = s_nworkers + aux;
+  if (slot >= s_order.size())
+    return -1;
+  return s_order[slot];
+}
+
+void
+topology::PinCurrentThread(unsigned cpu)
+{
+  cpu_set_t s;
+  CPU_ZERO(&s);
+  CPU_SET(cpu, &s);
+  ALWAYS_ASSERT(!sched_setaffinity(0, sizeof(s), &s));
+  ALWAYS_ASSERT(!sched_yield());
+}
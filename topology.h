@@ -0,0 +1,87 @@
+#pragma once
+
+#include <string>
+#include <vector>
+
+#include "macros.h"
+
+/**
+ * The machine's CPU topology (sockets, NUMA nodes, physical cores and their
+ * SMT siblings), as read from sysfs, and the placement policy deciding which
+ * CPU each pinned thread runs on.
+ *
+ * Pinned threads are named by slot: slots [0, nworkers) are the workers (the
+ * numbers passed to rcu::pin_current_thread(), which also pick the
+ * allocator's per-core regions), and the auxiliary threads (the ticker, then
+ * the loggers) take the slots after them. The policy orders the CPUs, and
+ * slot i runs on the i-th CPU of that order.
+ */
+class topology {
+public:
+
+  struct cpu {
+    unsigned id_;     // as in sched.h
+    unsigned socket_; // dense, from 0
+    unsigned node_;   // numa node
+    unsigned core_;   // dense within the socket, from 0
+    unsigned smt_;    // rank among the core's siblings, from 0
+  };
+
+  enum placement {
+    // slot i is cpu i, but threads only run on its numa node (the
+    // original --pin-cpus behavior)
+    PLACEMENT_NODE = 0,
+    // fill a socket core by core, with each core's siblings adjacent
+    PLACEMENT_COMPACT,
+    // round robin over the sockets, siblings last
+    PLACEMENT_SCATTER,
+    // one cpu per physical core, over every socket, before any sibling
+    PLACEMENT_NOSMT,
+    // fill a socket's physical cores, then its siblings, then move on to
+    // the next socket
+    PLACEMENT_SOCKET_FIRST,
+  };
+
+  // the cpus this process may run on, sorted by id
+  static const std::vector<cpu> &Cpus();
+
+  static unsigned NSockets();
+  static unsigned NNodes();
+  static unsigned NCores(); // physical cores
+
+  // eg "2 sockets, 2 nodes, 16 cores, 32 cpus"
+  static std::string Describe();
+
+  static const char *PlacementStr(placement p);
+
+  // false if s names no policy
+  static bool ParsePlacement(const std::string &s, placement &p);
+
+  // not thread safe, call before pinning any thread
+  static void SetPlacement(placement p, size_t nworkers);
+
+  static inline placement
+  GetPlacement()
+  {
+    return s_placement;
+  }
+
+  // the cpu slot runs on (slots wrap around the cpus)
+  static unsigned CpuOfSlot(size_t slot);
+
+  /**
+   * The cpu of auxiliary thread aux (the ticker is 0, logger i is i + 1),
+   * ie of slot nworkers + aux, or -1 to leave it unpinned: under
+   * PLACEMENT_NODE, or if the workers already took every cpu (a spare cpu
+   * is better than sharing one with a worker)
+   */
+  static int AuxCpu(size_t aux);
+
+  // restricts the calling thread to cpu
+  static void PinCurrentThread(unsigned cpu);
+
+private:
+  static placement s_placement;
+  static size_t s_nworkers;
+  static std::vector<unsigned> s_order; // cpu ids, in placement order
+};
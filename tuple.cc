@@ -4,6 +4,17 @@
 using namespace std;
 using namespace util;
 
+#if !defined(TUPLE_CHECK_KEY) && \
+    !defined(CHECK_INVARIANTS) && \
+    !defined(TUPLE_LOCK_OWNERSHIP_CHECKING) && \
+    !defined(TUPLE_MAGIC)
+#ifdef TUPLE_COMPACT
+static_assert(sizeof(dbtuple) == 16, "compact dbtuple header should be 16 bytes");
+#else
+static_assert(sizeof(dbtuple) == 24, "dbtuple header should be 24 bytes");
+#endif
+#endif
+
 event_avg_counter dbtuple::g_evt_avg_dbtuple_stable_version_spins
   ("avg_dbtuple_stable_version_spins");
 event_avg_counter dbtuple::g_evt_avg_dbtuple_lock_acquire_spins
@@ -59,6 +70,9 @@ dbtuple::VersionInfoStr(version_t v)
   buf << (IsWriteIntent(v) ? "WR" : "-") << " | ";
   buf << (IsModifying(v) ? "MOD" : "-") << " | ";
   buf << (IsLatest(v) ? "LATEST" : "-") << " | ";
+#ifdef TUPLE_COMPACT
+  buf << (IsChained(v) ? "NEXT" : "-") << " | ";
+#endif
   buf << Version(v);
   buf << "]";
   return buf.str();
@@ -72,7 +86,7 @@ format_tuple(ostream &o, const dbtuple &t)
   o << &t << " [tid=" << g_proto_version_str(t.version)
     << ", size=" << t.size
     << ", contents=0x" << hexify(truncated_contents) << (t.size > 16 ? "..." : "")
-    << ", next=" << t.next << "]";
+    << ", next=" << t.get_next() << "]";
   return o;
 }
 
@@ -55,6 +55,13 @@ public:
   static const tid_t MIN_TID = 0;
   static const tid_t MAX_TID = (tid_t) -1;
 
+  // the record buf space taken up by a next pointer (see get_next())
+#ifdef TUPLE_COMPACT
+  static const size_t ChainOverhead = sizeof(dbtuple *);
+#else
+  static const size_t ChainOverhead = 0;
+#endif
+
   // lock ownership helpers- works by recording all tuple
   // locks obtained in each transaction, and then when the txn
   // finishes, calling AssertAllTupleLocksReleased(), which makes
@@ -96,7 +103,15 @@ private:
   static const version_t HDR_LATEST_SHIFT = 4;
   static const version_t HDR_LATEST_MASK = 0x1 << HDR_LATEST_SHIFT;
 
+#ifdef TUPLE_COMPACT
+  // set iff the tuple has a next pointer (see get_next())
+  static const version_t HDR_CHAINED_SHIFT = 5;
+  static const version_t HDR_CHAINED_MASK = 0x1 << HDR_CHAINED_SHIFT;
+
+  static const version_t HDR_VERSION_SHIFT = 6;
+#else
   static const version_t HDR_VERSION_SHIFT = 5;
+#endif
   static const version_t HDR_VERSION_MASK = ((version_t)-1) << HDR_VERSION_SHIFT;
 
 public:
@@ -124,6 +139,9 @@ public:
   // <-- low bits
   // [ locked | deleting | write_intent | modifying | latest | version ]
   // [  0..1  |   1..2   |    2..3      |   3..4    |  4..5  |  5..32  ]
+  //
+  // (with TUPLE_COMPACT, bit 5 is the chained bit, and the version starts
+  // at bit 6)
   volatile version_t hdr;
 
 #ifdef TUPLE_LOCK_OWNERSHIP_CHECKING
@@ -139,9 +157,17 @@ public:
   node_size_type alloc_size; // max size record allowed. is the space
                              // available for the record buf
 
+#ifndef TUPLE_COMPACT
   dbtuple *next; // be very careful about traversing this pointer,
                  // GC is capable of reaping it at certain (well defined)
                  // points, and will not bother to set it to null
+#else
+  // the compact layout has no next field: only a tuple with an older
+  // version has a next pointer, kept in the last sizeof(dbtuple *) bytes of
+  // its record buf (which are then not available to the record), and
+  // flagged by the chained bit. this takes the header from 24 bytes down to
+  // 16 (one allocator::AllocAlignment unit)
+#endif
 
 #ifdef TUPLE_CHECK_KEY
   // for debugging
@@ -189,7 +215,9 @@ private:
       , version(MAX_TID)
       , size(CheckBounds(size))
       , alloc_size(CheckBounds(alloc_size))
+#ifndef TUPLE_COMPACT
       , next(nullptr)
+#endif
 #ifdef TUPLE_CHECK_KEY
       , key()
       , tree(nullptr)
@@ -230,7 +258,9 @@ private:
       , version(version)
       , size(base->size)
       , alloc_size(CheckBounds(alloc_size))
+#ifndef TUPLE_COMPACT
       , next(base->next)
+#endif
 #ifdef TUPLE_CHECK_KEY
       , key()
       , tree(nullptr)
@@ -239,11 +269,15 @@ private:
       , opaque(0)
 #endif
   {
-    INVARIANT(size <= alloc_size);
     INVARIANT(set_latest == is_latest());
     if (base->is_deleting())
       mark_deleting();
     NDB_MEMCPY(&value_start[0], base->get_value_start(), size);
+#ifdef TUPLE_COMPACT
+    if (base->get_next())
+      set_next(base->get_next());
+#endif
+    INVARIANT(size <= value_capacity());
     ++g_evt_dbtuple_creates;
     g_evt_dbtuple_bytes_allocated += alloc_size + sizeof(dbtuple);
   }
@@ -269,7 +303,9 @@ private:
       , version(version)
       , size(CheckBounds(new_size))
       , alloc_size(CheckBounds(alloc_size))
+#ifndef TUPLE_COMPACT
       , next(next)
+#endif
 #ifdef TUPLE_CHECK_KEY
       , key()
       , tree(nullptr)
@@ -284,6 +320,11 @@ private:
     INVARIANT(new_size || is_deleting());
     if (needs_old_value)
       NDB_MEMCPY(&value_start[0], r, old_size);
+#ifdef TUPLE_COMPACT
+    if (next)
+      set_next(next);
+#endif
+    INVARIANT(new_size <= value_capacity());
     ++g_evt_dbtuple_creates;
     g_evt_dbtuple_bytes_allocated += alloc_size + sizeof(dbtuple);
   }
@@ -375,6 +416,35 @@ public:
     return hdr;
   }
 
+  // like lock(), but gives up (returning false) after spins failed
+  // attempts, for callers which must not wait for the lock indefinitely
+  inline bool
+  try_lock(bool write_intent, unsigned int spins)
+  {
+    CheckMagic();
+    version_t v = hdr;
+    const version_t lockmask = write_intent ?
+      (HDR_LOCKED_MASK | HDR_WRITE_INTENT_MASK) :
+      (HDR_LOCKED_MASK);
+    while (IsLocked(v) ||
+           !__sync_bool_compare_and_swap(&hdr, v, v | lockmask)) {
+      if (!spins--)
+        return false;
+      nop_pause();
+      v = hdr;
+    }
+#ifdef TUPLE_LOCK_OWNERSHIP_CHECKING
+    lock_owner = std::this_thread::get_id();
+    AddTupleToLockRegion(this);
+    INVARIANT(is_lock_owner());
+#endif
+    COMPILER_MEMORY_FENCE;
+    INVARIANT(IsLocked(hdr));
+    INVARIANT(!write_intent || IsWriteIntent(hdr));
+    INVARIANT(!IsModifying(hdr));
+    return true;
+  }
+
   inline void
   unlock()
   {
@@ -465,6 +535,21 @@ public:
     return v & HDR_MODIFYING_MASK;
   }
 
+  // upgrades a lock taken w/o write intent
+  inline version_t
+  mark_write_intent()
+  {
+    CheckMagic();
+    version_t v = hdr;
+    INVARIANT(IsLocked(v));
+    INVARIANT(is_lock_owner());
+    v |= HDR_WRITE_INTENT_MASK;
+    COMPILER_MEMORY_FENCE;
+    hdr = v;
+    COMPILER_MEMORY_FENCE;
+    return v;
+  }
+
   inline bool
   is_write_intent() const
   {
@@ -527,6 +612,24 @@ public:
     return v;
   }
 
+  // as reader_stable_version(), but gives up after spins pauses. returns
+  // true if succeeded, false otherwise
+  inline bool
+  try_reader_stable_version(bool allow_write_intent, unsigned int spins,
+                            version_t &v) const
+  {
+    v = hdr;
+    while (IsModifying(v) ||
+           (!allow_write_intent && IsWriteIntent(v))) {
+      if (!spins--)
+        return false;
+      nop_pause();
+      v = hdr;
+    }
+    COMPILER_MEMORY_FENCE;
+    return true;
+  }
+
   /**
    * returns true if succeeded, false otherwise
    */
@@ -570,6 +673,55 @@ public:
     return hdr == version;
   }
 
+#ifdef TUPLE_COMPACT
+  inline bool
+  is_chained() const
+  {
+    return IsChained(hdr);
+  }
+
+  static inline bool
+  IsChained(version_t v)
+  {
+    return v & HDR_CHAINED_MASK;
+  }
+
+  inline ALWAYS_INLINE struct dbtuple *
+  get_next()
+  {
+    return is_chained() ? *next_slot() : nullptr;
+  }
+
+  inline const struct dbtuple *
+  get_next() const
+  {
+    return is_chained() ? *next_slot() : nullptr;
+  }
+
+  // the caller must hold the lock, and have marked the tuple modifying if
+  // it is visible to readers. the record must fit in the first
+  // alloc_size - ChainOverhead bytes
+  inline ALWAYS_INLINE void
+  set_next(struct dbtuple *next)
+  {
+    CheckMagic();
+    if (!next) {
+      clear_next();
+      return;
+    }
+    INVARIANT(alloc_size >= ChainOverhead);
+    *next_slot() = next;
+    COMPILER_MEMORY_FENCE;
+    hdr |= HDR_CHAINED_MASK;
+  }
+
+  inline void
+  clear_next()
+  {
+    CheckMagic();
+    hdr &= ~HDR_CHAINED_MASK;
+  }
+#else
   inline ALWAYS_INLINE struct dbtuple *
   get_next()
   {
@@ -595,6 +747,26 @@ public:
     CheckMagic();
     this->next = nullptr;
   }
+#endif
+
+  // the space a record can use (alloc_size, less the next pointer of a
+  // chained compact tuple)
+  inline size_t
+  value_capacity() const
+  {
+#ifdef TUPLE_COMPACT
+    if (is_chained())
+      return alloc_size - ChainOverhead;
+#endif
+    return alloc_size;
+  }
+
+  // the memory this tuple (not its chain) takes up in the allocator
+  inline size_t
+  footprint() const
+  {
+    return allocator::ArenaSize(sizeof(*this) + alloc_size).first;
+  }
 
   inline ALWAYS_INLINE uint8_t *
   get_value_start()
@@ -618,6 +790,22 @@ public:
 
 private:
 
+#ifdef TUPLE_COMPACT
+  inline dbtuple **
+  next_slot()
+  {
+    return reinterpret_cast<dbtuple **>(
+        &value_start[0] + alloc_size - ChainOverhead);
+  }
+
+  inline dbtuple * const *
+  next_slot() const
+  {
+    return reinterpret_cast<dbtuple * const *>(
+        &value_start[0] + alloc_size - ChainOverhead);
+  }
+#endif
+
 #ifdef ENABLE_EVENT_COUNTERS
   struct scoped_recorder {
     scoped_recorder(unsigned long &n) : n(&n) {}
@@ -635,7 +823,8 @@ private:
   static ReadStatus
   record_at_chain(
       const dbtuple *starting, tid_t t, tid_t &start_t,
-      Reader &reader, StringAllocator &sa, bool allow_write_intent)
+      Reader &reader, StringAllocator &sa, bool allow_write_intent,
+      unsigned int max_spins)
   {
 #ifdef ENABLE_EVENT_COUNTERS
     unsigned long nretries = 0;
@@ -644,7 +833,12 @@ private:
     const dbtuple *current = starting;
   loop:
     INVARIANT(current->version != MAX_TID);
-    const version_t v = current->reader_stable_version(allow_write_intent);
+    version_t v;
+    if (!max_spins)
+      v = current->reader_stable_version(allow_write_intent);
+    else if (unlikely(!current->try_reader_stable_version(
+            allow_write_intent, max_spins, v)))
+      return READ_FAILED;
     const struct dbtuple *p;
     const bool found = current->is_not_behind(t);
     if (found) {
@@ -680,7 +874,8 @@ private:
   inline ALWAYS_INLINE ReadStatus
   record_at(
       tid_t t, tid_t &start_t,
-      Reader &reader, StringAllocator &sa, bool allow_write_intent) const
+      Reader &reader, StringAllocator &sa, bool allow_write_intent,
+      unsigned int max_spins) const
   {
 #ifdef ENABLE_EVENT_COUNTERS
     unsigned long nretries = 0;
@@ -696,7 +891,12 @@ private:
       return READ_EMPTY;
     }
   loop:
-    const version_t v = reader_stable_version(allow_write_intent);
+    version_t v;
+    if (!max_spins)
+      v = reader_stable_version(allow_write_intent);
+    else if (unlikely(!try_reader_stable_version(
+            allow_write_intent, max_spins, v)))
+      return READ_FAILED;
     const struct dbtuple *p;
     const bool found = is_not_behind(t);
     if (found) {
@@ -715,7 +915,8 @@ private:
     if (unlikely(!reader_check_version(v)))
       goto retry;
     if (p)
-      return record_at_chain(p, t, start_t, reader, sa, allow_write_intent);
+      return record_at_chain(p, t, start_t, reader, sa, allow_write_intent,
+                             max_spins);
     // NB(stephentu): if we reach the end of a chain then we assume that
     // the record exists as a deleted record.
     //
@@ -757,15 +958,20 @@ public:
    *
    * NB(stephentu): calling stable_read() while holding the lock
    * is an error- this will cause deadlock
+   *
+   * If max_spins is not 0, waits at most that many pauses for each version
+   * to be stable (not being modified, nor write intent locked unless
+   * allow_write_intent), and returns READ_FAILED if one is not
    */
   template <typename Reader, typename StringAllocator>
   inline ALWAYS_INLINE ReadStatus
   stable_read(
       tid_t t, tid_t &start_t,
       Reader &reader, StringAllocator &sa,
-      bool allow_write_intent) const
+      bool allow_write_intent,
+      unsigned int max_spins = 0) const
   {
-    return record_at(t, start_t, reader, sa, allow_write_intent);
+    return record_at(t, start_t, reader, sa, allow_write_intent, max_spins);
   }
 
   inline bool
@@ -837,6 +1043,9 @@ public:
     TUPLE_WRITER_COMPUTE_DELTA_NEEDED, // last two args ignored
     TUPLE_WRITER_DO_WRITE,
     TUPLE_WRITER_DO_DELTA_WRITE,
+    TUPLE_WRITER_LOGS_VALUE_DELTA, // all three args ignored. is what
+                                   // DO_DELTA_WRITE writes a value delta
+                                   // (see value_delta.h), not the value?
   };
   typedef size_t (*tuple_writer_t)(TupleWriterMode, const void *, uint8_t *, size_t);
 
@@ -875,7 +1084,7 @@ public:
     if (likely(txn->can_overwrite_record_tid(version, t) && old_sz)) {
       INVARIANT(!is_deleting());
       // see if we have enough space
-      if (likely(new_sz <= alloc_size)) {
+      if (likely(new_sz <= value_capacity())) {
         // directly update in place
         mark_modifying();
         if (v)
@@ -926,7 +1135,8 @@ public:
     ++g_evt_dbtuple_spills;
     g_evt_avg_record_spill_len.offer(size);
 
-    if (new_sz <= alloc_size && old_sz) {
+    // (this tuple keeps the new value, and becomes chained)
+    if (new_sz + ChainOverhead <= alloc_size && old_sz) {
       INVARIANT(!is_deleting());
       dbtuple * const spill = alloc(version, this, false);
       INVARIANT(!spill->is_latest());
@@ -989,17 +1199,27 @@ public:
   // NB: we round up allocation sizes because jemalloc will do this
   // internally anyways, so we might as well grab more usable space (really
   // just internal vs external fragmentation)
+  //
+  // the rounded size is the allocator's size class (arena) for the tuple,
+  // so whatever the class has past the header and record is kept as room
+  // for the record to grow in place (and, in the compact layout, for a next
+  // pointer)
+  static inline size_t
+  AllocSize(size_t sz, bool chained)
+  {
+    const size_t max_alloc_sz =
+      std::numeric_limits<node_size_type>::max() + sizeof(dbtuple);
+    const size_t needed_sz = sz + (chained ? ChainOverhead : 0);
+    return std::min(
+        util::round_up<size_t, allocator::LgAllocAlignment>(sizeof(dbtuple) + needed_sz),
+        max_alloc_sz);
+  }
 
   static inline dbtuple *
   alloc_first(size_type sz, bool acquire_lock)
   {
     INVARIANT(sz <= std::numeric_limits<node_size_type>::max());
-    const size_t max_alloc_sz =
-      std::numeric_limits<node_size_type>::max() + sizeof(dbtuple);
-    const size_t alloc_sz =
-      std::min(
-          util::round_up<size_t, allocator::LgAllocAlignment>(sizeof(dbtuple) + sz),
-          max_alloc_sz);
+    const size_t alloc_sz = AllocSize(sz, false);
     char *p = reinterpret_cast<char *>(rcu::s_instance.alloc(alloc_sz));
     INVARIANT(p);
     INVARIANT((alloc_sz - sizeof(dbtuple)) >= sz);
@@ -1010,12 +1230,7 @@ public:
   static inline dbtuple *
   alloc(tid_t version, struct dbtuple *base, bool set_latest)
   {
-    const size_t max_alloc_sz =
-      std::numeric_limits<node_size_type>::max() + sizeof(dbtuple);
-    const size_t alloc_sz =
-      std::min(
-          util::round_up<size_t, allocator::LgAllocAlignment>(sizeof(dbtuple) + base->size),
-          max_alloc_sz);
+    const size_t alloc_sz = AllocSize(base->size, base->get_next());
     char *p = reinterpret_cast<char *>(rcu::s_instance.alloc(alloc_sz));
     INVARIANT(p);
     return new (p) dbtuple(
@@ -1032,12 +1247,7 @@ public:
 
     const size_t needed_sz =
       copy_old_value ? std::max(newsz, oldsz) : newsz;
-    const size_t max_alloc_sz =
-      std::numeric_limits<node_size_type>::max() + sizeof(dbtuple);
-    const size_t alloc_sz =
-      std::min(
-          util::round_up<size_t, allocator::LgAllocAlignment>(sizeof(dbtuple) + needed_sz),
-          max_alloc_sz);
+    const size_t alloc_sz = AllocSize(needed_sz, next);
     char *p = reinterpret_cast<char *>(rcu::s_instance.alloc(alloc_sz));
     INVARIANT(p);
     return new (p) dbtuple(
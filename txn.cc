@@ -48,6 +48,17 @@ CLASS_STATIC_COUNTER_IMPL(transaction_base, scopedperf::tsc_ctr, g_txn_commit_pr
 CLASS_STATIC_COUNTER_IMPL(transaction_base, scopedperf::tsc_ctr, g_txn_commit_probe5, g_txn_commit_probe5_cg);
 CLASS_STATIC_COUNTER_IMPL(transaction_base, scopedperf::tsc_ctr, g_txn_commit_probe6, g_txn_commit_probe6_cg);
 
+unsigned transaction_base::CommitPhaseSamplePeriod = 0;
+__thread unsigned transaction_base::tl_ncommits = 0;
+__thread transaction_base::commit_phase_sample
+  transaction_base::tl_commit_phase_sample;
+
+void
+transaction_base::SetCommitPhaseSamplePeriod(unsigned n)
+{
+  CommitPhaseSamplePeriod = n;
+}
+
 #define EVENT_COUNTER_IMPL_X(x) \
   event_counter transaction_base::g_ ## x ## _ctr(#x);
 ABORT_REASONS(EVENT_COUNTER_IMPL_X)
@@ -61,6 +72,10 @@ event_counter transaction_base::g_evt_dbtuple_write_search_failed
     ("dbtuple_write_search_failed");
 event_counter transaction_base::g_evt_dbtuple_write_insert_failed
     ("dbtuple_write_insert_failed");
+event_counter transaction_base::g_evt_read_locks
+    ("read_locks");
+event_counter transaction_base::g_evt_read_lock_failed
+    ("read_lock_failed");
 
 event_counter transaction_base::evt_local_search_lookups("local_search_lookups");
 event_counter transaction_base::evt_local_search_write_set_hits("local_search_write_set_hits");
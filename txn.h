@@ -22,6 +22,7 @@
 #include "btree_choice.h"
 #include "core.h"
 #include "counter.h"
+#include "histogram.h"
 #include "macros.h"
 #include "varkey.h"
 #include "util.h"
@@ -106,6 +107,56 @@ public:
     return 0;
   }
 
+  // the phases of commit(), in order. LOCK includes sorting the write set
+#define COMMIT_PHASES(x) \
+    x(COMMIT_PHASE_LOCK) \
+    x(COMMIT_PHASE_GEN_TID) \
+    x(COMMIT_PHASE_READ_VALIDATION) \
+    x(COMMIT_PHASE_NODE_VALIDATION) \
+    x(COMMIT_PHASE_INSTALL)
+
+  enum commit_phase {
+#define ENUM_X(x) x,
+    COMMIT_PHASES(ENUM_X)
+#undef ENUM_X
+    NCommitPhases
+  };
+
+  static const char *
+  CommitPhaseStr(commit_phase phase)
+  {
+    switch (phase) {
+#define CASE_X(x) case x: return #x;
+    COMMIT_PHASES(CASE_X)
+#undef CASE_X
+    default:
+      break;
+    }
+    ALWAYS_ASSERT(false);
+    return 0;
+  }
+
+  // every CommitPhaseSamplePeriod-th commit() of a read/write txn run by a
+  // thread (none if 0) is timed, in cycles (rdtsc), phase by phase. off (0)
+  // by default
+  static unsigned CommitPhaseSamplePeriod;
+
+  static void SetCommitPhaseSamplePeriod(unsigned n);
+
+  // if the last timed commit() of the calling thread committed, and was
+  // not taken yet, fills in cycles[0, NCommitPhases) with its phases and
+  // returns true
+  static inline bool
+  TakeCommitPhaseSample(uint64_t *cycles)
+  {
+    if (likely(!tl_commit_phase_sample.valid_))
+      return false;
+    for (size_t i = 0; i < NCommitPhases; i++)
+      cycles[i] = tl_commit_phase_sample.cycles_[i];
+    tl_commit_phase_sample.valid_ = false;
+    return true;
+  }
+
   transaction_base(uint64_t flags)
     : state(TXN_EMBRYO),
       reason(ABORT_REASON_NONE),
@@ -329,6 +380,8 @@ protected:
   static event_counter g_evt_read_logical_deleted_node_scan;
   static event_counter g_evt_dbtuple_write_search_failed;
   static event_counter g_evt_dbtuple_write_insert_failed;
+  static event_counter g_evt_read_locks;
+  static event_counter g_evt_read_lock_failed;
 
   static event_counter evt_local_search_lookups;
   static event_counter evt_local_search_write_set_hits;
@@ -342,6 +395,54 @@ protected:
   CLASS_STATIC_COUNTER_DECL(scopedperf::tsc_ctr, g_txn_commit_probe5, g_txn_commit_probe5_cg);
   CLASS_STATIC_COUNTER_DECL(scopedperf::tsc_ctr, g_txn_commit_probe6, g_txn_commit_probe6_cg);
 
+  struct commit_phase_sample {
+    bool valid_;
+    uint64_t cycles_[NCommitPhases];
+  };
+
+  static __thread unsigned tl_ncommits;
+  static __thread commit_phase_sample tl_commit_phase_sample;
+
+  // times the phases of one commit(), if it is sampled
+  class commit_phase_timer {
+  public:
+    inline commit_phase_timer(bool read_write)
+      : last_(0)
+    {
+      if (likely(!CommitPhaseSamplePeriod) || !read_write ||
+          (++tl_ncommits % CommitPhaseSamplePeriod) != 0)
+        return;
+      NDB_MEMSET(&cycles_[0], 0, sizeof(cycles_));
+      last_ = rdtsc();
+    }
+
+    // the time since the last phase ended goes to phase
+    inline ALWAYS_INLINE void
+    end_phase(commit_phase phase)
+    {
+      if (likely(!last_))
+        return;
+      const uint64_t now = rdtsc();
+      cycles_[phase] += now - last_;
+      last_ = now;
+    }
+
+    // the commit() succeeded
+    inline void
+    committed() const
+    {
+      if (likely(!last_))
+        return;
+      tl_commit_phase_sample.valid_ = true;
+      for (size_t i = 0; i < NCommitPhases; i++)
+        tl_commit_phase_sample.cycles_[i] = cycles_[i];
+    }
+
+  private:
+    uint64_t last_; // 0 if not timed
+    uint64_t cycles_[NCommitPhases];
+  };
+
   txn_state state;
   abort_reason reason;
   const uint64_t flags;
@@ -726,6 +827,21 @@ protected:
   void
   do_node_read(const typename concurrent_btree::node_opaque_t *n, uint64_t version);
 
+  // may this txn hand its thread over to another coroutine (see coro.h)?
+  // not while it holds any tuple lock (its inserts are locked until
+  // commit, as are the tuples locked at read), since a txn of the same
+  // thread spinning on one would never let go of the thread
+  inline bool
+  may_yield() const
+  {
+    if (!read_locks.empty())
+      return false;
+    for (auto &w : write_set)
+      if (w.is_insert())
+        return false;
+    return true;
+  }
+
 public:
   // expected public overrides
 
@@ -770,6 +886,26 @@ protected:
 
   void on_post_rcu_region_completion();
 
+  // Should this txn lock tuple when it reads it, so that no other txn can
+  // write tuple before this one commits? Only asked of non-snapshot txns
+  bool should_lock_at_read(const dbtuple *tuple);
+
+  // Called when this txn is about to abort because of tuple: its read
+  // failed validation, or it could not be locked for write
+  void on_contended_tuple(const dbtuple *tuple);
+
+  // Should this txn report why it aborts to on_abort_cause()? Such a txn
+  // remembers where in the index every tuple/node it reads comes from,
+  // so this must not change over the lifetime of the txn
+  bool attributes_aborts() const;
+
+  // Called when this txn is about to abort (user aborts aside) because
+  // of the record at key in btr. btr is null (and key empty) if unknown.
+  // For node interference, key is the key whose lookup read the node
+  void on_abort_cause(const concurrent_btree *btr,
+                      const std::string &key,
+                      abort_reason r);
+
 protected:
   inline void clear();
 
@@ -813,13 +949,53 @@ protected:
     return const_cast<transaction *>(this)->find_write_set(tuple);
   }
 
+  // if try_lock, gives up (signaling abort) instead of waiting on a lock
+  // for too long
   inline bool
   handle_last_tuple_in_group(
-      dbtuple_write_info &info, bool did_group_insert);
+      dbtuple_write_info &info, bool did_group_insert, bool try_lock);
+
+  // locks taken at read time (see should_lock_at_read()) are held until
+  // commit/abort. a txn holding any never waits on another lock for long,
+  // since other txns may be waiting on its locks taken out of order
+  static const unsigned int ReadLockSpins = 1 << 12;
+
+  typedef typename util::vec<dbtuple *, 4>::type read_lock_vec;
+
+  inline void lock_at_read(dbtuple *tuple);
+
+  // removes tuple from read_locks, returns false if it was not there
+  inline bool take_read_lock(const dbtuple *tuple);
+
+  inline void release_read_locks();
+
+  // where a tuple/node read came from (see attributes_aborts())
+  struct read_origin {
+    read_origin(const void *obj, const concurrent_btree *btr,
+                const char *key, size_t keylen)
+      : obj_(obj), btr_(btr), key_(key, keylen) {}
+    const void *obj_;
+    const concurrent_btree *btr_;
+    std::string key_;
+  };
+
+  inline void
+  note_read_origin(const void *obj, const concurrent_btree *btr,
+                   const char *key, size_t keylen)
+  {
+    if (likely(!cast()->attributes_aborts()))
+      return;
+    read_origins.emplace_back(obj, btr, key, keylen);
+  }
+
+  // reports obj (a tuple or node) as the cause of aborting w/ r
+  void attribute_abort(const void *obj, abort_reason r);
 
   read_set_map read_set;
   write_set_map write_set;
   absent_set_map absent_set;
+  read_lock_vec read_locks;
+  std::vector<read_origin> read_origins;
 
   string_allocator_type *sa;
 
@@ -858,8 +1034,22 @@ struct txn_epoch_sync {
   // the last reset invocation?
   static inline std::pair<uint64_t, double>
     compute_ntxn_persisted() { return {0, 0.0}; }
+  // distribution of persist latencies (usec), from the last reset
+  // invocation
+  static inline log_histogram
+    compute_persist_latency_histogram() { return log_histogram(); }
+  // how many txns committed on core have been persisted, from the last
+  // reset invocation? safe to call while txns are running
+  static inline uint64_t
+    compute_ntxn_persisted_on_core(unsigned core) { return 0; }
   // reset the persisted counters
   static inline void reset_ntxn_persisted() {}
+  // pin the snapshot a read-only txn started now would read, filling in
+  // the last epoch it includes. false if there are no snapshots
+  static inline bool pin_snapshot(uint64_t &epoch) { return false; }
+  static inline void unpin_snapshot() {}
+  // should read-only txns started by this thread read the pinned snapshot?
+  static inline void use_pinned_snapshot(bool use) {}
 };
 
 #endif /* _NDB_TXN_H_ */
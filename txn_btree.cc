@@ -344,6 +344,138 @@ test_multi_btree()
   }
 }
 
+template <template <typename> class TxnType, typename Traits>
+static void
+test_multi_search()
+{
+  for (size_t txn_flags_idx = 0;
+       txn_flags_idx < ARRAY_NELEMS(TxnFlags);
+       txn_flags_idx++) {
+    const uint64_t txn_flags = TxnFlags[txn_flags_idx];
+    txn_btree<TxnType> btr(sizeof(rec));
+    typename Traits::StringAllocator arena;
+
+    // only the even keys exist
+    const size_t nkeys = 3 * concurrent_btree::PrefetchSearchBatch;
+    for (size_t i = 0; i < nkeys; i += 2) {
+      TxnType<Traits> t(txn_flags, arena);
+      btr.insert_object(t, u64_varkey(i), rec(i));
+      AssertSuccessfulCommit(t);
+    }
+
+    vector<string> keys;
+    for (size_t i = 0; i < nkeys; i++)
+      keys.push_back(u64_varkey(i).str());
+    vector<string> vs(nkeys);
+    bool found[nkeys];
+
+    {
+      TxnType<Traits> t(txn_flags, arena);
+      btr.multi_search(t, &keys[0], nkeys, &vs[0], found);
+      for (size_t i = 0; i < nkeys; i++) {
+        ALWAYS_ASSERT_COND_IN_TXN(t, found[i] == !(i % 2));
+        if (found[i])
+          AssertByteEquality(rec(i), vs[i]);
+      }
+      AssertSuccessfulCommit(t);
+    }
+
+    // the reads are validated as search()'s are: a concurrent write to a
+    // key read, or an insert of a key found absent, aborts the reader
+    for (size_t k = 0; k < 2; k++) {
+      TxnType<Traits> t0(txn_flags, arena), t1(txn_flags, arena);
+      btr.multi_search(t0, &keys[0], nkeys, &vs[0], found);
+      btr.insert_object(t1, u64_varkey(k), rec(1000 + k));
+      AssertSuccessfulCommit(t1);
+      btr.insert_object(t0, u64_varkey(nkeys), rec(0));
+      AssertFailedCommit(t0);
+    }
+
+    txn_epoch_sync<TxnType>::sync();
+    txn_epoch_sync<TxnType>::finish();
+  }
+}
+
+template <template <typename> class TxnType, typename Traits>
+static void
+test_coroutine_txns()
+{
+  for (size_t txn_flags_idx = 0;
+       txn_flags_idx < ARRAY_NELEMS(TxnFlags);
+       txn_flags_idx++) {
+    const uint64_t txn_flags = TxnFlags[txn_flags_idx];
+    txn_btree<TxnType> btr(sizeof(rec));
+    typename Traits::StringAllocator arena;
+    for (size_t i = 0; i < 100; i++) {
+      TxnType<Traits> t(txn_flags, arena);
+      btr.insert_object(t, u64_varkey(i), rec(i));
+      AssertSuccessfulCommit(t);
+    }
+
+    // a txn which read a record a txn of another coroutine writes in the
+    // meantime (both yield in search()) still fails validation
+    {
+      bool a_read = false, b_done = false;
+      vector<coro::fn_t> fns;
+      fns.push_back([&]() {
+        typename Traits::StringAllocator arena;
+        TxnType<Traits> t(txn_flags, arena);
+        string v;
+        ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(10), v));
+        AssertByteEquality(rec(10), v);
+        a_read = true;
+        while (!b_done)
+          coro::Yield();
+        btr.insert_object(t, u64_varkey(11), rec(0));
+        AssertFailedCommit(t);
+      });
+      fns.push_back([&]() {
+        while (!a_read)
+          coro::Yield();
+        typename Traits::StringAllocator arena;
+        TxnType<Traits> t(txn_flags, arena);
+        string v;
+        ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(20), v));
+        btr.insert_object(t, u64_varkey(10), rec(1000));
+        AssertSuccessfulCommit(t);
+        b_done = true;
+      });
+      coro::RunAll(fns);
+    }
+
+    // a txn never yields while it holds a lock: here the second
+    // coroutine would spin on the first one's insert for good
+    {
+      bool inserted = false;
+      vector<coro::fn_t> fns;
+      fns.push_back([&]() {
+        typename Traits::StringAllocator arena;
+        TxnType<Traits> t(txn_flags, arena);
+        btr.insert_object(t, u64_varkey(1000), rec(1000));
+        inserted = true;
+        string v;
+        for (size_t i = 0; i < 100; i++)
+          btr.search(t, u64_varkey(i), v);
+        AssertSuccessfulCommit(t);
+      });
+      fns.push_back([&]() {
+        while (!inserted)
+          coro::Yield();
+        typename Traits::StringAllocator arena;
+        TxnType<Traits> t(txn_flags, arena);
+        string v;
+        ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(1000), v));
+        AssertByteEquality(rec(1000), v);
+        AssertSuccessfulCommit(t);
+      });
+      coro::RunAll(fns);
+    }
+
+    txn_epoch_sync<TxnType>::sync();
+    txn_epoch_sync<TxnType>::finish();
+  }
+}
+
 template <template <typename> class TxnType, typename Traits>
 static void
 test_read_only_snapshot()
@@ -390,6 +522,257 @@ test_read_only_snapshot()
   }
 }
 
+// old versions stay readable whichever way a write makes room for them (see
+// dbtuple::write_record_at()), and footprints count the latest versions
+template <template <typename> class TxnType, typename Traits>
+static void
+test_tuple_footprint()
+{
+  static const size_t NewSizes[] = {40, 8, 200}; // same, smaller, larger
+  for (size_t txn_flags_idx = 0;
+       txn_flags_idx < ARRAY_NELEMS(TxnFlags);
+       txn_flags_idx++) {
+    const uint64_t txn_flags = TxnFlags[txn_flags_idx];
+    txn_btree<TxnType> btr;
+    typename Traits::StringAllocator arena;
+
+    for (size_t i = 0; i < ARRAY_NELEMS(NewSizes); i++) {
+      TxnType<Traits> t(txn_flags, arena);
+      const string v(40, 'a' + i);
+      btr.insert(t, u64_varkey(i), (const uint8_t *) v.data(), v.size());
+      AssertSuccessfulCommit(t);
+    }
+
+    map<string, uint64_t> f = btr.unsafe_footprint();
+    ALWAYS_ASSERT(f["tuples"] == ARRAY_NELEMS(NewSizes));
+    ALWAYS_ASSERT(f["tuple_header_bytes"] ==
+                  ARRAY_NELEMS(NewSizes) * sizeof(dbtuple));
+    ALWAYS_ASSERT(f["tuple_bytes"] >=
+                  ARRAY_NELEMS(NewSizes) * (sizeof(dbtuple) + 40));
+    ALWAYS_ASSERT((f["tuple_bytes"] % ::allocator::AllocAlignment) == 0);
+    ALWAYS_ASSERT(f["chained_tuples"] == 0);
+
+    // see test_read_only_snapshot()
+    txn_epoch_sync<TxnType>::sync();
+
+    {
+      TxnType<Traits> t1(
+          txn_flags | transaction_base::TXN_FLAG_READ_ONLY, arena);
+      for (size_t i = 0; i < ARRAY_NELEMS(NewSizes); i++) {
+        TxnType<Traits> t0(txn_flags, arena);
+        const string v(NewSizes[i], 'x');
+        btr.insert(t0, u64_varkey(i), (const uint8_t *) v.data(), v.size());
+        AssertSuccessfulCommit(t0);
+      }
+      for (size_t i = 0; i < ARRAY_NELEMS(NewSizes); i++) {
+        string v1;
+        ALWAYS_ASSERT_COND_IN_TXN(t1, btr.search(t1, u64_varkey(i), v1));
+        ALWAYS_ASSERT_COND_IN_TXN(t1, v1 == string(40, 'a' + i));
+      }
+      AssertSuccessfulCommit(t1);
+    }
+
+    for (size_t i = 0; i < ARRAY_NELEMS(NewSizes); i++) {
+      TxnType<Traits> t(txn_flags, arena);
+      string v;
+      ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(i), v));
+      ALWAYS_ASSERT_COND_IN_TXN(t, v == string(NewSizes[i], 'x'));
+      AssertSuccessfulCommit(t);
+    }
+
+    f = btr.unsafe_footprint();
+    ALWAYS_ASSERT(f["tuples"] == ARRAY_NELEMS(NewSizes));
+    ALWAYS_ASSERT(f["chained_tuples"] == ARRAY_NELEMS(NewSizes));
+
+    txn_epoch_sync<TxnType>::sync();
+    txn_epoch_sync<TxnType>::finish();
+  }
+}
+
+// transaction_proto2 only: exercises locking records when read
+template <template <typename> class TxnType, typename Traits>
+static void
+test_lock_at_read()
+{
+  txn_btree<TxnType> btr;
+  typename Traits::StringAllocator arena;
+
+  {
+    TxnType<Traits> t(0, arena);
+    btr.insert_object(t, u64_varkey(0), rec(0));
+    AssertSuccessfulCommit(t);
+  }
+
+  // one read validation failure on key 0 makes it hot, and this thread
+  // pessimistic
+  transaction_proto2_static::SetHotRecordThreshold(1);
+  transaction_proto2_static::SetPessimisticAfterAborts(1);
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v0));
+    btr.insert_object(t1, u64_varkey(0), rec(1));
+    AssertSuccessfulCommit(t1);
+    btr.insert_object(t0, u64_varkey(1), rec(1));
+    AssertFailedCommit(t0);
+  }
+
+  // a record locked when read is released on abort (a user abort, which
+  // leaves this thread pessimistic)
+  {
+    TxnType<Traits> t(0, arena);
+    string v;
+    ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(0), v));
+    AssertByteEquality(rec(1), v);
+    t.abort();
+  }
+
+  // ... and upgraded when written
+  {
+    TxnType<Traits> t(0, arena);
+    string v;
+    ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(0), v));
+    AssertByteEquality(rec(1), v);
+    btr.insert_object(t, u64_varkey(0), rec(2));
+    AssertSuccessfulCommit(t);
+  }
+
+  // while key 0 is hot, t0 locks it when read, which must not fail t1
+  transaction_proto2_static::SetPessimisticAfterAborts(0);
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0, v1;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v0));
+    ALWAYS_ASSERT_COND_IN_TXN(t1, btr.search(t1, u64_varkey(0), v1));
+    AssertByteEquality(rec(2), v1);
+    btr.insert_object(t1, u64_varkey(1), rec(2));
+    AssertSuccessfulCommit(t1);
+    AssertSuccessfulCommit(t0);
+  }
+  transaction_proto2_static::SetHotRecordThreshold(0);
+
+  txn_epoch_sync<TxnType>::sync();
+  txn_epoch_sync<TxnType>::finish();
+}
+
+static uint64_t
+abort_attr_count(const string &name)
+{
+  const map<string, counter_data> m = event_counter::get_counters({name});
+  auto it = m.find(name);
+  return it == m.end() ? 0 : it->second.count_;
+}
+
+// transaction_proto2 only: exercises abort attribution
+template <template <typename> class TxnType, typename Traits>
+static void
+test_abort_attribution()
+{
+  txn_btree<TxnType> btr(128, false, "abort_attr_test");
+  typename Traits::StringAllocator arena;
+
+  {
+    TxnType<Traits> t(0, arena);
+    btr.insert_object(t, u64_varkey(0), rec(0));
+    AssertSuccessfulCommit(t);
+  }
+
+  const string read_name =
+    "abort_attr:abort_attr_test:READ_NODE_INTEREFERENCE:" +
+    hexify(u64_varkey(0).str());
+  const string scan_name =
+    "abort_attr:abort_attr_test:NODE_SCAN_READ_VERSION_CHANGED:" +
+    hexify(u64_varkey(10).str());
+  const uint64_t nread = abort_attr_count(read_name);
+  const uint64_t nscan = abort_attr_count(scan_name);
+
+  transaction_proto2_static::SetAbortSamplePeriod(1);
+
+  // key 0 changes under t0's read of it
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v0));
+    btr.insert_object(t1, u64_varkey(0), rec(1));
+    AssertSuccessfulCommit(t1);
+    btr.insert_object(t0, u64_varkey(1), rec(1));
+    AssertFailedCommit(t0);
+  }
+  ALWAYS_ASSERT(abort_attr_count(read_name) == nread + 1);
+
+  // key 10 shows up after t0 found it absent
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, !btr.search(t0, u64_varkey(10), v0));
+    btr.insert_object(t1, u64_varkey(10), rec(1));
+    AssertSuccessfulCommit(t1);
+    AssertFailedCommit(t0);
+  }
+  ALWAYS_ASSERT(abort_attr_count(scan_name) == nscan + 1);
+
+  // unsampled txns are not attributed
+  transaction_proto2_static::SetAbortSamplePeriod(0);
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v0));
+    btr.insert_object(t1, u64_varkey(0), rec(2));
+    AssertSuccessfulCommit(t1);
+    btr.insert_object(t0, u64_varkey(1), rec(2));
+    AssertFailedCommit(t0);
+  }
+  ALWAYS_ASSERT(abort_attr_count(read_name) == nread + 1);
+
+  txn_epoch_sync<TxnType>::sync();
+  txn_epoch_sync<TxnType>::finish();
+}
+
+template <template <typename> class TxnType, typename Traits>
+static void
+test_commit_phase_sampling()
+{
+  txn_btree<TxnType> btr;
+  typename Traits::StringAllocator arena;
+  uint64_t cycles[transaction_base::NCommitPhases];
+
+  transaction_base::SetCommitPhaseSamplePeriod(1);
+  {
+    TxnType<Traits> t(0, arena);
+    btr.insert_object(t, u64_varkey(0), rec(0));
+    AssertSuccessfulCommit(t);
+  }
+  ALWAYS_ASSERT(transaction_base::TakeCommitPhaseSample(&cycles[0]));
+  // taken only once
+  ALWAYS_ASSERT(!transaction_base::TakeCommitPhaseSample(&cycles[0]));
+
+  // aborted commits are not sampled
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v0));
+    btr.insert_object(t1, u64_varkey(0), rec(1));
+    AssertSuccessfulCommit(t1);
+    ALWAYS_ASSERT(transaction_base::TakeCommitPhaseSample(&cycles[0]));
+    btr.insert_object(t0, u64_varkey(1), rec(1));
+    AssertFailedCommit(t0);
+  }
+  ALWAYS_ASSERT(!transaction_base::TakeCommitPhaseSample(&cycles[0]));
+
+  // nor are snapshot txns
+  {
+    TxnType<Traits> t(transaction_base::TXN_FLAG_READ_ONLY, arena);
+    string v;
+    btr.search(t, u64_varkey(0), v); // may predate key 0
+    AssertSuccessfulCommit(t);
+  }
+  ALWAYS_ASSERT(!transaction_base::TakeCommitPhaseSample(&cycles[0]));
+  transaction_base::SetCommitPhaseSamplePeriod(0);
+
+  txn_epoch_sync<TxnType>::sync();
+  txn_epoch_sync<TxnType>::finish();
+}
+
 namespace test_long_keys_ns {
 
 static inline string
@@ -586,6 +969,106 @@ test_insert_same_key()
   y(inline_str_fixed<10>,v2)
 DO_STRUCT(testrec, TESTREC_KEY_FIELDS, TESTREC_VALUE_FIELDS)
 
+struct no_read_own_writes_traits : public default_transaction_traits {
+  static const bool read_own_writes = false;
+};
+
+// put_delta() patches a record with a value delta (here, EncodeDelta()'s of
+// testrec values), while snapshots keep reading the old value. without
+// read_own_writes, only the delta is written (see test_tuple_footprint()
+// for the ways a write makes room)
+template <template <typename> class TxnType, typename Traits>
+static void
+test_put_delta()
+{
+  const testrec::value v0(2, 3, "hello");
+  testrec::value v1(v0), v2(v0);
+  v1.v2.assign("world");    // same encoded size
+  v2.v2.assign("world");
+  v2.v0 = 1 << 20;          // grows, moving v1 and v2
+  const testrec::value *const vs[] = {&v0, &v1, &v2};
+
+  {
+    string d, v = Encode(v0);
+    ALWAYS_ASSERT(value_delta::FailsafeApply(
+          v, EncodeDelta(d, Encode(v0), v1, FIELDS(2))));
+    ALWAYS_ASSERT(v == Encode(v1));
+    ALWAYS_ASSERT(value_delta::FailsafeApply(
+          v, EncodeDelta(d, Encode(v1), v2, FIELDS(0))));
+    ALWAYS_ASSERT(v == Encode(v2));
+
+    // through the last field read
+    testrec::value p;
+    v.resize(ProjectMaxBytes<testrec::value>(FIELDS(0)));
+    ProjectDecode(v, p, FIELDS(0));
+    ALWAYS_ASSERT(p.v0 == v2.v0);
+    ProjectDecode(Encode(v2), p, FIELDS(1, 2));
+    ALWAYS_ASSERT(p == v2);
+  }
+
+  for (size_t txn_flags_idx = 0;
+       txn_flags_idx < ARRAY_NELEMS(TxnFlags);
+       txn_flags_idx++) {
+    const uint64_t txn_flags = TxnFlags[txn_flags_idx];
+    txn_btree<TxnType> btr;
+    typename Traits::StringAllocator arena;
+
+    {
+      TxnType<Traits> t(txn_flags, arena);
+      const string e = Encode(v0);
+      btr.insert(t, u64_varkey(0), (const uint8_t *) e.data(), e.size());
+      AssertSuccessfulCommit(t);
+    }
+
+    // see test_read_only_snapshot()
+    txn_epoch_sync<TxnType>::sync();
+
+    {
+      TxnType<Traits> t1(
+          txn_flags | transaction_base::TXN_FLAG_READ_ONLY, arena);
+      for (size_t i = 1; i < ARRAY_NELEMS(vs); i++) {
+        TxnType<Traits> t0(txn_flags, arena);
+        string v, d;
+        ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v));
+        ALWAYS_ASSERT_COND_IN_TXN(t0, v == Encode(*vs[i - 1]));
+        if (i == 1)
+          EncodeDelta(d, v, v1, FIELDS(2));
+        else
+          EncodeDelta(d, v, v2, FIELDS(0));
+        btr.put_delta(t0, u64_varkey(0), d);
+        AssertSuccessfulCommit(t0);
+      }
+      string v;
+      ALWAYS_ASSERT_COND_IN_TXN(t1, btr.search(t1, u64_varkey(0), v));
+      ALWAYS_ASSERT_COND_IN_TXN(t1, v == Encode(v0));
+      AssertSuccessfulCommit(t1);
+    }
+
+    // a delta over a value which changed since is not committed
+    {
+      TxnType<Traits> t0(txn_flags, arena), t1(txn_flags, arena);
+      string v, d;
+      ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(0), v));
+      const string e = Encode(v0);
+      btr.insert(t1, u64_varkey(0), (const uint8_t *) e.data(), e.size());
+      AssertSuccessfulCommit(t1);
+      btr.put_delta(t0, u64_varkey(0), EncodeDelta(d, v, v1, FIELDS(0)));
+      AssertFailedCommit(t0);
+    }
+
+    {
+      TxnType<Traits> t(txn_flags, arena);
+      string v;
+      ALWAYS_ASSERT_COND_IN_TXN(t, btr.search(t, u64_varkey(0), v));
+      ALWAYS_ASSERT_COND_IN_TXN(t, v == Encode(v0));
+      AssertSuccessfulCommit(t);
+    }
+
+    txn_epoch_sync<TxnType>::sync();
+    txn_epoch_sync<TxnType>::finish();
+  }
+}
+
 namespace test_typed_btree_ns {
 
 static const pair<testrec::key, testrec::value> scan_values[] = {
@@ -1767,6 +2250,108 @@ mp_test_batch_processing()
   }
 }
 
+namespace mp_test_read_lock_deadlock_ns {
+
+  // exposes the tuple a key maps to
+  template <template <typename> class TxnType>
+  class probe_btree : public txn_btree<TxnType> {
+  public:
+    const dbtuple *
+    tuple_of(uint64_t k)
+    {
+      typename concurrent_btree::value_type v{};
+      ALWAYS_ASSERT(this->underlying_btree.search(u64_varkey(k), v));
+      return reinterpret_cast<const dbtuple *>(v);
+    }
+  };
+
+  // writes both keys in one txn
+  template <template <typename> class TxnType, typename Traits>
+  class write_worker : public txn_btree_worker<TxnType> {
+  public:
+    write_worker(txn_btree<TxnType> &btr, uint64_t k0, uint64_t k1)
+      : txn_btree_worker<TxnType>(btr, 0), k0(k0), k1(k1), committed(false) {}
+    virtual void run()
+    {
+      typename Traits::StringAllocator arena;
+      TxnType<Traits> t(this->txn_flags, arena);
+      this->btr->insert_object(t, u64_varkey(k0), rec(1));
+      this->btr->insert_object(t, u64_varkey(k1), rec(1));
+      committed = t.commit(false);
+    }
+    const uint64_t k0;
+    const uint64_t k1;
+    bool committed;
+  };
+}
+
+// transaction_proto2 only: t0 locks key x when read, while a writer, in
+// commit, holds write intent on key z and waits for x. t0 then reading z
+// must not wait for the writer, but abort (and let it commit)
+template <template <typename> class TxnType, typename Traits>
+static void
+mp_test_read_lock_deadlock()
+{
+  using namespace mp_test_read_lock_deadlock_ns;
+
+  probe_btree<TxnType> btr;
+  typename Traits::StringAllocator arena;
+  {
+    TxnType<Traits> t(0, arena);
+    for (uint64_t i = 0; i < 3; i++)
+      btr.insert_object(t, u64_varkey(i), rec(0));
+    AssertSuccessfulCommit(t);
+  }
+
+  // a failed commit (on key 2) makes this thread pessimistic
+  transaction_proto2_static::SetPessimisticAfterAborts(1);
+  {
+    TxnType<Traits> t0(0, arena), t1(0, arena);
+    string v0;
+    ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(2), v0));
+    btr.insert_object(t1, u64_varkey(2), rec(1));
+    AssertSuccessfulCommit(t1);
+    btr.insert_object(t0, u64_varkey(2), rec(2));
+    AssertFailedCommit(t0);
+  }
+
+  // the writer locks its records in address order: z is the one it locks
+  // first
+  const dbtuple * const tuple0 = btr.tuple_of(0);
+  const dbtuple * const tuple1 = btr.tuple_of(1);
+  const uint64_t z = tuple0 < tuple1 ? 0 : 1;
+  const uint64_t x = 1 - z;
+  const dbtuple * const ztuple = z ? tuple1 : tuple0;
+
+  TxnType<Traits> t0(0, arena);
+  string v;
+  ALWAYS_ASSERT_COND_IN_TXN(t0, btr.search(t0, u64_varkey(x), v));
+
+  // once z is write intent locked, the writer waits for x, which t0 holds
+  write_worker<TxnType, Traits> w(btr, x, z);
+  w.start();
+  while (!ztuple->is_write_intent())
+    nop_pause();
+
+  bool aborted = false;
+  try {
+    btr.search(t0, u64_varkey(z), v);
+  } catch (transaction_abort_exception &e) {
+    ALWAYS_ASSERT(e.get_reason() ==
+                  transaction_base::ABORT_REASON_UNSTABLE_READ);
+    aborted = true;
+  }
+  ALWAYS_ASSERT(aborted);
+  w.join();
+  ALWAYS_ASSERT(w.committed);
+  transaction_proto2_static::SetPessimisticAfterAborts(0);
+
+  txn_epoch_sync<TxnType>::sync();
+  txn_epoch_sync<TxnType>::finish();
+
+  cerr << "mp_test_read_lock_deadlock passed" << endl;
+}
+
 namespace read_only_perf_ns {
   const size_t nkeys = 140000000; // 140M
   //const size_t nkeys = 100000; // 100K
@@ -1888,7 +2473,15 @@ void txn_btree_test()
   test_absent_key_race<transaction_proto2, default_transaction_traits>();
   test_inc_value_size<transaction_proto2, default_transaction_traits>();
   test_multi_btree<transaction_proto2, default_transaction_traits>();
+  test_multi_search<transaction_proto2, default_transaction_traits>();
+  test_coroutine_txns<transaction_proto2, default_transaction_traits>();
   test_read_only_snapshot<transaction_proto2, default_transaction_traits>();
+  test_tuple_footprint<transaction_proto2, default_transaction_traits>();
+  test_put_delta<transaction_proto2, default_transaction_traits>();
+  test_put_delta<transaction_proto2, no_read_own_writes_traits>();
+  test_lock_at_read<transaction_proto2, default_transaction_traits>();
+  test_abort_attribution<transaction_proto2, default_transaction_traits>();
+  test_commit_phase_sampling<transaction_proto2, default_transaction_traits>();
   test_long_keys<transaction_proto2, default_transaction_traits>();
   test_long_keys2<transaction_proto2, default_transaction_traits>();
   test_insert_same_key<transaction_proto2, default_transaction_traits>();
@@ -1900,6 +2493,7 @@ void txn_btree_test()
   mp_test3<transaction_proto2, default_transaction_traits>();
   mp_test_simple_write_skew<transaction_proto2, default_transaction_traits>();
   mp_test_batch_processing<transaction_proto2, default_transaction_traits>();
+  mp_test_read_lock_deadlock<transaction_proto2, default_transaction_traits>();
 
   //read_only_perf<transaction_proto1>();
   //read_only_perf<transaction_proto2>();
@@ -1,7 +1,13 @@
 #ifndef _NDB_TXN_BTREE_H_
 #define _NDB_TXN_BTREE_H_
 
+#include <algorithm>
+#include <iterator>
+#include <vector>
+
 #include "base_txn_btree.h"
+#include "small_vector.h"
+#include "value_delta.h"
 
 // XXX: hacky
 extern void txn_btree_test();
@@ -161,6 +167,7 @@ struct txn_btree_ {
     const std::string * const vx = reinterpret_cast<const std::string *>(v);
     switch (mode) {
     case dbtuple::TUPLE_WRITER_NEEDS_OLD_VALUE:
+    case dbtuple::TUPLE_WRITER_LOGS_VALUE_DELTA:
       return 0;
     case dbtuple::TUPLE_WRITER_COMPUTE_NEEDED:
     case dbtuple::TUPLE_WRITER_COMPUTE_DELTA_NEEDED:
@@ -174,6 +181,34 @@ struct txn_btree_ {
     return 0;
   }
 
+  // v is a value delta (see value_delta.h), patched into the old value in
+  // place, and logged as is. a tuple without an old value (only possible if
+  // the txn is bound to fail validation, see txn_btree::put_delta()) gets
+  // one of the right size, with its bytes left unspecified
+  static size_t
+  delta_tuple_writer(dbtuple::TupleWriterMode mode, const void *v, uint8_t *p, size_t sz)
+  {
+    const std::string * const dx = reinterpret_cast<const std::string *>(v);
+    switch (mode) {
+    case dbtuple::TUPLE_WRITER_NEEDS_OLD_VALUE:
+    case dbtuple::TUPLE_WRITER_LOGS_VALUE_DELTA:
+      return 1;
+    case dbtuple::TUPLE_WRITER_COMPUTE_NEEDED:
+      return std::max(value_delta::NewSize(*dx, sz), size_t(1));
+    case dbtuple::TUPLE_WRITER_COMPUTE_DELTA_NEEDED:
+      return dx->size();
+    case dbtuple::TUPLE_WRITER_DO_WRITE:
+      if (likely(sz))
+        value_delta::Apply(p, *dx);
+      return 0;
+    case dbtuple::TUPLE_WRITER_DO_DELTA_WRITE:
+      NDB_MEMCPY(p, dx->data(), dx->size());
+      return 0;
+    }
+    ALWAYS_ASSERT(false);
+    return 0;
+  }
+
   typedef std::string Key;
   typedef key_reader KeyReader;
   typedef key_writer KeyWriter;
@@ -288,6 +323,7 @@ public:
     : super_type(value_size_hint, mostly_append, name)
   {}
 
+  // searches k as is, without making a string of it
   template <typename Traits>
   inline bool
   search(Transaction<Traits> &t,
@@ -295,7 +331,8 @@ public:
          value_type &v,
          size_t max_bytes_read = string_type::npos)
   {
-    return search(t, to_string_type(k), v, max_bytes_read);
+    single_value_reader_type r(&v, max_bytes_read);
+    return this->do_search_varkey(t, k, r);
   }
 
   // either returns false or v is set to not-empty with value
@@ -311,6 +348,26 @@ public:
     return this->do_search(t, k, r);
   }
 
+  // searches keys[0, n) at once (see do_multi_search()): found[i] tells
+  // whether keys[i] was found, and if so vs[i] holds its value
+  template <typename Traits>
+  inline void
+  multi_search(Transaction<Traits> &t,
+               const key_type *keys,
+               size_t n,
+               value_type *vs,
+               bool *found,
+               size_type max_bytes_read = string_type::npos)
+  {
+    if (!n)
+      return;
+    small_vector<single_value_reader_type,
+                 concurrent_btree::PrefetchSearchBatch> rs;
+    for (size_t i = 0; i < n; i++)
+      rs.emplace_back(&vs[i], max_bytes_read);
+    this->do_multi_search(t, keys, n, &rs[0], found);
+  }
+
   template <typename Traits>
   inline void
   search_range_call(Transaction<Traits> &t,
@@ -424,6 +481,49 @@ public:
         txn_btree_::tuple_writer, true);
   }
 
+  template <typename Traits>
+  inline void
+  insert(Transaction<Traits> &t, const varkey &k, const value_type &v)
+  {
+    INVARIANT(!v.empty());
+    this->do_tree_put(
+        t, stablize(t, k), stablize(t, v),
+        txn_btree_::tuple_writer, true);
+  }
+
+  // puts the value which the value delta d (see value_delta.h) makes of k's
+  // current one, writing (and logging) only the bytes d covers. the txn
+  // must have read k, found it, and not written it since: d is taken to be
+  // relative to the value read, which commit validates is still the latest.
+  // txns which read their own writes put the whole value instead
+  template <typename Traits>
+  inline void
+  put_delta(Transaction<Traits> &t, const key_type &k, const std::string &d)
+  {
+    INVARIANT(d.size() >= value_delta::HeaderSize);
+    if (Traits::read_own_writes) {
+      value_type v;
+      if (unlikely(!search(t, k, v))) {
+        // removed since the txn read it
+        t.abort();
+        throw transaction_abort_exception(transaction_base::ABORT_REASON_USER);
+      }
+      ALWAYS_ASSERT(value_delta::FailsafeApply(v, d));
+      put(t, k, v);
+      return;
+    }
+    this->do_tree_put(
+        t, stablize(t, k), stablize(t, d),
+        txn_btree_::delta_tuple_writer, false);
+  }
+
+  template <typename Traits>
+  inline void
+  put_delta(Transaction<Traits> &t, const varkey &k, const std::string &d)
+  {
+    put_delta(t, to_string_type(k), d);
+  }
+
   // insert() methods below are for legacy use
 
   template <typename Traits>
@@ -476,6 +576,99 @@ public:
     this->do_tree_put(t, stablize(t, k), nullptr, txn_btree_::tuple_writer, false);
   }
 
+  // bulk loading: records are made by bulk_record() (on any thread), and
+  // later built into the tree by bulk_load()
+  typedef std::pair<std::string, dbtuple *> bulk_record_t;
+
+  // the record k => v, made outside of any txn. its tuple is committed at
+  // MIN_TID, so every txn can read it once it is in the tree
+  inline bulk_record_t
+  bulk_record(const key_type &k, const value_type &v) const
+  {
+    INVARIANT(!v.empty());
+    dbtuple * const tuple = dbtuple::alloc_first(v.size(), false);
+    txn_btree_::tuple_writer(
+        dbtuple::TUPLE_WRITER_DO_WRITE, &v, tuple->get_value_start(), 0);
+    tuple->version = dbtuple::MIN_TID;
+#ifdef TUPLE_CHECK_KEY
+    tuple->key.assign(k.data(), k.size());
+    tuple->tree = (void *) &this->underlying_btree;
+#endif
+    return bulk_record_t(k, tuple);
+  }
+
+  /**
+   * Builds the tree bottom-up (see concurrent_btree::bulk_load()) from runs
+   * of records, e.g. one per loader thread. each run is sorted first, unless
+   * it already is, and the runs are merged. a key which appears more than
+   * once maps to its last record (runs are ordered, as are records within
+   * a run), as if the records had been inserted in order. runs are cleared.
+   *
+   * Is not transactional (nothing is logged), and NOT THREAD SAFE: no txn
+   * may use the tree until it returns. the tree must be empty
+   */
+  void
+  bulk_load(std::vector<std::vector<bulk_record_t>> &runs,
+            double fill_factor = 1.0)
+  {
+    const auto key_less =
+      [](const bulk_record_t &a, const bulk_record_t &b) {
+        return a.first < b.first;
+      };
+    std::vector<bulk_record_t> records;
+    size_t n = 0;
+    for (auto &run : runs)
+      n += run.size();
+    records.reserve(n);
+    std::vector<size_t> bounds(1, 0); // of the runs, in records
+    for (auto &run : runs) {
+      if (run.empty())
+        continue;
+      if (!std::is_sorted(run.begin(), run.end(), key_less))
+        std::stable_sort(run.begin(), run.end(), key_less);
+      records.insert(records.end(),
+                     std::make_move_iterator(run.begin()),
+                     std::make_move_iterator(run.end()));
+      std::vector<bulk_record_t>().swap(run);
+      bounds.push_back(records.size());
+    }
+    // merge neighbouring runs pairwise, so a record moves log(#runs) times
+    while (bounds.size() > 2) {
+      std::vector<size_t> merged(1, 0);
+      for (size_t i = 2; i < bounds.size(); i += 2) {
+        std::inplace_merge(records.begin() + bounds[i - 2],
+                           records.begin() + bounds[i - 1],
+                           records.begin() + bounds[i], key_less);
+        merged.push_back(bounds[i]);
+      }
+      if (!(bounds.size() % 2))
+        merged.push_back(bounds.back());
+      bounds.swap(merged);
+    }
+
+    std::vector<typename concurrent_btree::bulk_entry_t> entries;
+    entries.reserve(records.size());
+    for (size_t i = 0; i < records.size(); i++) {
+      if (i + 1 < records.size() &&
+          records[i].first == records[i + 1].first) {
+        dbtuple * const tuple = records[i].second;
+#ifdef CHECK_INVARIANTS
+        tuple->lock(true);
+#endif
+        tuple->clear_latest();
+#ifdef CHECK_INVARIANTS
+        tuple->unlock();
+#endif
+        dbtuple::release_no_rcu(tuple);
+        continue;
+      }
+      entries.emplace_back(
+          varkey(records[i].first),
+          (typename concurrent_btree::value_type) records[i].second);
+    }
+    this->underlying_btree.bulk_load(entries, fill_factor);
+  }
+
   static void Test();
 
 };
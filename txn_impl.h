@@ -22,6 +22,7 @@ transaction<Protocol, Traits>::~transaction()
   // transaction shouldn't fall out of scope w/o resolution
   // resolution means TXN_EMBRYO, TXN_COMMITED, and TXN_ABRT
   INVARIANT(state != TXN_ACTIVE);
+  INVARIANT(read_locks.empty());
   INVARIANT(rcu::s_instance.in_rcu_region());
   const unsigned cur_depth = rcu_guard_->sync()->depth();
   rcu_guard_.destroy();
@@ -73,6 +74,7 @@ transaction<Protocol, Traits>::abort_impl(abort_reason reason)
       tuple->unlock();
     }
   }
+  release_read_locks();
 
   clear();
 }
@@ -103,6 +105,52 @@ transaction<Protocol, Traits>::cleanup_inserted_tuple_marker(
   dbtuple::release(marker); // rcu free
 }
 
+template <template <typename> class Protocol, typename Traits>
+void
+transaction<Protocol, Traits>::lock_at_read(dbtuple *tuple)
+{
+  // uncommitted inserts are locked by their txn (maybe this one) already
+  if (tuple->version == dbtuple::MAX_TID)
+    return;
+  for (auto t : read_locks)
+    if (t == tuple)
+      return;
+  // w/o write intent, so readers (and their validation) are not disturbed
+  if (likely(tuple->try_lock(false, ReadLockSpins))) {
+    read_locks.push_back(tuple);
+    ++g_evt_read_locks;
+  } else {
+    // read optimistically instead
+    ++g_evt_read_lock_failed;
+  }
+}
+
+template <template <typename> class Protocol, typename Traits>
+bool
+transaction<Protocol, Traits>::take_read_lock(const dbtuple *tuple)
+{
+  for (size_t i = 0; i < read_locks.size(); i++) {
+    if (read_locks[i] == tuple) {
+      read_locks[i] = read_locks.back();
+      read_locks.pop_back();
+      return true;
+    }
+  }
+  return false;
+}
+
+template <template <typename> class Protocol, typename Traits>
+void
+transaction<Protocol, Traits>::release_read_locks()
+{
+  for (auto t : read_locks) {
+    INVARIANT(t->is_locked());
+    INVARIANT(!t->is_write_intent());
+    t->unlock();
+  }
+  read_locks.clear();
+}
+
 namespace {
   inline const char *
   transaction_state_to_cstr(transaction_base::txn_state state)
@@ -193,7 +241,8 @@ template <template <typename> class Protocol, typename Traits>
 bool
 transaction<Protocol, Traits>::handle_last_tuple_in_group(
     dbtuple_write_info &last,
-    bool did_group_insert)
+    bool did_group_insert,
+    bool try_lock)
 {
   if (did_group_insert) {
     // don't need to lock
@@ -215,7 +264,17 @@ transaction<Protocol, Traits>::handle_last_tuple_in_group(
       // again in sorted order
       return false; // signal abort
     }
-    const dbtuple::version_t v = tuple->lock(true); // lock for write
+    dbtuple::version_t v;
+    if (unlikely(take_read_lock(tuple))) {
+      // locked when read, so only needs the write intent
+      v = tuple->mark_write_intent();
+    } else if (unlikely(try_lock)) {
+      if (!tuple->try_lock(true, ReadLockSpins))
+        return false; // signal abort
+      v = tuple->unstable_version();
+    } else {
+      v = tuple->lock(true); // lock for write
+    }
     INVARIANT(dbtuple::IsLatest(v) == tuple->is_latest());
     last.mark_locked();
     if (unlikely(!dbtuple::IsLatest(v) ||
@@ -255,6 +314,7 @@ transaction<Protocol, Traits>::commit(bool doThrow)
 
   dbtuple_write_info_vec write_dbtuples;
   std::pair<bool, tid_t> commit_tid(false, 0);
+  commit_phase_timer phase_timer(!is_snapshot());
 
   // copy write tuples to vector for sorting
   if (!write_set.empty()) {
@@ -296,11 +356,16 @@ transaction<Protocol, Traits>::commit(bool doThrow)
       typename dbtuple_write_info_vec::iterator it_end = write_dbtuples.end();
       dbtuple_write_info *last_px = nullptr;
       bool inserted_last_run = false;
+      // locks taken at read time are not in sort order
+      const bool try_lock = !read_locks.empty();
       for (; it != it_end; last_px = &(*it), ++it) {
         if (likely(last_px && last_px->tuple != it->tuple)) {
           // on boundary
-          if (unlikely(!handle_last_tuple_in_group(*last_px, inserted_last_run))) {
+          if (unlikely(!handle_last_tuple_in_group(
+                  *last_px, inserted_last_run, try_lock))) {
+            cast()->on_contended_tuple(last_px->get_tuple());
             abort_trap((reason = ABORT_REASON_WRITE_NODE_INTERFERENCE));
+            attribute_abort(last_px->get_tuple(), reason);
             goto do_abort;
           }
           inserted_last_run = false;
@@ -317,19 +382,25 @@ transaction<Protocol, Traits>::commit(bool doThrow)
         }
       }
       if (likely(last_px) &&
-          unlikely(!handle_last_tuple_in_group(*last_px, inserted_last_run))) {
+          unlikely(!handle_last_tuple_in_group(
+              *last_px, inserted_last_run, try_lock))) {
+        cast()->on_contended_tuple(last_px->get_tuple());
         abort_trap((reason = ABORT_REASON_WRITE_NODE_INTERFERENCE));
+        attribute_abort(last_px->get_tuple(), reason);
         goto do_abort;
       }
+      phase_timer.end_phase(COMMIT_PHASE_LOCK);
       commit_tid.first = true;
       PERF_DECL(
           static std::string probe5_name(
             std::string(__PRETTY_FUNCTION__) + std::string(":gen_commit_tid:")));
       ANON_REGION(probe5_name.c_str(), &transaction_base::g_txn_commit_probe5_cg);
       commit_tid.second = cast()->gen_commit_tid(write_dbtuples);
+      phase_timer.end_phase(COMMIT_PHASE_GEN_TID);
       VERBOSE(std::cerr << "commit tid: " << g_proto_version_str(commit_tid.second) << std::endl);
     } else {
       VERBOSE(std::cerr << "commit tid: <read-only>" << std::endl);
+      phase_timer.end_phase(COMMIT_PHASE_LOCK);
     }
 
     // do read validation
@@ -362,10 +433,13 @@ transaction<Protocol, Traits>::commit(bool doThrow)
 
           //std::cerr << "failed tuple: " << *it->get_tuple() << std::endl;
 
+          cast()->on_contended_tuple(it->get_tuple());
           abort_trap((reason = ABORT_REASON_READ_NODE_INTEREFERENCE));
+          attribute_abort(it->get_tuple(), reason);
           goto do_abort;
         }
       }
+      phase_timer.end_phase(COMMIT_PHASE_READ_VALIDATION);
 
       // check btree versions have not changed
       if (!absent_set.empty()) {
@@ -377,10 +451,12 @@ transaction<Protocol, Traits>::commit(bool doThrow)
             VERBOSE(std::cerr << "expected node " << util::hexify(it->first) << " at v="
                               << it->second.version << ", got v=" << v << std::endl);
             abort_trap((reason = ABORT_REASON_NODE_SCAN_READ_VERSION_CHANGED));
+            attribute_abort(it->first, reason);
             goto do_abort;
           }
         }
       }
+      phase_timer.end_phase(COMMIT_PHASE_NODE_VALIDATION);
     }
 
     // commit actual records
@@ -449,8 +525,11 @@ transaction<Protocol, Traits>::commit(bool doThrow)
           INVARIANT(!it->is_insert());
       }
     }
+    release_read_locks();
+    phase_timer.end_phase(COMMIT_PHASE_INSTALL);
   }
   state = TXN_COMMITED;
+  phase_timer.committed();
   if (commit_tid.first)
     cast()->on_tid_finish(commit_tid.second);
   clear();
@@ -478,6 +557,7 @@ do_abort:
       INVARIANT(!it->is_insert());
     }
   }
+  release_read_locks();
 
   state = TXN_ABRT;
   if (commit_tid.first)
@@ -495,6 +575,28 @@ do_abort:
 #endif
 }
 
+template <template <typename> class Protocol, typename Traits>
+void
+transaction<Protocol, Traits>::attribute_abort(
+    const void *obj, abort_reason r)
+{
+  if (likely(!cast()->attributes_aborts()))
+    return;
+  // a write of ours we could not lock
+  for (auto &w : write_set)
+    if (w.get_tuple() == obj) {
+      cast()->on_abort_cause(w.get_btree(), w.get_key(), r);
+      return;
+    }
+  // the latest read of obj
+  for (auto it = read_origins.rbegin(); it != read_origins.rend(); ++it)
+    if (it->obj_ == obj) {
+      cast()->on_abort_cause(it->btr_, it->key_, r);
+      return;
+    }
+  cast()->on_abort_cause(nullptr, std::string(), r);
+}
+
 template <template <typename> class Protocol, typename Traits>
 std::pair< dbtuple *, bool >
 transaction<Protocol, Traits>::try_insert_new_tuple(
@@ -549,6 +651,8 @@ transaction<Protocol, Traits>::try_insert_new_tuple(
     if (it != absent_set.end()) {
       if (unlikely(it->second.version != insert_info.old_version)) {
         abort_trap((reason = ABORT_REASON_WRITE_NODE_INTERFERENCE));
+        if (cast()->attributes_aborts())
+          cast()->on_abort_cause(&btr, *key, reason);
         return std::make_pair(tuple, true);
       }
       VERBOSE(std::cerr << "bump node=" << util::hexify(it->first) << " from v=" << insert_info.old_version
@@ -591,21 +695,30 @@ transaction<Protocol, Traits>::do_tuple_read(
     }
   }
 
+  if (!is_snapshot_txn && unlikely(cast()->should_lock_at_read(tuple)))
+    lock_at_read(const_cast<dbtuple *>(tuple));
+
   // do the actual tuple read
   dbtuple::ReadStatus stat;
   {
     PERF_DECL(static std::string probe0_name(std::string(__PRETTY_FUNCTION__) + std::string(":do_read:")));
     ANON_REGION(probe0_name.c_str(), &private_::txn_btree_search_probe0_cg);
     tuple->prefetch();
-    stat = tuple->stable_read(snapshot_tid, start_t, value_reader, this->string_allocator(), is_snapshot_txn);
+    // a txn holding read locks may not wait on a writer for long: the
+    // writer may be waiting (in commit) for one of those locks
+    const unsigned int max_spins = read_locks.empty() ? 0 : ReadLockSpins;
+    stat = tuple->stable_read(snapshot_tid, start_t, value_reader, this->string_allocator(), is_snapshot_txn, max_spins);
     if (unlikely(stat == dbtuple::READ_FAILED)) {
       const transaction_base::abort_reason r = transaction_base::ABORT_REASON_UNSTABLE_READ;
+      cast()->on_contended_tuple(tuple);
+      attribute_abort(tuple, r);
       abort_impl(r);
       throw transaction_abort_exception(r);
     }
   }
   if (unlikely(!cast()->can_read_tid(start_t))) {
     const transaction_base::abort_reason r = transaction_base::ABORT_REASON_FUTURE_TID_READ;
+    attribute_abort(tuple, r);
     abort_impl(r);
     throw transaction_abort_exception(r);
   }
@@ -635,6 +748,7 @@ transaction<Protocol, Traits>::do_node_read(
   } else if (it->second.version != v) {
     const transaction_base::abort_reason r =
       transaction_base::ABORT_REASON_NODE_SCAN_READ_VERSION_CHANGED;
+    attribute_abort(n, r);
     abort_impl(r);
     throw transaction_abort_exception(r);
   }
@@ -1,5 +1,8 @@
 #include <iostream>
+#include <fstream>
 #include <thread>
+#include <mutex>
+#include <tuple>
 #include <fcntl.h>
 #include <unistd.h>
 #include <sys/uio.h>
@@ -9,6 +12,7 @@
 #include "txn_proto2_impl.h"
 #include "counter.h"
 #include "util.h"
+#include "topology.h"
 
 using namespace std;
 using namespace util;
@@ -19,11 +23,20 @@ bool txn_logger::g_persist = false;
 bool txn_logger::g_call_fsync = true;
 bool txn_logger::g_use_compression = false;
 bool txn_logger::g_fake_writes = false;
+uint64_t txn_logger::g_group_commit_us = 0;
+size_t txn_logger::g_group_commit_bytes = 0;
+string txn_logger::g_catalog_fname;
+int txn_logger::g_pepoch_fd = -1;
+txn_logger::table_slot txn_logger::g_table_slots[txn_logger::g_max_tables];
 size_t txn_logger::g_nworkers = 0;
 txn_logger::epoch_array
   txn_logger::per_thread_sync_epochs_[txn_logger::g_nmax_loggers];
 aligned_padded_elem<atomic<uint64_t>>
   txn_logger::system_sync_epoch_(0);
+txn_logger::epoch_array
+  txn_logger::per_thread_sync_tids_[txn_logger::g_nmax_loggers];
+aligned_padded_elem<atomic<uint64_t>>
+  txn_logger::system_sync_tid_(0);
 percore<txn_logger::persist_ctx>
   txn_logger::g_persist_ctxs;
 percore<txn_logger::persist_stats>
@@ -40,6 +53,10 @@ event_counter
   txn_logger::g_evt_logger_writev_limit_met("logger_writev_limit_met");
 event_counter
   txn_logger::g_evt_logger_max_lag_wait("logger_max_lag_wait");
+event_counter
+  txn_logger::g_evt_log_buffer_group_commit("log_buffer_group_commit");
+event_counter
+  txn_logger::g_evt_logger_flush_ring_full("logger_flush_ring_full");
 event_avg_counter
   txn_logger::g_evt_avg_log_buffer_compress_time_us("avg_log_buffer_compress_time_us");
 event_avg_counter
@@ -52,6 +69,69 @@ event_avg_counter
 static event_avg_counter
   evt_avg_log_buffer_iov_len("avg_log_buffer_iov_len");
 
+// names of the registered tables, indexed by (table id - 1)
+static mutex g_tables_lock;
+static vector<string> g_table_names;
+
+void
+txn_logger::RegisterTable(const concurrent_btree *btr, const string &name)
+{
+  std::lock_guard<mutex> l(g_tables_lock);
+  ALWAYS_ASSERT(g_table_names.size() < g_max_tables / 2);
+  g_table_names.push_back(name);
+  const uint32_t id = g_table_names.size();
+  size_t i = TableSlot(btr);
+  for (;;) {
+    const concurrent_btree *p =
+      g_table_slots[i].btr_.load(memory_order_acquire);
+    if (p == btr || !p)
+      break;
+    i = (i + 1) % g_max_tables;
+  }
+  // publish the id before the key, so TableId() never sees a stale id for
+  // a newly inserted key
+  g_table_slots[i].id_.store(id, memory_order_release);
+  g_table_slots[i].btr_.store(btr, memory_order_release);
+  if (!g_catalog_fname.empty())
+    write_catalog();
+}
+
+string
+txn_logger::TableName(const concurrent_btree *btr)
+{
+  const uint32_t id = TableId(btr);
+  std::lock_guard<mutex> l(g_tables_lock);
+  if (!id || id > g_table_names.size())
+    return "<unknown>";
+  return g_table_names[id - 1];
+}
+
+void
+txn_logger::write_catalog()
+{
+  const string tmpname = g_catalog_fname + ".tmp";
+  {
+    ofstream out(tmpname.c_str(), ios::out | ios::trunc);
+    out << "compress " << g_use_compression << endl;
+    for (size_t i = 0; i < g_table_names.size(); i++)
+      out << "table " << (i + 1) << " " << g_table_names[i] << endl;
+    ALWAYS_ASSERT(out.good());
+  }
+  if (g_call_fsync) {
+    const int fd = open(tmpname.c_str(), O_RDONLY);
+    ALWAYS_ASSERT(fd != -1);
+    if (fsync(fd) == -1) {
+      perror("fsync");
+      ALWAYS_ASSERT(false);
+    }
+    close(fd);
+  }
+  if (rename(tmpname.c_str(), g_catalog_fname.c_str()) == -1) {
+    perror("rename");
+    ALWAYS_ASSERT(false);
+  }
+}
+
 void
 txn_logger::Init(
     size_t nworkers,
@@ -60,7 +140,10 @@ txn_logger::Init(
     vector<vector<unsigned>> *assignments_used,
     bool call_fsync,
     bool use_compression,
-    bool fake_writes)
+    bool fake_writes,
+    uint64_t group_commit_us,
+    size_t group_commit_bytes,
+    log_writer::backend writer_backend)
 {
   INVARIANT(!g_persist);
   INVARIANT(g_nworkers == 0);
@@ -68,53 +151,66 @@ txn_logger::Init(
   INVARIANT(!logfiles.empty());
   INVARIANT(logfiles.size() <= g_nmax_loggers);
   INVARIANT(!use_compression || g_perthread_buffers > 1); // need 1 as scratch buf
-  vector<int> fds;
-  for (auto &fname : logfiles) {
-    int fd = open(fname.c_str(), O_CREAT|O_WRONLY|O_TRUNC, 0664);
-    if (fd == -1) {
-      perror("open");
-      ALWAYS_ASSERT(false);
-    }
-    fds.push_back(fd);
+  INVARIANT(!group_commit_bytes || group_commit_us);
+  // never freed, like the logger threads which use them
+  vector<log_writer *> log_writers;
+  for (auto &fname : logfiles)
+    log_writers.push_back(log_writer::Make(writer_backend, fname, call_fsync));
+  g_pepoch_fd = open(PersistentEpochFileName(logfiles[0]).c_str(),
+                     O_CREAT|O_WRONLY|O_TRUNC, 0664);
+  if (g_pepoch_fd == -1) {
+    perror("open");
+    ALWAYS_ASSERT(false);
   }
   g_persist = true;
   g_call_fsync = call_fsync;
   g_use_compression = use_compression;
   g_fake_writes = fake_writes;
+  g_group_commit_us = group_commit_us;
+  // by default, a buffer only goes out early when its time is up
+  g_group_commit_bytes = group_commit_bytes ? group_commit_bytes : g_buffer_size;
   g_nworkers = nworkers;
 
+  {
+    std::lock_guard<mutex> l(g_tables_lock);
+    g_catalog_fname = CatalogFileName(logfiles[0]);
+    write_catalog();
+  }
+
   for (size_t i = 0; i < g_nmax_loggers; i++)
-    for (size_t j = 0; j < g_nworkers; j++)
+    for (size_t j = 0; j < g_nworkers; j++) {
       per_thread_sync_epochs_[i].epochs_[j].store(0, memory_order_release);
+      per_thread_sync_tids_[i].epochs_[j].store(0, memory_order_release);
+    }
 
   vector<thread> writers;
   vector<vector<unsigned>> assignments(assignments_given);
 
   if (assignments.empty()) {
     // compute assuming homogenous disks
-    if (g_nworkers <= fds.size()) {
+    if (g_nworkers <= log_writers.size()) {
       // each thread gets its own logging worker
       for (size_t i = 0; i < g_nworkers; i++)
         assignments.push_back({(unsigned) i});
     } else {
       // XXX: currently we assume each logger is equally as fast- we should
       // adjust ratios accordingly for non-homogenous loggers
-      const size_t threads_per_logger = g_nworkers / fds.size();
-      for (size_t i = 0; i < fds.size(); i++) {
+      const size_t threads_per_logger = g_nworkers / log_writers.size();
+      for (size_t i = 0; i < log_writers.size(); i++) {
         assignments.emplace_back(
             MakeRange<unsigned>(
               i * threads_per_logger,
-              ((i + 1) == fds.size()) ?  g_nworkers : (i + 1) * threads_per_logger));
+              ((i + 1) == log_writers.size()) ?  g_nworkers : (i + 1) * threads_per_logger));
       }
     }
   }
 
-  INVARIANT(AssignmentsValid(assignments, fds.size(), g_nworkers));
+  INVARIANT(AssignmentsValid(assignments, log_writers.size(), g_nworkers));
 
   for (size_t i = 0; i < assignments.size(); i++) {
     writers.emplace_back(
         &txn_logger::writer,
-        i, fds[i], assignments[i]);
+        i, log_writers[i], assignments[i]);
     writers.back().detach();
   }
 
@@ -130,9 +226,10 @@ txn_logger::persister(
     vector<vector<unsigned>> assignments)
 {
   timer loop_timer;
+  const uint64_t delay_time_usec =
+    IsGroupCommitEnabled() ? g_group_commit_us : ticker::tick_us();
   for (;;) {
     const uint64_t last_loop_usec = loop_timer.lap();
-    const uint64_t delay_time_usec = ticker::tick_us;
     if (last_loop_usec < delay_time_usec) {
       const uint64_t sleep_ns = (delay_time_usec - last_loop_usec) * 1000;
       struct timespec t;
@@ -144,11 +241,55 @@ txn_logger::persister(
   }
 }
 
+uint64_t
+txn_logger::EpochMaxTid(uint64_t e)
+{
+  typedef transaction_proto2_static tps;
+  return tps::MakeTid(tps::CoreMask, tps::NumIdMask >> tps::NumIdShift, e);
+}
+
+void
+txn_logger::release_flushed_txns(uint64_t tid)
+{
+  const uint64_t now_us = timer::cur_usec();
+  for (size_t i = 0; i < g_persist_stats.size(); i++) {
+    auto &ps = g_persist_stats[i];
+    const uint64_t head = ps.flush_head_.load(memory_order_acquire);
+    uint64_t tail = ps.flush_tail_.load(memory_order_acquire);
+    for (; tail != head; tail++) {
+      const persist_stats::flush_record &f = ps.flushes_[tail % g_max_flushes];
+      // a core's buffers are flushed in TID order
+      if (f.last_tid_ > tid)
+        break;
+      INVARIANT(now_us >= f.earliest_start_us_);
+      non_atomic_fetch_add(ps.ntxns_persisted_, f.ntxns_);
+      non_atomic_fetch_add(
+          ps.latency_numer_,
+          (now_us - f.earliest_start_us_) * f.ntxns_);
+      ps.latency_hist_.add(now_us - f.earliest_start_us_, f.ntxns_);
+    }
+    ps.flush_tail_.store(tail, memory_order_release);
+  }
+}
+
 void
 txn_logger::advance_system_sync_epoch(
     const vector<vector<unsigned>> &assignments)
 {
+  typedef transaction_proto2_static tps;
+  const bool group_commit = IsGroupCommitEnabled();
+
+  // before this round adds to them
+  for (size_t i = 0; i < g_persist_stats.size(); i++) {
+    auto &ps = g_persist_stats[i];
+    if (ps.clear_latency_hist_.load(memory_order_acquire)) {
+      ps.latency_hist_.clear();
+      ps.clear_latency_hist_.store(false, memory_order_release);
+    }
+  }
+
   uint64_t min_so_far = numeric_limits<uint64_t>::max();
+  uint64_t min_tid_so_far = numeric_limits<uint64_t>::max();
   const uint64_t best_tick_ex =
     ticker::s_instance.global_current_tick();
   // special case 0
@@ -165,7 +306,11 @@ txn_logger::advance_system_sync_epoch(
         // core->logger queue is empty, then that means we can advance its sync
         // epoch up to best_tick_inc, b/c it is guaranteed that the next time
         // it does any actions will be in epoch > best_tick_inc
-        if (!ctx.persist_buffers_.peek()) {
+        //
+        // in group commit mode, txns are released before their epoch ends,
+        // so the thread must not be holding on to unpushed txns either
+        if (!ctx.persist_buffers_.peek() &&
+            (!group_commit || !has_unpushed_entries(ctx))) {
           spinlock &l = ticker::s_instance.lock_for(k);
           if (!l.is_locked()) {
             bool did_lock = false;
@@ -176,8 +321,10 @@ txn_logger::advance_system_sync_epoch(
               }
             }
             if (did_lock) {
-              if (!ctx.persist_buffers_.peek()) {
+              if (!ctx.persist_buffers_.peek() &&
+                  (!group_commit || !has_unpushed_entries(ctx))) {
                 min_so_far = min(min_so_far, best_tick_inc);
+                min_tid_so_far = min(min_tid_so_far, EpochMaxTid(best_tick_inc));
                 per_thread_sync_epochs_[i].epochs_[k].store(
                     best_tick_inc, memory_order_release);
                 l.unlock();
@@ -187,12 +334,26 @@ txn_logger::advance_system_sync_epoch(
             }
           }
         }
-        min_so_far = min(
-            per_thread_sync_epochs_[i].epochs_[k].load(
-              memory_order_acquire),
-            min_so_far);
+        const uint64_t e =
+          per_thread_sync_epochs_[i].epochs_[k].load(memory_order_acquire);
+        min_so_far = min(e, min_so_far);
+        if (group_commit)
+          min_tid_so_far = min(
+              max(per_thread_sync_tids_[i].epochs_[k].load(
+                    memory_order_acquire),
+                  EpochMaxTid(e)),
+              min_tid_so_far);
       }
 
+  if (group_commit) {
+    INVARIANT(min_tid_so_far < numeric_limits<uint64_t>::max());
+    INVARIANT(min_tid_so_far >= EpochMaxTid(min_so_far));
+    // the last epoch the persisted TID covers completely
+    const uint64_t e = tps::EpochId(min_tid_so_far);
+    min_so_far = (min_tid_so_far == EpochMaxTid(e) || !e) ? e : (e - 1);
+    release_flushed_txns(min_tid_so_far);
+  }
+
   const uint64_t syssync =
     system_sync_epoch_->load(memory_order_acquire);
 
@@ -212,21 +373,48 @@ txn_logger::advance_system_sync_epoch(
         non_atomic_fetch_add(
             ps.latency_numer_,
             (now_us - start_us) * ntxns_in_epoch);
+        if (ntxns_in_epoch)
+          ps.latency_hist_.add(now_us - start_us, ntxns_in_epoch);
         pes.ntxns_.store(0, memory_order_release);
         pes.earliest_start_us_.store(0, memory_order_release);
     }
   }
 
   system_sync_epoch_->store(min_so_far, memory_order_release);
+  const uint64_t syssync_tid =
+    system_sync_tid_->load(memory_order_acquire);
+  if (group_commit)
+    system_sync_tid_->store(min_tid_so_far, memory_order_release);
+
+  // the writers have already synced every log buffer up to min_so_far (and
+  // min_tid_so_far), so it is safe to advertise it to recovery
+  if ((min_so_far > syssync ||
+       (group_commit && min_tid_so_far > syssync_tid)) &&
+      !g_fake_writes) {
+    const uint64_t pepoch[2] = {min_so_far, min_tid_so_far};
+    const size_t n = (group_commit ? 2 : 1) * sizeof(uint64_t);
+    if (unlikely(pwrite(g_pepoch_fd, &pepoch[0], n, 0) != ssize_t(n))) {
+      perror("pwrite");
+      ALWAYS_ASSERT(false);
+    }
+    if (g_call_fsync && unlikely(fdatasync(g_pepoch_fd) == -1)) {
+      perror("fdatasync");
+      ALWAYS_ASSERT(false);
+    }
+  }
 }
 
 void
 txn_logger::writer(
-    unsigned id, int fd,
+    unsigned id, log_writer *w,
     vector<unsigned> assignment)
 {
 
-  if (g_pin_loggers_to_numa_nodes) {
+  // logger id is auxiliary thread id + 1, after the ticker
+  const int cpu = topology::AuxCpu(id + 1);
+  if (cpu >= 0) {
+    topology::PinCurrentThread(cpu);
+  } else if (g_pin_loggers_to_numa_nodes) {
     ALWAYS_ASSERT(!numa_run_on_node(id % numa_num_configured_nodes()));
     ALWAYS_ASSERT(!sched_yield());
   }
@@ -240,9 +428,15 @@ txn_logger::writer(
   // fsync in the background...
   bool sense = false; // cur is at sense, prev is at !sense
   uint64_t epoch_prefixes[2][NMAXCORES];
+  uint64_t tid_prefixes[NMAXCORES]; // group commit mode only
 
   NDB_MEMSET(&epoch_prefixes[0], 0, sizeof(epoch_prefixes[0]));
   NDB_MEMSET(&epoch_prefixes[1], 0, sizeof(epoch_prefixes[1]));
+  NDB_MEMSET(&tid_prefixes[0], 0, sizeof(tid_prefixes));
+
+  const bool group_commit = IsGroupCommitEnabled();
+  const uint64_t delay_time_usec =
+    group_commit ? g_group_commit_us : ticker::tick_us();
 
   // NOTE: a core id in the persistence system really represets
   // all cores in the regular system modulo g_nworkers
@@ -250,9 +444,8 @@ txn_logger::writer(
   for (;;) {
 
     const uint64_t last_loop_usec = loop_timer.lap();
-    const uint64_t delay_time_usec = ticker::tick_us;
-    // don't allow this loop to proceed less than an epoch's worth of time,
-    // so we can batch IO
+    // don't allow this loop to proceed less than an epoch's worth of time
+    // (or a group commit interval), so we can batch IO
     if (last_loop_usec < delay_time_usec && nbufswritten < iovs.size()) {
       const uint64_t sleep_ns = (delay_time_usec - last_loop_usec) * 1000;
       struct timespec t;
@@ -272,6 +465,7 @@ txn_logger::writer(
       INVARIANT(idx >= 0 && idx < g_nworkers);
       for (size_t k = idx; k < NMAXCORES; k += g_nworkers) {
         persist_ctx &ctx = persist_ctx_for(k, INITMODE_NONE);
+        persist_stats &ps = g_persist_stats[k];
         ctx.persist_buffers_.peekall(pxs);
         for (auto px : pxs) {
           INVARIANT(px);
@@ -288,6 +482,14 @@ txn_logger::writer(
             ++g_evt_logger_max_lag_wait;
             break;
           }
+          const uint64_t flush_head =
+            ps.flush_head_.load(memory_order_acquire);
+          if (group_commit &&
+              flush_head - ps.flush_tail_.load(memory_order_acquire) ==
+                g_max_flushes) {
+            ++g_evt_logger_flush_ring_full;
+            break;
+          }
           iovs[nbufswritten].iov_base = (void *) &px->buf_start_[0];
 
 #ifdef LOGGER_UNSAFE_REDUCE_BUFFER_SIZE
@@ -296,6 +498,7 @@ txn_logger::writer(
   #define PXLEN(px) ((px)->curoff_)
 #endif
 
+          px->header()->datasize_ = px->datasize();
           const size_t pxlen = PXLEN(px);
 
           iovs[nbufswritten].iov_len = pxlen;
@@ -323,10 +526,22 @@ txn_logger::writer(
           INVARIANT(epoch_prefixes[sense][k] <= px_epoch);
           INVARIANT(px_epoch > 0);
           epoch_prefixes[sense][k] = px_epoch - 1;
-          auto &pes = g_persist_stats[k].d_[px_epoch % g_max_lag_epochs];
-          if (!pes.ntxns_.load(memory_order_acquire))
-            pes.earliest_start_us_.store(px->earliest_start_us_, memory_order_release);
-          non_atomic_fetch_add(pes.ntxns_, px->header()->nentries_);
+          if (group_commit) {
+            // released by the persister, once the system's persisted TID
+            // reaches it (it can't before this write is synced)
+            tid_prefixes[k] = px->header()->last_tid_;
+            persist_stats::flush_record &f =
+              ps.flushes_[flush_head % g_max_flushes];
+            f.last_tid_ = px->header()->last_tid_;
+            f.ntxns_ = px->header()->nentries_;
+            f.earliest_start_us_ = px->earliest_start_us_;
+            ps.flush_head_.store(flush_head + 1, memory_order_release);
+          } else {
+            auto &pes = ps.d_[px_epoch % g_max_lag_epochs];
+            if (!pes.ntxns_.load(memory_order_acquire))
+              pes.earliest_start_us_.store(px->earliest_start_us_, memory_order_release);
+            non_atomic_fetch_add(pes.ntxns_, px->header()->nentries_);
+          }
           g_evt_avg_log_entry_ntxns.offer(px->header()->nentries_);
         }
       }
@@ -345,19 +560,8 @@ txn_logger::writer(
 #ifdef ENABLE_EVENT_COUNTERS
       timer write_timer;
 #endif
-      const ssize_t ret = writev(fd, &iovs[0], nbufswritten);
-      if (unlikely(ret == -1)) {
-        perror("writev");
-        ALWAYS_ASSERT(false);
-      }
-
-      if (g_call_fsync) {
-        const int fret = fdatasync(fd);
-        if (unlikely(fret == -1)) {
-          perror("fdatasync");
-          ALWAYS_ASSERT(false);
-        }
-      }
+      // durable on return (unless !g_call_fsync)
+      w->write(&iovs[0], nbufswritten, nbyteswritten);
 
 #ifdef ENABLE_EVENT_COUNTERS
       {
@@ -374,12 +578,16 @@ txn_logger::writer(
     // return all buffers that have been io_scheduled_ - we can do this as
     // soon as write returns. we take care to return to the proper buffer
     epoch_array &ea = per_thread_sync_epochs_[id];
+    epoch_array &ta = per_thread_sync_tids_[id];
     for (auto idx: assignment) {
       for (size_t k = idx; k < NMAXCORES; k += g_nworkers) {
         const uint64_t x0 = ea.epochs_[k].load(memory_order_acquire);
         const uint64_t x1 = epoch_prefixes[dosense][k];
         if (x1 > x0)
           ea.epochs_[k].store(x1, memory_order_release);
+        if (group_commit &&
+            tid_prefixes[k] > ta.epochs_[k].load(memory_order_acquire))
+          ta.epochs_[k].store(tid_prefixes[k], memory_order_release);
 
         persist_ctx &ctx = persist_ctx_for(k, INITMODE_NONE);
         pbuffer *px, *px0;
@@ -427,6 +635,17 @@ txn_logger::compute_ntxns_persisted_statistics()
   return make_tuple(acc, acc1, double(num)/double(acc));
 }
 
+log_histogram
+txn_logger::compute_persist_latency_histogram()
+{
+  log_histogram h;
+  for (size_t i = 0; i < g_persist_stats.size(); i++)
+    // a histogram still to be cleared only holds latencies from before
+    if (!g_persist_stats[i].clear_latency_hist_.load(memory_order_acquire))
+      h += g_persist_stats[i].latency_hist_;
+  return h;
+}
+
 void
 txn_logger::clear_ntxns_persisted_statistics()
 {
@@ -436,6 +655,12 @@ txn_logger::clear_ntxns_persisted_statistics()
     ps.ntxns_pushed_.store(0, memory_order_release);
     ps.ntxns_committed_.store(0, memory_order_release);
     ps.latency_numer_.store(0, memory_order_release);
+    // the persister may be adding to it
+    ps.clear_latency_hist_.store(true, memory_order_release);
+    // like the per-epoch stats below, this races with the persister, so it
+    // is only called when the logger is idle
+    ps.flush_tail_.store(
+        ps.flush_head_.load(memory_order_acquire), memory_order_release);
     for (size_t e = 0; e < g_max_lag_epochs; e++) {
       auto &pes = ps.d_[e];
       pes.ntxns_.store(0, memory_order_release);
@@ -484,10 +709,151 @@ transaction_proto2_static::InitGC()
   g_flags->g_gc_init.store(true, memory_order_release);
 }
 
+void
+transaction_proto2_static::SetReadOnlyEpochMultiplier(uint64_t m)
+{
+  ALWAYS_ASSERT(m >= 1);
+  ReadOnlyEpochMultiplier = m;
+}
+
+void
+transaction_proto2_static::SetHotRecordThreshold(unsigned n)
+{
+  ALWAYS_ASSERT(n <= HotRecordCountMask);
+  HotRecordThreshold = n;
+}
+
+void
+transaction_proto2_static::SetPessimisticAfterAborts(unsigned n)
+{
+  PessimisticAfterAborts = n;
+}
+
+void
+transaction_proto2_static::SetAbortSamplePeriod(unsigned n)
+{
+  AbortSamplePeriod = n;
+}
+
+void
+transaction_proto2_static::SetAbortKeyPrefixLen(unsigned n)
+{
+  AbortKeyPrefixLen = n;
+}
+
+namespace {
+  // abort_attr counts of one core, by (table, reason, key prefix). tables
+  // are only named when the counts are read, which keeps the catalog lock
+  // off the abort path. the lock is only ever contended by readers of the
+  // counts
+  struct abort_attribution {
+    typedef tuple<const concurrent_btree *,
+                  transaction_base::abort_reason,
+                  string> cause;
+    spinlock lock_;
+    map<cause, uint64_t> counts_;
+  };
+
+  static percore<abort_attribution> g_abort_attributions CACHE_ALIGNED;
+
+  class abort_attribution_source : public counter_source {
+  public:
+    abort_attribution_source()
+    {
+      event_counter::register_source(this);
+    }
+
+    virtual void
+    fill(const string &prefix, map<string, counter_data> &m)
+    {
+      map<const concurrent_btree *, string> names;
+      for (size_t i = 0; i < coreid::NMaxCores; i++) {
+        abort_attribution &a = g_abort_attributions[i];
+        ::lock_guard<spinlock> l(a.lock_);
+        for (auto &p : a.counts_) {
+          const string name = Name(p.first, names);
+          if (name.compare(0, prefix.size(), prefix) == 0)
+            m[name].count_ += p.second;
+        }
+      }
+    }
+
+    virtual void
+    reset()
+    {
+      for (size_t i = 0; i < coreid::NMaxCores; i++) {
+        abort_attribution &a = g_abort_attributions[i];
+        ::lock_guard<spinlock> l(a.lock_);
+        a.counts_.clear();
+      }
+    }
+
+  private:
+    // abort_attr:<table>:<reason>:<key prefix in hex>
+    static string
+    Name(const abort_attribution::cause &c,
+         map<const concurrent_btree *, string> &names)
+    {
+      const concurrent_btree * const btr = get<0>(c);
+      auto it = names.find(btr);
+      if (it == names.end())
+        it = names.emplace(
+            btr, btr ? txn_logger::TableName(btr) : string("<unknown>")).first;
+      // ABORT_REASON_x => x
+      const string reason(transaction_base::AbortReasonStr(get<1>(c)));
+      string name("abort_attr:");
+      name += it->second;
+      name += ":";
+      name += reason.substr(string("ABORT_REASON_").size());
+      name += ":";
+      name += hexify(get<2>(c));
+      return name;
+    }
+  };
+
+  abort_attribution_source g_abort_attribution_source;
+}
+
+void
+transaction_proto2_static::CountAbortCause(
+    const concurrent_btree *btr,
+    const string &key,
+    transaction_base::abort_reason r)
+{
+  abort_attribution &a = g_abort_attributions.my();
+  ::lock_guard<spinlock> l(a.lock_);
+  a.counts_[abort_attribution::cause(
+      btr, r, key.substr(0, AbortKeyPrefixLen))]++;
+}
+
+uint64_t
+transaction_proto2_static::PinSnapshot()
+{
+  // computed exactly like a read-only txn's snapshot, and published while
+  // still guarded. until the guard is released, the epoch cannot advance
+  // far enough for GC to reclaim anything visible in the snapshot, and any
+  // GC pass which reads the epoch after that also sees the pin
+  scoped_rcu_region guard;
+  const uint64_t tid =
+    ComputeReadOnlyTid(ticker::s_instance.global_last_tick_exclusive());
+  ALWAYS_ASSERT(!g_pinned_snapshot->ro_tick_.load(memory_order_acquire));
+  g_pinned_snapshot->tid_.store(tid, memory_order_release);
+  g_pinned_snapshot->ro_tick_.store(
+      to_read_only_tick(EpochId(tid)) + 1, memory_order_release);
+  return tid;
+}
+
+void
+transaction_proto2_static::UnpinSnapshot()
+{
+  INVARIANT(g_pinned_snapshot->ro_tick_.load(memory_order_acquire));
+  g_pinned_snapshot->ro_tick_.store(0, memory_order_release);
+}
+
 static void
 sleep_ro_epoch()
 {
-  const uint64_t sleep_ns = transaction_proto2_static::ReadOnlyEpochUsec * 1000;
+  const uint64_t sleep_ns = transaction_proto2_static::ReadOnlyEpochUsec() * 1000;
   struct timespec t;
   t.tv_sec  = sleep_ns / ONE_SECOND_NS;
   t.tv_nsec = sleep_ns % ONE_SECOND_NS;
@@ -514,7 +880,7 @@ transaction_proto2_static::PurgeThreadOutstandingGCTasks()
       sleep_ro_epoch();
       continue;
     }
-    const uint64_t ro_tick_geq = ro_tick_ex - 1;
+    const uint64_t ro_tick_geq = clamp_to_pinned_snapshot(ro_tick_ex - 1);
     if (ro_tick_geq < e) {
       sleep_ro_epoch();
       continue;
@@ -693,10 +1059,23 @@ transaction_proto2_static::clean_up_to_including(threadctx &ctx, uint64_t ro_tic
   INVARIANT(!rcu::s_instance.in_rcu_region());
 }
 
+uint64_t transaction_proto2_static::ReadOnlyEpochMultiplier =
+  transaction_proto2_static::DefaultReadOnlyEpochMultiplier;
 aligned_padded_elem<transaction_proto2_static::hackstruct>
   transaction_proto2_static::g_hack;
 aligned_padded_elem<transaction_proto2_static::flags>
   transaction_proto2_static::g_flags;
+aligned_padded_elem<transaction_proto2_static::pinned_snapshot>
+  transaction_proto2_static::g_pinned_snapshot;
+__thread bool transaction_proto2_static::tl_use_pinned_snapshot = false;
+unsigned transaction_proto2_static::HotRecordThreshold = 0;
+unsigned transaction_proto2_static::PessimisticAfterAborts = 0;
+std::atomic<uint64_t> transaction_proto2_static::g_hot_records[
+  1 << transaction_proto2_static::HotRecordSlotBits];
+__thread unsigned transaction_proto2_static::tl_nconsecutive_aborts = 0;
+unsigned transaction_proto2_static::AbortSamplePeriod = 0;
+unsigned transaction_proto2_static::AbortKeyPrefixLen = 8;
+__thread unsigned transaction_proto2_static::tl_nsampled_txns = 0;
 percore_lazy<transaction_proto2_static::threadctx>
   transaction_proto2_static::g_threadctxs;
 event_counter
@@ -714,3 +1093,6 @@ event_avg_counter
 event_avg_counter
   transaction_proto2_static::g_evt_avg_proto_gc_queue_len(
       "avg_proto_gc_queue_len");
+event_counter
+  transaction_proto2_static::g_evt_pessimistic_txns(
+      "pessimistic_txns");
@@ -13,6 +13,8 @@
 #include "txn_btree.h"
 #include "macros.h"
 #include "circbuf.h"
+#include "histogram.h"
+#include "log_writer.h"
 #include "spinbarrier.h"
 #include "record/serializer.h"
 
@@ -38,6 +40,9 @@ public:
   static const size_t g_horizon_buffer_size = 2 * (1<<16); // in bytes
   static const size_t g_max_lag_epochs = 128; // cannot lag more than 128 epochs
   static const bool   g_pin_loggers_to_numa_nodes = false;
+  static const size_t g_table_slot_bits = 14;
+  static const size_t g_max_tables = (1<<g_table_slot_bits); // slots in the table id map
+  static const size_t g_max_flushes = g_perthread_buffers; // unreleased buffers per core (group commit)
 
   static inline bool
   IsPersistenceEnabled()
@@ -51,10 +56,22 @@ public:
     return g_use_compression;
   }
 
+  // in group commit mode, workers hand a log buffer to their logger once it
+  // holds g_group_commit_bytes, or its oldest txn is g_group_commit_us old,
+  // instead of at the end of each epoch. loggers and the persister also run
+  // every g_group_commit_us, and txns are released as durable as soon as
+  // the system's persisted TID passes them (see system_sync_tid_)
+  static inline bool
+  IsGroupCommitEnabled()
+  {
+    return g_group_commit_us;
+  }
+
   // init the logging subsystem.
   //
   // should only be called ONCE is not thread-safe.  if assignments_used is not
-  // null, then fills it with a copy of the assignment actually computed
+  // null, then fills it with a copy of the assignment actually computed.
+  // writer_backend picks how loggers write their files (see log_writer.h)
   static void Init(
       size_t nworkers,
       const std::vector<std::string> &logfiles,
@@ -62,11 +79,29 @@ public:
       std::vector<std::vector<unsigned>> *assignments_used = nullptr,
       bool call_fsync = true,
       bool use_compression = false,
-      bool fake_writes = false);
-
+      bool fake_writes = false,
+      uint64_t group_commit_us = 0,
+      size_t group_commit_bytes = 0,
+      log_writer::backend writer_backend = log_writer::BACKEND_POSIX);
+
+  // on disk, a log file is a sequence of [logbuf_header][data] buffers. the
+  // data is a sequence of log entries, or (with compression) a sequence of
+  // [uint32_t len][lz4 block] chunks, each of which decodes to entries. an
+  // entry is:
+  //
+  //   [uint64_t tid][varint nwrites]
+  //     nwrites * [varint table_id][varint klen][key][varint vlen][value]
+  //
+  // where vlen = 0 denotes a removal. table ids are resolved by the catalog
+  // file written next to the first log file (see CatalogFileName()). if vlen
+  // has LogValueDeltaFlag set, the value is a value delta (see
+  // value_delta.h, txn_btree::put_delta()) of vlen & ~LogValueDeltaFlag
+  // bytes, to apply to the key's previous value
+  static const uint32_t LogValueDeltaFlag = 1U << 31;
   struct logbuf_header {
     uint64_t nentries_; // > 0 for all valid log buffers
     uint64_t last_tid_; // TID of the last commit
+    uint32_t datasize_; // bytes following the header, set by the logger
   } PACKED;
 
   struct pbuffer {
@@ -180,9 +215,27 @@ public:
 
   typedef circbuf<pbuffer, g_perthread_buffers> pbuffer_circbuf;
 
+  // should px be handed to the logger early? now_us is the start time of
+  // the txn just written into px
+  static inline bool
+  GroupCommitDue(const pbuffer *px, uint64_t now_us);
+
   static std::tuple<uint64_t, uint64_t, double>
   compute_ntxns_persisted_statistics();
 
+  // distribution of the (conservative) persist latencies, in usec, which
+  // make up the average returned by compute_ntxns_persisted_statistics()
+  static log_histogram
+  compute_persist_latency_histogram();
+
+  // number of txns from core which have been persisted so far
+  static inline uint64_t
+  compute_ntxns_persisted_on_core(unsigned core)
+  {
+    return g_persist_stats[core].ntxns_persisted_.load(
+        std::memory_order_acquire);
+  }
+
   // purge counters from each thread about the number of
   // persisted txns
   static void
@@ -198,6 +251,50 @@ public:
   static void
   wait_until_current_point_persisted();
 
+  // assigns the table backed by btr an id, which is recorded with every
+  // write to btr in the log. a btr which is registered again (e.g. a new
+  // table at the address of a dropped one) gets a fresh id
+  static void
+  RegisterTable(const concurrent_btree *btr, const std::string &name);
+
+  // "<unknown>" if btr was never registered. takes a lock
+  static std::string
+  TableName(const concurrent_btree *btr);
+
+  // 0 if btr was never registered
+  static inline uint32_t
+  TableId(const concurrent_btree *btr)
+  {
+    for (size_t n = 0, i = TableSlot(btr); n < g_max_tables;
+         n++, i = (i + 1) % g_max_tables) {
+      const concurrent_btree *p =
+        g_table_slots[i].btr_.load(std::memory_order_acquire);
+      if (p == btr)
+        return g_table_slots[i].id_.load(std::memory_order_acquire);
+      if (!p)
+        return 0;
+    }
+    return 0;
+  }
+
+  // "table <id> <name>" per line, preceded by a "compress <0|1>" line.
+  // rewritten (atomically) whenever a table is registered
+  static inline std::string
+  CatalogFileName(const std::string &logfile)
+  {
+    return logfile + ".catalog";
+  }
+
+  // the system's persistent epoch (a raw uint64_t): every txn with an epoch
+  // <= this value is durable. in group commit mode, it is followed by the
+  // persisted TID: every txn with a TID <= that value is durable too.
+  // updated by the persister thread
+  static inline std::string
+  PersistentEpochFileName(const std::string &logfile)
+  {
+    return logfile + ".pepoch";
+  }
+
 private:
 
   // data structures
@@ -236,6 +333,22 @@ private:
     // us) for *persisted* txns (is conservative)
     std::atomic<uint64_t> latency_numer_;
 
+    // same latencies, bucketed. only written by the persister thread,
+    // which also clears it, once clear_latency_hist_ asks it to
+    log_histogram latency_hist_;
+    std::atomic<bool> clear_latency_hist_;
+
+    // group commit mode: buffers written by the logger, which are released
+    // once system_sync_tid_ reaches last_tid_. a ring, pushed to by this
+    // core's logger and popped by the persister
+    struct flush_record {
+      uint64_t last_tid_;
+      uint64_t ntxns_;
+      uint64_t earliest_start_us_;
+    } flushes_[g_max_flushes];
+    std::atomic<uint64_t> flush_head_;
+    std::atomic<uint64_t> flush_tail_;
+
     // per last g_max_lag_epochs information
     struct per_epoch_stats {
       std::atomic<uint64_t> ntxns_;
@@ -246,18 +359,56 @@ private:
 
     persist_stats() :
       ntxns_persisted_(0), ntxns_pushed_(0),
-      ntxns_committed_(0), latency_numer_(0) {}
+      ntxns_committed_(0), latency_numer_(0),
+      clear_latency_hist_(false),
+      flush_head_(0), flush_tail_(0) {}
+  };
+
+  struct table_slot {
+    std::atomic<const concurrent_btree *> btr_;
+    std::atomic<uint32_t> id_;
   };
 
   // helpers
 
+  static inline size_t
+  TableSlot(const concurrent_btree *btr)
+  {
+    return (reinterpret_cast<uintptr_t>(btr) * 0x9E3779B97F4A7C15UL) >>
+      (64 - g_table_slot_bits);
+  }
+
+  // called with the table lock held
+  static void
+  write_catalog();
+
+  // the largest TID in epoch e
+  static uint64_t EpochMaxTid(uint64_t e);
+
+  // does the core behind ctx hold txns which were not handed to its logger
+  // yet? only stable while the core is outside a guarded section
+  static inline bool
+  has_unpushed_entries(persist_ctx &ctx)
+  {
+    if (!ctx.init_)
+      return false;
+    pbuffer * const px = ctx.all_buffers_.peek();
+    return (px && px->header()->nentries_) ||
+           (ctx.horizon_ && ctx.horizon_->header()->nentries_);
+  }
+
+  // group commit mode: counts every flushed buffer with a last TID <= tid as
+  // persisted
+  static void
+  release_flushed_txns(uint64_t tid);
+
   static void
   advance_system_sync_epoch(
       const std::vector<std::vector<unsigned>> &assignments);
 
   // makes copy on purpose
   static void writer(
-      unsigned id, int fd,
+      unsigned id, log_writer *w,
       std::vector<unsigned> assignment);
 
   static void persister(
@@ -310,6 +461,18 @@ private:
   static bool g_fake_writes; // whether or not to fake doing writes (to measure
                              // pure overhead of disk)
 
+  static uint64_t g_group_commit_us; // 0 unless in group commit mode
+
+  static size_t g_group_commit_bytes;
+
+  static std::string g_catalog_fname; // empty until Init()
+
+  static int g_pepoch_fd; // -1 until Init()
+
+  // open addressed, never shrinks. writers are serialized by a lock in
+  // RegisterTable(), readers are lock-free
+  static table_slot g_table_slots[g_max_tables];
+
   static size_t g_nworkers; // assignments are computed based on g_nworkers
                             // but a logger responsible for core i is really
                             // responsible for cores i + k * g_nworkers, for k
@@ -328,6 +491,21 @@ private:
   static util::aligned_padded_elem<std::atomic<uint64_t>>
     system_sync_epoch_ CACHE_ALIGNED;
 
+  // group commit mode: v = per_thread_sync_tids_[i].epochs_[j] means logger
+  // i has persisted every transaction <= TID v on core j. a core's next TID
+  // is always larger than its last one, so
+  //   min_{core} max_{logger} per_thread_sync_tids_[logger].epochs_[core]
+  // (with idle cores counted as in per_thread_sync_epochs_) yields a TID
+  // below which every transaction is durable. any transaction a txn read
+  // from has a smaller TID, so the durable set is always consistent
+  static epoch_array
+    per_thread_sync_tids_[g_nmax_loggers] CACHE_ALIGNED;
+
+  // the persisted TID described above (0 outside of group commit mode).
+  // system_sync_epoch_ is the last epoch it covers completely
+  static util::aligned_padded_elem<std::atomic<uint64_t>>
+    system_sync_tid_ CACHE_ALIGNED;
+
   static percore<persist_ctx> g_persist_ctxs CACHE_ALIGNED;
 
   static percore<persist_stats> g_persist_stats CACHE_ALIGNED;
@@ -340,6 +518,8 @@ private:
   static event_counter g_evt_log_buffer_bytes_after_compress;
   static event_counter g_evt_logger_writev_limit_met;
   static event_counter g_evt_logger_max_lag_wait;
+  static event_counter g_evt_log_buffer_group_commit;
+  static event_counter g_evt_logger_flush_ring_full;
   static event_avg_counter g_evt_avg_log_entry_ntxns;
   static event_avg_counter g_evt_avg_log_buffer_compress_time_us;
   static event_avg_counter g_evt_avg_logger_bytes_per_writev;
@@ -350,7 +530,8 @@ static inline std::ostream &
 operator<<(std::ostream &o, txn_logger::logbuf_header &hdr)
 {
   o << "{nentries_=" << hdr.nentries_ << ", last_tid_="
-    << g_proto_version_str(hdr.last_tid_) << "}";
+    << g_proto_version_str(hdr.last_tid_)
+    << ", datasize_=" << hdr.datasize_ << "}";
   return o;
 }
 
@@ -365,18 +546,24 @@ public:
   // subsystem's tick
 
 #ifdef CHECK_INVARIANTS
-  static const uint64_t ReadOnlyEpochMultiplier = 10; /* 10 * 1 ms */
+  static const uint64_t DefaultReadOnlyEpochMultiplier = 10; /* 10 * 1 ms */
 #else
-  static const uint64_t ReadOnlyEpochMultiplier = 25; /* 25 * 40 ms */
-  static_assert(ticker::tick_us * ReadOnlyEpochMultiplier == 1000000, "");
+  static const uint64_t DefaultReadOnlyEpochMultiplier = 25; /* 25 * 40 ms */
 #endif
 
-  static_assert(ReadOnlyEpochMultiplier >= 1, "XX");
+  // ticks per read-only snapshot epoch. only SetReadOnlyEpochMultiplier()
+  // changes it, which must happen before the first txn
+  static uint64_t ReadOnlyEpochMultiplier;
 
-  static const uint64_t ReadOnlyEpochUsec =
-    ticker::tick_us * ReadOnlyEpochMultiplier;
+  static void SetReadOnlyEpochMultiplier(uint64_t m);
+
+  static inline uint64_t
+  ReadOnlyEpochUsec()
+  {
+    return ticker::tick_us() * ReadOnlyEpochMultiplier;
+  }
 
-  static inline uint64_t constexpr
+  static inline uint64_t
   to_read_only_tick(uint64_t epoch_tick)
   {
     return epoch_tick / ReadOnlyEpochMultiplier;
@@ -479,8 +666,56 @@ public:
   // thread-safe, can be called many times
   static void InitGC();
 
+  // snapshot pinning, for readers which need one consistent snapshot across
+  // many read-only txns (a long running txn would hold back the epoch).
+  //
+  // PinSnapshot() pins the snapshot a read-only txn started now would read,
+  // and returns its tid. until UnpinSnapshot(), GC keeps every version
+  // visible in it, and read-only txns started by a thread which called
+  // UsePinnedSnapshot(true) read it. at most one snapshot is pinned at a time
+  static uint64_t PinSnapshot();
+
+  static void UnpinSnapshot();
+
+  static inline void
+  UsePinnedSnapshot(bool use)
+  {
+    tl_use_pinned_snapshot = use;
+  }
+
   static void PurgeThreadOutstandingGCTasks();
 
+  // contention-adaptive concurrency control, for records which keep making
+  // txns abort (at commit, or on an unstable read). each such abort is
+  // counted against the record, and a record counted HotRecordThreshold
+  // times, with no more than HotRecordTicks ticks between counts, is hot:
+  // txns lock it when they read it, instead of validating it at commit.
+  // besides, a thread whose last PessimisticAfterAborts txns all aborted
+  // (user aborts aside) runs the next ones pessimistically, locking every
+  // record they read, until one commits.
+  //
+  // both are off (0) by default, and must not change while txns run
+  static unsigned HotRecordThreshold;
+  static unsigned PessimisticAfterAborts;
+
+  static const uint64_t HotRecordTicks = 25;
+
+  static void SetHotRecordThreshold(unsigned n);
+  static void SetPessimisticAfterAborts(unsigned n);
+
+  // abort attribution: every AbortSamplePeriod-th read/write txn run by a
+  // thread (none if 0) counts why it aborted, if it does (user aborts
+  // aside), as "abort_attr:<table>:<reason>:<key>", where key is the
+  // first AbortKeyPrefixLen bytes of the key of the record at fault, in
+  // hex. counts are kept per core, and read w/ event_counter::get_counters()
+  //
+  // off (0) by default, and must not change while txns run
+  static unsigned AbortSamplePeriod;
+  static unsigned AbortKeyPrefixLen;
+
+  static void SetAbortSamplePeriod(unsigned n);
+  static void SetAbortKeyPrefixLen(unsigned n);
+
 #ifdef PROTO2_CAN_DISABLE_GC
   static inline bool
   IsGCEnabled()
@@ -689,13 +924,85 @@ protected:
   };
   static util::aligned_padded_elem<flags> g_flags;
 
+  struct pinned_snapshot {
+    std::atomic<uint64_t> tid_;
+    std::atomic<uint64_t> ro_tick_; // read-only tick of tid_ + 1, 0 if unpinned
+    constexpr pinned_snapshot() : tid_(0), ro_tick_(0) {}
+  };
+  static util::aligned_padded_elem<pinned_snapshot> g_pinned_snapshot;
+
+  static __thread bool tl_use_pinned_snapshot;
+
+  // GC may only reclaim versions invisible to readers at >= the returned
+  // tick, which accounts for the pinned snapshot
+  static inline uint64_t
+  clamp_to_pinned_snapshot(uint64_t ro_tick_geq)
+  {
+    const uint64_t pinned =
+      g_pinned_snapshot->ro_tick_.load(std::memory_order_acquire);
+    return (pinned && ro_tick_geq >= pinned) ? pinned - 1 : ro_tick_geq;
+  }
+
   static percore_lazy<threadctx> g_threadctxs;
 
+  // abort counts of records, by a hash of the tuple's address (colliding
+  // records share a count, which only costs some extra locking). an entry
+  // is [ count | tick of the last count ], updated w/o atomic RMW, so
+  // concurrent counts may get lost
+  static const size_t HotRecordSlotBits = 16;
+  static const uint64_t HotRecordCountBits = 16;
+  static const uint64_t HotRecordCountMask =
+    (((uint64_t)1) << HotRecordCountBits) - 1;
+
+  static std::atomic<uint64_t> g_hot_records[1 << HotRecordSlotBits];
+
+  static inline std::atomic<uint64_t> &
+  hot_record_entry(const dbtuple *tuple)
+  {
+    const uint64_t h = (uint64_t(uintptr_t(tuple)) >> 4) * 0x9E3779B97F4A7C15UL;
+    return g_hot_records[h >> (64 - HotRecordSlotBits)];
+  }
+
+  static inline bool
+  IsHotRecord(const dbtuple *tuple, uint64_t tick)
+  {
+    if (likely(!HotRecordThreshold))
+      return false;
+    const uint64_t e = hot_record_entry(tuple).load(std::memory_order_relaxed);
+    return (e & HotRecordCountMask) >= HotRecordThreshold &&
+           (e >> HotRecordCountBits) + HotRecordTicks >= tick;
+  }
+
+  static inline void
+  CountContendedRecord(const dbtuple *tuple, uint64_t tick)
+  {
+    std::atomic<uint64_t> &entry = hot_record_entry(tuple);
+    const uint64_t e = entry.load(std::memory_order_relaxed);
+    uint64_t n = e & HotRecordCountMask;
+    if ((e >> HotRecordCountBits) + HotRecordTicks < tick)
+      n = 0; // cooled down
+    if (n < HotRecordCountMask)
+      n++;
+    entry.store((tick << HotRecordCountBits) | n, std::memory_order_relaxed);
+  }
+
+  // consecutive aborts of this thread's txns, if PessimisticAfterAborts
+  static __thread unsigned tl_nconsecutive_aborts;
+
+  // read/write txns started by this thread, if AbortSamplePeriod
+  static __thread unsigned tl_nsampled_txns;
+
+  static void
+  CountAbortCause(const concurrent_btree *btr,
+                  const std::string &key,
+                  transaction_base::abort_reason r);
+
   static event_counter g_evt_worker_thread_wait_log_buffer;
   static event_counter g_evt_dbtuple_no_space_for_delkey;
   static event_counter g_evt_proto_gc_delete_requeue;
   static event_avg_counter g_evt_avg_log_entry_size;
   static event_avg_counter g_evt_avg_proto_gc_queue_len;
+  static event_counter g_evt_pessimistic_txns;
 };
 
 bool
@@ -706,6 +1013,15 @@ txn_logger::pbuffer::can_hold_tid(uint64_t tid) const
           transaction_proto2_static::EpochId(tid));
 }
 
+bool
+txn_logger::GroupCommitDue(const pbuffer *px, uint64_t now_us)
+{
+  INVARIANT(IsGroupCommitEnabled());
+  INVARIANT(px->header()->nentries_);
+  return px->datasize() >= g_group_commit_bytes ||
+         now_us >= px->earliest_start_us_ + g_group_commit_us;
+}
+
 // protocol 2 - no global consistent TIDs
 template <typename Traits>
 class transaction_proto2 : public transaction<transaction_proto2, Traits>,
@@ -728,12 +1044,26 @@ public:
 
   transaction_proto2(uint64_t flags,
                      typename Traits::StringAllocator &sa)
-    : transaction<transaction_proto2, Traits>(flags, sa)
+    : transaction<transaction_proto2, Traits>(flags, sa),
+      pessimistic_(PessimisticAfterAborts &&
+                   tl_nconsecutive_aborts >= PessimisticAfterAborts &&
+                   !(flags & transaction_base::TXN_FLAG_READ_ONLY)),
+      attributes_aborts_(AbortSamplePeriod &&
+                         !(flags & transaction_base::TXN_FLAG_READ_ONLY) &&
+                         (++tl_nsampled_txns % AbortSamplePeriod) == 0)
   {
+    if (unlikely(pessimistic_))
+      ++g_evt_pessimistic_txns;
     if (this->get_flags() & transaction_base::TXN_FLAG_READ_ONLY) {
-      const uint64_t global_tick_ex =
-        this->rcu_guard_->guard()->impl().global_last_tick_exclusive();
-      u_.last_consistent_tid = ComputeReadOnlyTid(global_tick_ex);
+      if (unlikely(tl_use_pinned_snapshot)) {
+        INVARIANT(g_pinned_snapshot->ro_tick_.load(std::memory_order_acquire));
+        u_.last_consistent_tid =
+          g_pinned_snapshot->tid_.load(std::memory_order_acquire);
+      } else {
+        const uint64_t global_tick_ex =
+          this->rcu_guard_->guard()->impl().global_last_tick_exclusive();
+        u_.last_consistent_tid = ComputeReadOnlyTid(global_tick_ex);
+      }
     }
 #ifdef TUPLE_LOCK_OWNERSHIP_CHECKING
     dbtuple::TupleLockRegionBegin();
@@ -743,6 +1073,13 @@ public:
 
   ~transaction_proto2()
   {
+    if (PessimisticAfterAborts && !this->is_snapshot()) {
+      if (this->state == transaction_base::TXN_COMMITED)
+        tl_nconsecutive_aborts = 0;
+      else if (this->state == transaction_base::TXN_ABRT &&
+               this->reason != transaction_base::ABORT_REASON_USER)
+        tl_nconsecutive_aborts++;
+    }
 #ifdef TUPLE_LOCK_OWNERSHIP_CHECKING
     dbtuple::AssertAllTupleLocksReleased();
 #endif
@@ -776,6 +1113,34 @@ public:
     return true;
   }
 
+  inline bool
+  should_lock_at_read(const dbtuple *tuple)
+  {
+    return pessimistic_ ||
+           IsHotRecord(tuple, this->rcu_guard_->guard()->tick());
+  }
+
+  inline void
+  on_contended_tuple(const dbtuple *tuple)
+  {
+    if (HotRecordThreshold)
+      CountContendedRecord(tuple, this->rcu_guard_->guard()->tick());
+  }
+
+  inline bool
+  attributes_aborts() const
+  {
+    return attributes_aborts_;
+  }
+
+  inline void
+  on_abort_cause(const concurrent_btree *btr,
+                 const std::string &key,
+                 transaction_base::abort_reason r)
+  {
+    CountAbortCause(btr, key, r);
+  }
+
   inline void
   on_tid_finish(tid_t commit_tid)
   {
@@ -802,9 +1167,14 @@ public:
     space_needed += vs_uint32_t.nbytes(&nwrites);
 
     // each record needs to be recorded
+    write_set_u32_vec table_ids;
     write_set_u32_vec value_sizes;
     for (unsigned idx = 0; idx < nwrites; idx++) {
       const transaction_base::write_record_t &rec = this->write_set[idx];
+      const uint32_t table_id = txn_logger::TableId(rec.get_btree());
+      space_needed += vs_uint32_t.nbytes(&table_id);
+      table_ids.push_back(table_id);
+
       const uint32_t k_nbytes = rec.get_key().size();
       space_needed += vs_uint32_t.nbytes(&k_nbytes);
       space_needed += k_nbytes;
@@ -813,10 +1183,15 @@ public:
           rec.get_writer()(
               dbtuple::TUPLE_WRITER_COMPUTE_DELTA_NEEDED,
               rec.get_value(), nullptr, 0) : 0;
-      space_needed += vs_uint32_t.nbytes(&v_nbytes);
+      INVARIANT(v_nbytes < txn_logger::LogValueDeltaFlag);
+      const uint32_t v_field =
+        (v_nbytes && rec.get_writer()(
+           dbtuple::TUPLE_WRITER_LOGS_VALUE_DELTA, nullptr, nullptr, 0)) ?
+        (v_nbytes | txn_logger::LogValueDeltaFlag) : v_nbytes;
+      space_needed += vs_uint32_t.nbytes(&v_field);
       space_needed += v_nbytes;
 
-      value_sizes.push_back(v_nbytes);
+      value_sizes.push_back(v_field);
     }
 
     g_evt_avg_log_entry_size.offer(space_needed);
@@ -855,10 +1230,26 @@ public:
 
       INVARIANT(ctx.horizon_->space_remaining() >= space_needed);
       const uint64_t written =
-        write_current_txn_into_buffer(ctx.horizon_, commit_tid, value_sizes);
+        write_current_txn_into_buffer(
+            ctx.horizon_, commit_tid, table_ids, value_sizes);
       if (written != space_needed)
         INVARIANT(false);
 
+      if (txn_logger::IsGroupCommitEnabled() &&
+          txn_logger::GroupCommitDue(
+            ctx.horizon_, this->rcu_guard_->guard()->start_us())) {
+        const uint64_t npushed =
+          push_horizon_to_buffer(ctx.horizon_, ctx.lz4ctx_, pull_buf, push_buf);
+        if (npushed)
+          util::non_atomic_fetch_add(stats.ntxns_pushed_, npushed);
+        // the head buffer now ends with the horizon
+        txn_logger::pbuffer *px0 = pull_buf.deq();
+        INVARIANT(px0 && px0->header()->nentries_);
+        util::non_atomic_fetch_add(stats.ntxns_pushed_, px0->header()->nentries_);
+        push_buf.enq(px0);
+        ++txn_logger::g_evt_log_buffer_group_commit;
+      }
+
     } else {
 
     retry:
@@ -881,9 +1272,19 @@ public:
       }
 
       const uint64_t written =
-        write_current_txn_into_buffer(px, commit_tid, value_sizes);
+        write_current_txn_into_buffer(px, commit_tid, table_ids, value_sizes);
       if (written != space_needed)
         INVARIANT(false);
+
+      if (txn_logger::IsGroupCommitEnabled() &&
+          txn_logger::GroupCommitDue(
+            px, this->rcu_guard_->guard()->start_us())) {
+        txn_logger::pbuffer *px0 = pull_buf.deq();
+        INVARIANT(px == px0);
+        util::non_atomic_fetch_add(stats.ntxns_pushed_, px0->header()->nentries_);
+        push_buf.enq(px0);
+        ++txn_logger::g_evt_log_buffer_group_commit;
+      }
     }
   }
 
@@ -894,6 +1295,7 @@ private:
   write_current_txn_into_buffer(
       txn_logger::pbuffer *px,
       uint64_t commit_tid,
+      const write_set_u32_vec &table_ids,
       const write_set_u32_vec &value_sizes)
   {
     INVARIANT(px->can_hold_tid(commit_tid));
@@ -914,6 +1316,7 @@ private:
 #endif
 
 
+    INVARIANT(nwrites == table_ids.size());
     INVARIANT(nwrites == value_sizes.size());
 
     p = s_uint64_t.write(p, commit_tid);
@@ -921,12 +1324,14 @@ private:
 
     for (unsigned idx = 0; idx < nwrites; idx++) {
       const transaction_base::write_record_t &rec = this->write_set[idx];
+      p = vs_uint32_t.write(p, table_ids[idx]);
       const uint32_t k_nbytes = rec.get_key().size();
       p = vs_uint32_t.write(p, k_nbytes);
       NDB_MEMCPY(p, rec.get_key().data(), k_nbytes);
       p += k_nbytes;
-      const uint32_t v_nbytes = value_sizes[idx];
-      p = vs_uint32_t.write(p, v_nbytes);
+      const uint32_t v_field = value_sizes[idx];
+      const uint32_t v_nbytes = v_field & ~txn_logger::LogValueDeltaFlag;
+      p = vs_uint32_t.write(p, v_field);
       if (v_nbytes) {
         rec.get_writer()(dbtuple::TUPLE_WRITER_DO_DELTA_WRITE, rec.get_value(), p, v_nbytes);
         p += v_nbytes;
@@ -1105,7 +1510,7 @@ public:
     INVARIANT(tuple->opaque.compare_exchange_strong(exp, 1, std::memory_order_acq_rel));
 #endif
 
-    if (likely(key.size() <= tuple->alloc_size)) {
+    if (likely(key.size() <= tuple->value_capacity())) {
       NDB_MEMCPY(tuple->get_value_start(), key.data(), key.size());
       tuple->size = key.size();
 
@@ -1155,8 +1560,9 @@ public:
     if (unlikely(!ro_tick_ex))
       // won't have anything to clean
       return;
-    // all reads happening at >= ro_tick_geq
-    const uint64_t ro_tick_geq = ro_tick_ex - 1;
+    // all reads happening at >= ro_tick_geq. the pinned snapshot must be
+    // loaded after last_tick_ex (see PinSnapshot())
+    const uint64_t ro_tick_geq = clamp_to_pinned_snapshot(ro_tick_ex - 1);
     threadctx &ctx = g_threadctxs.my();
     clean_up_to_including(ctx, ro_tick_geq);
   }
@@ -1170,14 +1576,21 @@ private:
     // the epoch for this txn -- committing non-snapshot txns only
     uint64_t commit_epoch;
   } u_;
+
+  // lock every record read (see PessimisticAfterAborts)
+  const bool pessimistic_;
+
+  // sampled for abort attribution (see AbortSamplePeriod)
+  const bool attributes_aborts_;
 };
 
 // txn_btree_handler specialization
 template <>
 struct base_txn_btree_handler<transaction_proto2> {
   static inline void
-  on_construct()
+  on_construct(const std::string &name, const concurrent_btree *btr)
   {
+    txn_logger::RegisterTable(btr, name);
 #ifndef PROTO2_CAN_DISABLE_GC
     transaction_proto2_static::InitGC();
 #endif
@@ -1253,6 +1666,20 @@ struct txn_epoch_sync<transaction_proto2> : public transaction_proto2_static {
       return std::make_tuple(0, 0, 0.0);
     return txn_logger::compute_ntxns_persisted_statistics();
   }
+  static log_histogram
+  compute_persist_latency_histogram()
+  {
+    if (!txn_logger::IsPersistenceEnabled())
+      return log_histogram();
+    return txn_logger::compute_persist_latency_histogram();
+  }
+  static uint64_t
+  compute_ntxn_persisted_on_core(unsigned core)
+  {
+    if (!txn_logger::IsPersistenceEnabled())
+      return 0;
+    return txn_logger::compute_ntxns_persisted_on_core(core);
+  }
   static void
   reset_ntxn_persisted()
   {
@@ -1260,6 +1687,26 @@ struct txn_epoch_sync<transaction_proto2> : public transaction_proto2_static {
       return;
     txn_logger::clear_ntxns_persisted_statistics();
   }
+  static bool
+  pin_snapshot(uint64_t &epoch)
+  {
+#ifdef PROTO2_CAN_DISABLE_SNAPSHOTS
+    if (!IsSnapshotsEnabled())
+      return false;
+#endif
+    epoch = EpochId(PinSnapshot());
+    return true;
+  }
+  static void
+  unpin_snapshot()
+  {
+    UnpinSnapshot();
+  }
+  static void
+  use_pinned_snapshot(bool use)
+  {
+    UsePinnedSnapshot(use);
+  }
 };
 
 #endif /* _NDB_TXN_PROTO2_IMPL_H_ */
@@ -323,6 +323,8 @@ struct typed_txn_btree_ {
     case dbtuple::TUPLE_WRITER_DO_DELTA_WRITE:
       do_delta_write_standalone(vx, Fields, p, sz);
       return 0;
+    case dbtuple::TUPLE_WRITER_LOGS_VALUE_DELTA:
+      return 0;
     }
     ALWAYS_ASSERT(false);
     return 0;
@@ -0,0 +1,138 @@
+#ifndef _NDB_VALUE_DELTA_H_
+#define _NDB_VALUE_DELTA_H_
+
+#include <stdint.h>
+#include <algorithm>
+#include <limits>
+#include <string>
+
+#include "macros.h"
+#include "record/serializer.h"
+
+// a value delta describes a new version of a record value by the byte
+// ranges in which it differs from the old one:
+//
+//   [uint32_t new size][varint off][varint len][len bytes]...
+//
+// where a new size of 0 means the size does not change (values are never
+// empty). applying a delta copies each range over the old value, in
+// order, and then truncates or extends it to the new size. a delta has to
+// cover every byte which changes, including all of those past the old
+// size, so applying the same deltas again, in the same order, gives the
+// same value (which is why recovery can replay deltas over a checkpoint
+// which already has some of them).
+//
+// deltas of typed records are made by EncodeDelta() (see record/encoder.h),
+// and put into a txn_btree by txn_btree::put_delta()
+class value_delta {
+public:
+
+  static const size_t HeaderSize = sizeof(uint32_t);
+
+  // starts an empty delta, which keeps the size
+  static inline void
+  Init(std::string &delta)
+  {
+    delta.assign(HeaderSize, 0);
+  }
+
+  // appends the range [off, off+len), and returns where its len new bytes
+  // go (valid until delta is changed again)
+  static inline uint8_t *
+  AddRange(std::string &delta, size_t off, size_t len)
+  {
+    INVARIANT(delta.size() >= HeaderSize);
+    serializer<uint32_t, true> vs_uint32_t;
+    uint8_t buf[2 * serializer<uint32_t, true>::max_nbytes()];
+    uint8_t *p = vs_uint32_t.write(&buf[0], off);
+    p = vs_uint32_t.write(p, len);
+    delta.append((const char *) &buf[0], p - &buf[0]);
+    const size_t pos = delta.size();
+    delta.resize(pos + len);
+    return (uint8_t *) &delta[pos];
+  }
+
+  static inline void
+  SetNewSize(std::string &delta, size_t new_size)
+  {
+    INVARIANT(delta.size() >= HeaderSize);
+    INVARIANT(new_size <= std::numeric_limits<uint32_t>::max());
+    serializer<uint32_t, false>::write((uint8_t *) &delta[0], new_size);
+  }
+
+  // the size of the value, once delta is applied to one of old_size bytes
+  static inline size_t
+  NewSize(const uint8_t *delta, size_t old_size)
+  {
+    uint32_t new_size;
+    serializer<uint32_t, false>::read(delta, &new_size);
+    return new_size ? new_size : old_size;
+  }
+
+  static inline size_t
+  NewSize(const std::string &delta, size_t old_size)
+  {
+    INVARIANT(delta.size() >= HeaderSize);
+    return NewSize((const uint8_t *) delta.data(), old_size);
+  }
+
+  // applies a well formed delta to the value in [v, v+old_size), in place.
+  // [v, v+NewSize(delta, old_size)) must be valid memory
+  static inline void
+  Apply(uint8_t *v, const uint8_t *delta, size_t nbytes)
+  {
+    INVARIANT(nbytes >= HeaderSize);
+    serializer<uint32_t, true> vs_uint32_t;
+    const uint8_t *p = delta + HeaderSize;
+    const uint8_t * const end = delta + nbytes;
+    while (p < end) {
+      uint32_t off, len;
+      p = vs_uint32_t.read(p, &off);
+      p = vs_uint32_t.read(p, &len);
+      NDB_MEMCPY(v + off, p, len);
+      p += len;
+    }
+    INVARIANT(p == end);
+  }
+
+  static inline void
+  Apply(uint8_t *v, const std::string &delta)
+  {
+    Apply(v, (const uint8_t *) delta.data(), delta.size());
+  }
+
+  // applies delta to v, checking that it is well formed (for deltas read
+  // back from a log). returns false, leaving v unspecified, if not
+  static inline bool
+  FailsafeApply(std::string &v, const uint8_t *delta, size_t nbytes)
+  {
+    if (unlikely(nbytes < HeaderSize))
+      return false;
+    serializer<uint32_t, true> vs_uint32_t;
+    const size_t new_size = NewSize(delta, v.size());
+    const uint8_t *p = delta + HeaderSize;
+    const uint8_t * const end = delta + nbytes;
+    while (p < end) {
+      uint32_t off, len;
+      if (unlikely(!(p = vs_uint32_t.failsafe_read(p, end - p, &off)) ||
+                   !(p = vs_uint32_t.failsafe_read(p, end - p, &len)) ||
+                   size_t(end - p) < len ||
+                   size_t(off) + len > std::max(new_size, v.size())))
+        return false;
+      if (off + len > v.size())
+        v.resize(off + len);
+      NDB_MEMCPY(&v[off], p, len);
+      p += len;
+    }
+    v.resize(new_size);
+    return true;
+  }
+
+  static inline bool
+  FailsafeApply(std::string &v, const std::string &delta)
+  {
+    return FailsafeApply(v, (const uint8_t *) delta.data(), delta.size());
+  }
+};
+
+#endif /* _NDB_VALUE_DELTA_H_ */
@@ -219,4 +219,27 @@ typedef obj_varkey<int32_t>  s32_varkey;
 typedef obj_varkey<uint64_t> u64_varkey;
 typedef obj_varkey<int64_t>  s64_varkey;
 
+// a key of one or two 64-bit words, most significant first, stored big
+// endian (word by word, as u64_varkey stores one), so that byte order is
+// numeric order. the words live in the object, so copies would point into
+// the original: pass it by reference
+class int_varkey : public varkey {
+public:
+  static const size_t MaxWords = 2;
+
+  inline int_varkey(const uint64_t *k, size_t nwords)
+    : varkey((const uint8_t *) &words[0], nwords * sizeof(uint64_t))
+  {
+    INVARIANT(nwords >= 1 && nwords <= MaxWords);
+    for (size_t i = 0; i < nwords; i++)
+      words[i] = util::big_endian_trfm<uint64_t>()(k[i]);
+  }
+
+  int_varkey(const int_varkey &) = delete;
+  int_varkey &operator=(const int_varkey &) = delete;
+
+private:
+  uint64_t words[MaxWords];
+};
+
 #endif /* _NDB_VARKEY_H_ */